@@ -0,0 +1,28 @@
+"""
+Revision ID: 007_add_cache_tokens
+Revises: 006_add_contenido_to_prompt_item
+Create Date: 2026-10-17
+
+Alembic migration: agrega los tokens leídos/escritos en la caché de prompts del
+proveedor a noticia_salida y metricas_valor_periodistico
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007_add_cache_tokens'
+down_revision = '006_add_contenido_to_prompt_item'
+branch_labels = None
+depends_on = None
+
+TABLAS = ('noticia_salida', 'metricas_valor_periodistico')
+
+def upgrade():
+    for tabla in TABLAS:
+        op.add_column(tabla, sa.Column('tokens_cache_lectura', sa.Integer(), nullable=True, server_default='0'))
+        op.add_column(tabla, sa.Column('tokens_cache_escritura', sa.Integer(), nullable=True, server_default='0'))
+
+def downgrade():
+    for tabla in TABLAS:
+        op.drop_column(tabla, 'tokens_cache_escritura')
+        op.drop_column(tabla, 'tokens_cache_lectura')
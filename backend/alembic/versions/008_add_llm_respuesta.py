@@ -0,0 +1,29 @@
+"""
+Revision ID: 008_add_llm_respuesta
+Revises: 007_add_cache_tokens
+Create Date: 2026-10-17
+
+Alembic migration: agrega a noticia_salida el LLM que respondió realmente
+(con failover/hedging puede no ser el LLM pedido)
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008_add_llm_respuesta'
+down_revision = '007_add_cache_tokens'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('noticia_salida', sa.Column('llm_respuesta_id', sa.Integer(), nullable=True))
+    op.add_column('noticia_salida', sa.Column('modelo_respuesta', sa.String(length=100), nullable=True))
+    op.create_foreign_key(
+        'fk_noticia_salida_llm_respuesta', 'noticia_salida', 'llm_maestro',
+        ['llm_respuesta_id'], ['id'], ondelete='SET NULL'
+    )
+
+def downgrade():
+    op.drop_constraint('fk_noticia_salida_llm_respuesta', 'noticia_salida', type_='foreignkey')
+    op.drop_column('noticia_salida', 'modelo_respuesta')
+    op.drop_column('noticia_salida', 'llm_respuesta_id')
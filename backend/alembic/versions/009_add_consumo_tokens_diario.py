@@ -0,0 +1,32 @@
+"""
+Revision ID: 009_add_consumo_tokens_diario
+Revises: 008_add_llm_respuesta
+Create Date: 2026-10-17
+
+Alembic migration: tabla consumo_tokens_diario, contador diario de tokens por
+LLM/usuario usado por el presupuesto de tokens cuando no hay Redis
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009_add_consumo_tokens_diario'
+down_revision = '008_add_llm_respuesta'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'consumo_tokens_diario',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('ambito', sa.String(length=20), nullable=False),
+        sa.Column('entidad_id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=False),
+        sa.Column('tokens', sa.Integer(), nullable=False, server_default='0'),
+        sa.UniqueConstraint('ambito', 'entidad_id', 'fecha', name='uq_consumo_tokens_diario')
+    )
+    op.create_index('ix_consumo_tokens_diario_id', 'consumo_tokens_diario', ['id'])
+
+def downgrade():
+    op.drop_index('ix_consumo_tokens_diario_id', table_name='consumo_tokens_diario')
+    op.drop_table('consumo_tokens_diario')
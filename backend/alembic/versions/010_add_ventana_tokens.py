@@ -0,0 +1,33 @@
+"""
+Revision ID: 010_add_ventana_tokens
+Revises: 009_add_consumo_tokens_diario
+Create Date: 2026-10-17
+
+Alembic migration: tabla ventana_tokens con los anillos de consumo por minuto,
+hora y día de cada LLM, usuario y sección
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010_add_ventana_tokens'
+down_revision = '009_add_consumo_tokens_diario'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'ventana_tokens',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('ambito', sa.String(length=20), nullable=False),
+        sa.Column('entidad_id', sa.Integer(), nullable=False),
+        sa.Column('escala', sa.String(length=10), nullable=False),
+        sa.Column('ranuras', sa.JSON(), nullable=False),
+        sa.Column('actualizado_en', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('ambito', 'entidad_id', 'escala', name='uq_ventana_tokens')
+    )
+    op.create_index('ix_ventana_tokens_id', 'ventana_tokens', ['id'])
+
+def downgrade():
+    op.drop_index('ix_ventana_tokens_id', table_name='ventana_tokens')
+    op.drop_table('ventana_tokens')
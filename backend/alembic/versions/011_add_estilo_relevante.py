@@ -0,0 +1,24 @@
+"""
+Revision ID: 011_add_estilo_relevante
+Revises: 010_add_ventana_tokens
+Create Date: 2026-10-17
+
+Alembic migration: estilo_item.incluir_siempre y salida_maestro.estilo_top_k para
+enviar solo las reglas de estilo relevantes para cada noticia
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011_add_estilo_relevante'
+down_revision = '010_add_ventana_tokens'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('estilo_item', sa.Column('incluir_siempre', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column('salida_maestro', sa.Column('estilo_top_k', sa.Integer(), nullable=True))
+
+def downgrade():
+    op.drop_column('salida_maestro', 'estilo_top_k')
+    op.drop_column('estilo_item', 'incluir_siempre')
@@ -0,0 +1,53 @@
+"""
+Revision ID: 012_add_generation_jobs
+Revises: 011_add_estilo_relevante
+Create Date: 2026-10-17
+
+Alembic migration: tabla generation_jobs para la cola persistente de generación
+(los workers reclaman trabajos con SELECT ... FOR UPDATE SKIP LOCKED)
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '012_add_generation_jobs'
+down_revision = '011_add_estilo_relevante'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'generation_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('noticia_id', sa.Integer(), sa.ForeignKey('noticias.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('llm_id', sa.Integer(), sa.ForeignKey('llm_maestro.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('usuario_id', sa.Integer(), sa.ForeignKey('usuarios.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('salidas_ids', sa.JSON(), nullable=False),
+        sa.Column('regenerar', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('modo_combinado', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('estado', sa.String(length=20), nullable=False, server_default='pendiente'),
+        sa.Column('intentos', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_intentos', sa.Integer(), nullable=False, server_default='3'),
+        sa.Column('resultados', sa.JSON(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('worker', sa.String(length=100), nullable=True),
+        sa.Column('disponible_en', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('iniciado_en', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('latido_en', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('terminado_en', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True)
+    )
+    op.create_index('ix_generation_jobs_id', 'generation_jobs', ['id'])
+    op.create_index('ix_generation_jobs_noticia_id', 'generation_jobs', ['noticia_id'])
+    op.create_index('ix_generation_jobs_usuario_id', 'generation_jobs', ['usuario_id'])
+    op.create_index('ix_generation_jobs_estado', 'generation_jobs', ['estado'])
+    op.create_index('ix_generation_jobs_disponible_en', 'generation_jobs', ['disponible_en'])
+
+def downgrade():
+    op.drop_index('ix_generation_jobs_disponible_en', table_name='generation_jobs')
+    op.drop_index('ix_generation_jobs_estado', table_name='generation_jobs')
+    op.drop_index('ix_generation_jobs_usuario_id', table_name='generation_jobs')
+    op.drop_index('ix_generation_jobs_noticia_id', table_name='generation_jobs')
+    op.drop_index('ix_generation_jobs_id', table_name='generation_jobs')
+    op.drop_table('generation_jobs')
@@ -0,0 +1,24 @@
+"""
+Revision ID: 013_add_prioridad_generacion
+Revises: 012_add_generation_jobs
+Create Date: 2026-10-17
+
+Alembic migration: noticias.tipo (breaking/feature/opinion) y
+generation_jobs.prioridad para los carriles de prioridad de generación
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '013_add_prioridad_generacion'
+down_revision = '012_add_generation_jobs'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('noticias', sa.Column('tipo', sa.String(length=20), nullable=False, server_default='feature'))
+    op.add_column('generation_jobs', sa.Column('prioridad', sa.String(length=10), nullable=False, server_default='normal'))
+
+def downgrade():
+    op.drop_column('generation_jobs', 'prioridad')
+    op.drop_column('noticias', 'tipo')
@@ -0,0 +1,56 @@
+"""
+Revision ID: 014_add_bulk_regeneraciones
+Revises: 013_add_prioridad_generacion
+Create Date: 2026-10-17
+
+Alembic migration: tabla bulk_regeneraciones (regeneración masiva por filtro) y
+generation_jobs.regeneracion_id para enlazar los trabajos que encola
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '014_add_bulk_regeneraciones'
+down_revision = '013_add_prioridad_generacion'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'bulk_regeneraciones',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('usuario_id', sa.Integer(), sa.ForeignKey('usuarios.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('llm_id', sa.Integer(), sa.ForeignKey('llm_maestro.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('filtro', sa.JSON(), nullable=False),
+        sa.Column('salidas_ids', sa.JSON(), nullable=True),
+        sa.Column('modo', sa.String(length=10), nullable=False, server_default='cola'),
+        sa.Column('modo_combinado', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('estado', sa.String(length=20), nullable=False, server_default='en_curso'),
+        sa.Column('total_noticias', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('noticias_enviadas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cursor_noticia_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cursor_agotado', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('salidas_completadas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('salidas_con_error', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('lotes_batch', sa.JSON(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('terminado_en', sa.DateTime(timezone=True), nullable=True)
+    )
+    op.create_index('ix_bulk_regeneraciones_id', 'bulk_regeneraciones', ['id'])
+    op.create_index('ix_bulk_regeneraciones_usuario_id', 'bulk_regeneraciones', ['usuario_id'])
+    op.create_index('ix_bulk_regeneraciones_estado', 'bulk_regeneraciones', ['estado'])
+    op.add_column('generation_jobs', sa.Column(
+        'regeneracion_id', sa.Integer(),
+        sa.ForeignKey('bulk_regeneraciones.id', ondelete='SET NULL'), nullable=True
+    ))
+    op.create_index('ix_generation_jobs_regeneracion_id', 'generation_jobs', ['regeneracion_id'])
+
+def downgrade():
+    op.drop_index('ix_generation_jobs_regeneracion_id', table_name='generation_jobs')
+    op.drop_column('generation_jobs', 'regeneracion_id')
+    op.drop_index('ix_bulk_regeneraciones_estado', table_name='bulk_regeneraciones')
+    op.drop_index('ix_bulk_regeneraciones_usuario_id', table_name='bulk_regeneraciones')
+    op.drop_index('ix_bulk_regeneraciones_id', table_name='bulk_regeneraciones')
+    op.drop_table('bulk_regeneraciones')
@@ -0,0 +1,24 @@
+"""
+Revision ID: 015_add_huella_entradas
+Revises: 014_add_bulk_regeneraciones
+Create Date: 2026-10-17
+
+Alembic migration: noticia_salida.huella_entradas (regeneración incremental) y
+bulk_regeneraciones.salidas_omitidas
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '015_add_huella_entradas'
+down_revision = '014_add_bulk_regeneraciones'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('noticia_salida', sa.Column('huella_entradas', sa.JSON(), nullable=True))
+    op.add_column('bulk_regeneraciones', sa.Column('salidas_omitidas', sa.Integer(), nullable=False, server_default='0'))
+
+def downgrade():
+    op.drop_column('bulk_regeneraciones', 'salidas_omitidas')
+    op.drop_column('noticia_salida', 'huella_entradas')
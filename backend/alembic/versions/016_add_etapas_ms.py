@@ -0,0 +1,21 @@
+"""
+Revision ID: 016_add_etapas_ms
+Revises: 015_add_huella_entradas
+Create Date: 2026-10-17
+
+Alembic migration: noticia_salida.etapas_ms (latencia por etapa de la generación)
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '016_add_etapas_ms'
+down_revision = '015_add_huella_entradas'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('noticia_salida', sa.Column('etapas_ms', sa.JSON(), nullable=True))
+
+def downgrade():
+    op.drop_column('noticia_salida', 'etapas_ms')
@@ -0,0 +1,21 @@
+"""
+Revision ID: 017_add_paso_hasta_bulk
+Revises: 016_add_etapas_ms
+Create Date: 2026-10-17
+
+Alembic migration: bulk_regeneraciones.paso_hasta (paso batch reclamado por un proceso)
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '017_add_paso_hasta_bulk'
+down_revision = '016_add_etapas_ms'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('bulk_regeneraciones', sa.Column('paso_hasta', sa.DateTime(timezone=True), nullable=True))
+
+def downgrade():
+    op.drop_column('bulk_regeneraciones', 'paso_hasta')
@@ -14,6 +14,7 @@ except ImportError:
     logging.warning("redis no está instalado. Cache deshabilitado.")
 
 from config import settings
+from core import metricas_prometheus
 
 logger = logging.getLogger(__name__)
 
@@ -56,9 +57,11 @@ class CacheService:
             value = await self.redis.get(key)
             if value:
                 logger.debug(f"Cache hit: {key}")
+            metricas_prometheus.contar_consulta_cache(key, "hit" if value else "miss")
             return value
         except Exception as e:
             logger.error(f"Error obteniendo de cache: {str(e)}")
+            metricas_prometheus.contar_consulta_cache(key, "error")
             return None
     
     async def set(
@@ -1,20 +1,37 @@
 """
 Configuración de la base de datos con SQLAlchemy
 Gestión de sesiones y conexiones
+
+Dos engines sobre la misma base de datos mientras dura la migración a async:
+
+- engine / SessionLocal / get_db: síncronos (psycopg2). Los usan los routers
+  aún no migrados, los servicios (cola, generador) y el worker.
+- get_async_engine() / AsyncSessionLocal / get_async_db: asyncpg. Las rutas
+  async migradas (noticias, secciones, salidas, prompts) consultan con await y
+  no bloquean el event loop. Con AsyncSession no hay carga perezosa de
+  relaciones: las que se lean deben pedirse con las opciones de models/cargas.py.
+
+El engine async se crea al primer uso: sin asyncpg instalado la app arranca y
+solo fallan las consultas de las rutas migradas.
 """
+from threading import Lock
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
 from config import settings
 
-# Motor de base de datos
+# Motor de base de datos (SQLite solo como sustituto local, p.ej. scripts/benchmark_api.py:
+# las dependencias síncronas usan la conexión desde el pool de hilos)
 engine = create_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,  # Log SQL queries en desarrollo
     pool_pre_ping=True,   # Verificar conexiones
     pool_size=10,
-    max_overflow=20
+    max_overflow=20,
+    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
 )
 
 # Sesión local
@@ -24,6 +41,61 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# Drivers async equivalentes a los síncronos de DATABASE_URL
+DRIVERS_ASYNC = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+_async_lock = Lock()
+_async_engine: Optional[AsyncEngine] = None
+
+
+def url_async(url: str) -> str:
+    """DATABASE_URL con el driver async: postgresql(+psycopg2):// -> postgresql+asyncpg://"""
+    url = make_url(url)
+    driver = DRIVERS_ASYNC.get(url.get_backend_name())
+    if driver is None or url.drivername in DRIVERS_ASYNC.values():
+        return url.render_as_string(hide_password=False)
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    """Engine async (DATABASE_ASYNC_URL o DATABASE_URL con driver async), creado al primer uso"""
+    global _async_engine
+    with _async_lock:
+        if _async_engine is None:
+            url = settings.DATABASE_ASYNC_URL or url_async(settings.DATABASE_URL)
+            opciones = {} if url.startswith("sqlite") else {
+                "pool_size": settings.DB_ASYNC_POOL_SIZE,
+                "max_overflow": settings.DB_ASYNC_MAX_OVERFLOW
+            }
+            _async_engine = create_async_engine(url, echo=settings.DEBUG, pool_pre_ping=True, **opciones)
+        return _async_engine
+
+
+async def cerrar_async_engine() -> None:
+    """Cierra las conexiones del engine async (apagado)"""
+    global _async_engine
+    with _async_lock:
+        motor, _async_engine = _async_engine, None
+    if motor is not None:
+        await motor.dispose()
+
+
+class _SesionAsync(Session):
+    """Session interna de AsyncSession: sin bind propio usa get_async_engine() al ejecutar, no al crearse"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.bind is None:
+            return get_async_engine().sync_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+# Sesión async: sin expirar al hacer commit (tras el commit no se puede recargar perezosamente)
+AsyncSessionLocal = async_sessionmaker(
+    sync_session_class=_SesionAsync,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base para modelos
 Base = declarative_base()
 
@@ -40,6 +112,15 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency para obtener sesión async de BD
+    Uso: db: AsyncSession = Depends(get_async_db)
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """
     Inicializar base de datos
@@ -0,0 +1,257 @@
+"""
+Logging estructurado del backend
+backend/core/logs.py
+
+Sustituye a los print() del camino caliente (generador_ia, routers, cola). Los
+módulos usan logging.getLogger(__name__) con formato perezoso:
+
+    logger.debug("Prompt enviado al LLM (%d caracteres): %s", len(prompt), logs.truncar(prompt), extra=logs.MUESTREO)
+
+- El mensaje solo se formatea si el nivel está activo; truncar() tampoco corta
+  el texto hasta entonces. Los payloads (prompts, respuestas) se recortan a
+  LOG_MAX_CARACTERES.
+- extra=MUESTREO marca registros de payload: solo se emite 1 de cada
+  LOG_MUESTREO_PAYLOAD por mensaje.
+- El handler de la raíz es un QueueHandler: la petición solo encola el registro
+  y un hilo (QueueListener) escribe en stdout. Ni el disco ni un stdout lento
+  bloquean el event loop.
+- Cada registro lleva correlacion_id: el id de la petición (cabecera
+  X-Request-ID, o uno nuevo que se devuelve en la respuesta) o "trabajo-<id>"
+  en la cola de generación.
+- El nivel se cambia en caliente con PUT /api/admin/settings/logging.
+"""
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Dict, Iterator, Optional
+
+from config import settings
+
+CABECERA_CORRELACION = "X-Request-ID"
+FORMATO_TEXTO = "%(asctime)s %(levelname)-7s [%(correlacion_id)s] %(name)s: %(message)s"
+NIVELES = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+# extra= de los registros de payload sujetos a muestreo
+MUESTREO = {"muestreo": True}
+
+_correlacion: ContextVar[str] = ContextVar("correlacion_id", default="-")
+
+_lock = Lock()
+_cola: Optional[queue.SimpleQueue] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_manejador: Optional[logging.Handler] = None
+_muestreo = {"cada": max(1, settings.LOG_MUESTREO_PAYLOAD)}
+_contadores_muestreo: Dict[Any, Any] = {}
+_estadisticas = {"payload_descartados": 0}
+
+
+def _contar(clave: str, n: int = 1) -> None:
+    with _lock:
+        _estadisticas[clave] += n
+
+
+# ==================== CORRELACIÓN ====================
+
+def nuevo_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def correlacion_actual() -> str:
+    return _correlacion.get()
+
+
+@contextmanager
+def correlacion(identificador: Optional[str] = None) -> Iterator[str]:
+    """Asocia los registros del bloque (y de las tareas que cree) a `identificador`"""
+    identificador = identificador or nuevo_id()
+    token = _correlacion.set(identificador)
+    try:
+        yield identificador
+    finally:
+        _correlacion.reset(token)
+
+
+class MiddlewareCorrelacion:
+    """Middleware ASGI: id de correlación por petición (X-Request-ID de entrada o uno nuevo)"""
+
+    __slots__ = ("app",)
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cabecera = CABECERA_CORRELACION.lower().encode("latin-1")
+        recibido = next((valor for nombre, valor in scope.get("headers", []) if nombre == cabecera), b"")
+        # Se acepta el id del cliente/proxy solo si es corto e imprimible
+        identificador = recibido.decode("latin-1")[:64] if recibido and recibido.isascii() else nuevo_id()
+
+        async def _send(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje.setdefault("headers", [])
+                mensaje["headers"] = list(mensaje["headers"]) + [(cabecera, identificador.encode("latin-1"))]
+            await send(mensaje)
+
+        with correlacion(identificador):
+            await self.app(scope, receive, _send)
+
+
+# ==================== PAYLOADS ====================
+
+class Truncado:
+    """Texto que se recorta al formatear el registro (no antes: si el nivel no está activo, no cuesta nada)"""
+
+    __slots__ = ("valor", "limite")
+
+    def __init__(self, valor: Any, limite: Optional[int] = None):
+        self.valor = valor
+        self.limite = limite
+
+    def __str__(self) -> str:
+        texto = self.valor if isinstance(self.valor, str) else str(self.valor)
+        limite = self.limite or settings.LOG_MAX_CARACTERES
+        if len(texto) <= limite:
+            return texto
+        return f"{texto[:limite]}… [+{len(texto) - limite} caracteres]"
+
+
+def truncar(valor: Any, limite: Optional[int] = None) -> Truncado:
+    return Truncado(valor, limite)
+
+
+class FiltroContexto(logging.Filter):
+    """Añade correlacion_id al registro (corre en el hilo que registra, antes de encolar)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlacion_id = _correlacion.get()
+        return True
+
+
+class FiltroMuestreo(logging.Filter):
+    """Deja pasar 1 de cada LOG_MUESTREO_PAYLOAD registros marcados con extra=MUESTREO, por mensaje"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "muestreo", False):
+            return True
+        clave = (record.name, record.msg)
+        contador = _contadores_muestreo.get(clave)
+        if contador is None:
+            contador = _contadores_muestreo.setdefault(clave, itertools.count())
+        if next(contador) % _muestreo["cada"] == 0:
+            return True
+        _contar("payload_descartados")
+        return False
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": self.formatTime(record),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "correlacion_id": getattr(record, "correlacion_id", "-"),
+            "mensaje": record.getMessage()
+        }
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False)
+
+
+# ==================== CONFIGURACIÓN ====================
+
+def configurar(nivel: Optional[str] = None, formato: Optional[str] = None, destino: Any = None) -> None:
+    """
+    Instala el QueueHandler en la raíz y arranca el hilo escritor (idempotente)
+
+    Args:
+        nivel: nivel inicial (por defecto LOG_LEVEL)
+        formato: "texto" o "json" (por defecto LOG_FORMATO)
+        destino: stream donde escribe el hilo (por defecto sys.stdout)
+    """
+    global _cola, _listener, _manejador
+    with _lock:
+        if _listener is not None:
+            return
+        _cola = queue.SimpleQueue()
+        salida = logging.StreamHandler(destino or sys.stdout)
+        if (formato or settings.LOG_FORMATO) == "json":
+            salida.setFormatter(FormatoJSON())
+        else:
+            salida.setFormatter(logging.Formatter(FORMATO_TEXTO))
+        _manejador = logging.handlers.QueueHandler(_cola)
+        _manejador.addFilter(FiltroContexto())
+        _manejador.addFilter(FiltroMuestreo())
+        logging.getLogger().addHandler(_manejador)
+        _listener = logging.handlers.QueueListener(_cola, salida)
+        _listener.start()
+    set_nivel(nivel or settings.LOG_LEVEL)
+
+
+def detener() -> None:
+    """Quita el QueueHandler, escribe lo pendiente y para el hilo escritor (apagado)"""
+    global _listener, _manejador
+    with _lock:
+        listener, _listener = _listener, None
+        manejador, _manejador = _manejador, None
+    if manejador is not None:
+        logging.getLogger().removeHandler(manejador)
+    if listener is not None:
+        listener.stop()
+
+
+def set_nivel(nivel: str, logger: Optional[str] = None) -> None:
+    """
+    Cambia el nivel de la raíz o de un logger concreto ("services.generador_ia")
+
+    Raises:
+        ValueError: nivel desconocido
+    """
+    nivel = str(nivel).upper()
+    if nivel not in NIVELES:
+        raise ValueError(f"Nivel de log no válido: {nivel} (usar {', '.join(NIVELES)})")
+    logging.getLogger(logger or None).setLevel(nivel)
+
+
+def set_muestreo_payload(cada: int) -> None:
+    if cada < 1:
+        raise ValueError("El muestreo debe ser 1 o mayor")
+    _muestreo["cada"] = int(cada)
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    """Nivel de la raíz, loggers con nivel propio, muestreo y registros pendientes de escribir"""
+    propios = {
+        nombre: logging.getLevelName(logger.level)
+        for nombre, logger in sorted(logging.root.manager.loggerDict.items())
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET
+        and nombre.split(".")[0] in ("services", "routers", "core", "main")
+    }
+    with _lock:
+        estadisticas = dict(_estadisticas)
+        pendientes = _cola.qsize() if _cola is not None else 0
+    return {
+        "nivel": logging.getLevelName(logging.getLogger().level),
+        "loggers": propios,
+        "muestreo_payload": _muestreo["cada"],
+        "en_cola": pendientes,
+        "asincrono": _listener is not None,
+        **estadisticas
+    }
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
@@ -0,0 +1,208 @@
+"""
+Métricas Prometheus del backend (GET /metrics)
+Sin prometheus_client instalado todas las funciones son no-op y /metrics responde 503
+"""
+import asyncio
+import os
+import time
+from threading import Lock
+from typing import Any, Optional, Tuple
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+    )
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Varios workers: PROMETHEUS_MULTIPROC_DIR apunta a un directorio vacío en cada despliegue
+MULTIPROCESO = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Peticiones no enrutadas (404, OPTIONS de CORS): una sola serie en vez de una por URL
+RUTA_SIN_PLANTILLA = "<sin_ruta>"
+
+BUCKETS_PETICION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BUCKETS_LLM = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+if PROMETHEUS_AVAILABLE:
+    PETICIONES = Counter(
+        "noticias_http_peticiones_total", "Peticiones HTTP atendidas",
+        ["metodo", "ruta", "estado"]
+    )
+    LATENCIA_PETICION = Histogram(
+        "noticias_http_peticion_segundos", "Duración de las peticiones HTTP (hasta el último byte)",
+        ["metodo", "ruta"], buckets=BUCKETS_PETICION
+    )
+    EN_CURSO = Gauge(
+        "noticias_http_peticiones_en_curso", "Peticiones HTTP en curso",
+        multiprocess_mode="livesum"
+    )
+    POOL_EN_USO = Gauge(
+        "noticias_db_pool_conexiones_en_uso", "Conexiones del pool de SQLAlchemy prestadas",
+        multiprocess_mode="livesum"
+    )
+    POOL_OVERFLOW = Gauge(
+        "noticias_db_pool_overflow_en_uso", "Conexiones prestadas por encima de pool_size",
+        multiprocess_mode="livesum"
+    )
+    LATENCIA_LLM = Histogram(
+        "noticias_llm_llamada_segundos", "Duración de las llamadas a proveedores LLM",
+        ["proveedor", "modelo", "resultado"], buckets=BUCKETS_LLM
+    )
+    ERRORES_LLM = Counter(
+        "noticias_llm_errores_total", "Errores de proveedores LLM",
+        ["proveedor", "modelo", "codigo"]
+    )
+    TOKENS_LLM = Counter(
+        "noticias_llm_tokens_total", "Tokens consumidos por LLMMaestro",
+        ["llm_id", "llm"]
+    )
+    CONSULTAS_CACHE = Counter(
+        "noticias_cache_consultas_total", "Lecturas de CacheService",
+        ["espacio", "resultado"]
+    )
+    ETAPAS_GENERACION = Histogram(
+        "noticias_generacion_etapa_segundos", "Latencia por etapa de la generación de salidas",
+        ["etapa", "proveedor", "modelo", "tipo_salida"], buckets=BUCKETS_PETICION
+    )
+    LAG_LOOP = Histogram(
+        "noticias_event_loop_lag_segundos", "Retraso del event loop (LOOP_VIGILANTE_ACTIVO)",
+        buckets=BUCKETS_PETICION
+    )
+
+
+# ==================== HTTP ====================
+
+class MiddlewareMetricas:
+    """Middleware ASGI: peticiones, latencia y en curso por plantilla de ruta"""
+
+    __slots__ = ("app",)
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROMETHEUS_AVAILABLE:
+            await self.app(scope, receive, send)
+            return
+
+        estado = 500
+        inicio = time.perf_counter()
+
+        async def _send(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        EN_CURSO.inc()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            EN_CURSO.dec()
+            # FastAPI deja la ruta resuelta en el scope al enrutar
+            ruta = getattr(scope.get("route"), "path", None) or RUTA_SIN_PLANTILLA
+            PETICIONES.labels(scope["method"], ruta, str(estado)).inc()
+            LATENCIA_PETICION.labels(scope["method"], ruta).observe(time.perf_counter() - inicio)
+
+
+# ==================== POOL DE CONEXIONES ====================
+
+def instrumentar_pool(engine: Any) -> None:
+    """Mantiene los gauges del pool con los eventos checkout/checkin del engine"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    from sqlalchemy import event
+
+    pool_size = engine.pool.size() if hasattr(engine.pool, "size") else 0
+    lock = Lock()
+    prestadas = [0]
+
+    def _actualizar(delta: int) -> None:
+        with lock:
+            prestadas[0] += delta
+            en_uso = prestadas[0]
+        POOL_EN_USO.set(en_uso)
+        POOL_OVERFLOW.set(max(0, en_uso - pool_size) if pool_size else 0)
+
+    event.listen(engine, "checkout", lambda *_: _actualizar(1))
+    event.listen(engine, "checkin", lambda *_: _actualizar(-1))
+
+
+# ==================== LLM ====================
+
+def codigo_error(error: BaseException) -> str:
+    """Código HTTP del error del proveedor, 'timeout' o el nombre de la clase"""
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    for estado in (getattr(error, "status_code", None), getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(estado, int):
+            return str(estado)
+    return type(error).__name__
+
+
+def observar_llamada_llm(llm: Any, inicio: float, error: Optional[BaseException] = None) -> None:
+    """Registra una llamada al proveedor que empezó en `inicio` (time.perf_counter())"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    proveedor = str(getattr(llm, "proveedor", None) or "-")
+    modelo = str(getattr(llm, "modelo_id", None) or "-")
+    LATENCIA_LLM.labels(proveedor, modelo, "error" if error else "ok").observe(time.perf_counter() - inicio)
+    if error is not None:
+        ERRORES_LLM.labels(proveedor, modelo, codigo_error(error)).inc()
+
+
+def contar_tokens(llm: Any, tokens: int) -> None:
+    if not PROMETHEUS_AVAILABLE or not tokens:
+        return
+    TOKENS_LLM.labels(str(getattr(llm, "id", "-")), str(getattr(llm, "nombre", None) or "-")).inc(tokens)
+
+
+def observar_etapa(etapa: str, proveedor: str, modelo: str, tipo_salida: str, ms: float) -> None:
+    if PROMETHEUS_AVAILABLE:
+        ETAPAS_GENERACION.labels(etapa, proveedor, modelo, tipo_salida).observe(ms / 1000)
+
+
+def observar_lag_loop(ms: float) -> None:
+    if PROMETHEUS_AVAILABLE:
+        LAG_LOOP.observe(ms / 1000)
+
+
+# ==================== CACHÉ ====================
+
+def espacio_clave(clave: str) -> str:
+    """Espacio de la clave de caché: sus dos primeros segmentos ("llm:respuesta")"""
+    return ":".join(clave.split(":", 2)[:2])
+
+
+def contar_consulta_cache(clave: str, resultado: str) -> None:
+    """resultado: hit, miss o error"""
+    if PROMETHEUS_AVAILABLE:
+        CONSULTAS_CACHE.labels(espacio_clave(clave), resultado).inc()
+
+
+# ==================== EXPOSICIÓN ====================
+
+def exponer() -> Tuple[bytes, str]:
+    """
+    Cuerpo y content-type de /metrics
+
+    Raises:
+        RuntimeError: prometheus_client no está instalado
+    """
+    if not PROMETHEUS_AVAILABLE:
+        raise RuntimeError("prometheus_client no está instalado")
+    if MULTIPROCESO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return generate_latest(registro), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def proceso_terminado() -> None:
+    """Al apagar un worker: sus gauges 'livesum' dejan de sumar"""
+    if PROMETHEUS_AVAILABLE and MULTIPROCESO:
+        multiprocess.mark_process_dead(os.getpid())
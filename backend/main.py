@@ -2,12 +2,27 @@
 Sistema de Noticias con IA - FastAPI Backend v2.0
 Con PostgreSQL y SQLAlchemy
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import logging
 import uvicorn
 from config import settings
-from core.database import init_db, engine
+from core.database import init_db, engine, SessionLocal, cerrar_async_engine
+from core.cache import get_cache_service
+from core import logs
+from core import metricas_prometheus
+from services.proveedores_llm import cerrar_executor, cerrar_clientes, precalentar
+from models.orm_models import LLMMaestro
+from services.generador_ia import GeneradorIA
+from services import presupuesto_tokens
+from services import ventanas_tokens
+from services import cola_generacion
+from services import regeneracion_masiva
+from services import bloqueos_loop
+from services import perfilador
 
 # Importar routers
 from routers import noticias, ai, auth, proyectos
@@ -16,6 +31,35 @@ from routers import admin_usuarios  # Administración de usuarios
 from routers import metricas  # Métricas de valor periodístico
 from routers import files as files_router
 from routers import admin_settings
+from routers import uso_tokens
+from routers import trabajos_generacion
+from routers import regeneracion_masiva as regeneracion_masiva_router
+
+# Logging con QueueHandler antes de crear la app (ver core/logs.py)
+logs.configurar()
+logger = logging.getLogger(__name__)
+
+async def precalentar_llms_activos():
+    """Abre en segundo plano las conexiones de los LLM activos (no retrasa el arranque)"""
+    if settings.LLM_PRECALENTAR_TIMEOUT_S <= 0:
+        return
+    db = SessionLocal()
+    try:
+        llms = [
+            GeneradorIA._snapshot_llm(llm)
+            for llm in db.query(LLMMaestro).filter(LLMMaestro.activo == True).all()
+            if llm.api_key
+        ]
+    except Exception as e:
+        logger.warning("⚠️ Precalentado de LLM omitido: %s", e)
+        return
+    finally:
+        db.close()
+    resultados = await precalentar(llms)
+    if resultados:
+        listos = sum(1 for ok in resultados.values() if ok)
+        logger.info("🔌 Conexiones LLM precalentadas: %s/%s", listos, len(resultados))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -24,12 +68,45 @@ async def lifespan(app: FastAPI):
     print("🔄 Inicializando base de datos...")
     init_db()
     print("✅ Sistema inicializado correctamente")
+    tarea_precalentado = asyncio.create_task(precalentar_llms_activos())
+    tarea_volcado = asyncio.create_task(presupuesto_tokens.volcar_periodicamente())
+    tarea_ventanas = asyncio.create_task(ventanas_tokens.sincronizar_periodicamente())
+    # Consumidor de la cola de generación dentro de la API (sin workers dedicados)
+    tarea_cola = asyncio.create_task(cola_generacion.trabajar()) if settings.COLA_TRABAJOS_EN_API else None
+    tarea_bulk = asyncio.create_task(regeneracion_masiva.supervisar()) if settings.COLA_TRABAJOS_EN_API else None
+    if settings.LOOP_VIGILANTE_ACTIVO:
+        await bloqueos_loop.iniciar(app)
     
     yield
     
     # Shutdown: Cerrar conexiones
+    await bloqueos_loop.detener()
+    tarea_precalentado.cancel()
+    tarea_volcado.cancel()
+    tarea_ventanas.cancel()
+    if tarea_bulk:
+        tarea_bulk.cancel()
+        await asyncio.gather(tarea_bulk, return_exceptions=True)
+    if tarea_cola:
+        # Los trabajos en curso vuelven a la cola para otro worker
+        tarea_cola.cancel()
+        await asyncio.gather(tarea_cola, return_exceptions=True)
+    try:
+        await presupuesto_tokens.volcar()
+    except Exception as e:
+        logger.error("⚠️ Error volcando consumo de tokens: %s", e)
+    try:
+        await ventanas_tokens.sincronizar()
+    except Exception as e:
+        logger.error("⚠️ Error sincronizando ventanas de tokens: %s", e)
+    cerrar_executor()
+    await cerrar_clientes()
+    await get_cache_service().close()
     engine.dispose()
+    await cerrar_async_engine()
+    metricas_prometheus.proceso_terminado()
     print("🔴 Sistema apagándose...")
+    logs.detener()
 
 # Crear aplicación FastAPI
 app = FastAPI(
@@ -59,10 +136,24 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Perfil por petición con la cabecera X-Perfilar (solo si PERFILADOR_CLAVE está definida)
+app.add_middleware(perfilador.MiddlewarePerfil)
+# Métricas Prometheus (último middleware añadido = el más externo: también cuenta preflights CORS)
+app.add_middleware(metricas_prometheus.MiddlewareMetricas)
+metricas_prometheus.instrumentar_pool(engine)
+# Id de correlación por petición en los logs (X-Request-ID)
+app.add_middleware(logs.MiddlewareCorrelacion)
+
 print('CORS origins configurados:', allowed_origins)
 print('🔧 CORS credentials habilitadas: True')
 print('🔧 Verificar que el frontend esté en:', [o for o in allowed_origins if 'woodcock' in o])
 
+
+@app.exception_handler(presupuesto_tokens.PresupuestoExcedido)
+async def presupuesto_excedido_handler(request: Request, exc: presupuesto_tokens.PresupuestoExcedido):
+    """Límite diario de tokens alcanzado (LLM o usuario)"""
+    return JSONResponse(status_code=429, content={"detail": str(exc)})
+
 # Incluir routers
 app.include_router(auth.router, prefix="/api/auth", tags=["autenticacion"])
 app.include_router(proyectos.router)  # Incluye prefix en el router
@@ -76,6 +167,8 @@ app.include_router(estilos.router)
 app.include_router(secciones.router)
 app.include_router(salidas.router)
 app.include_router(generacion.router)  # 🎉 Nuevo - Generación IA
+app.include_router(trabajos_generacion.router)  # Cola de trabajos de generación
+app.include_router(regeneracion_masiva_router.router)  # Regeneración masiva (bulk)
 app.include_router(metricas.router)  # 📊 Nuevo - Métricas de valor periodístico
 # Router para extracción de archivos (PDF/DOCX/DOC/TXT)
 app.include_router(files_router.router, prefix="/api/files", tags=["files"])
@@ -89,6 +182,7 @@ app.include_router(admin_usuarios.router, prefix="/api", tags=["admin-usuarios"]
 
 # Router para ajustes de administración (runtime settings)
 app.include_router(admin_settings.router)
+app.include_router(uso_tokens.router)  # Ventanas de consumo de tokens
 
 # Endpoint raíz
 @app.get("/")
@@ -119,6 +213,15 @@ async def health_check():
         "version": settings.VERSION
     }
 
+# Métricas Prometheus (agregadas entre workers si PROMETHEUS_MULTIPROC_DIR está definido)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    try:
+        cuerpo, tipo = metricas_prometheus.exponer()
+    except RuntimeError as e:
+        return Response(str(e), status_code=503, media_type="text/plain")
+    return Response(cuerpo, media_type=tipo)
+
 # Ejecutar servidor
 if __name__ == "__main__":
     uvicorn.run(
@@ -0,0 +1,33 @@
+"""
+Opciones de carga ansiosa de relaciones
+Se pasan a .options() en consultas síncronas y async
+
+Con AsyncSession acceder a una relación no cargada falla (no hay carga perezosa
+dentro del loop) y Noticia.to_dict() lo ocultaría con 'Sin autor'. Con Session
+síncrona cada acceso perezoso es una consulta más por fila (N+1). Las rutas
+piden aquí lo que van a leer:
+
+    NOTICIA_CON_AUTOR       noticia.autor_nombre / to_dict()
+    NOTICIA_PARA_GENERAR    además noticia.seccion.prompt.items y noticia.seccion.estilo.items
+    SECCION_CON_PLANTILLAS  seccion.prompt.items y seccion.estilo.items (SeccionConRelaciones)
+    PROMPT_CON_ITEMS        prompt.items (schemas PromptMaestro)
+"""
+from sqlalchemy.orm import joinedload, selectinload
+
+from models.orm_models import EstiloMaestro, Noticia, PromptMaestro, Seccion
+
+NOTICIA_CON_AUTOR = (joinedload(Noticia.usuario_creador),)
+
+# Muchos-a-uno con JOIN; las listas de items en una consulta aparte (IN) cada una
+SECCION_CON_PLANTILLAS = (
+    joinedload(Seccion.prompt).selectinload(PromptMaestro.items),
+    joinedload(Seccion.estilo).selectinload(EstiloMaestro.items),
+)
+
+NOTICIA_PARA_GENERAR = (
+    *NOTICIA_CON_AUTOR,
+    joinedload(Noticia.seccion).joinedload(Seccion.prompt).selectinload(PromptMaestro.items),
+    joinedload(Noticia.seccion).joinedload(Seccion.estilo).selectinload(EstiloMaestro.items),
+)
+
+PROMPT_CON_ITEMS = (selectinload(PromptMaestro.items),)
@@ -2,7 +2,7 @@
 Modelos ORM con SQLAlchemy
 Define la estructura de las tablas en PostgreSQL
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Table, JSON, Boolean, DECIMAL, Date, Numeric
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Table, JSON, Boolean, DECIMAL, Date, Numeric, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -58,6 +58,8 @@ class Noticia(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     # Estado de la noticia
     estado = Column(String(50), default='activo', index=True)  # activo, archivado, eliminado
+    # Tipo: breaking, feature, opinion (breaking se genera con prioridad urgente)
+    tipo = Column(String(20), nullable=False, default='feature', server_default='feature')
     
     # Foreign Keys
     proyecto_id = Column(Integer, ForeignKey('proyectos.id', ondelete='SET NULL'), nullable=True)
@@ -260,7 +262,7 @@ class LLMMaestro(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String(100), nullable=False, unique=True)
-    proveedor = Column(String(50), nullable=False, index=True)  # Anthropic, OpenAI, Google
+    proveedor = Column(String(50), nullable=False, index=True)  # Anthropic, OpenAI, Google, Mock
     modelo_id = Column(String(100), nullable=False)  # claude-sonnet-4-20250514
     url_api = Column(String(500), nullable=False)
     api_key = Column(Text, nullable=False)  # Encriptada
@@ -377,6 +379,8 @@ class EstiloItem(Base):
     nombre_archivo = Column(String(200), nullable=False)
     contenido = Column(Text, nullable=True)
     orden = Column(Integer, nullable=False, default=1)
+    # Se envía siempre completo; si no, solo entran sus reglas relevantes para la noticia
+    incluir_siempre = Column(Boolean, nullable=False, default=False, server_default='false')
     
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -433,6 +437,8 @@ class SalidaMaestro(Base):
     descripcion = Column(Text, nullable=True)
     tipo_salida = Column(String(50), nullable=False, index=True)  # print, digital, social
     configuracion = Column(JSON, default={})  # {"max_caracteres": 280, "hashtags": 3}
+    # Reglas de estilo relevantes a incluir (None = ESTILO_TOP_K, 0 = manual completo)
+    estilo_top_k = Column(Integer, nullable=True)
     
     # Estado
     activo = Column(Boolean, default=True, index=True)
@@ -470,6 +476,20 @@ class NoticiaSalida(Base):
     # Estadísticas
     tokens_usados = Column(Integer, nullable=True)
     tiempo_generacion_ms = Column(Integer, nullable=True)
+    tokens_cache_lectura = Column(Integer, nullable=True, default=0)  # entrada servida desde la caché de prompts
+    tokens_cache_escritura = Column(Integer, nullable=True, default=0)  # entrada escrita en la caché de prompts
+    
+    # LLM que generó el contenido (con failover puede no ser el de la noticia)
+    llm_respuesta_id = Column(Integer, ForeignKey('llm_maestro.id', ondelete='SET NULL'), nullable=True)
+    modelo_respuesta = Column(String(100), nullable=True)
+    
+    # Hash por entrada del prompt: {"noticia", "prompt", "estilo", "salida", "modelo"}
+    # (regenerar omite la salida si no cambió ninguna; ver services/huella_entradas.py)
+    huella_entradas = Column(JSON, nullable=True)
+
+    # Milisegundos por etapa de la última generación: {"orm", "prompt", "estilo", "cola",
+    # "ttft", "llm", "parseo", "post"} (ver services/etapas_generacion.py)
+    etapas_ms = Column(JSON, nullable=True)
     
     # Metadata
     generado_en = Column(DateTime(timezone=True), server_default=func.now())
@@ -501,6 +521,8 @@ class MetricasValorPeriodistico(Base):
     
     # Métricas de Costo
     tokens_total = Column(Integer, nullable=False)
+    tokens_cache_lectura = Column(Integer, nullable=True, default=0)
+    tokens_cache_escritura = Column(Integer, nullable=True, default=0)
     costo_generacion = Column(Numeric(10, 4), nullable=False)  # USD
     costo_estimado_manual = Column(Numeric(10, 2), nullable=False)  # USD manual
     ahorro_costo = Column(Numeric(10, 2), nullable=False)  # diferencia
@@ -535,3 +557,125 @@ class MetricasValorPeriodistico(Base):
     
     def __repr__(self):
         return f"<MetricasValor(id={self.id}, noticia_id={self.noticia_id}, roi={self.roi_porcentaje}%)>"
+
+
+class ConsumoTokensDiario(Base):
+    """
+    Contador diario de tokens por LLM o por usuario
+    Respaldo de services/presupuesto_tokens.py cuando no hay Redis
+    """
+    __tablename__ = 'consumo_tokens_diario'
+    __table_args__ = (
+        UniqueConstraint('ambito', 'entidad_id', 'fecha', name='uq_consumo_tokens_diario'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    ambito = Column(String(20), nullable=False)  # llm, usuario
+    entidad_id = Column(Integer, nullable=False)
+    fecha = Column(Date, nullable=False)
+    tokens = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<ConsumoTokensDiario({self.ambito}={self.entidad_id}, fecha={self.fecha}, tokens={self.tokens})>"
+
+
+class VentanaTokens(Base):
+    """
+    Anillo de consumo de tokens de una entidad (LLM, usuario o sección) para una
+    escala (minuto, hora, día). Persistencia de services/ventanas_tokens.py
+    """
+    __tablename__ = 'ventana_tokens'
+    __table_args__ = (
+        UniqueConstraint('ambito', 'entidad_id', 'escala', name='uq_ventana_tokens'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    ambito = Column(String(20), nullable=False)  # llm, usuario, seccion
+    entidad_id = Column(Integer, nullable=False)
+    escala = Column(String(10), nullable=False)  # minuto, hora, dia
+    ranuras = Column(JSON, nullable=False, default=list)  # [[época, tokens], ...] vigentes
+    actualizado_en = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<VentanaTokens({self.ambito}={self.entidad_id}, escala={self.escala})>"
+
+
+class TrabajoGeneracion(Base):
+    """
+    Trabajo de generación en segundo plano (ver services/cola_generacion.py)
+    Lo encola la API y lo reclama un worker con SELECT ... FOR UPDATE SKIP LOCKED
+    """
+    __tablename__ = 'generation_jobs'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    noticia_id = Column(Integer, ForeignKey('noticias.id', ondelete='CASCADE'), nullable=False, index=True)
+    llm_id = Column(Integer, ForeignKey('llm_maestro.id', ondelete='SET NULL'), nullable=True)
+    usuario_id = Column(Integer, ForeignKey('usuarios.id', ondelete='SET NULL'), nullable=True, index=True)
+    salidas_ids = Column(JSON, nullable=False, default=list)
+    regenerar = Column(Boolean, nullable=False, default=False)
+    modo_combinado = Column(Boolean, nullable=False, default=False)
+    # Clase de prioridad: urgente, normal, lote (se reclaman en ese orden)
+    prioridad = Column(String(10), nullable=False, default='normal', server_default='normal')
+    # Regeneración masiva que lo encoló (None = trabajo suelto)
+    regeneracion_id = Column(Integer, ForeignKey('bulk_regeneraciones.id', ondelete='SET NULL'), nullable=True, index=True)
+    
+    # Estado: pendiente, en_curso, completado, error, cancelado
+    estado = Column(String(20), nullable=False, default='pendiente', index=True)
+    intentos = Column(Integer, nullable=False, default=0)
+    max_intentos = Column(Integer, nullable=False, default=3)
+    # {salida_id: {"estado": "completado"|"error", "noticia_salida_id", "tokens_usados", "error"}}
+    resultados = Column(JSON, nullable=False, default=dict)
+    error = Column(Text, nullable=True)
+    worker = Column(String(100), nullable=True)
+    
+    # Tiempos
+    disponible_en = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # backoff de reintentos
+    iniciado_en = Column(DateTime(timezone=True), nullable=True)
+    latido_en = Column(DateTime(timezone=True), nullable=True)  # el worker sigue vivo
+    terminado_en = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<TrabajoGeneracion(id={self.id}, noticia_id={self.noticia_id}, estado='{self.estado}')>"
+
+
+class RegeneracionMasiva(Base):
+    """
+    Regeneración de las salidas de todas las noticias que cumplen un filtro
+    (ver services/regeneracion_masiva.py). El cursor permite reanudarla tras un reinicio.
+    """
+    __tablename__ = 'bulk_regeneraciones'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey('usuarios.id', ondelete='SET NULL'), nullable=True, index=True)
+    llm_id = Column(Integer, ForeignKey('llm_maestro.id', ondelete='SET NULL'), nullable=True)
+    # {"seccion_id", "proyecto_id", "estado", "desde", "hasta"}
+    filtro = Column(JSON, nullable=False, default=dict)
+    salidas_ids = Column(JSON, nullable=True)  # None = las salidas que ya tiene cada noticia
+    modo = Column(String(10), nullable=False, default='cola')  # cola, batch
+    modo_combinado = Column(Boolean, nullable=False, default=False)
+    
+    # Estado: en_curso, pausada, completada, cancelada, error
+    estado = Column(String(20), nullable=False, default='en_curso', index=True)
+    total_noticias = Column(Integer, nullable=False, default=0)
+    noticias_enviadas = Column(Integer, nullable=False, default=0)
+    cursor_noticia_id = Column(Integer, nullable=False, default=0)  # última noticia enviada
+    cursor_agotado = Column(Boolean, nullable=False, default=False)
+    # Resultados de los lotes (modo batch); en modo cola se leen de generation_jobs
+    salidas_completadas = Column(Integer, nullable=False, default=0)
+    salidas_con_error = Column(Integer, nullable=False, default=0)
+    # Salidas sin cambios en sus entradas (no se llamó al LLM), en ambos modos
+    salidas_omitidas = Column(Integer, nullable=False, default=0)
+    # {batch_id: {"proveedor", "noticias": [...], "estado", "enviado_en"}}
+    lotes_batch = Column(JSON, nullable=False, default=dict)
+    # Paso batch en curso (llamadas al proveedor sin la fila bloqueada) hasta esta hora
+    paso_hasta = Column(DateTime(timezone=True), nullable=True)
+    error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    terminado_en = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<RegeneracionMasiva(id={self.id}, modo='{self.modo}', estado='{self.estado}')>"
@@ -27,6 +27,7 @@ class NoticiaBase(BaseModel):
     proyecto_id: Optional[int] = None  # Asociar a proyecto
     llm_id: Optional[int] = None  # Modelo LLM asociado
     estado: Optional[str] = Field('activo', description="Estado de la noticia: activo, archivado, eliminado")
+    tipo: Optional[str] = Field('feature', description="Tipo de noticia: breaking, feature, opinion")
 
 class NoticiaCreate(NoticiaBase):
     """Schema para crear noticias"""
@@ -45,6 +46,7 @@ class NoticiaUpdate(BaseModel):
     proyecto_id: Optional[int] = None
     llm_id: Optional[int] = None
     estado: Optional[str] = Field(None, description="Estado de la noticia: activo, archivado, eliminado")
+    tipo: Optional[str] = Field(None, description="Tipo de noticia: breaking, feature, opinion")
 
 class Noticia(NoticiaBase):
     """Schema completo de noticia con metadata"""
@@ -331,6 +333,8 @@ class MetricasValorPeriodisticoBase(BaseModel):
     tiempo_estimado_manual: int
     ahorro_tiempo_minutos: int
     tokens_total: int
+    tokens_cache_lectura: Optional[int] = 0
+    tokens_cache_escritura: Optional[int] = 0
     costo_generacion: float
     costo_estimado_manual: float
     ahorro_costo: float
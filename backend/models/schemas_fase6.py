@@ -18,6 +18,7 @@ class ProveedorLLM(str, Enum):
     GOOGLE = "Google"
     COHERE = "Cohere"
     MISTRAL = "Mistral"
+    MOCK = "Mock"  # Simulado con latencia configurable (services/proveedor_mock.py)
 
 
 class TipoSalida(str, Enum):
@@ -169,6 +170,7 @@ class EstiloItemBase(BaseModel):
     nombre_archivo: str = Field(..., description="Nombre del archivo")
     contenido: Optional[str] = Field(None, description="Contenido del archivo")
     orden: int = Field(default=1, description="Orden de procesamiento")
+    incluir_siempre: bool = Field(default=False, description="Enviar siempre completo (si no, solo sus reglas relevantes)")
 
 class EstiloItemCreate(EstiloItemBase):
     """Schema para crear EstiloItem"""
@@ -180,6 +182,7 @@ class EstiloItemUpdate(EstiloItemBase):
     nombre_archivo: Optional[str] = None
     contenido: Optional[str] = None
     orden: Optional[int] = None
+    incluir_siempre: Optional[bool] = None
 
 class EstiloItem(EstiloItemBase):
     """Schema para EstiloItem"""
@@ -301,6 +304,7 @@ class SalidaMaestroBase(BaseModel):
     descripcion: Optional[str] = Field(None, description="Descripción de la salida")
     tipo_salida: TipoSalida = Field(..., description="Tipo de salida (print/digital/social)")
     configuracion: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Configuración específica")
+    estilo_top_k: Optional[int] = Field(None, ge=0, description="Reglas de estilo relevantes a incluir (vacío = valor global, 0 = manual completo)")
     activo: bool = Field(default=True, description="¿Está activa la salida?")
     
 
@@ -316,6 +320,7 @@ class SalidaMaestroUpdate(BaseModel):
     descripcion: Optional[str] = None
     tipo_salida: Optional[TipoSalida] = None
     configuracion: Optional[Dict[str, Any]] = None
+    estilo_top_k: Optional[int] = Field(None, ge=0)
     activo: Optional[bool] = None
 
 
@@ -339,6 +344,10 @@ class NoticiaSalidaBase(BaseModel):
     contenido_generado: str = Field(..., min_length=10, description="Contenido generado para esta salida")
     tokens_usados: Optional[int] = Field(None, ge=0, description="Tokens consumidos")
     tiempo_generacion_ms: Optional[int] = Field(None, ge=0, description="Tiempo de generación en ms")
+    tokens_cache_lectura: Optional[int] = Field(None, ge=0, description="Tokens de entrada leídos de la caché de prompts")
+    tokens_cache_escritura: Optional[int] = Field(None, ge=0, description="Tokens de entrada escritos en la caché de prompts")
+    llm_respuesta_id: Optional[int] = Field(None, description="LLM que respondió (puede ser un fallback)")
+    modelo_respuesta: Optional[str] = Field(None, description="modelo_id del LLM que respondió")
 
 
 class NoticiaSalidaCreate(NoticiaSalidaBase):
@@ -359,6 +368,10 @@ class NoticiaSalida(NoticiaSalidaBase):
     id: int
     generado_en: datetime
     nombre_salida: Optional[str] = None  # <-- Añadido para serializar el nombre
+    # Solo al regenerar: omitida si ninguna entrada cambió; si no, las que cambiaron
+    omitida: Optional[bool] = Field(None, description="Regeneración omitida: sus entradas no cambiaron")
+    entradas_cambiadas: Optional[List[str]] = Field(None, description="Entradas que cambiaron: noticia, prompt, estilo, salida, modelo")
+    etapas_ms: Optional[Dict[str, int]] = Field(None, description="Milisegundos por etapa de la generación (orm, prompt, estilo, cola, ttft, llm, parseo, post)")
     class Config:
         from_attributes = True
 
@@ -372,6 +385,10 @@ class NoticiaSalidaTemporal(BaseModel):
     contenido_generado: str = Field(..., min_length=10, description="Contenido generado para esta salida")
     tokens_usados: Optional[int] = Field(None, ge=0, description="Tokens consumidos")
     tiempo_generacion_ms: Optional[int] = Field(None, ge=0, description="Tiempo de generación en ms")
+    tokens_cache_lectura: Optional[int] = Field(None, ge=0, description="Tokens de entrada leídos de la caché de prompts")
+    tokens_cache_escritura: Optional[int] = Field(None, ge=0, description="Tokens de entrada escritos en la caché de prompts")
+    llm_respuesta_id: Optional[int] = Field(None, description="LLM que respondió (puede ser un fallback)")
+    modelo_respuesta: Optional[str] = Field(None, description="modelo_id del LLM que respondió")
     generado_en: str = Field(..., description="Timestamp de generación")
     nombre_salida: Optional[str] = None
     temporal: Optional[bool] = Field(True, description="Marca que es temporal (solo en memoria)")
@@ -392,6 +409,7 @@ class DatosNoticiaTemporal(BaseModel):
     contenido: str = Field(..., min_length=10, description="Contenido de la noticia")
     seccion_id: int = Field(..., description="ID de la sección")
     proyecto_id: Optional[int] = Field(None, description="ID del proyecto")
+    tipo: Optional[str] = Field('feature', description="Tipo de noticia: breaking, feature, opinion")
 
 
 class GenerarSalidasRequest(BaseModel):
@@ -415,6 +433,77 @@ class GenerarSalidasTemporalRequest(BaseModel):
     salidas_ids: List[int] = Field(..., min_items=1, description="IDs de las salidas a generar")
     llm_id: int = Field(..., description="ID del LLM a usar")
     regenerar: bool = Field(default=True, description="Siempre regenerar para temporal")
+    modo_combinado: bool = Field(default=False, description="Pedir todas las salidas en una sola llamada al LLM")
+    usar_cache: bool = Field(default=True, description="Reutilizar respuestas idénticas recientes del LLM (False fuerza una llamada nueva)")
+
+
+class EncolarGeneracionRequest(BaseModel):
+    """Request para encolar la generación de salidas de una noticia guardada"""
+    noticia_id: int = Field(..., description="ID de la noticia")
+    salidas_ids: List[int] = Field(..., min_items=1, description="IDs de las salidas a generar")
+    llm_id: int = Field(..., description="ID del LLM a usar")
+    regenerar: bool = Field(default=False, description="¿Regenerar si ya existe?")
+    modo_combinado: bool = Field(default=False, description="Pedir todas las salidas en una sola llamada al LLM")
+    lote: bool = Field(default=False, description="Trabajo en lote: cede el paso a la generación interactiva")
+
+
+class TrabajoGeneracion(BaseModel):
+    """Estado de un trabajo de la cola de generación"""
+    id: int
+    noticia_id: int
+    llm_id: Optional[int] = None
+    usuario_id: Optional[int] = None
+    salidas_ids: List[int]
+    regenerar: bool
+    modo_combinado: bool
+    prioridad: str = Field(description="Clase de prioridad: urgente, normal o lote")
+    estado: str = Field(description="pendiente, en_curso, completado, error o cancelado")
+    intentos: int
+    max_intentos: int
+    resultados: Dict[str, Any] = Field(default_factory=dict, description="Resultado por salida_id")
+    error: Optional[str] = None
+    worker: Optional[str] = None
+    disponible_en: Optional[datetime] = None
+    iniciado_en: Optional[datetime] = None
+    terminado_en: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class RegeneracionMasivaRequest(BaseModel):
+    """Request para regenerar las salidas de todas las noticias que cumplen un filtro"""
+    llm_id: int = Field(..., description="ID del LLM a usar")
+    seccion_id: Optional[int] = Field(default=None, description="Solo noticias de esta sección")
+    proyecto_id: Optional[int] = Field(default=None, description="Solo noticias de este proyecto")
+    estado: Optional[str] = Field(default=None, description="activo o archivado (por defecto, todas menos las eliminadas)")
+    desde: Optional[datetime] = Field(default=None, description="Fecha de la noticia desde (incluida)")
+    hasta: Optional[datetime] = Field(default=None, description="Fecha de la noticia hasta (incluida)")
+    salidas_ids: Optional[List[int]] = Field(default=None, description="Salidas a regenerar (por defecto, las que ya tiene cada noticia)")
+    modo: str = Field(default="cola", pattern="^(cola|batch)$", description="cola (trabajos en lote) o batch (API batch del proveedor)")
+    modo_combinado: bool = Field(default=False, description="Pedir todas las salidas en una sola llamada al LLM (modo cola)")
+
+
+class RegeneracionMasiva(BaseModel):
+    """Progreso de una regeneración masiva"""
+    id: int
+    estado: str = Field(description="en_curso, pausada, completada, cancelada o error")
+    modo: str
+    filtro: Dict[str, Any] = Field(default_factory=dict)
+    llm_id: Optional[int] = None
+    salidas_ids: Optional[List[int]] = None
+    total_noticias: int
+    noticias_enviadas: int
+    porcentaje: float = Field(description="Noticias terminadas sobre el total")
+    trabajos: Dict[str, int] = Field(default_factory=dict, description="Trabajos de la cola por estado")
+    lotes_en_proceso: int = 0
+    salidas_batch_completadas: int = 0
+    salidas_con_error: int = 0
+    salidas_omitidas: int = Field(default=0, description="Salidas sin cambios en sus entradas (sin llamar al LLM)")
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    terminado_en: Optional[datetime] = None
 
 
 class GenerarSalidasResponse(BaseModel):
@@ -1,8 +1,27 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional
 
 from services import runtime_settings
+from services import cache_respuestas
+from services import coalescencia
+from services import enrutamiento
+from services import presupuesto_tokens
+from services import presupuesto_prompt
+from services import estilo_relevante
+from services import cola_generacion
+from services import prioridad_generacion
+from services import regeneracion_masiva
+from services import huella_entradas
+from services import proveedor_mock
+from services import etapas_generacion
+from services import bloqueos_loop
+from services import perfilador
+from core import logs
+from core.auth import get_current_admin
+from core.database import get_db
 from config import settings
 
 router = APIRouter(prefix="/api/admin/settings", tags=["AdminSettings"])
@@ -12,6 +31,16 @@ class PromptLimitPayload(BaseModel):
     MAX_PROMPT_CHARS: Optional[int]
 
 
+class PromptTokensPayload(BaseModel):
+    MAX_PROMPT_TOKENS: Optional[int]
+
+
+class LoggingPayload(BaseModel):
+    nivel: Optional[str] = None
+    logger: Optional[str] = None  # p.ej. "services.generador_ia"; sin él, la raíz
+    muestreo_payload: Optional[int] = None
+
+
 @router.get("/")
 def get_prompt_limit():
     """Devuelve el valor actual del límite de caracteres del prompt (override runtime o config)"""
@@ -33,3 +62,169 @@ def set_prompt_limit(payload: PromptLimitPayload):
     # Aplicar override en memoria
     runtime_settings.set_max_prompt_chars(payload.MAX_PROMPT_CHARS)
     return {"MAX_PROMPT_CHARS": int(payload.MAX_PROMPT_CHARS), "note": "runtime override"}
+
+
+@router.get("/presupuesto-prompt")
+def get_presupuesto_prompt():
+    """Presupuesto de tokens del prompt (override runtime o config) y contadores del planificador"""
+    override = runtime_settings.get_max_prompt_tokens()
+    return {
+        "MAX_PROMPT_TOKENS": presupuesto_prompt.get_presupuesto_global(),
+        "note": "runtime override" if override is not None else "config",
+        "estadisticas": presupuesto_prompt.get_estadisticas()
+    }
+
+
+@router.put("/presupuesto-prompt")
+def set_presupuesto_prompt(payload: PromptTokensPayload):
+    """
+    Override runtime de MAX_PROMPT_TOKENS (null vuelve al valor de config).
+    Los LLM con configuracion['max_tokens_prompt'] usan su propio presupuesto.
+    """
+    if payload.MAX_PROMPT_TOKENS is None:
+        runtime_settings.set_max_prompt_tokens(None)
+        return {"MAX_PROMPT_TOKENS": int(settings.MAX_PROMPT_TOKENS), "note": "reset to config"}
+
+    if payload.MAX_PROMPT_TOKENS <= 0:
+        raise HTTPException(status_code=400, detail="MAX_PROMPT_TOKENS must be a positive integer")
+
+    runtime_settings.set_max_prompt_tokens(payload.MAX_PROMPT_TOKENS)
+    return {"MAX_PROMPT_TOKENS": int(payload.MAX_PROMPT_TOKENS), "note": "runtime override"}
+
+
+@router.get("/estilo-relevante")
+def get_estilo_relevante():
+    """Tokens del manual de estilo completo frente a las reglas relevantes enviadas (ahorro por generación)"""
+    return {"ESTILO_TOP_K": settings.ESTILO_TOP_K, **estilo_relevante.get_estadisticas()}
+
+
+@router.get("/cache-respuestas")
+def get_cache_respuestas():
+    """Contadores de la caché de respuestas del LLM (aciertos, fallos, omitidas por 'regenerar')"""
+    return cache_respuestas.get_estadisticas()
+
+
+@router.get("/coalescencia")
+def get_coalescencia():
+    """Contadores de generaciones idénticas que compartieron una sola llamada al LLM"""
+    return coalescencia.get_estadisticas()
+
+
+@router.get("/enrutamiento")
+def get_enrutamiento():
+    """Reintentos, timeouts, failovers y hedges de la política de enrutamiento, y p95 por LLM"""
+    return enrutamiento.get_estadisticas()
+
+
+@router.get("/presupuesto-tokens")
+def get_presupuesto_tokens():
+    """Reservas, rechazos por límite diario, degradaciones a fallbacks y volcados a llm_maestro"""
+    return presupuesto_tokens.get_estadisticas()
+
+
+@router.get("/cola-generacion")
+def get_cola_generacion(db: Session = Depends(get_db)):
+    """Trabajos de generación por estado y contadores del consumidor de este proceso"""
+    return {
+        "COLA_TRABAJOS_EN_API": settings.COLA_TRABAJOS_EN_API,
+        "COLA_CONCURRENCIA": settings.COLA_CONCURRENCIA,
+        "estadisticas": cola_generacion.get_estadisticas(db)
+    }
+
+
+@router.get("/regeneracion-masiva")
+def get_regeneracion_masiva(db: Session = Depends(get_db)):
+    """Regeneraciones masivas por estado, lotes enviados a las APIs batch y límites"""
+    return {
+        "BULK_MAX_EN_VUELO": settings.BULK_MAX_EN_VUELO,
+        "BULK_BATCH_TAMANO": settings.BULK_BATCH_TAMANO,
+        "BULK_BATCH_MAX_EN_VUELO": settings.BULK_BATCH_MAX_EN_VUELO,
+        "estadisticas": regeneracion_masiva.get_estadisticas(db)
+    }
+
+
+@router.get("/regeneracion-incremental")
+def get_regeneracion_incremental():
+    """Salidas omitidas al regenerar (entradas sin cambios) y qué entradas cambiaron en el resto"""
+    return {
+        "REGENERAR_INCREMENTAL": settings.REGENERAR_INCREMENTAL,
+        "estadisticas": huella_entradas.get_estadisticas()
+    }
+
+
+@router.get("/prioridades")
+def get_prioridades():
+    """Por LLM y clase de prioridad: plazas reservadas, en uso, profundidad de cola y esperas"""
+    return {
+        "PRIORIDAD_RESERVA_URGENTE": settings.PRIORIDAD_RESERVA_URGENTE,
+        "PRIORIDAD_RESERVA_NORMAL": settings.PRIORIDAD_RESERVA_NORMAL,
+        "llms": prioridad_generacion.get_estadisticas()
+    }
+
+
+@router.get("/proveedor-mock")
+def get_proveedor_mock():
+    """Llamadas al proveedor Mock, errores inyectados (429/500/timeout) y tokens reportados"""
+    return proveedor_mock.get_estadisticas()
+
+
+@router.get("/etapas-generacion")
+def get_etapas_generacion():
+    """Latencia por etapa de la generación (p50/p95/p99) por proveedor, modelo y tipo de salida"""
+    return {"etapas": etapas_generacion.get_estadisticas()}
+
+
+@router.get("/bloqueos-loop")
+def get_bloqueos_loop(limite: int = 20):
+    """Lag del event loop y sitios (por ruta) que lo bloquearon más tiempo, con su pila"""
+    return bloqueos_loop.get_estadisticas(limite)
+
+
+@router.get("/perfil", response_class=PlainTextResponse)
+async def get_perfil(
+    segundos: float = 10.0,
+    intervalo_ms: Optional[float] = None,
+    inactivos: bool = False,
+    current_user=Depends(get_current_admin)  # Solo admin
+):
+    """
+    Perfil por muestreo de este worker durante `segundos`, en formato collapsed stack
+    (flamegraph.pl, speedscope). X-Perfil-Pid indica qué worker lo atendió.
+    """
+    try:
+        perfil = await perfilador.perfilar_proceso(segundos, intervalo_ms, inactivos)
+    except perfilador.PerfilEnCurso as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    resumen = perfil.resumen()
+    return PlainTextResponse(perfil.colapsado(), headers={
+        "X-Perfil-Pid": str(resumen["pid"]),
+        "X-Perfil-Muestras": str(resumen["muestras"]),
+        "Content-Disposition": f'attachment; filename="perfil-{resumen["pid"]}.folded"'
+    })
+
+
+@router.get("/perfilador")
+def get_perfilador():
+    """Perfiles en curso en este worker, perfiles hechos y peticiones perfiladas u omitidas"""
+    return perfilador.get_estadisticas()
+
+
+@router.get("/logging")
+def get_logging():
+    """Nivel de log actual, loggers con nivel propio, muestreo de payloads y registros en cola"""
+    return logs.get_estadisticas()
+
+
+@router.put("/logging")
+def set_logging(payload: LoggingPayload):
+    """Cambia en caliente el nivel (de la raíz o de un logger) y el muestreo de prompts/respuestas"""
+    try:
+        if payload.nivel is not None:
+            logs.set_nivel(payload.nivel, payload.logger)
+        if payload.muestreo_payload is not None:
+            logs.set_muestreo_payload(payload.muestreo_payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return logs.get_estadisticas()
@@ -2,12 +2,14 @@
 """
 Router de IA - Solo acceso a modelos vía llm_maestro. No se permite fallback ni texto suelto fuera de funciones.
 """
+import logging
 from fastapi import APIRouter, HTTPException, status, Depends
 from sqlalchemy.orm import Session
 from typing import Dict, List
 import httpx
 import uuid
 from services.generador_ia import GeneradorIA
+from services.presupuesto_tokens import PresupuestoExcedido
 from core.database import get_db
 from models import orm_models
 from models.schemas import (
@@ -19,6 +21,8 @@ from models.schemas import (
     TipoAnalisisIA
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # Almacenamiento de conversaciones en memoria
@@ -92,13 +96,15 @@ async def chat_con_ia(request: ChatRequest, db: Session = Depends(get_db)):
     # Generar respuesta usando el modelo seleccionado, enviando el historial truncado
     generador = GeneradorIA(db)
     try:
-        respuesta_llm = generador.generar_contenido(
+        respuesta_llm = await generador.generar_contenido_async(
             llm=llm,
             prompt_contenido=historial_truncado,  # Enviar historial optimizado
             max_tokens=2000
         )
         respuesta_texto = respuesta_llm.get("contenido", "")
         tokens_usados = respuesta_llm.get("tokens_usados", 0)
+    except PresupuestoExcedido as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al generar respuesta con el modelo: {str(e)}")
 
@@ -147,7 +153,7 @@ def obtener_noticia_por_id(noticia_id: int, db: Session) -> orm_models.Noticia:
     noticia_dict = noticia.to_dict()
     
     # Solo modo simulado permitido aquí
-    print("ℹ️ Generando resumen simulado (solo permitido vía llm_maestro)")
+    logger.info("ℹ️ Generando resumen simulado (solo permitido vía llm_maestro)")
     contenido = noticia.contenido
     palabras = contenido.split()
     resumen = ' '.join(palabras[:30]) + "..."
@@ -1,6 +1,7 @@
 """
 Router para manejo explícito de items de Estilo
 """
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
@@ -9,6 +10,9 @@ from models.orm_models import EstiloItem, EstiloMaestro
 from models.schemas_fase6 import EstiloItem as EstiloItemSchema
 from core.auth import get_current_user, get_current_admin
 from models.schemas import Usuario
+from services import plantillas
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/estilo-items", tags=["EstiloItems"])
 
@@ -26,9 +30,6 @@ def obtener_item(item_id: int, db: Session = Depends(get_db), current_user: Usua
 
 @router.post("/", response_model=EstiloItemSchema, status_code=201)
 def crear_item(item: EstiloItemSchema, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_admin)):
-    import logging
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger("estilo_items")
     try:
         # Validar que no haya campos extra y que el estilo exista
         if not item.estilo_id:
@@ -37,22 +38,24 @@ def crear_item(item: EstiloItemSchema, db: Session = Depends(get_db), current_us
         
         estilo_exists = db.query(EstiloMaestro).filter(EstiloMaestro.id == item.estilo_id).first()
         if not estilo_exists:
-            logger.error(f"EstiloMaestro con id={item.estilo_id} no existe")
+            logger.error("EstiloMaestro con id=%s no existe", item.estilo_id)
             raise HTTPException(status_code=404, detail=f"EstiloMaestro con id={item.estilo_id} no existe")
         
         db_item = EstiloItem(
             estilo_id=item.estilo_id,
             nombre_archivo=item.nombre_archivo,
             contenido=item.contenido if item.contenido is not None else "",
-            orden=item.orden
+            orden=item.orden,
+            incluir_siempre=item.incluir_siempre
         )
         db.add(db_item)
         db.commit()
+        plantillas.invalidar_estilo(db_item.estilo_id)
         db.refresh(db_item)
-        logger.info(f"Item creado correctamente: id={db_item.id}")
+        logger.info("Item creado correctamente: id=%s", db_item.id)
         return db_item
     except Exception as e:
-        logger.error(f"Error al crear EstiloItem: {e}", exc_info=True)
+        logger.error("Error al crear EstiloItem: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error interno al crear EstiloItem: {str(e)}")
 
 @router.put("/{item_id}", response_model=EstiloItemSchema)
@@ -64,8 +67,10 @@ def actualizar_item(item_id: int, item_update: EstiloItemSchema, db: Session = D
     db_item.nombre_archivo = item_update.nombre_archivo
     db_item.contenido = item_update.contenido if item_update.contenido is not None else ""
     db_item.orden = item_update.orden
+    db_item.incluir_siempre = item_update.incluir_siempre
     
     db.commit()
+    plantillas.invalidar_estilo(db_item.estilo_id)
     db.refresh(db_item)
     return db_item
 
@@ -76,4 +81,5 @@ def eliminar_item(item_id: int, db: Session = Depends(get_db), current_user: Usu
         raise HTTPException(status_code=404, detail=f"Item {item_id} no encontrado")
     db.delete(db_item)
     db.commit()
+    plantillas.invalidar_estilo(db_item.estilo_id)
     return None
\ No newline at end of file
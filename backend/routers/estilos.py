@@ -1,6 +1,7 @@
 
 
 """Router para Estilos - CRUD completo"""
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
@@ -13,6 +14,10 @@ from models.schemas_fase6 import (
 )
 from core.auth import get_current_user, get_current_admin
 from models.schemas import Usuario
+from services import plantillas
+from core import logs
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/estilos", tags=["Estilos"])
 
@@ -73,10 +78,12 @@ async def crear_item_estilo(
         estilo_id=estilo_id,
         nombre_archivo=item.nombre_archivo,
         contenido=item.contenido if item.contenido else "",
-        orden=item.orden
+        orden=item.orden,
+        incluir_siempre=item.incluir_siempre
     )
     db.add(db_item)
     db.commit()
+    plantillas.invalidar_estilo(db_item.estilo_id)
     db.refresh(db_item)
     return db_item
 
@@ -104,8 +111,11 @@ async def actualizar_item_estilo(
         db_item.contenido = item_update.contenido
     if item_update.orden is not None:
         db_item.orden = item_update.orden
+    if item_update.incluir_siempre is not None:
+        db_item.incluir_siempre = item_update.incluir_siempre
     
     db.commit()
+    plantillas.invalidar_estilo(estilo_id)
     db.refresh(db_item)
     return db_item
 
@@ -127,6 +137,7 @@ async def eliminar_item_estilo(
     
     db.delete(db_item)
     db.commit()
+    plantillas.invalidar_estilo(estilo_id)
     return None
 
 # Antiguo endpoint de items (mantenido por compatibilidad)
@@ -147,10 +158,12 @@ async def crear_estilo_item(
         estilo_id=item.estilo_id,
         nombre_archivo=item.nombre_archivo,
         contenido=item.contenido if item.contenido else "",
-        orden=item.orden if item.orden else 1
+        orden=item.orden if item.orden else 1,
+        incluir_siempre=item.incluir_siempre
     )
     db.add(db_item)
     db.commit()
+    plantillas.invalidar_estilo(db_item.estilo_id)
     db.refresh(db_item)
     return db_item
 
@@ -204,14 +217,16 @@ async def crear_estilo(estilo: EstiloMaestroCreate, db: Session = Depends(get_db
                 estilo_id=db_estilo.id,
                 nombre_archivo=item_data.get("nombre_archivo"),
                 contenido=item_data.get("contenido", ""),
-                orden=item_data.get("orden", idx+1)
+                orden=item_data.get("orden", idx+1),
+                incluir_siempre=bool(item_data.get("incluir_siempre", False))
             )
         else:
             db_item = EstiloItem(
                 estilo_id=db_estilo.id,
                 nombre_archivo=item_data.nombre_archivo,
                 contenido=item_data.contenido if hasattr(item_data, 'contenido') else "",
-                orden=item_data.orden if hasattr(item_data, 'orden') else idx+1
+                orden=item_data.orden if hasattr(item_data, 'orden') else idx+1,
+                incluir_siempre=getattr(item_data, 'incluir_siempre', False)
             )
         db.add(db_item)
     
@@ -221,14 +236,11 @@ async def crear_estilo(estilo: EstiloMaestroCreate, db: Session = Depends(get_db
 
 @router.put("/{estilo_id}", response_model=EstiloMaestro)
 async def actualizar_estilo(estilo_id: int, estilo_update: EstiloMaestroUpdate, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_admin)):
-    import logging
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger("estilos")
     
-    logger.info(f"[DEBUG] Actualizando estilo: {estilo_id}")
-    logger.info(f"[DEBUG] Datos de actualización: {estilo_update.model_dump(exclude={'items'})}")
+    logger.debug("Actualizando estilo: %s", estilo_id)
+    logger.debug("Datos de actualización: %s", logs.truncar(estilo_update))
     if hasattr(estilo_update, 'items'):
-        logger.info(f"[DEBUG] Items recibidos: {estilo_update.items}")
+        logger.debug("Items recibidos: %s", logs.truncar(estilo_update.items))
     
     try:
         db_estilo = db.query(EstiloMaestroORM).filter(EstiloMaestroORM.id == estilo_id).first()
@@ -242,15 +254,15 @@ async def actualizar_estilo(estilo_id: int, estilo_update: EstiloMaestroUpdate,
                 setattr(db_estilo, field, value)
         
         # Manejar items - siempre procesamos items ya que el schema los incluye
-        logger.info(f"[DEBUG] Procesando items desde actualización")
+        logger.debug("Procesando items desde actualización")
         
         # Eliminar items existentes
         items_deleted = db.query(EstiloItemORM).filter(EstiloItemORM.estilo_id == estilo_id).delete()
-        logger.info(f"[DEBUG] Items eliminados: {items_deleted}")
+        logger.debug("Items eliminados: %s", items_deleted)
         
         # Agregar nuevos items si hay
         if estilo_update.items:
-            logger.info(f"[DEBUG] Procesando {len(estilo_update.items)} items nuevos")
+            logger.debug("Procesando %s items nuevos", len(estilo_update.items))
             for idx, item_data in enumerate(estilo_update.items):
                 try:
                     # Convertir el item_data a diccionario y agregar estilo_id
@@ -258,30 +270,32 @@ async def actualizar_estilo(estilo_id: int, estilo_update: EstiloMaestroUpdate,
                         "estilo_id": estilo_id,
                         "nombre_archivo": item_data.nombre_archivo,
                         "contenido": item_data.contenido if item_data.contenido is not None else "",
-                        "orden": item_data.orden if item_data.orden is not None else idx+1
+                        "orden": item_data.orden if item_data.orden is not None else idx+1,
+                        "incluir_siempre": item_data.incluir_siempre
                     }
                     # Crear nuevo item usando el modelo ORM
                     db_item = EstiloItemORM(**item_dict)
                     db.add(db_item)
-                    logger.info(f"[DEBUG] Item {idx + 1} agregado correctamente: {item_data.nombre_archivo}")
+                    logger.debug("Item %s agregado correctamente: %s", idx + 1, item_data.nombre_archivo)
                 except Exception as item_error:
-                    logger.error(f"[ERROR] Error al procesar item {idx + 1}: {str(item_error)}")
+                    logger.error("Error al procesar item %s: %s", idx + 1, item_error)
                     raise
         
         # Commit y refresh
         db.commit()
+        plantillas.invalidar_estilo(estilo_id)
         db.refresh(db_estilo)
-        logger.info("[DEBUG] Estilo actualizado exitosamente")
+        logger.debug("Estilo actualizado exitosamente")
         
         # Verificar items guardados
         items_count = db.query(EstiloItemORM).filter(EstiloItemORM.estilo_id == estilo_id).count()
-        logger.info(f"[DEBUG] Items guardados en la base de datos: {items_count}")
+        logger.debug("Items guardados en la base de datos: %s", items_count)
         
         return db_estilo
         
     except Exception as e:
         db.rollback()
-        logger.error(f"[ERROR] Error al actualizar estilo: {str(e)}")
+        logger.error("Error al actualizar estilo: %s", e)
         raise HTTPException(status_code=500, detail=f"Error al actualizar estilo: {str(e)}")
 
 @router.delete("/{estilo_id}", status_code=204)
@@ -291,4 +305,5 @@ async def eliminar_estilo(estilo_id: int, db: Session = Depends(get_db), current
         raise HTTPException(status_code=404, detail=f"Estilo {estilo_id} no encontrado")
     db.delete(db_estilo)
     db.commit()
+    plantillas.invalidar_estilo(estilo_id)
     return None
@@ -2,13 +2,17 @@
 Router para Generación de Contenido IA
 Endpoints para generar contenido optimizado por salidas
 """
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+import json
 from core.database import get_db
 from core.auth import get_current_user, get_current_editor
 from models.schemas import Usuario
+from models.cargas import NOTICIA_PARA_GENERAR, SECCION_CON_PLANTILLAS
 from models.orm_models import (
     Noticia as NoticiaORM,
     Noticia,  # Para crear nuevas noticias
@@ -27,6 +31,10 @@ from models.schemas_fase6 import (
     GenerarSalidasTemporalResponse
 )
 from services.generador_ia import GeneradorIA
+from services.presupuesto_tokens import PresupuestoExcedido
+from services import prioridad_generacion
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api/generar",
@@ -43,7 +51,7 @@ async def publicar_salidas(
     Publica las salidas generadas de una noticia y guarda métricas de valor.
     """
     # Validar noticia existente
-    noticia = db.query(NoticiaORM).filter(NoticiaORM.id == request.noticia_id).first()
+    noticia = db.query(NoticiaORM).options(*NOTICIA_PARA_GENERAR).filter(NoticiaORM.id == request.noticia_id).first()
     if not noticia:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -67,10 +75,7 @@ async def publicar_salidas(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Salidas no encontradas o inactivas: {salidas_faltantes}"
         )
-    # Log detallado del contenido recibido en metricas_valor
-    import logging
-    logging.warning(f"[LOG CRÍTICO] metricas_valor recibido en request: {request.metricas_valor}")
-    print(f"[LOG CRÍTICO] metricas_valor recibido en request: {request.metricas_valor}")
+    logger.debug("metricas_valor recibido en request: %s", request.metricas_valor)
 
     # Generar y guardar métricas de valor
     generador = GeneradorIA(db)
@@ -120,10 +125,10 @@ async def obtener_salidas_de_noticia(
     generador = GeneradorIA(db)
     
     if request.temporal:
-        print("🎯 Generación temporal - usando método temporal")
+        logger.debug("🎯 Generación temporal - usando método temporal")
         # Capturar métricas para todos los usuarios cuando es noticia existente (tiene ID)
         capturar_metricas = hasattr(noticia, 'id') and noticia.id is not None
-        print(f"📊 Métricas temporales: capturar={capturar_metricas}, noticia_id={getattr(noticia, 'id', None)}")
+        logger.debug("📊 Métricas temporales: capturar=%s, noticia_id=%s", capturar_metricas, getattr(noticia, 'id', None))
         
         resultados = generador.generar_multiples_salidas_temporal(
             noticia_temporal=noticia,
@@ -134,7 +139,7 @@ async def obtener_salidas_de_noticia(
             usuario_id=current_user.id
         )
     else:
-        print("🎯 Generación normal - usando método normal")
+        logger.debug("🎯 Generación normal - usando método normal")
         resultados = generador.generar_multiples_salidas(
             noticia=noticia,
             salidas=salidas,
@@ -155,7 +160,7 @@ async def obtener_salidas_de_noticia(
         # Para modo normal (publicación): guardar métricas para TODOS los usuarios
         if len(resultados) > 0:
             try:
-                print("💾 Usuario publicando - guardando métricas en BD...")
+                logger.info("💾 Usuario publicando - guardando métricas en BD...")
                 # Calcular métricas de valor
                 contenido_total = f"{noticia.titulo} {noticia.contenido} "
                 for r in resultados:
@@ -166,7 +171,7 @@ async def obtener_salidas_de_noticia(
                     tiempo_generacion_total=tiempo_total_ms / 1000.0,  # Convertir a segundos
                     tokens_totales=total_tokens,
                     cantidad_salidas=len(resultados),
-                    modelo_usado=llm.modelo_id,
+                    modelo_usado=generador.modelo_predominante(resultados, llm.modelo_id),
                     contenido_total=contenido_total,
                     tipo_noticia=tipo_noticia,
                     complejidad=complejidad
@@ -174,7 +179,7 @@ async def obtener_salidas_de_noticia(
                 # Si el request incluye session_id, asociar métricas temporales
                 session_id = getattr(request, 'session_id', None)
                 if session_id:
-                    print(f"🔄 Intentando asociar métricas temporales con session_id: {session_id}")
+                    logger.info("🔄 Intentando asociar métricas temporales con session_id: %s", session_id)
                     metrica_guardada = generador.guardar_metricas_valor(
                         metricas=metricas,
                         noticia_id=noticia.id,
@@ -189,11 +194,11 @@ async def obtener_salidas_de_noticia(
                         session_id=request.session_id if hasattr(request, 'session_id') else None
                     )
                 if metrica_guardada:
-                    print(f"✅ Métricas guardadas en BD - ID: {metrica_guardada.id}, Usuario: {current_user.username}")
+                    logger.info("✅ Métricas guardadas en BD - ID: %s, Usuario: %s", metrica_guardada.id, current_user.username)
                 else:
-                    print("⚠️ Error guardando métricas en BD")
+                    logger.warning("⚠️ Error guardando métricas en BD")
             except Exception as e:
-                print(f"❌ Error procesando métricas al publicar: {e}")
+                logger.error("❌ Error procesando métricas al publicar: %s", e)
                 import traceback
                 traceback.print_exc()
                 # No fallar la publicación por errores de métricas
@@ -207,24 +212,16 @@ async def obtener_salidas_de_noticia(
     )
 
 
-@router.post("/salidas-temporal", response_model=GenerarSalidasTemporalResponse)
-async def generar_salidas_temporal(
+def _preparar_generacion_temporal(
     request: GenerarSalidasTemporalRequest,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_editor)
+    db: Session,
+    current_user: Usuario
 ):
     """
-    Genera contenido para múltiples salidas SIN crear la noticia en BD
-    
-    **Flujo temporal:**
-    1. Toma datos de noticia (no guardada)
-    2. Selecciona salidas (web, print, social, etc.)
-    3. Usa un LLM para generar contenido
-    4. Devuelve resultados SIN guardar en BD
-    5. **Métricas**: Se calculan y muestran solo para admins (para análisis)
-    
-    **Nota**: Al publicar posteriormente, las métricas se guardan para TODOS los usuarios
-    **Usado por "Generar Noticias" antes de "Publicar"**
+    Valida salidas, LLM y sección de una generación temporal
+
+    Returns:
+        Tupla (salidas, llm, noticia_temporal)
     """
     # Validar salidas
     salidas = db.query(SalidaMaestroORM).filter(
@@ -254,7 +251,7 @@ async def generar_salidas_temporal(
     
     # Obtener sección para prompts y estilos
     from models.orm_models import Seccion
-    seccion_real = db.query(Seccion).filter(Seccion.id == request.datosNoticia.seccion_id).first()
+    seccion_real = db.query(Seccion).options(*SECCION_CON_PLANTILLAS).filter(Seccion.id == request.datosNoticia.seccion_id).first()
     if not seccion_real:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -267,12 +264,6 @@ async def generar_salidas_temporal(
             detail=f"Sección {seccion_real.id} no tiene Estilo asociado. Asocie un Estilo para poder generar salidas temporales."
         )
     
-    # Pre-cargar relaciones de prompt y estilo
-    if seccion_real.prompt and seccion_real.prompt.items:
-        _ = seccion_real.prompt.items
-    if seccion_real.estilo and seccion_real.estilo.items:
-        _ = seccion_real.estilo.items
-    
     # Crear objeto temporal con los datos
     from types import SimpleNamespace
     noticia_temporal = SimpleNamespace()
@@ -281,10 +272,35 @@ async def generar_salidas_temporal(
     noticia_temporal.contenido = request.datosNoticia.contenido
     noticia_temporal.seccion_id = request.datosNoticia.seccion_id
     noticia_temporal.proyecto_id = request.datosNoticia.proyecto_id
+    noticia_temporal.tipo = request.datosNoticia.tipo
     noticia_temporal.usuario_id = current_user.id  # Usar usuario_id en lugar de autor
     noticia_temporal.fecha = datetime.now()
     noticia_temporal.seccion = seccion_real
     
+    return salidas, llm, noticia_temporal
+
+
+@router.post("/salidas-temporal", response_model=GenerarSalidasTemporalResponse)
+async def generar_salidas_temporal(
+    request: GenerarSalidasTemporalRequest,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_editor)
+):
+    """
+    Genera contenido para múltiples salidas SIN crear la noticia en BD
+    
+    **Flujo temporal:**
+    1. Toma datos de noticia (no guardada)
+    2. Selecciona salidas (web, print, social, etc.)
+    3. Usa un LLM para generar contenido
+    4. Devuelve resultados SIN guardar en BD
+    5. **Métricas**: Se calculan y muestran solo para admins (para análisis)
+    
+    **Nota**: Al publicar posteriormente, las métricas se guardan para TODOS los usuarios
+    **Usado por "Generar Noticias" antes de "Publicar"**
+    """
+    salidas, llm, noticia_temporal = _preparar_generacion_temporal(request, db, current_user)
+
     # Determinar si capturar métricas
     # - Siempre para noticia existente (modo edición) 
     # - SIEMPRE para creación nueva (todos los usuarios pueden publicar noticias)
@@ -294,16 +310,21 @@ async def generar_salidas_temporal(
     # Eliminado: generación y uso de session_id para métricas temporales
     
     # Generar contenido temporal
-    generador = GeneradorIA(db)
-    print(f"🔄 Iniciando generación temporal para {len(salidas)} salidas (métricas: {capturar_metricas})")
+    generador = GeneradorIA(
+        db, usuario=current_user,
+        prioridad=prioridad_generacion.clasificar_noticia(noticia_temporal, current_user)
+    )
+    logger.info("🔄 Iniciando generación temporal para %s salidas (métricas: %s)", len(salidas), capturar_metricas)
     
-    resultado_completo = generador.generar_multiples_salidas_temporal(
+    resultado_completo = await generador.generar_multiples_salidas_temporal_async(
         noticia_temporal=noticia_temporal,
         salidas=salidas,
         llm=llm,
         regenerar=True,  # Siempre regenerar para temporal
         usuario_id=current_user.id,
-        capturar_metricas=capturar_metricas
+        capturar_metricas=capturar_metricas,
+        modo_combinado=request.modo_combinado,
+        usar_cache=request.usar_cache
     )
     
     # Extraer datos del resultado completo
@@ -312,12 +333,12 @@ async def generar_salidas_temporal(
     tiempo_total = resultado_completo.get("tiempo_total", 0)
     metricas_valor = resultado_completo.get("metricas_valor", None)
     
-    print(f"✅ Resultados obtenidos: {len(resultados)} items, {len(errores)} errores")
+    logger.info("✅ Resultados obtenidos: %s items, %s errores", len(resultados), len(errores))
     if metricas_valor:
         if es_noticia_existente:
-            print(f"📈 Métricas incluidas para noticia existente: ROI {metricas_valor.get('roi_porcentaje', 0)}%")
+            logger.info("📈 Métricas incluidas para noticia existente: ROI %s%%", metricas_valor.get('roi_porcentaje', 0))
         else:
-            print(f"📈 Métricas incluidas para admin: ROI {metricas_valor.get('roi_porcentaje', 0)}%")
+            logger.info("📈 Métricas incluidas para admin: ROI %s%%", metricas_valor.get('roi_porcentaje', 0))
     
     # Calcular totales - los resultados temporales son diccionarios
     total_tokens = sum(r.get("tokens_usados", 0) for r in resultados if r.get("tokens_usados"))
@@ -340,6 +361,54 @@ async def generar_salidas_temporal(
     return GenerarSalidasTemporalResponse(**response_data)
 
 
+def _formato_sse(evento: dict) -> str:
+    """Serializa un evento de generación con formato Server-Sent Events"""
+    return f"event: {evento['evento']}\ndata: {json.dumps(evento, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/salidas-temporal/stream")
+async def generar_salidas_temporal_stream(
+    request: GenerarSalidasTemporalRequest,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_editor)
+):
+    """
+    Igual que /salidas-temporal pero enviando el progreso por Server-Sent Events
+
+    **Eventos (por salida, según van ocurriendo):**
+    - `inicio`: la salida empezó a generarse
+    - `delta`: fragmento de texto recibido del LLM
+    - `titulo`: título detectado
+    - `completado`: salida terminada, con tokens_usados y tiempo_generacion_ms
+    - `error`: la salida falló (las demás continúan)
+    - `fin`: resumen con total_tokens, tiempo_total_ms, errores y métricas
+    """
+    salidas, llm, noticia_temporal = _preparar_generacion_temporal(request, db, current_user)
+
+    generador = GeneradorIA(
+        db, usuario=current_user,
+        prioridad=prioridad_generacion.clasificar_noticia(noticia_temporal, current_user)
+    )
+    logger.info("🔄 Iniciando generación temporal (stream) para %s salidas", len(salidas))
+
+    async def eventos():
+        async for evento in generador.generar_multiples_salidas_temporal_stream(
+            noticia_temporal=noticia_temporal,
+            salidas=salidas,
+            llm=llm,
+            usuario_id=current_user.id,
+            capturar_metricas=True,
+            usar_cache=request.usar_cache
+        ):
+            yield _formato_sse(evento)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/salida-individual", response_model=NoticiaSalida)
 async def generar_salida_individual(
     noticia_id: int,
@@ -348,6 +417,7 @@ async def generar_salida_individual(
     estilo_id: Optional[int] = None,
     # prompt_id y estilo_id eliminados del endpoint individual (ajustar frontend si es necesario)
     regenerar: bool = False,
+    forzar: bool = False,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_editor)
 ):
@@ -355,19 +425,15 @@ async def generar_salida_individual(
     Genera contenido para una sola salida
     
     **Más simple que generar múltiples salidas**
+    **regenerar**: si ninguna entrada cambió (noticia, prompt, estilo, salida, modelo)
+    se devuelve la salida actual con `omitida=true`; `forzar=true` llama al LLM igualmente
     """
     # Validaciones
-    noticia = db.query(NoticiaORM).filter(NoticiaORM.id == noticia_id).first()
+    # Sección, prompt, estilo y sus items en la misma consulta (sin cargas perezosas)
+    noticia = db.query(NoticiaORM).options(*NOTICIA_PARA_GENERAR).filter(NoticiaORM.id == noticia_id).first()
     if not noticia:
         raise HTTPException(status_code=404, detail="Noticia no encontrada")
     
-    # Asegurar que las relaciones estén cargadas
-    if noticia.seccion:
-        if noticia.seccion.prompt:
-            _ = noticia.seccion.prompt.items
-        if noticia.seccion.estilo:
-            _ = noticia.seccion.estilo.items
-    
     salida = db.query(SalidaMaestroORM).filter(
         SalidaMaestroORM.id == salida_id,
         SalidaMaestroORM.activo == True
@@ -398,10 +464,16 @@ async def generar_salida_individual(
         raise HTTPException(status_code=400, detail="No hay Estilo efectivo: asocie un Estilo a la Sección o pase estilo_id")
 
     # Generar
-    generador = GeneradorIA(db)
-    resultado = generador.generar_para_salida(
+    generador = GeneradorIA(
+        db, usuario=current_user,
+        prioridad=prioridad_generacion.clasificar_noticia(noticia, current_user)
+    )
+    if forzar:
+        generador.incremental = False
+    resultado = await generador.generar_para_salida_async(
         noticia=noticia,
         salida=salida,
+        llm=llm,
         estilo=estilo_obj,
         regenerar=regenerar
     )
@@ -465,6 +537,8 @@ async def actualizar_salida_generada(
 async def regenerar_todas_salidas(
     noticia_id: int,
     llm_id: int,
+    modo_combinado: bool = False,
+    forzar: bool = False,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_editor)
 ):
@@ -472,11 +546,14 @@ async def regenerar_todas_salidas(
     Regenera TODAS las salidas existentes de una noticia
     
     **Útil cuando se actualiza el contenido de la noticia**
+    **modo_combinado**: pide todas las salidas en una sola llamada al LLM
+    **forzar**: regenera también las salidas cuyas entradas no cambiaron (por defecto
+    se omiten y se informa qué entradas cambiaron en las demás)
     """
     from models.orm_models import NoticiaSalida
     
     # Validar noticia
-    noticia = db.query(NoticiaORM).filter(NoticiaORM.id == noticia_id).first()
+    noticia = db.query(NoticiaORM).options(*NOTICIA_PARA_GENERAR).filter(NoticiaORM.id == noticia_id).first()
     if not noticia:
         raise HTTPException(status_code=404, detail="Noticia no encontrada")
     
@@ -507,18 +584,32 @@ async def regenerar_todas_salidas(
     
     # Regenerar todas
     try:
-        generador = GeneradorIA(db)
-        resultados = generador.generar_multiples_salidas(
+        generador = GeneradorIA(
+            db, usuario=current_user,
+            prioridad=prioridad_generacion.clasificar_noticia(noticia, current_user)
+        )
+        if forzar:
+            generador.incremental = False
+        resultados = await generador.generar_multiples_salidas_async(
             noticia=noticia,
             salidas=salidas,
             llm=llm,
-            regenerar=True
+            regenerar=True,
+            modo_combinado=modo_combinado
         )
+        omitidas = [r.salida_id for r in resultados if getattr(r, 'omitida', False)]
         
         return {
-            "message": f"Regeneradas {len(resultados)} salidas",
-            "salidas": resultados
+            "message": f"Regeneradas {len(resultados) - len(omitidas)} salidas ({len(omitidas)} sin cambios)",
+            "salidas": resultados,
+            "omitidas": omitidas,
+            "entradas_cambiadas": {
+                r.salida_id: r.entradas_cambiadas
+                for r in resultados if not getattr(r, 'omitida', False) and getattr(r, 'entradas_cambiadas', None) is not None
+            }
         }
         
+    except PresupuestoExcedido as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
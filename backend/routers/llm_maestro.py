@@ -15,6 +15,9 @@ from models.schemas_fase6 import (
     ProveedorLLM
 )
 from core.auth import get_current_user, get_current_admin
+from services import proveedores_llm
+from services import presupuesto_tokens
+from services import ventanas_tokens
 from models.schemas import Usuario
 
 router = APIRouter(
@@ -215,6 +218,8 @@ async def actualizar_llm(
             db.add(db_item)
         db.commit()
     db.refresh(db_llm)
+    # Clave, proveedor o URL pueden haber cambiado: el próximo uso crea un cliente nuevo
+    proveedores_llm.invalidar_clientes_llm(llm_id)
     return db_llm
 
 
@@ -240,6 +245,7 @@ async def eliminar_llm(
     
     db.delete(db_llm)
     db.commit()
+    proveedores_llm.invalidar_clientes_llm(llm_id)
     
     return None
 
@@ -267,13 +273,15 @@ async def toggle_activo_llm(
     db_llm.activo = not db_llm.activo
     db.commit()
     db.refresh(db_llm)
+    if not db_llm.activo:
+        proveedores_llm.invalidar_clientes_llm(llm_id)
     
     return db_llm
 
 
 # ==================== RESETEAR TOKENS DIARIOS ====================
 
-@router.post("/{llm_id}/reset-tokens", response_model=LLMMaestro)
+@router.post("/{llm_id}/reset-tokens", response_model=LLMMaestro, deprecated=True)
 async def resetear_tokens_diarios(
     llm_id: int,
     db: Session = Depends(get_db),
@@ -282,6 +290,9 @@ async def resetear_tokens_diarios(
     """
     Resetear el contador de tokens usados hoy
     ⚠️ Solo para administradores
+
+    Obsoleto: el consumo se lleva en ventanas deslizantes que avanzan solas
+    (ver /api/uso-tokens); se mantiene para correcciones manuales.
     """
     db_llm = db.query(LLMMaestroORM).filter(LLMMaestroORM.id == llm_id).first()
     
@@ -291,6 +302,9 @@ async def resetear_tokens_diarios(
             detail=f"LLM con ID {llm_id} no encontrado"
         )
     
+    # El contador de presupuesto es la fuente de tokens_usados_hoy (ver presupuesto_tokens.volcar)
+    await presupuesto_tokens.reiniciar(presupuesto_tokens.AMBITO_LLM, llm_id)
+    ventanas_tokens.reiniciar("llm", llm_id)
     db_llm.tokens_usados_hoy = 0
     db.commit()
     db.refresh(db_llm)
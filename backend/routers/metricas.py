@@ -2,6 +2,7 @@
 Router para Métricas de Valor Periodístico
 Endpoints para consultar métricas guardadas en BD
 """
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Optional
@@ -12,6 +13,8 @@ from models.orm_models import MetricasValorPeriodistico
 from models.schemas import MetricasValorResumen
 from services.generador_ia import GeneradorIA
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/api/metricas",
     tags=["Métricas"]
@@ -34,11 +37,11 @@ async def obtener_metricas_noticia(
     - No existen métricas para la noticia
     - Usuario no es admin
     """
-    print(f"🔍 Obteniendo métricas para noticia {noticia_id}, usuario: {current_user.username}, role: {current_user.role}")
+    logger.debug("🔍 Obteniendo métricas para noticia %s, usuario: %s, role: %s", noticia_id, current_user.username, current_user.role)
     
     # Solo admins pueden ver métricas
     if current_user.role != 'admin':
-        print(f"❌ Usuario {current_user.username} no es admin, retornando None")
+        logger.debug("Usuario %s no es admin, retornando None", current_user.username)
         return None
     
     # Buscar métricas más recientes para esta noticia
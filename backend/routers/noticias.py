@@ -1,13 +1,16 @@
 """
 Router de Noticias - Endpoints CRUD con PostgreSQL y Autenticación
 """
+import logging
 from fastapi import APIRouter, HTTPException, status, Query, Depends
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
-from core.database import get_db
+from core.database import get_async_db
 from models import orm_models
+from models.cargas import NOTICIA_CON_AUTOR
 from models.schemas import (
     Noticia, 
     NoticiaCreate, 
@@ -18,6 +21,8 @@ from models.schemas import (
 from models.orm_models import MetricasValorPeriodistico  # Para asociar métricas
 from routers.auth import get_current_user, get_current_active_user
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -40,6 +45,21 @@ def verificar_permiso_noticia(
     return False
 
 
+async def _salidas_ids(db: AsyncSession, noticia_id: int) -> List[int]:
+    """IDs de las salidas asociadas a la noticia"""
+    return list(await db.scalars(
+        select(orm_models.NoticiaSalida.salida_id).where(orm_models.NoticiaSalida.noticia_id == noticia_id)
+    ))
+
+
+async def _noticia_con_autor(db: AsyncSession, noticia_id: int) -> Optional[orm_models.Noticia]:
+    """Noticia con usuario_creador cargado (autor_nombre); relee la fila si ya estaba en la sesión"""
+    return await db.scalar(
+        select(orm_models.Noticia).where(orm_models.Noticia.id == noticia_id)
+        .options(*NOTICIA_CON_AUTOR).execution_options(populate_existing=True)
+    )
+
+
 # ==================== ENDPOINTS PÚBLICOS (SIN AUTH) ====================
 
 
@@ -50,7 +70,7 @@ async def listar_noticias(
     estado: Optional[str] = None,  # Nuevo filtro
     limite: int = Query(default=100, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Listar todas las noticias con filtros opcionales
@@ -62,40 +82,39 @@ async def listar_noticias(
     - proyecto_id: Filtrar noticias de un proyecto específico
     - estado: Filtrar por estado ('activo', 'archivado', etc)
     """
-    query = db.query(orm_models.Noticia).options(joinedload(orm_models.Noticia.usuario_creador))
+    query = select(orm_models.Noticia).options(*NOTICIA_CON_AUTOR)
     if seccion_id:
-        query = query.filter(orm_models.Noticia.seccion_id == seccion_id)
+        query = query.where(orm_models.Noticia.seccion_id == seccion_id)
     if proyecto_id:
-        query = query.filter(orm_models.Noticia.proyecto_id == proyecto_id)
+        query = query.where(orm_models.Noticia.proyecto_id == proyecto_id)
     if estado:
-        query = query.filter(orm_models.Noticia.estado == estado)
+        query = query.where(orm_models.Noticia.estado == estado)
     # Ordenar por fecha más reciente
     query = query.order_by(orm_models.Noticia.created_at.desc())
-    noticias = query.offset(offset).limit(limite).all()
+    noticias = (await db.scalars(query.offset(offset).limit(limite))).all()
     return [n.to_dict() for n in noticias]
 
 
 @router.get("/{noticia_id}")
-def obtener_noticia(noticia_id: int, db: Session = Depends(get_db)):
+async def obtener_noticia(noticia_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Obtener una noticia específica por ID
     
     📖 Endpoint PÚBLICO - No requiere autenticación
     """
-    noticia = db.query(orm_models.Noticia).options(joinedload(orm_models.Noticia.usuario_creador)).filter(
-        orm_models.Noticia.id == noticia_id
-    ).first()
+    noticia = await _noticia_con_autor(db, noticia_id)
     if not noticia:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Noticia con ID {noticia_id} no encontrada"
         )
     # Buscar todas las salidas asociadas
-    salidas_ids = [rel.salida_id for rel in db.query(orm_models.NoticiaSalida).filter_by(noticia_id=noticia_id)]
     data = noticia.to_dict()
-    data['salidas_ids'] = salidas_ids
+    data['salidas_ids'] = await _salidas_ids(db, noticia_id)
     # Buscar métricas asociadas
-    metrica = db.query(orm_models.MetricasValorPeriodistico).filter_by(noticia_id=noticia_id).first()
+    metrica = await db.scalar(
+        select(orm_models.MetricasValorPeriodistico).where(orm_models.MetricasValorPeriodistico.noticia_id == noticia_id).limit(1)
+    )
     if metrica:
         data['metricas'] = {
             'tiempo_generacion_total': float(metrica.tiempo_generacion_total),
@@ -127,27 +146,27 @@ def obtener_noticia(noticia_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/stats/resumen", response_model=EstadisticasResponse)
-async def obtener_estadisticas(db: Session = Depends(get_db)):
+async def obtener_estadisticas(db: AsyncSession = Depends(get_async_db)):
     """
     Obtener estadísticas generales del sistema
     
     📖 Endpoint PÚBLICO - No requiere autenticación
     """
-    noticias = db.query(orm_models.Noticia).all()
-    # Contar noticias por sección
-    secciones_count = {}
-    for noticia in noticias:
-        sec = noticia.seccion_id
-        secciones_count[sec] = secciones_count.get(sec, 0) + 1
+    Noticia = orm_models.Noticia
+    # Contar noticias por sección (agregado en SQL, sin cargar las noticias)
+    secciones_count = dict((await db.execute(
+        select(Noticia.seccion_id, func.count()).group_by(Noticia.seccion_id)
+    )).all())
     # Contar noticias con análisis IA
-    noticias_ia = sum(1 for n in noticias if n.resumen_ia)
+    noticias_ia = await db.scalar(
+        select(func.count()).select_from(Noticia).where(Noticia.resumen_ia.is_not(None), Noticia.resumen_ia != "")
+    )
     # Últimas 5 noticias
-    ultimas = db.query(orm_models.Noticia).order_by(
-        orm_models.Noticia.created_at.desc()
-    ).limit(5).all()
-    ultimas_titulos = [n.titulo for n in ultimas]
+    ultimas_titulos = list(await db.scalars(
+        select(Noticia.titulo).order_by(Noticia.created_at.desc()).limit(5)
+    ))
     return EstadisticasResponse(
-        total_noticias=len(noticias),
+        total_noticias=sum(secciones_count.values()),
         noticias_por_seccion=secciones_count,
         noticias_con_ia=noticias_ia,
         ultimas_actualizaciones=ultimas_titulos
@@ -160,7 +179,7 @@ async def obtener_estadisticas(db: Session = Depends(get_db)):
 async def crear_noticia(
     noticia: NoticiaCreate,
     current_user: orm_models.Usuario = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Crear una nueva noticia
@@ -177,9 +196,7 @@ async def crear_noticia(
     
     # Validar que el proyecto exista si se proporciona proyecto_id
     if noticia.proyecto_id:
-        proyecto = db.query(orm_models.Proyecto).filter(
-            orm_models.Proyecto.id == noticia.proyecto_id
-        ).first()
+        proyecto = await db.get(orm_models.Proyecto, noticia.proyecto_id)
         
         if not proyecto:
             raise HTTPException(
@@ -195,43 +212,42 @@ async def crear_noticia(
         usuario_id=current_user.id,  # Vincular con el usuario como fuente de verdad
         proyecto_id=noticia.proyecto_id,  # Vincular con proyecto (opcional)
         llm_id=noticia.llm_id,
-        estado=noticia.estado if hasattr(noticia, 'estado') and noticia.estado else 'activo'
+        estado=noticia.estado if hasattr(noticia, 'estado') and noticia.estado else 'activo',
+        tipo=noticia.tipo or 'feature'
     )
     db.add(nueva_noticia)
-    db.commit()
-    db.refresh(nueva_noticia)
+    await db.commit()
+    await db.refresh(nueva_noticia)
     
     # ✨ ASOCIAR MÉTRICAS TEMPORALES SI EXISTE session_id
     if noticia.session_id:
-            print(f"🔄 Asociando métricas de session_id: {noticia.session_id} a noticia_id: {nueva_noticia.id}")
+            logger.info("🔄 Asociando métricas de session_id: %s a noticia_id: %s", noticia.session_id, nueva_noticia.id)
             try:
-                metricas_temporales = db.query(orm_models.MetricasValorPeriodistico).filter(
+                metricas_temporales = (await db.scalars(select(orm_models.MetricasValorPeriodistico).where(
                     orm_models.MetricasValorPeriodistico.session_id == noticia.session_id
-                ).all()
+                ))).all()
                 if metricas_temporales:
                     # Limpiar duplicados previos para esta noticia
-                    db.query(orm_models.MetricasValorPeriodistico).filter(
+                    await db.execute(delete(orm_models.MetricasValorPeriodistico).where(
                         orm_models.MetricasValorPeriodistico.noticia_id == nueva_noticia.id
-                    ).delete()
-                    db.commit()
+                    ))
+                    await db.commit()
                     for metrica in metricas_temporales:
                         metrica.noticia_id = nueva_noticia.id
                         metrica.session_id = None
-                        print(f"📊 Métrica asociada: tokens={metrica.tokens_total}, costo={metrica.costo_generacion}")
-                    db.commit()
-                    print(f"✅ {len(metricas_temporales)} métricas asociadas exitosamente")
+                        logger.info("📊 Métrica asociada: tokens=%s, costo=%s", metrica.tokens_total, metrica.costo_generacion)
+                    await db.commit()
+                    logger.info("✅ %s métricas asociadas exitosamente", len(metricas_temporales))
                     # Si ya asociamos métricas, NO recalcular ni guardar nuevas métricas
-                    data = nueva_noticia.to_dict()
-                    salidas_ids = [rel.salida_id for rel in db.query(orm_models.NoticiaSalida).filter_by(noticia_id=nueva_noticia.id)]
-                    data['salidas_ids'] = salidas_ids
+                    data = (await _noticia_con_autor(db, nueva_noticia.id)).to_dict()
+                    data['salidas_ids'] = await _salidas_ids(db, nueva_noticia.id)
                     return data
                 else:
-                    print(f"⚠️ No se encontraron métricas para session_id: {noticia.session_id}")
+                    logger.warning("⚠️ No se encontraron métricas para session_id: %s", noticia.session_id)
                     # Si no hay métricas temporales, recalcular y guardar nuevas métricas
                     from services.generador_ia import GeneradorIA
-                    generador = GeneradorIA(db)
-                    # Recalcular métricas solo si no existen
-                    metricas = generador.calcular_metricas_valor(
+                    # Recalcular métricas solo si no existen (GeneradorIA trabaja con la Session síncrona)
+                    metricas = await db.run_sync(lambda sesion: GeneradorIA(sesion).calcular_metricas_valor(
                         tiempo_generacion_total=0.0,
                         tokens_totales=0,
                         cantidad_salidas=0,
@@ -239,21 +255,21 @@ async def crear_noticia(
                         contenido_total="",
                         tipo_noticia=getattr(noticia, 'tipo', 'feature'),
                         complejidad=getattr(noticia, 'complejidad', 'media')
-                    )
+                    ))
                     metrica_nueva = orm_models.MetricasValorPeriodistico(
                         noticia_id=nueva_noticia.id,
                         usuario_id=current_user.id,
                         **metricas
                     )
                     db.add(metrica_nueva)
-                    db.commit()
-                    print(f"✅ Métrica nueva creada y asociada a noticia {nueva_noticia.id}")
+                    await db.commit()
+                    logger.info("✅ Métrica nueva creada y asociada a noticia %s", nueva_noticia.id)
             except Exception as e:
-                print(f"❌ Error asociando métricas: {e}")
-                db.rollback()
+                logger.error("❌ Error asociando métricas: %s", e)
+                await db.rollback()
                 db.add(nueva_noticia)
-                db.commit()
-                db.refresh(nueva_noticia)
+                await db.commit()
+                await db.refresh(nueva_noticia)
     # Asociar salidas si se envían
     if getattr(noticia, 'salidas_ids', None):
         for salida_id in noticia.salidas_ids:
@@ -264,11 +280,10 @@ async def crear_noticia(
                 contenido_generado=""
             )
             db.add(rel)
-        db.commit()
+        await db.commit()
     # Devolver noticia con salidas asociadas
-    salidas_ids = [rel.salida_id for rel in db.query(orm_models.NoticiaSalida).filter_by(noticia_id=nueva_noticia.id)]
-    data = nueva_noticia.to_dict()
-    data['salidas_ids'] = salidas_ids
+    data = (await _noticia_con_autor(db, nueva_noticia.id)).to_dict()
+    data['salidas_ids'] = await _salidas_ids(db, nueva_noticia.id)
     return data
 
 
@@ -277,7 +292,7 @@ async def actualizar_noticia(
     noticia_id: int, 
     noticia_update: NoticiaUpdate,
     current_user: orm_models.Usuario = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Actualizar una noticia existente
@@ -288,9 +303,7 @@ async def actualizar_noticia(
        - editor: solo puede editar sus propias noticias
        - viewer: sin permisos
     """
-    noticia = db.query(orm_models.Noticia).filter(
-        orm_models.Noticia.id == noticia_id
-    ).first()
+    noticia = await db.get(orm_models.Noticia, noticia_id)
     
     if not noticia:
         raise HTTPException(
@@ -318,7 +331,7 @@ async def actualizar_noticia(
     salidas_ids = update_data.get("salidas_ids")
     if salidas_ids is not None:
         # Eliminar relaciones actuales
-        db.query(orm_models.NoticiaSalida).filter_by(noticia_id=noticia_id).delete()
+        await db.execute(delete(orm_models.NoticiaSalida).where(orm_models.NoticiaSalida.noticia_id == noticia_id))
         # Crear nuevas relaciones
         for salida_id in salidas_ids:
             rel = orm_models.NoticiaSalida(
@@ -328,13 +341,11 @@ async def actualizar_noticia(
                 contenido_generado=""
             )
             db.add(rel)
-        db.commit()
-    db.commit()  # <--- Asegura que los cambios de estado y otros campos se guarden
-    db.refresh(noticia)
+        await db.commit()
+    await db.commit()  # <--- Asegura que los cambios de estado y otros campos se guarden
     # Devolver noticia con salidas asociadas
-    salidas_ids_resp = [rel.salida_id for rel in db.query(orm_models.NoticiaSalida).filter_by(noticia_id=noticia_id)]
-    data = noticia.to_dict()
-    data['salidas_ids'] = salidas_ids_resp
+    data = (await _noticia_con_autor(db, noticia_id)).to_dict()
+    data['salidas_ids'] = await _salidas_ids(db, noticia_id)
     return data
 
 
@@ -342,7 +353,7 @@ async def actualizar_noticia(
 async def eliminar_noticia(
     noticia_id: int,
     current_user: orm_models.Usuario = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Eliminar una noticia por ID
@@ -353,9 +364,7 @@ async def eliminar_noticia(
        - editor: solo puede eliminar sus propias noticias
        - viewer: sin permisos
     """
-    noticia = db.query(orm_models.Noticia).filter(
-        orm_models.Noticia.id == noticia_id
-    ).first()
+    noticia = await db.get(orm_models.Noticia, noticia_id)
     
     if not noticia:
         raise HTTPException(
@@ -371,9 +380,9 @@ async def eliminar_noticia(
         )
     
     # Eliminar relaciones de salidas asociadas
-    db.query(orm_models.NoticiaSalida).filter_by(noticia_id=noticia_id).delete()
-    db.delete(noticia)
-    db.commit()
+    await db.execute(delete(orm_models.NoticiaSalida).where(orm_models.NoticiaSalida.noticia_id == noticia_id))
+    await db.delete(noticia)
+    await db.commit()
     
     return ResponseModel(
         success=True,
@@ -384,7 +393,7 @@ async def eliminar_noticia(
 # ==================== ENDPOINTS DE DESARROLLO ====================
 
 @router.post("/seed", response_model=ResponseModel)
-async def crear_datos_ejemplo(db: Session = Depends(get_db)):
+async def crear_datos_ejemplo(db: AsyncSession = Depends(get_async_db)):
     """
     Crear datos de ejemplo para testing
     
@@ -411,9 +420,9 @@ async def crear_datos_ejemplo(db: Session = Depends(get_db)):
     for dato in datos_ejemplo:
         noticia = orm_models.Noticia(**dato)
         db.add(noticia)
-    db.commit()
+    await db.commit()
     return ResponseModel(
         success=True,
         message=f"Se crearon {len(datos_ejemplo)} noticias de ejemplo",
-        data={"total_noticias": db.query(orm_models.Noticia).count()}
+        data={"total_noticias": await db.scalar(select(func.count()).select_from(orm_models.Noticia))}
     )
@@ -1,6 +1,7 @@
 """
 Router para manejo explícito de items de Prompt
 """
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
@@ -9,6 +10,10 @@ from models.orm_models import PromptItem, PromptMaestro
 from models.schemas_fase6 import PromptItem as PromptItemSchema
 from core.auth import get_current_user, get_current_admin
 from models.schemas import Usuario
+from services import plantillas
+from core import logs
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/prompt-items", tags=["PromptItems"])
 
@@ -26,17 +31,14 @@ def obtener_item(item_id: int, db: Session = Depends(get_db), current_user: Usua
 
 @router.post("/", response_model=PromptItemSchema, status_code=201)
 def crear_item(item: PromptItemSchema, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_admin)):
-    import logging
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger("prompt_items")
     try:
         payload = item.model_dump(exclude_unset=True)
-        logger.info(f"Payload recibido en crear_item: {payload}")
+        logger.debug("Payload recibido en crear_item: %s", logs.truncar(payload))
         # Validar que no haya campos extra
         allowed_fields = {'prompt_id', 'nombre_archivo', 'contenido', 'orden'}
         extra_fields = set(payload.keys()) - allowed_fields
         if extra_fields:
-            logger.error(f"Campos extra no permitidos en payload: {extra_fields}")
+            logger.error("Campos extra no permitidos en payload: %s", extra_fields)
             raise HTTPException(status_code=422, detail=f"Campos extra no permitidos: {', '.join(extra_fields)}")
         # Validar que prompt_id no sea None y que el Prompt exista
         if not payload.get('prompt_id'):
@@ -44,16 +46,17 @@ def crear_item(item: PromptItemSchema, db: Session = Depends(get_db), current_us
             raise HTTPException(status_code=422, detail="El campo prompt_id es obligatorio y no puede ser None")
         prompt_exists = db.query(PromptMaestro).filter(PromptMaestro.id == payload['prompt_id']).first()
         if not prompt_exists:
-            logger.error(f"PromptMaestro con id={payload['prompt_id']} no existe")
+            logger.error("PromptMaestro con id=%s no existe", payload['prompt_id'])
             raise HTTPException(status_code=404, detail=f"PromptMaestro con id={payload['prompt_id']} no existe")
         db_item = PromptItem(**payload)
         db.add(db_item)
         db.commit()
+        plantillas.invalidar_prompt(db_item.prompt_id)
         db.refresh(db_item)
-        logger.info(f"Item creado correctamente: id={db_item.id}")
+        logger.info("Item creado correctamente: id=%s", db_item.id)
         return db_item
     except Exception as e:
-        logger.error(f"Error al crear PromptItem: {e}", exc_info=True)
+        logger.error("Error al crear PromptItem: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error interno al crear PromptItem: {str(e)}")
 
 @router.put("/{item_id}", response_model=PromptItemSchema)
@@ -61,10 +64,13 @@ def actualizar_item(item_id: int, item_update: PromptItemSchema, db: Session = D
     db_item = db.query(PromptItem).filter(PromptItem.id == item_id).first()
     if not db_item:
         raise HTTPException(status_code=404, detail=f"Item {item_id} no encontrado")
+    prompt_id_anterior = db_item.prompt_id
     update_data = item_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_item, field, value)
     db.commit()
+    plantillas.invalidar_prompt(prompt_id_anterior)
+    plantillas.invalidar_prompt(db_item.prompt_id)
     db.refresh(db_item)
     return db_item
 
@@ -75,4 +81,5 @@ def eliminar_item(item_id: int, db: Session = Depends(get_db), current_user: Usu
         raise HTTPException(status_code=404, detail=f"Item {item_id} no encontrado")
     db.delete(db_item)
     db.commit()
+    plantillas.invalidar_prompt(db_item.prompt_id)
     return None
@@ -1,20 +1,36 @@
 
 """Router para Prompts - CRUD completo"""
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from core.database import get_db
+from core.database import get_async_db
+from models.cargas import PROMPT_CON_ITEMS
 from models.orm_models import PromptMaestro as PromptMaestroORM, PromptItem
 from models.schemas_fase6 import PromptMaestro, PromptMaestroCreate, PromptMaestroUpdate
 from core.auth import get_current_user, get_current_admin
 from models.schemas import Usuario
+from services import plantillas
 import re
+from core import logs
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/prompts", tags=["Prompts"])
 
+
+async def _prompt_con_items(db: AsyncSession, prompt_id: int) -> Optional[PromptMaestroORM]:
+    """Prompt con sus items recién leídos (también tras modificarlos en esta sesión)"""
+    return await db.scalar(
+        select(PromptMaestroORM).where(PromptMaestroORM.id == prompt_id)
+        .options(*PROMPT_CON_ITEMS).execution_options(populate_existing=True)
+    )
+
+
 @router.get("/activos", response_model=List[PromptMaestro])
-async def listar_prompts_activos(db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_user)):
-    return db.query(PromptMaestroORM).filter(PromptMaestroORM.activo == True).all()
+async def listar_prompts_activos(db: AsyncSession = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)):
+    return (await db.scalars(select(PromptMaestroORM).where(PromptMaestroORM.activo == True).options(*PROMPT_CON_ITEMS))).all()
 
 @router.get("/", response_model=List[PromptMaestro])
 async def listar_prompts(
@@ -22,33 +38,33 @@ async def listar_prompts(
     # categoria eliminado
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    query = db.query(PromptMaestroORM)
+    query = select(PromptMaestroORM).options(*PROMPT_CON_ITEMS)
     if activo is not None:
-        query = query.filter(PromptMaestroORM.activo == activo)
+        query = query.where(PromptMaestroORM.activo == activo)
     # Filtro por categoria eliminado
-    return query.offset(skip).limit(limit).all()
+    return (await db.scalars(query.offset(skip).limit(limit))).all()
 
 @router.get("/{prompt_id}", response_model=PromptMaestro)
-async def obtener_prompt(prompt_id: int, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_user)):
-    prompt = db.query(PromptMaestroORM).filter(PromptMaestroORM.id == prompt_id).first()
+async def obtener_prompt(prompt_id: int, db: AsyncSession = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)):
+    prompt = await _prompt_con_items(db, prompt_id)
     if not prompt:
         raise HTTPException(status_code=404, detail=f"Prompt {prompt_id} no encontrado")
     return prompt
 
 @router.post("/", response_model=PromptMaestro, status_code=201)
-async def crear_prompt(prompt: PromptMaestroCreate, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_admin)):
-    existing = db.query(PromptMaestroORM).filter(PromptMaestroORM.nombre == prompt.nombre).first()
+async def crear_prompt(prompt: PromptMaestroCreate, db: AsyncSession = Depends(get_async_db), current_user: Usuario = Depends(get_current_admin)):
+    existing = await db.scalar(select(PromptMaestroORM).where(PromptMaestroORM.nombre == prompt.nombre))
     if existing:
         raise HTTPException(status_code=400, detail=f"Prompt '{prompt.nombre}' ya existe")
     items_data = prompt.items if hasattr(prompt, 'items') else []
     prompt_dict = prompt.model_dump(exclude={"items"})
     db_prompt = PromptMaestroORM(**prompt_dict)
     db.add(db_prompt)
-    db.commit()
-    db.refresh(db_prompt)
+    await db.commit()
+    await db.refresh(db_prompt)
     # Persistir items
     for idx, item_data in enumerate(items_data):
         # Si es un diccionario, usar directamente
@@ -68,13 +84,12 @@ async def crear_prompt(prompt: PromptMaestroCreate, db: Session = Depends(get_db
                 orden=item_data.orden if hasattr(item_data, 'orden') else idx+1
             )
         db.add(db_item)
-    db.commit()
-    db.refresh(db_prompt)
-    return db_prompt
+    await db.commit()
+    return await _prompt_con_items(db, db_prompt.id)
 
 @router.put("/{prompt_id}", response_model=PromptMaestro)
-async def actualizar_prompt(prompt_id: int, prompt_update: PromptMaestroUpdate, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_admin)):
-    db_prompt = db.query(PromptMaestroORM).filter(PromptMaestroORM.id == prompt_id).first()
+async def actualizar_prompt(prompt_id: int, prompt_update: PromptMaestroUpdate, db: AsyncSession = Depends(get_async_db), current_user: Usuario = Depends(get_current_admin)):
+    db_prompt = await db.get(PromptMaestroORM, prompt_id)
     if not db_prompt:
         raise HTTPException(status_code=404, detail=f"Prompt {prompt_id} no encontrado")
     update_data = prompt_update.model_dump(exclude_unset=True, exclude={"items"})
@@ -82,9 +97,9 @@ async def actualizar_prompt(prompt_id: int, prompt_update: PromptMaestroUpdate,
         setattr(db_prompt, field, value)
     # Actualizar items si vienen en el payload
     if hasattr(prompt_update, "items") and prompt_update.items is not None:
-        print("[DEBUG] Items recibidos en PUT /api/prompts/{}:".format(prompt_id), prompt_update.items)
+        logger.debug("Items recibidos en PUT /api/prompts/%s: %s", prompt_id, logs.truncar(prompt_update.items))
         # Eliminar items previos
-        db.query(PromptItem).filter(PromptItem.prompt_id == prompt_id).delete()
+        await db.execute(delete(PromptItem).where(PromptItem.prompt_id == prompt_id))
         # Agregar nuevos items
         for idx, item_data in enumerate(prompt_update.items):
             # Si es un diccionario, usar directamente
@@ -104,15 +119,16 @@ async def actualizar_prompt(prompt_id: int, prompt_update: PromptMaestroUpdate,
                     orden=item_data.orden if hasattr(item_data, 'orden') else idx+1
                 )
             db.add(db_item)
-    db.commit()
-    db.refresh(db_prompt)
-    return db_prompt
+    await db.commit()
+    plantillas.invalidar_prompt(prompt_id)
+    return await _prompt_con_items(db, prompt_id)
 
 @router.delete("/{prompt_id}", status_code=204)
-async def eliminar_prompt(prompt_id: int, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_admin)):
-    db_prompt = db.query(PromptMaestroORM).filter(PromptMaestroORM.id == prompt_id).first()
+async def eliminar_prompt(prompt_id: int, db: AsyncSession = Depends(get_async_db), current_user: Usuario = Depends(get_current_admin)):
+    db_prompt = await db.get(PromptMaestroORM, prompt_id)
     if not db_prompt:
         raise HTTPException(status_code=404, detail=f"Prompt {prompt_id} no encontrado")
-    db.delete(db_prompt)
-    db.commit()
+    await db.delete(db_prompt)
+    await db.commit()
+    plantillas.invalidar_prompt(prompt_id)
     return None
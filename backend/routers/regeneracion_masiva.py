@@ -0,0 +1,151 @@
+"""
+Router de la regeneración masiva de salidas
+Regenera las salidas de las noticias de una sección, proyecto, estado o rango de fechas
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from core.database import get_db
+from core.auth import get_current_user, get_current_editor
+from models.schemas import Usuario
+from models.orm_models import (
+    SalidaMaestro as SalidaMaestroORM,
+    LLMMaestro as LLMMaestroORM,
+    RegeneracionMasiva as RegeneracionMasivaORM
+)
+from models.schemas_fase6 import RegeneracionMasivaRequest, RegeneracionMasiva
+from services import regeneracion_masiva
+
+router = APIRouter(
+    prefix="/api/generar/bulk",
+    tags=["Generación IA"]
+)
+
+
+def _obtener_regeneracion(db: Session, regeneracion_id: int, current_user: Usuario) -> RegeneracionMasivaORM:
+    regeneracion = db.query(RegeneracionMasivaORM).filter(RegeneracionMasivaORM.id == regeneracion_id).first()
+    if not regeneracion:
+        raise HTTPException(status_code=404, detail="Regeneración no encontrada")
+    if regeneracion.usuario_id != current_user.id and current_user.role != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para ver esta regeneración"
+        )
+    return regeneracion
+
+
+@router.post("/", response_model=RegeneracionMasiva, status_code=status.HTTP_202_ACCEPTED)
+async def crear_regeneracion(
+    request: RegeneracionMasivaRequest,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_editor)
+):
+    """
+    Regenera las salidas de todas las noticias que cumplen el filtro
+
+    Devuelve la regeneración al momento; el supervisor (API o worker_generacion.py)
+    la hace avanzar en segundo plano y se puede reanudar tras un reinicio.
+
+    **Modos:**
+    - `cola`: un trabajo por noticia con prioridad lote, con un máximo en vuelo
+    - `batch`: lotes a la API batch del proveedor (Anthropic/OpenAI; 50% más barata,
+      resultados en minutos u horas)
+
+    Sin `salidas_ids` se regeneran las salidas que ya tiene cada noticia. Las salidas
+    cuyas entradas no cambiaron desde su última generación se omiten (`salidas_omitidas`).
+    """
+    llm = db.query(LLMMaestroORM).filter(
+        LLMMaestroORM.id == request.llm_id,
+        LLMMaestroORM.activo == True
+    ).first()
+    if not llm:
+        raise HTTPException(status_code=404, detail="LLM no encontrado o inactivo")
+
+    if request.salidas_ids:
+        encontradas = {
+            salida_id for (salida_id,) in db.query(SalidaMaestroORM.id).filter(
+                SalidaMaestroORM.id.in_(request.salidas_ids),
+                SalidaMaestroORM.activo == True
+            ).all()
+        }
+        faltantes = [salida_id for salida_id in request.salidas_ids if salida_id not in encontradas]
+        if faltantes:
+            raise HTTPException(status_code=404, detail=f"Salidas no encontradas o inactivas: {faltantes}")
+
+    if request.desde and request.hasta and request.desde > request.hasta:
+        raise HTTPException(status_code=400, detail="'desde' no puede ser posterior a 'hasta'")
+
+    regeneracion = regeneracion_masiva.crear(
+        db,
+        filtro={
+            "seccion_id": request.seccion_id,
+            "proyecto_id": request.proyecto_id,
+            "estado": request.estado,
+            "desde": request.desde,
+            "hasta": request.hasta
+        },
+        llm_id=llm.id,
+        usuario_id=current_user.id,
+        salidas_ids=request.salidas_ids,
+        modo=request.modo,
+        modo_combinado=request.modo_combinado
+    )
+    return regeneracion_masiva.resumen(db, regeneracion)
+
+
+@router.get("/{regeneracion_id}", response_model=RegeneracionMasiva)
+async def obtener_regeneracion(
+    regeneracion_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Progreso: noticias enviadas, trabajos por estado, lotes en proceso y porcentaje"""
+    return regeneracion_masiva.resumen(db, _obtener_regeneracion(db, regeneracion_id, current_user))
+
+
+@router.post("/{regeneracion_id}/pausar", response_model=RegeneracionMasiva)
+async def pausar_regeneracion(
+    regeneracion_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Deja de enviar noticias hasta reanudar"""
+    regeneracion = _obtener_regeneracion(db, regeneracion_id, current_user)
+    if not regeneracion_masiva.pausar(db, regeneracion):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"La regeneración está {regeneracion.estado} y no se puede pausar"
+        )
+    return regeneracion_masiva.resumen(db, regeneracion)
+
+
+@router.post("/{regeneracion_id}/reanudar", response_model=RegeneracionMasiva)
+async def reanudar_regeneracion(
+    regeneracion_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Continúa una regeneración pausada desde donde iba"""
+    regeneracion = _obtener_regeneracion(db, regeneracion_id, current_user)
+    if not regeneracion_masiva.reanudar(db, regeneracion):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"La regeneración está {regeneracion.estado} y no se puede reanudar"
+        )
+    return regeneracion_masiva.resumen(db, regeneracion)
+
+
+@router.delete("/{regeneracion_id}", response_model=RegeneracionMasiva)
+async def cancelar_regeneracion(
+    regeneracion_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Cancela la regeneración y sus trabajos pendientes (lo ya generado se mantiene)"""
+    regeneracion = _obtener_regeneracion(db, regeneracion_id, current_user)
+    if not regeneracion_masiva.cancelar(db, regeneracion):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"La regeneración ya está {regeneracion.estado}"
+        )
+    return regeneracion_masiva.resumen(db, regeneracion)
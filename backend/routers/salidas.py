@@ -1,13 +1,17 @@
 """Router para Salidas - CRUD completo"""
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from core.database import get_db
+from core.database import get_async_db
 from models.orm_models import SalidaMaestro as SalidaMaestroORM
 from models.schemas_fase6 import SalidaMaestro, SalidaMaestroCreate, SalidaMaestroUpdate, TipoSalida
 from core.auth import get_current_user, get_current_admin
 from models.schemas import Usuario
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/salidas", tags=["Salidas"])
 
 @router.get("/", response_model=List[SalidaMaestro])
@@ -16,60 +20,60 @@ async def listar_salidas(
     tipo_salida: Optional[TipoSalida] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    print(f"DEBUG: listar_salidas llamado - activo={activo}, tipo_salida={tipo_salida}, skip={skip}, limit={limit}")
-    print(f"DEBUG: current_user={current_user.email if current_user else 'None'}")
+    logger.debug("listar_salidas llamado - activo=%s, tipo_salida=%s, skip=%s, limit=%s", activo, tipo_salida, skip, limit)
+    logger.debug("current_user=%s", current_user.email if current_user else 'None')
     
-    query = db.query(SalidaMaestroORM)
+    query = select(SalidaMaestroORM)
     if activo is not None:
-        query = query.filter(SalidaMaestroORM.activo == activo)
+        query = query.where(SalidaMaestroORM.activo == activo)
     if tipo_salida:
-        query = query.filter(SalidaMaestroORM.tipo_salida == tipo_salida.value)
+        query = query.where(SalidaMaestroORM.tipo_salida == tipo_salida.value)
     
-    results = query.offset(skip).limit(limit).all()
-    print(f"DEBUG: Encontradas {len(results)} salidas")
+    results = (await db.scalars(query.offset(skip).limit(limit))).all()
+    logger.debug("Encontradas %s salidas", len(results))
     for result in results:
-        print(f"DEBUG: Salida {result.id}: {result.nombre} (activo={result.activo})")
+        logger.debug("Salida %s: %s (activo=%s)", result.id, result.nombre, result.activo)
     
     return results
 
 @router.get("/{salida_id}", response_model=SalidaMaestro)
-async def obtener_salida(salida_id: int, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_user)):
-    salida = db.query(SalidaMaestroORM).filter(SalidaMaestroORM.id == salida_id).first()
+async def obtener_salida(salida_id: int, db: AsyncSession = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)):
+    salida = await db.get(SalidaMaestroORM, salida_id)
     if not salida:
         raise HTTPException(status_code=404, detail=f"Salida {salida_id} no encontrada")
     return salida
 
 @router.post("/", response_model=SalidaMaestro, status_code=201)
-async def crear_salida(salida: SalidaMaestroCreate, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_admin)):
-    existing = db.query(SalidaMaestroORM).filter(SalidaMaestroORM.nombre == salida.nombre).first()
+async def crear_salida(salida: SalidaMaestroCreate, db: AsyncSession = Depends(get_async_db), current_user: Usuario = Depends(get_current_admin)):
+    existing = await db.scalar(select(SalidaMaestroORM).where(SalidaMaestroORM.nombre == salida.nombre))
     if existing:
         raise HTTPException(status_code=400, detail=f"Salida '{salida.nombre}' ya existe")
     db_salida = SalidaMaestroORM(**salida.model_dump())
     db.add(db_salida)
-    db.commit()
-    db.refresh(db_salida)
+    await db.commit()
+    await db.refresh(db_salida)
     return db_salida
 
 @router.put("/{salida_id}", response_model=SalidaMaestro)
-async def actualizar_salida(salida_id: int, salida_update: SalidaMaestroUpdate, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_admin)):
-    db_salida = db.query(SalidaMaestroORM).filter(SalidaMaestroORM.id == salida_id).first()
+async def actualizar_salida(salida_id: int, salida_update: SalidaMaestroUpdate, db: AsyncSession = Depends(get_async_db), current_user: Usuario = Depends(get_current_admin)):
+    db_salida = await db.get(SalidaMaestroORM, salida_id)
     if not db_salida:
         raise HTTPException(status_code=404, detail=f"Salida {salida_id} no encontrada")
     update_data = salida_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_salida, field, value)
-    db.commit()
-    db.refresh(db_salida)
+    await db.commit()
+    await db.refresh(db_salida)
     return db_salida
 
 @router.delete("/{salida_id}", status_code=204)
-async def eliminar_salida(salida_id: int, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_admin)):
-    db_salida = db.query(SalidaMaestroORM).filter(SalidaMaestroORM.id == salida_id).first()
+async def eliminar_salida(salida_id: int, db: AsyncSession = Depends(get_async_db), current_user: Usuario = Depends(get_current_admin)):
+    db_salida = await db.get(SalidaMaestroORM, salida_id)
     if not db_salida:
         raise HTTPException(status_code=404, detail=f"Salida {salida_id} no encontrada")
-    db.delete(db_salida)
-    db.commit()
+    await db.delete(db_salida)
+    await db.commit()
     return None
@@ -0,0 +1,169 @@
+"""
+Router de la cola de trabajos de generación
+Encola la generación de salidas y consulta su progreso (polling o Server-Sent Events)
+"""
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+import asyncio
+import json
+
+from config import settings
+from core.database import get_db, SessionLocal
+from core.auth import get_current_user, get_current_editor
+from models.schemas import Usuario
+from models.orm_models import (
+    Noticia as NoticiaORM,
+    SalidaMaestro as SalidaMaestroORM,
+    LLMMaestro as LLMMaestroORM,
+    TrabajoGeneracion as TrabajoGeneracionORM
+)
+from models.schemas_fase6 import EncolarGeneracionRequest, TrabajoGeneracion
+from services import cola_generacion
+from services import prioridad_generacion
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/generar/trabajos",
+    tags=["Generación IA"]
+)
+
+# Cada cuánto el stream de eventos vuelve a leer el trabajo
+INTERVALO_EVENTOS_S = 1.0
+
+
+def _obtener_trabajo(db: Session, trabajo_id: int, current_user: Usuario) -> TrabajoGeneracionORM:
+    trabajo = db.query(TrabajoGeneracionORM).filter(TrabajoGeneracionORM.id == trabajo_id).first()
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if trabajo.usuario_id != current_user.id and current_user.role != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para ver este trabajo"
+        )
+    return trabajo
+
+
+@router.post("/", response_model=TrabajoGeneracion, status_code=status.HTTP_202_ACCEPTED)
+async def encolar_generacion(
+    request: EncolarGeneracionRequest,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_editor)
+):
+    """
+    Encola la generación de salidas de una noticia y devuelve el trabajo al momento
+
+    La generación la hace un worker (worker_generacion.py o el consumidor interno
+    de la API). El progreso se consulta con GET /{id} o GET /{id}/eventos (SSE).
+
+    **Prioridad**: las noticias breaking pasan delante; con `lote=true` el trabajo
+    cede el paso a la generación interactiva.
+    """
+    noticia = db.query(NoticiaORM).filter(NoticiaORM.id == request.noticia_id).first()
+    if not noticia:
+        raise HTTPException(status_code=404, detail="Noticia no encontrada")
+
+    llm = db.query(LLMMaestroORM).filter(
+        LLMMaestroORM.id == request.llm_id,
+        LLMMaestroORM.activo == True
+    ).first()
+    if not llm:
+        raise HTTPException(status_code=404, detail="LLM no encontrado o inactivo")
+
+    encontradas = {
+        salida_id for (salida_id,) in db.query(SalidaMaestroORM.id).filter(
+            SalidaMaestroORM.id.in_(request.salidas_ids),
+            SalidaMaestroORM.activo == True
+        ).all()
+    }
+    faltantes = [salida_id for salida_id in request.salidas_ids if salida_id not in encontradas]
+    if faltantes:
+        raise HTTPException(status_code=404, detail=f"Salidas no encontradas o inactivas: {faltantes}")
+
+    trabajo = cola_generacion.encolar(
+        db,
+        noticia_id=noticia.id,
+        salidas_ids=request.salidas_ids,
+        llm_id=llm.id,
+        usuario_id=current_user.id,
+        regenerar=request.regenerar,
+        modo_combinado=request.modo_combinado,
+        prioridad=prioridad_generacion.clasificar_noticia(noticia, current_user, lote=request.lote)
+    )
+    # Enlaza el id de esta petición con el de la ejecución ("trabajo-<id>")
+    logger.info(
+        "📥 Trabajo de generación %s encolado%s", trabajo.id,
+        "" if settings.COLA_TRABAJOS_EN_API else " (lo atenderá un worker dedicado)"
+    )
+    return trabajo
+
+
+@router.get("/{trabajo_id}", response_model=TrabajoGeneracion)
+async def obtener_trabajo(
+    trabajo_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Estado del trabajo y resultado por salida (para polling)"""
+    return _obtener_trabajo(db, trabajo_id, current_user)
+
+
+@router.get("/{trabajo_id}/eventos")
+async def eventos_trabajo(
+    trabajo_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Progreso del trabajo por Server-Sent Events
+
+    **Eventos:**
+    - `estado`: el estado o los resultados cambiaron (incluye el progreso por salida)
+    - `fin`: el trabajo terminó (completado, error o cancelado); se cierra el stream
+    """
+    _obtener_trabajo(db, trabajo_id, current_user)
+
+    async def eventos():
+        anterior = None
+        while not await request.is_disconnected():
+            # Sesión propia por lectura: la del request se cierra al empezar el stream
+            sesion = SessionLocal()
+            try:
+                trabajo = sesion.get(TrabajoGeneracionORM, trabajo_id)
+                resumen = cola_generacion.resumen_trabajo(trabajo) if trabajo else None
+            finally:
+                sesion.close()
+            if resumen is None:
+                break
+            if resumen != anterior:
+                anterior = resumen
+                yield f"event: estado\ndata: {json.dumps(resumen, ensure_ascii=False, default=str)}\n\n"
+            if resumen["estado"] in cola_generacion.ESTADOS_FINALES:
+                yield f"event: fin\ndata: {json.dumps(resumen, ensure_ascii=False, default=str)}\n\n"
+                break
+            await asyncio.sleep(INTERVALO_EVENTOS_S)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.delete("/{trabajo_id}", response_model=TrabajoGeneracion)
+async def cancelar_trabajo(
+    trabajo_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Cancela un trabajo que aún no ha empezado a ejecutarse"""
+    trabajo = _obtener_trabajo(db, trabajo_id, current_user)
+    if not cola_generacion.cancelar(db, trabajo):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"El trabajo ya está {trabajo.estado} y no se puede cancelar"
+        )
+    return trabajo
@@ -0,0 +1,64 @@
+"""
+Router de uso de tokens por ventanas deslizantes
+Consumo del último minuto, la última hora y las últimas 24 h por LLM, usuario y sección
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from core.auth import get_current_user, get_current_admin
+from models.schemas import Usuario
+from services import ventanas_tokens
+
+router = APIRouter(
+    prefix="/api/uso-tokens",
+    tags=["Uso de tokens"]
+)
+
+
+def _validar(ambito: str, serie: Optional[str]) -> None:
+    if ambito not in ventanas_tokens.AMBITOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ámbito inválido. Usa uno de: {', '.join(ventanas_tokens.AMBITOS)}"
+        )
+    if serie is not None and serie not in ventanas_tokens.ESCALAS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Serie inválida. Usa una de: {', '.join(ventanas_tokens.ESCALAS)}"
+        )
+
+
+@router.get("/")
+async def resumen_uso_tokens(
+    current_user: Usuario = Depends(get_current_admin)  # Solo admin
+):
+    """
+    Uso de tokens de todas las entidades con consumo en las últimas 24 h
+    ⚠️ Solo para administradores
+    """
+    return {ambito: ventanas_tokens.resumen(ambito) for ambito in ventanas_tokens.AMBITOS}
+
+
+@router.get("/{ambito}/{entidad_id}")
+async def obtener_uso_tokens(
+    ambito: str,
+    entidad_id: int,
+    serie: Optional[str] = None,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Tokens consumidos por un LLM, usuario o sección en cada ventana
+
+    - **ambito**: llm, usuario o seccion
+    - **serie**: minuto, hora o dia para incluir el detalle por ranura
+
+    Cada usuario puede consultar su propio consumo; el resto solo los administradores.
+    """
+    _validar(ambito, serie)
+    propio = ambito == "usuario" and entidad_id == current_user.id
+    if not propio and current_user.role != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo los administradores pueden consultar este consumo"
+        )
+    return ventanas_tokens.uso(ambito, entidad_id, serie)
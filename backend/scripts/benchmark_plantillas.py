@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: render de prompts con plantilla compilada vs bucle de str.replace
+
+Compara el armado que hacía procesar_prompt en cada llamada (ordenar + unir items,
+reemplazar variable por variable y buscar variables faltantes) con el render de
+una PlantillaCompilada ya cacheada. El tamaño por defecto simula un manual de
+estilo de ~60 KB.
+
+Uso:
+    python scripts/benchmark_plantillas.py --kb 60 --repeticiones 2000
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+import types
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.plantillas import PlantillaCompilada
+
+
+def crear_items(kb):
+    """Items de prompt con algunas variables repartidas en ~kb KB de texto"""
+    parrafo = "Regla de estilo: usa frases cortas, verbos activos y evita adjetivos innecesarios. " * 10
+    items = []
+    total = 0
+    orden = 1
+    while total < kb * 1024:
+        contenido = f"{parrafo}\nTEMA: {{tema}} | SALIDA: {{nombre_salida}} ({{tipo_salida}})\n{parrafo}"
+        items.append(types.SimpleNamespace(contenido=contenido, orden=orden))
+        total += len(contenido)
+        orden += 1
+    items.append(types.SimpleNamespace(contenido="TÍTULO: {titulo}\nCONTENIDO: {contenido}", orden=orden))
+    return list(reversed(items))
+
+
+def render_replace(items, variables):
+    """Implementación anterior de procesar_prompt (sin prints ni truncado)"""
+    ordenados = sorted(items, key=lambda it: it.orden or 0)
+    contenido = "\n\n---\n\n".join(it.contenido.strip() for it in ordenados).strip()
+    for nombre_var, valor in variables.items():
+        contenido = contenido.replace(f"{{{nombre_var}}}", str(valor))
+    faltantes = re.findall(r'\{([a-zA-Z_][a-zA-Z0-9_]*)\}', contenido)
+    if faltantes:
+        raise ValueError(faltantes)
+    return contenido
+
+
+def main(args):
+    items = crear_items(args.kb)
+    variables = {
+        "titulo": "Título de prueba",
+        "contenido": "Contenido de la noticia " * 50,
+        "autor": "Redacción",
+        "seccion": "General",
+        "tipo_salida": "digital",
+        "nombre_salida": "Web",
+        "fecha": "01/01/2025",
+        "tema": "Economía",
+    }
+    plantilla = PlantillaCompilada("\n\n---\n\n".join(it.contenido.strip() for it in sorted(items, key=lambda it: it.orden)).strip())
+    assert plantilla.renderizar(variables) == render_replace(items, variables)
+
+    t_replace = timeit.timeit(lambda: render_replace(items, variables), number=args.repeticiones)
+    t_compilada = timeit.timeit(lambda: plantilla.renderizar(variables), number=args.repeticiones)
+
+    print(f"Plantilla: {len(plantilla.texto) / 1024:.1f} KB, {len(plantilla.variables)} variables, {len(items)} items")
+    print(f"str.replace      : {t_replace / args.repeticiones * 1e6:10.1f} µs/render")
+    print(f"plantilla compil.: {t_compilada / args.repeticiones * 1e6:10.1f} µs/render")
+    print(f"Aceleración      : x{t_replace / t_compilada:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--kb", type=int, default=60, help="Tamaño aproximado del texto de la plantilla")
+    parser.add_argument("--repeticiones", type=int, default=2000)
+    main(parser.parse_args())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga: latencia de GET /api/noticias/ mientras corren generaciones IA
+
+Mide p50/p95/p99 del listado de noticias en reposo y luego con N generaciones
+concurrentes (POST /api/generar/salidas-temporal). Con la capa async de
+proveedores el p99 debe mantenerse estable: las llamadas al LLM ya no ocupan
+el event loop.
+
+Uso:
+    python scripts/carga_noticias_durante_generacion.py \\
+        --url http://127.0.0.1:8000 --email admin@test.com --password secreto \\
+        --llm-id 1 --seccion-id 1 --salidas 1 2 --generaciones 20
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (valores en ms)"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100.0 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def resumen(nombre, latencias):
+    print(
+        f"{nombre:<28} n={len(latencias):<5} "
+        f"p50={percentil(latencias, 50):8.1f}ms "
+        f"p95={percentil(latencias, 95):8.1f}ms "
+        f"p99={percentil(latencias, 99):8.1f}ms"
+    )
+
+
+async def medir_listado(cliente, headers, duracion, concurrencia):
+    """Lanza GET /api/noticias/ en bucle durante `duracion` segundos"""
+    latencias = []
+    fin = time.perf_counter() + duracion
+
+    async def worker():
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            respuesta = await cliente.get("/api/noticias/", params={"limite": 20}, headers=headers)
+            respuesta.raise_for_status()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    await asyncio.gather(*(worker() for _ in range(concurrencia)))
+    return latencias
+
+
+async def generar(cliente, headers, args, i):
+    payload = {
+        "datosNoticia": {
+            "titulo": f"Noticia de carga {i}",
+            "contenido": "Contenido de prueba para medir la latencia del servidor durante la generación.",
+            "seccion_id": args.seccion_id
+        },
+        "salidas_ids": args.salidas,
+        "llm_id": args.llm_id
+    }
+    respuesta = await cliente.post("/api/generar/salidas-temporal", json=payload, headers=headers)
+    return respuesta.status_code
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=300) as cliente:
+        login = await cliente.post("/api/auth/login/json", json={"email": args.email, "password": args.password})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        print("📏 Midiendo listado en reposo...")
+        reposo = await medir_listado(cliente, headers, args.duracion, args.concurrencia)
+
+        print(f"🚀 Lanzando {args.generaciones} generaciones y midiendo listado...")
+        generaciones = asyncio.gather(
+            *(generar(cliente, headers, args, i) for i in range(args.generaciones)),
+            return_exceptions=True
+        )
+        carga = await medir_listado(cliente, headers, args.duracion, args.concurrencia)
+        estados = await generaciones
+
+        print()
+        resumen("GET /api/noticias/ reposo", reposo)
+        resumen("GET /api/noticias/ carga", carga)
+        print(f"Generaciones: {sum(1 for e in estados if e == 200)}/{len(estados)} OK")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--llm-id", type=int, required=True)
+    parser.add_argument("--seccion-id", type=int, required=True)
+    parser.add_argument("--salidas", type=int, nargs="+", required=True)
+    parser.add_argument("--generaciones", type=int, default=20)
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de medición por fase")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Clientes simultáneos del listado")
+    asyncio.run(main(parser.parse_args()))
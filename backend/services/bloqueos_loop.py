@@ -0,0 +1,260 @@
+"""
+Detector de bloqueos del event loop (LOOP_VIGILANTE_ACTIVO)
+
+Muchas rutas async hacen consultas síncronas de SQLAlchemy, bcrypt, parseo de PDF
+o llamadas al LLM dentro del loop: mientras duran, el worker no atiende a nadie.
+El vigilante tiene dos piezas:
+
+- un latido en el loop (asyncio.sleep de intervalo = umbral / 4) que mide el
+  retraso con que despierta: el lag del event loop;
+- un hilo que, si el latido lleva más de LOOP_BLOQUEO_UMBRAL_MS sin llegar,
+  copia la pila del hilo del loop (sys._current_frames) una vez por bloqueo.
+
+Cuando el loop vuelve, el bloqueo se agrega por (ruta, sitio): la ruta es la
+plantilla del endpoint async que estaba en la pila (o "-" fuera de una petición)
+y el sitio la línea de código propio más interna, la que hay que sacar del loop
+(run_in_executor / def en lugar de async def). GET /api/admin/settings/bloqueos-loop
+los ordena por tiempo total bloqueado.
+
+Coste: un despertar del loop y otro del hilo cada intervalo; la pila solo se
+copia cuando ya hay un bloqueo.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from core import metricas_prometheus
+
+logger = logging.getLogger(__name__)
+
+# Código propio: los sitios se buscan dentro del backend y fuera de las dependencias
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUERA_DE_PETICION = "-"
+MAX_FRAMES_PILA = 30
+MAX_SITIOS = 500
+
+# Límites superiores (ms) del histograma de lag; el último es +inf
+BUCKETS_LAG_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_lock = Lock()
+_lag = {"conteos": [0] * (len(BUCKETS_LAG_MS) + 1), "suma_ms": 0.0, "n": 0, "max_ms": 0.0}
+# (ruta, sitio) -> {"n", "total_ms", "max_ms", "pila"}
+_bloqueos: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_estadisticas = {"bloqueos_registrados": 0, "descartados": 0}
+_vigilante: Optional["Vigilante"] = None
+
+
+def _contar(clave: str, n: int = 1) -> None:
+    with _lock:
+        _estadisticas[clave] += n
+
+
+def rutas_async(app: Any) -> Dict[Any, str]:
+    """Código de cada endpoint async -> "MÉTODOS /plantilla" (los def corren en el threadpool)"""
+    rutas = {}
+    for ruta in getattr(app, "routes", []):
+        endpoint = getattr(ruta, "endpoint", None)
+        if endpoint is not None and inspect.iscoroutinefunction(endpoint):
+            metodos = ",".join(sorted(getattr(ruta, "methods", None) or ()))
+            rutas[endpoint.__code__] = f"{metodos} {ruta.path}".strip()
+    return rutas
+
+
+def _es_propio(archivo: str) -> bool:
+    return archivo.startswith(_RAIZ) and "site-packages" not in archivo
+
+
+def analizar_pila(frame: Any, rutas: Dict[Any, str]) -> Tuple[str, str, List[str]]:
+    """
+    Ruta, sitio y pila resumida de un frame del hilo del loop
+
+    Returns:
+        Tupla (ruta o FUERA_DE_PETICION, "archivo:línea función", líneas de la pila
+        de la más externa a la más interna)
+    """
+    ruta = FUERA_DE_PETICION
+    actual = frame
+    while actual is not None:
+        if actual.f_code in rutas:
+            ruta = rutas[actual.f_code]
+            break
+        actual = actual.f_back
+
+    resumen = traceback.extract_stack(frame, limit=MAX_FRAMES_PILA)
+    propio = next((f for f in reversed(resumen) if _es_propio(f.filename)), resumen[-1] if resumen else None)
+    sitio = "-"
+    if propio is not None:
+        sitio = f"{os.path.relpath(propio.filename, _RAIZ) if _es_propio(propio.filename) else propio.filename}:{propio.lineno} {propio.name}"
+    pila = [f"{f.filename}:{f.lineno} {f.name}" for f in resumen]
+    return ruta, sitio, pila
+
+
+def observar_lag(lag_ms: float) -> None:
+    with _lock:
+        _lag["conteos"][bisect_left(BUCKETS_LAG_MS, lag_ms)] += 1
+        _lag["suma_ms"] += lag_ms
+        _lag["n"] += 1
+        _lag["max_ms"] = max(_lag["max_ms"], lag_ms)
+    metricas_prometheus.observar_lag_loop(lag_ms)
+
+
+def registrar_bloqueo(ruta: str, sitio: str, pila: List[str], duracion_ms: float) -> None:
+    with _lock:
+        bloqueo = _bloqueos.get((ruta, sitio))
+        if bloqueo is None:
+            if len(_bloqueos) >= MAX_SITIOS:
+                _estadisticas["descartados"] += 1
+                return
+            bloqueo = _bloqueos[(ruta, sitio)] = {"n": 0, "total_ms": 0.0, "max_ms": 0.0, "pila": pila}
+        bloqueo["n"] += 1
+        bloqueo["total_ms"] += duracion_ms
+        if duracion_ms >= bloqueo["max_ms"]:
+            bloqueo["max_ms"] = duracion_ms
+            bloqueo["pila"] = pila
+        _estadisticas["bloqueos_registrados"] += 1
+
+
+class Vigilante:
+    """Latido en el loop + hilo que captura la pila cuando el latido se retrasa"""
+
+    __slots__ = (
+        "umbral_s", "intervalo_s", "rutas", "_loop_hilo", "_ultimo", "_capturado",
+        "_pendiente", "_pendiente_lock", "_tarea", "_hilo", "_detener"
+    )
+
+    def __init__(self, umbral_ms: float, rutas: Optional[Dict[Any, str]] = None):
+        self.umbral_s = umbral_ms / 1000
+        self.intervalo_s = max(0.005, self.umbral_s / 4)
+        self.rutas = rutas or {}
+        self._loop_hilo: Optional[int] = None
+        self._ultimo: Optional[float] = None
+        self._capturado: Optional[float] = None
+        self._pendiente: Optional[Tuple[str, str, List[str]]] = None
+        self._pendiente_lock = Lock()
+        self._tarea: Optional[asyncio.Task] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._detener = threading.Event()
+
+    def iniciar(self) -> None:
+        """Arranca el latido en el loop actual y el hilo vigilante"""
+        self._loop_hilo = threading.get_ident()
+        self._ultimo = time.perf_counter()
+        self._tarea = asyncio.get_running_loop().create_task(self._latir(), name="vigilante-loop")
+        self._hilo = threading.Thread(target=self._vigilar, name="vigilante-loop", daemon=True)
+        self._hilo.start()
+
+    async def detener(self) -> None:
+        self._detener.set()
+        if self._tarea is not None:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+        if self._hilo is not None:
+            self._hilo.join(timeout=1)
+
+    async def _latir(self) -> None:
+        while True:
+            esperado = time.perf_counter() + self.intervalo_s
+            await asyncio.sleep(self.intervalo_s)
+            ahora = time.perf_counter()
+            self._ultimo = ahora
+            lag_ms = max(0.0, ahora - esperado) * 1000
+            observar_lag(lag_ms)
+            with self._pendiente_lock:
+                pendiente, self._pendiente = self._pendiente, None
+            if pendiente is not None:
+                registrar_bloqueo(*pendiente, lag_ms)
+
+    def _vigilar(self) -> None:
+        while not self._detener.wait(self.intervalo_s):
+            ultimo = self._ultimo
+            if ultimo is None or ultimo == self._capturado:
+                continue
+            if time.perf_counter() - ultimo - self.intervalo_s < self.umbral_s:
+                continue
+            frame = sys._current_frames().get(self._loop_hilo)
+            if frame is None:
+                continue
+            # Una captura por bloqueo: la del momento en que supera el umbral
+            self._capturado = ultimo
+            muestra = analizar_pila(frame, self.rutas)
+            del frame
+            with self._pendiente_lock:
+                self._pendiente = muestra
+
+
+async def iniciar(app: Any = None, umbral_ms: Optional[float] = None) -> Vigilante:
+    """Arranca el vigilante en el loop actual (lifespan); las rutas async salen de `app`"""
+    global _vigilante
+    vigilante = Vigilante(umbral_ms or settings.LOOP_BLOQUEO_UMBRAL_MS, rutas_async(app) if app is not None else None)
+    vigilante.iniciar()
+    _vigilante = vigilante
+    logger.info("🐢 Vigilante del event loop activo (umbral %s ms)", vigilante.umbral_s * 1000)
+    return vigilante
+
+
+async def detener() -> None:
+    global _vigilante
+    vigilante, _vigilante = _vigilante, None
+    if vigilante is not None:
+        await vigilante.detener()
+
+
+def _percentil(conteos: List[int], n: int, p: float) -> float:
+    objetivo = p / 100.0 * n
+    acumulado = 0
+    for i, conteo in enumerate(conteos):
+        acumulado += conteo
+        if acumulado >= objetivo:
+            return float(BUCKETS_LAG_MS[min(i, len(BUCKETS_LAG_MS) - 1)])
+    return float(BUCKETS_LAG_MS[-1])
+
+
+def get_estadisticas(limite: int = 20) -> Dict[str, Any]:
+    """Lag del loop y los `limite` sitios que más tiempo lo bloquearon"""
+    with _lock:
+        lag = {**_lag, "conteos": list(_lag["conteos"])}
+        bloqueos = [(clave, dict(valor)) for clave, valor in _bloqueos.items()]
+        estadisticas = dict(_estadisticas)
+    bloqueos.sort(key=lambda item: item[1]["total_ms"], reverse=True)
+    vigilante = _vigilante
+    return {
+        "activo": vigilante is not None,
+        "umbral_ms": vigilante.umbral_s * 1000 if vigilante else settings.LOOP_BLOQUEO_UMBRAL_MS,
+        "lag": {
+            "n": lag["n"],
+            "media_ms": round(lag["suma_ms"] / lag["n"], 3) if lag["n"] else 0.0,
+            "p50_ms": _percentil(lag["conteos"], lag["n"], 50) if lag["n"] else 0.0,
+            "p99_ms": _percentil(lag["conteos"], lag["n"], 99) if lag["n"] else 0.0,
+            "max_ms": round(lag["max_ms"], 3)
+        },
+        "bloqueos": [
+            {
+                "ruta": ruta,
+                "sitio": sitio,
+                "n": valor["n"],
+                "total_ms": round(valor["total_ms"], 1),
+                "max_ms": round(valor["max_ms"], 1),
+                "media_ms": round(valor["total_ms"] / valor["n"], 1),
+                "pila": valor["pila"]
+            }
+            for (ruta, sitio), valor in bloqueos[:limite]
+        ],
+        **estadisticas
+    }
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        _lag.update({"conteos": [0] * (len(BUCKETS_LAG_MS) + 1), "suma_ms": 0.0, "n": 0, "max_ms": 0.0})
+        _bloqueos.clear()
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
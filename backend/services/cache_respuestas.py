@@ -0,0 +1,85 @@
+"""
+Caché de respuestas del LLM direccionada por contenido
+La clave es un hash de (modelo, mensajes renderizados, max_tokens, temperature,
+configuración de post-procesamiento): dos peticiones idénticas (re-clic en
+"Generar" sobre un borrador sin cambios, doble envío del frontend) reutilizan la
+misma respuesta en lugar de pagar otra llamada al proveedor.
+
+Se apoya en core.cache.CacheService (Redis); sin Redis la caché queda desactivada
+y todas las consultas cuentan como fallo.
+"""
+from threading import Lock
+from typing import Any, Dict, Optional
+import hashlib
+import json
+
+from config import settings
+from core.cache import get_cache_service
+
+PREFIJO_CLAVE = "llm:respuesta:"
+
+_lock = Lock()
+_estadisticas = {"aciertos": 0, "fallos": 0, "omitidas": 0}
+
+
+def calcular_clave(
+    modelo_id: str,
+    mensajes: Any,
+    max_tokens: int,
+    temperature: float,
+    config_postproceso: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Clave de caché estable para una petición al LLM
+
+    Args:
+        modelo_id: Modelo del proveedor
+        mensajes: Prompt final (texto o lista de mensajes con bloques)
+        max_tokens: Máximo de tokens a generar
+        temperature: Temperatura de la generación
+        config_postproceso: Configuración que se aplica después (estilo + salida)
+    """
+    contenido = json.dumps(
+        [modelo_id, mensajes, max_tokens, temperature, config_postproceso or {}],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return PREFIJO_CLAVE + hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+async def obtener(clave: str) -> Optional[Dict[str, Any]]:
+    """Resultado cacheado para la clave (o None), contando acierto/fallo"""
+    resultado = await get_cache_service().get_json(clave)
+    with _lock:
+        _estadisticas["aciertos" if resultado else "fallos"] += 1
+    return resultado
+
+
+async def guardar(clave: str, resultado: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+    """Guarda el resultado con el TTL configurado (LLM_CACHE_TTL por defecto)"""
+    return await get_cache_service().set_json(clave, resultado, ttl or settings.LLM_CACHE_TTL)
+
+
+def registrar_omision() -> None:
+    """Cuenta una generación que saltó la caché a propósito (p.ej. 'regenerar')"""
+    with _lock:
+        _estadisticas["omitidas"] += 1
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    """Aciertos, fallos, omisiones y si la caché está activa (hay conexión Redis)"""
+    with _lock:
+        estadisticas = dict(_estadisticas)
+    consultas = estadisticas["aciertos"] + estadisticas["fallos"]
+    estadisticas["tasa_aciertos"] = round(estadisticas["aciertos"] / consultas, 4) if consultas else 0.0
+    estadisticas["habilitada"] = get_cache_service().redis is not None
+    estadisticas["ttl_segundos"] = settings.LLM_CACHE_TTL
+    return estadisticas
+
+
+def reiniciar_estadisticas() -> None:
+    """Pone los contadores a cero"""
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
@@ -0,0 +1,223 @@
+"""
+Coalescencia (single-flight) de generaciones idénticas en curso
+Si llega una petición con la misma clave que otra que todavía está esperando al
+proveedor (doble clic, dos pestañas con la misma noticia/salida/LLM), no se lanza
+otra llamada: la segunda espera y recibe el resultado de la primera.
+
+Dentro del proceso se comparte un asyncio.Future por clave. Con
+LLM_COALESCENCIA_REDIS activo (y Redis disponible vía core.cache) además se toma un
+lock por clave en Redis, de modo que workers distintos también comparten la llamada:
+el que no obtiene el lock espera a que el dueño publique el resultado bajo la clave.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config import settings
+from core.cache import get_cache_service
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_LOCK = "llm:singleflight:lock:"
+PREFIJO_RESULTADO = "llm:singleflight:resultado:"
+INTERVALO_ESPERA_REDIS = 0.25
+# El resultado publicado solo sirve a los que esperaban: no debe actuar como caché
+TTL_RESULTADO_MS = 5000
+
+# Borra el lock solo si sigue siendo nuestro
+_SCRIPT_LIBERAR = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_en_curso: Dict[str, asyncio.Future] = {}
+_lock = Lock()
+_estadisticas = {"lideres": 0, "coalescidas": 0, "coalescidas_redis": 0}
+
+
+def _contar(clave: str) -> None:
+    with _lock:
+        _estadisticas[clave] += 1
+
+
+def en_curso(clave: str) -> Optional[asyncio.Future]:
+    """Future de la generación en curso para la clave (None si no hay ninguna)"""
+    futuro = _en_curso.get(clave)
+    if futuro is not None and not futuro.done():
+        return futuro
+    return None
+
+
+def registrar(clave: str) -> asyncio.Future:
+    """Marca la clave como en curso; el llamador debe cerrarla con liberar()"""
+    futuro = asyncio.get_running_loop().create_future()
+    # Evita el aviso "exception was never retrieved" cuando nadie estaba esperando
+    futuro.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _en_curso[clave] = futuro
+    _contar("lideres")
+    return futuro
+
+
+def liberar(
+    clave: str,
+    futuro: asyncio.Future,
+    resultado: Optional[Dict[str, Any]] = None,
+    error: Optional[BaseException] = None
+) -> None:
+    """Entrega el resultado (o el error) a quienes esperaban y quita la clave"""
+    if _en_curso.get(clave) is futuro:
+        del _en_curso[clave]
+    if futuro.done():
+        return
+    if error is not None:
+        futuro.set_exception(error)
+    elif resultado is not None:
+        # Copia: el líder sigue post-procesando su resultado antes de que despierten los demás
+        futuro.set_result(dict(resultado))
+    else:
+        futuro.cancel()
+
+
+async def esperar(futuro: asyncio.Future) -> Optional[Dict[str, Any]]:
+    """
+    Espera el resultado de otra generación
+
+    Returns:
+        Copia del resultado, o None si la generación líder se canceló (el llamador
+        debe generar por su cuenta)
+    """
+    try:
+        resultado = await asyncio.shield(futuro)
+    except asyncio.CancelledError:
+        if futuro.cancelled():
+            return None
+        raise
+    _contar("coalescidas")
+    return dict(resultado)
+
+
+async def compartir(
+    clave: str,
+    generar: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Ejecuta generar() una sola vez por clave entre las peticiones concurrentes
+
+    Returns:
+        Tupla (resultado, compartido). compartido=True indica que el resultado
+        viene de la llamada de otra petición (no se consumieron tokens propios)
+    """
+    while True:
+        futuro = en_curso(clave)
+        if futuro is None:
+            break
+        resultado = await esperar(futuro)
+        if resultado is not None:
+            return resultado, True
+
+    futuro = registrar(clave)
+    resultado = None
+    try:
+        if settings.LLM_COALESCENCIA_REDIS:
+            resultado, compartido = await _compartir_redis(clave, generar)
+        else:
+            resultado, compartido = await generar(), False
+    except Exception as e:
+        liberar(clave, futuro, error=e)
+        raise
+    finally:
+        # Sin resultado ni error (líder cancelado) los que esperaban generan por su cuenta
+        liberar(clave, futuro, resultado=resultado)
+    return resultado, compartido
+
+
+async def _compartir_redis(
+    clave: str,
+    generar: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Coalescencia entre workers con un lock en Redis (SET NX PX)
+
+    Sin conexión a Redis, o ante cualquier error de Redis, se genera localmente.
+    """
+    redis = get_cache_service().redis
+    if redis is None:
+        return await generar(), False
+
+    clave_lock = PREFIJO_LOCK + clave
+    clave_resultado = PREFIJO_RESULTADO + clave
+    token = uuid.uuid4().hex
+    publicado, adquirido = None, False
+    try:
+        publicado, adquirido = await _turno_redis(redis, clave_lock, clave_resultado, token)
+    except Exception as e:
+        logger.warning("⚠️ Coalescencia Redis no disponible (%s), generando localmente", e)
+
+    if publicado is not None:
+        _contar("coalescidas_redis")
+        return json.loads(publicado), True
+    if not adquirido:
+        return await generar(), False
+
+    try:
+        resultado = await generar()
+        try:
+            await redis.set(clave_resultado, json.dumps(resultado), px=TTL_RESULTADO_MS)
+        except Exception as e:
+            logger.warning("⚠️ No se pudo publicar el resultado en Redis: %s", e)
+        return resultado, False
+    finally:
+        try:
+            await redis.eval(_SCRIPT_LIBERAR, 1, clave_lock, token)
+        except Exception as e:
+            logger.warning("⚠️ No se pudo liberar el lock de coalescencia: %s", e)
+
+
+async def _turno_redis(redis: Any, clave_lock: str, clave_resultado: str, token: str) -> Tuple[Optional[str], bool]:
+    """
+    Espera hasta tomar el lock de la clave o encontrar el resultado publicado por su dueño
+
+    Returns:
+        Tupla (resultado publicado, lock tomado); (None, False) si se agotó la espera
+    """
+    loop = asyncio.get_running_loop()
+    limite = loop.time() + settings.LLM_COALESCENCIA_LOCK_TTL
+    while True:
+        publicado = await redis.get(clave_resultado)
+        if publicado:
+            return publicado, False
+        if await redis.set(clave_lock, token, nx=True, px=settings.LLM_COALESCENCIA_LOCK_TTL * 1000):
+            # El dueño anterior pudo publicar y soltar el lock entre el GET y el SET
+            publicado = await redis.get(clave_resultado)
+            if publicado:
+                await redis.eval(_SCRIPT_LIBERAR, 1, clave_lock, token)
+                return publicado, False
+            return None, True
+        publicado = await redis.get(clave_resultado)
+        if publicado:
+            return publicado, False
+        if loop.time() > limite:
+            logger.warning("⚠️ Coalescencia Redis: tiempo de espera agotado para %s, generando localmente", clave_resultado[-12:])
+            return None, False
+        await asyncio.sleep(INTERVALO_ESPERA_REDIS)
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    """Generaciones líderes, peticiones que compartieron una llamada y claves en curso"""
+    with _lock:
+        estadisticas = dict(_estadisticas)
+    estadisticas["en_curso"] = len(_en_curso)
+    estadisticas["modo_redis"] = bool(settings.LLM_COALESCENCIA_REDIS)
+    return estadisticas
+
+
+def reiniciar_estadisticas() -> None:
+    """Pone los contadores a cero"""
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
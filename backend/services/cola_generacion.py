@@ -0,0 +1,537 @@
+"""
+Cola persistente de trabajos de generación (tabla generation_jobs)
+Los workers reclaman trabajos con SELECT ... FOR UPDATE SKIP LOCKED
+"""
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from config import settings
+from core import logs
+from core.database import SessionLocal
+from models.cargas import NOTICIA_PARA_GENERAR
+from models.orm_models import (
+    TrabajoGeneracion,
+    RegeneracionMasiva,
+    Noticia,
+    SalidaMaestro,
+    LLMMaestro,
+    Usuario
+)
+from services.generador_ia import GeneradorIA
+from services import prioridad_generacion
+from services import proveedores_llm
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETADO = "completado"
+ERROR = "error"
+CANCELADO = "cancelado"
+ESTADOS_FINALES = (COMPLETADO, ERROR, CANCELADO)
+
+ESPERA_BASE_S = 5
+ESPERA_MAX_S = 300
+
+_lock = Lock()
+_estadisticas = {
+    "encolados": 0,
+    "reclamados": 0,
+    "completados": 0,
+    "reintentos": 0,
+    "errores": 0,
+    "abandonados_recuperados": 0,
+    "cancelados": 0
+}
+_en_curso_local = 0
+
+
+def _contar(clave: str, n: int = 1) -> None:
+    with _lock:
+        _estadisticas[clave] += n
+
+
+def _ahora() -> datetime:
+    return datetime.utcnow()
+
+
+def id_worker() -> str:
+    """Identificador del proceso que reclama trabajos (host:pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def espera_reintento(intentos: int) -> int:
+    """Segundos hasta el siguiente intento: 10, 20, 40... hasta ESPERA_MAX_S"""
+    return min(ESPERA_BASE_S * 2 ** intentos, ESPERA_MAX_S)
+
+
+# ==================== ENCOLAR / RECLAMAR ====================
+
+def encolar(
+    db: Session,
+    noticia_id: int,
+    salidas_ids: List[int],
+    llm_id: int,
+    usuario_id: Optional[int] = None,
+    regenerar: bool = False,
+    modo_combinado: bool = False,
+    prioridad: str = prioridad_generacion.NORMAL,
+    regeneracion_id: Optional[int] = None,
+    confirmar: bool = True
+) -> TrabajoGeneracion:
+    """
+    Crea un trabajo pendiente y lo devuelve (la generación la hace un worker)
+
+    Con confirmar=False solo lo añade a la sesión: el llamador hace commit junto con
+    sus propios cambios (la regeneración masiva avanza el cursor en la misma transacción).
+    """
+    trabajo = TrabajoGeneracion(
+        noticia_id=noticia_id,
+        salidas_ids=list(dict.fromkeys(salidas_ids)),
+        llm_id=llm_id,
+        usuario_id=usuario_id,
+        regenerar=regenerar,
+        modo_combinado=modo_combinado,
+        prioridad=prioridad,
+        regeneracion_id=regeneracion_id,
+        estado=PENDIENTE,
+        intentos=0,
+        max_intentos=settings.COLA_MAX_INTENTOS,
+        resultados={},
+        disponible_en=_ahora()
+    )
+    db.add(trabajo)
+    if confirmar:
+        db.commit()
+        db.refresh(trabajo)
+    _contar("encolados")
+    return trabajo
+
+
+def _orden_prioridad():
+    return case(
+        {clase: rango for clase, rango in prioridad_generacion.RANGO.items()},
+        value=TrabajoGeneracion.prioridad,
+        else_=prioridad_generacion.RANGO[prioridad_generacion.NORMAL]
+    )
+
+
+def reclamar(db: Session, worker: str) -> Optional[TrabajoGeneracion]:
+    """
+    Reclama el trabajo pendiente ya disponible de mayor prioridad (y más antiguo)
+
+    SKIP LOCKED salta las filas que otro worker está reclamando en ese momento, así
+    que dos workers nunca se llevan el mismo trabajo ni se esperan entre sí.
+    """
+    ahora = _ahora()
+    trabajo = db.query(TrabajoGeneracion).filter(
+        TrabajoGeneracion.estado == PENDIENTE,
+        TrabajoGeneracion.disponible_en <= ahora
+    ).order_by(_orden_prioridad(), TrabajoGeneracion.id).with_for_update(skip_locked=True).first()
+    if trabajo is None:
+        db.rollback()
+        return None
+    trabajo.estado = EN_CURSO
+    trabajo.intentos = (trabajo.intentos or 0) + 1
+    trabajo.worker = worker
+    trabajo.iniciado_en = ahora
+    trabajo.latido_en = ahora
+    db.commit()
+    _contar("reclamados")
+    return trabajo
+
+
+def recuperar_abandonados(db: Session) -> int:
+    """
+    Devuelve a la cola los trabajos en_curso sin latido reciente (worker caído)
+
+    Si ya agotaron sus intentos se marcan como error.
+    """
+    limite = _ahora() - timedelta(seconds=settings.COLA_TRABAJO_EXPIRA_S)
+    abandonados = db.query(TrabajoGeneracion).filter(
+        TrabajoGeneracion.estado == EN_CURSO,
+        TrabajoGeneracion.latido_en < limite
+    ).with_for_update(skip_locked=True).all()
+    for trabajo in abandonados:
+        logger.warning("⚠️ Trabajo de generación %s abandonado por %s", trabajo.id, trabajo.worker)
+        trabajo.worker = None
+        if trabajo.intentos >= trabajo.max_intentos:
+            trabajo.estado = ERROR
+            trabajo.error = "El worker dejó de responder y se agotaron los intentos"
+            trabajo.terminado_en = _ahora()
+        else:
+            trabajo.estado = PENDIENTE
+            trabajo.disponible_en = _ahora()
+    db.commit()
+    if abandonados:
+        _contar("abandonados_recuperados", len(abandonados))
+    return len(abandonados)
+
+
+def cancelar(db: Session, trabajo: TrabajoGeneracion) -> bool:
+    """Cancela un trabajo que aún no ha empezado; False si ya lo reclamó un worker"""
+    actualizadas = db.query(TrabajoGeneracion).filter(
+        TrabajoGeneracion.id == trabajo.id,
+        TrabajoGeneracion.estado == PENDIENTE
+    ).update({"estado": CANCELADO, "terminado_en": _ahora()}, synchronize_session=False)
+    db.commit()
+    db.refresh(trabajo)
+    if actualizadas:
+        _contar("cancelados")
+    return bool(actualizadas)
+
+
+# ==================== EJECUCIÓN ====================
+
+async def _latir(trabajo_id: int, fabrica_sesiones: Any) -> None:
+    """Actualiza latido_en mientras el trabajo se ejecuta (el UPDATE va al executor, fuera del loop)"""
+    while True:
+        await asyncio.sleep(settings.COLA_LATIDO_S)
+        try:
+            await proveedores_llm.ejecutar_en_executor(_actualizar_latido, trabajo_id, fabrica_sesiones)
+        except Exception as e:
+            logger.warning("⚠️ Error actualizando latido del trabajo %s: %s", trabajo_id, e)
+
+
+def _actualizar_latido(trabajo_id: int, fabrica_sesiones: Any) -> None:
+    db = fabrica_sesiones()
+    try:
+        db.query(TrabajoGeneracion).filter(
+            TrabajoGeneracion.id == trabajo_id,
+            TrabajoGeneracion.estado == EN_CURSO
+        ).update({"latido_en": _ahora()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _cerrar_intento(trabajo: TrabajoGeneracion, fallidas: List[str], error: Optional[str] = None) -> None:
+    """Marca el trabajo como completado, lo reprograma o lo da por fallido"""
+    if not fallidas and not error:
+        trabajo.estado = COMPLETADO
+        trabajo.error = None
+        trabajo.terminado_en = _ahora()
+        _contar("completados")
+        return
+    trabajo.error = error or f"Fallaron {len(fallidas)} salidas: {', '.join(fallidas)}"
+    trabajo.worker = None
+    if trabajo.intentos >= trabajo.max_intentos:
+        trabajo.estado = ERROR
+        trabajo.terminado_en = _ahora()
+        _contar("errores")
+    else:
+        espera = espera_reintento(trabajo.intentos)
+        trabajo.estado = PENDIENTE
+        trabajo.disponible_en = _ahora() + timedelta(seconds=espera)
+        _contar("reintentos")
+        logger.info("🔁 Trabajo %s: intento %s/%s fallido, reintento en %ss", trabajo.id, trabajo.intentos, trabajo.max_intentos, espera)
+
+
+async def ejecutar(trabajo_id: int, worker: Optional[str] = None, fabrica_sesiones: Any = None) -> Optional[str]:
+    """
+    Ejecuta un trabajo ya reclamado y guarda el resultado de cada salida
+
+    Solo genera las salidas que aún no están completadas (reintentos). Las
+    NoticiaSalida las guarda el generador como en la generación síncrona.
+
+    Returns:
+        Estado final del trabajo tras este intento
+    """
+    # Los registros de la ejecución (generador incluido) llevan el id del trabajo
+    with logs.correlacion(f"trabajo-{trabajo_id}"):
+        return await _ejecutar(trabajo_id, worker, fabrica_sesiones)
+
+
+async def _ejecutar(trabajo_id: int, worker: Optional[str], fabrica_sesiones: Any) -> Optional[str]:
+    global _en_curso_local
+    fabrica = fabrica_sesiones or SessionLocal
+    worker = worker or id_worker()
+    db = fabrica()
+    latido = asyncio.create_task(_latir(trabajo_id, fabrica))
+    with _lock:
+        _en_curso_local += 1
+    try:
+        # Cargar y cerrar el trabajo va al executor: con COLA_TRABAJOS_EN_API el loop es el de la API
+        estado, entradas = await proveedores_llm.ejecutar_en_executor(_cargar_trabajo, db, trabajo_id)
+        if entradas is None:
+            return estado
+        trabajo = entradas["trabajo"]
+        logger.info(
+            "🧵 [%s] Trabajo %s: %s salidas (intento %s/%s)",
+            worker, trabajo.id, len(entradas["salidas"]), trabajo.intentos, trabajo.max_intentos
+        )
+        generador = GeneradorIA(db, usuario=entradas["usuario"], prioridad=trabajo.prioridad)
+        hechas, errores = await generador.generar_salidas_con_errores_async(
+            noticia=entradas["noticia"],
+            salidas=entradas["salidas"],
+            llm=entradas["llm"],
+            regenerar=trabajo.regenerar,
+            modo_combinado=trabajo.modo_combinado
+        )
+        return await proveedores_llm.ejecutar_en_executor(
+            _cerrar_trabajo, db, trabajo, worker, entradas["resultados"], hechas, errores
+        )
+    except asyncio.CancelledError:
+        # Apagado del worker: el trabajo vuelve a la cola sin gastar un intento
+        await proveedores_llm.ejecutar_en_executor(_devolver_a_cola, fabrica, trabajo_id, worker)
+        raise
+    except Exception as e:
+        logger.error("❌ Error ejecutando trabajo de generación %s: %s", trabajo_id, e)
+        return await proveedores_llm.ejecutar_en_executor(_registrar_error, db, trabajo_id, str(e))
+    finally:
+        latido.cancel()
+        with _lock:
+            _en_curso_local -= 1
+        db.close()
+
+
+def _cargar_trabajo(db: Session, trabajo_id: int) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Carga el trabajo reclamado y las entradas de su generación
+
+    Returns:
+        Tupla (estado, entradas); entradas es None si no hay nada que generar (el
+        trabajo ya no está en curso, o se cerró por faltar la noticia o el LLM)
+    """
+    trabajo = db.get(TrabajoGeneracion, trabajo_id)
+    if trabajo is None or trabajo.estado != EN_CURSO:
+        return getattr(trabajo, 'estado', None), None
+
+    noticia = db.get(Noticia, trabajo.noticia_id, options=NOTICIA_PARA_GENERAR)
+    llm = db.query(LLMMaestro).filter(
+        LLMMaestro.id == trabajo.llm_id,
+        LLMMaestro.activo == True
+    ).first() if trabajo.llm_id else None
+    if noticia is None or llm is None:
+        trabajo.intentos = trabajo.max_intentos  # no tiene sentido reintentar
+        _cerrar_intento(trabajo, [], "Noticia no encontrada" if noticia is None else "LLM no encontrado o inactivo")
+        db.commit()
+        return trabajo.estado, None
+
+    resultados = dict(trabajo.resultados or {})
+    pendientes = [
+        salida_id for salida_id in trabajo.salidas_ids
+        if (resultados.get(str(salida_id)) or {}).get("estado") != COMPLETADO
+    ]
+    salidas = db.query(SalidaMaestro).filter(
+        SalidaMaestro.id.in_(pendientes),
+        SalidaMaestro.activo == True
+    ).all()
+    encontradas = {salida.id for salida in salidas}
+    for salida_id in pendientes:
+        if salida_id not in encontradas:
+            resultados[str(salida_id)] = {"estado": ERROR, "error": "Salida no encontrada o inactiva"}
+
+    usuario = db.get(Usuario, trabajo.usuario_id) if trabajo.usuario_id else None
+    return trabajo.estado, {
+        "trabajo": trabajo,
+        "noticia": noticia,
+        "llm": llm,
+        "salidas": salidas,
+        "usuario": usuario,
+        "resultados": resultados
+    }
+
+
+def _cerrar_trabajo(
+    db: Session,
+    trabajo: TrabajoGeneracion,
+    worker: str,
+    resultados: Dict[str, Any],
+    hechas: List[Any],
+    errores: List[Dict[str, Any]]
+) -> Optional[str]:
+    """Guarda el resultado de cada salida y cierra el intento; devuelve el estado final"""
+    for noticia_salida in hechas:
+        resultados[str(noticia_salida.salida_id)] = {
+            "estado": COMPLETADO,
+            "noticia_salida_id": noticia_salida.id,
+            "tokens_usados": noticia_salida.tokens_usados,
+            # Regeneración incremental: omitida sin llamar al LLM o entradas que cambiaron
+            "omitida": getattr(noticia_salida, "omitida", False),
+            "entradas_cambiadas": getattr(noticia_salida, "entradas_cambiadas", None)
+        }
+    for error in errores:
+        resultados[str(error["salida_id"])] = {"estado": ERROR, "error": error["error"]}
+
+    db.refresh(trabajo)
+    if trabajo.estado != EN_CURSO or trabajo.worker != worker:
+        # Otro worker lo dio por abandonado y lo retomó: su intento manda
+        logger.warning("⚠️ Trabajo %s reasignado a %s, se descarta este intento", trabajo.id, trabajo.worker)
+        return trabajo.estado
+    trabajo.resultados = resultados
+    omitidas = sum(1 for noticia_salida in hechas if getattr(noticia_salida, "omitida", False))
+    if omitidas and trabajo.regeneracion_id:
+        db.query(RegeneracionMasiva).filter(RegeneracionMasiva.id == trabajo.regeneracion_id).update(
+            {RegeneracionMasiva.salidas_omitidas: RegeneracionMasiva.salidas_omitidas + omitidas},
+            synchronize_session=False
+        )
+    fallidas = [
+        str(salida_id) for salida_id in trabajo.salidas_ids
+        if resultados.get(str(salida_id), {}).get("estado") != COMPLETADO
+    ]
+    _cerrar_intento(trabajo, fallidas)
+    db.commit()
+    return trabajo.estado
+
+
+def _devolver_a_cola(fabrica_sesiones: Any, trabajo_id: int, worker: str) -> None:
+    """Devuelve a la cola un trabajo en curso de este worker sin gastar el intento"""
+    db = fabrica_sesiones()
+    try:
+        db.query(TrabajoGeneracion).filter(
+            TrabajoGeneracion.id == trabajo_id,
+            TrabajoGeneracion.estado == EN_CURSO,
+            TrabajoGeneracion.worker == worker
+        ).update({
+            "estado": PENDIENTE,
+            "worker": None,
+            "intentos": TrabajoGeneracion.intentos - 1,
+            "disponible_en": _ahora()
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _registrar_error(db: Session, trabajo_id: int, error: str) -> Optional[str]:
+    """Cierra el intento con el error de la ejecución; devuelve el estado final"""
+    db.rollback()
+    trabajo = db.get(TrabajoGeneracion, trabajo_id)
+    if trabajo is None:
+        return None
+    _cerrar_intento(trabajo, [], error)
+    db.commit()
+    return trabajo.estado
+
+
+async def trabajar(
+    worker: Optional[str] = None,
+    concurrencia: Optional[int] = None,
+    fabrica_sesiones: Any = None,
+    detener: Optional[asyncio.Event] = None
+) -> None:
+    """
+    Bucle de un worker: reclama hasta `concurrencia` trabajos a la vez y los ejecuta
+
+    Cada COLA_TRABAJO_EXPIRA_S también recupera los trabajos abandonados. Las
+    consultas a la cola van al executor: con COLA_TRABAJOS_EN_API el bucle comparte
+    el event loop con la API. Al cancelarse, los trabajos en curso vuelven a la cola.
+    """
+    fabrica = fabrica_sesiones or SessionLocal
+    worker = worker or id_worker()
+    concurrencia = max(1, concurrencia or settings.COLA_CONCURRENCIA)
+    activos: set = set()
+    ultimo_barrido = 0.0
+    logger.info("🧵 Worker de generación %s escuchando la cola (concurrencia %s)", worker, concurrencia)
+    try:
+        while not (detener and detener.is_set()):
+            barrer = asyncio.get_running_loop().time() - ultimo_barrido >= settings.COLA_TRABAJO_EXPIRA_S
+            try:
+                reclamados = await proveedores_llm.ejecutar_en_executor(
+                    _consultar_cola, fabrica, worker, concurrencia - len(activos), barrer
+                )
+            except Exception as e:
+                logger.warning("⚠️ Error consultando la cola de generación: %s", e)
+                reclamados = []
+            if barrer:
+                ultimo_barrido = asyncio.get_running_loop().time()
+            for trabajo_id in reclamados:
+                tarea = asyncio.create_task(ejecutar(trabajo_id, worker, fabrica))
+                activos.add(tarea)
+                tarea.add_done_callback(activos.discard)
+            await asyncio.sleep(settings.COLA_INTERVALO_S)
+        if activos:
+            await asyncio.gather(*activos, return_exceptions=True)
+    finally:
+        for tarea in list(activos):
+            tarea.cancel()
+        if activos:
+            await asyncio.gather(*activos, return_exceptions=True)
+
+
+def _consultar_cola(fabrica_sesiones: Any, worker: str, libres: int, barrer: bool) -> List[int]:
+    """Recupera abandonados (si toca) y reclama hasta `libres` trabajos; devuelve sus ids"""
+    db = fabrica_sesiones()
+    reclamados = []
+    try:
+        if barrer:
+            recuperar_abandonados(db)
+        while len(reclamados) < libres:
+            trabajo = reclamar(db, worker)
+            if trabajo is None:
+                break
+            reclamados.append(trabajo.id)
+    except Exception:
+        db.rollback()
+        if not reclamados:
+            raise
+        logger.warning("⚠️ Error reclamando trabajos de generación tras reclamar %s", len(reclamados), exc_info=True)
+    finally:
+        db.close()
+    return reclamados
+
+
+# ==================== CONSULTA ====================
+
+def resumen_trabajo(trabajo: TrabajoGeneracion) -> Dict[str, Any]:
+    """Estado del trabajo con el progreso por salida (para el polling y el SSE)"""
+    resultados = trabajo.resultados or {}
+    completadas = sum(1 for r in resultados.values() if r.get("estado") == COMPLETADO)
+    return {
+        "id": trabajo.id,
+        "estado": trabajo.estado,
+        "prioridad": trabajo.prioridad,
+        "intentos": trabajo.intentos,
+        "max_intentos": trabajo.max_intentos,
+        "total_salidas": len(trabajo.salidas_ids or []),
+        "salidas_completadas": completadas,
+        "resultados": resultados,
+        "error": trabajo.error,
+        "disponible_en": trabajo.disponible_en.isoformat() if trabajo.disponible_en else None,
+        "terminado_en": trabajo.terminado_en.isoformat() if trabajo.terminado_en else None
+    }
+
+
+def get_estadisticas(db: Optional[Session] = None) -> Dict[str, Any]:
+    """
+    Contadores del proceso y, con db, trabajos por estado y pendientes por clase de
+    prioridad (profundidad de cola y espera del más antiguo)
+    """
+    with _lock:
+        estadisticas = dict(_estadisticas)
+        estadisticas["en_curso_en_este_proceso"] = _en_curso_local
+    if db is not None:
+        filas = db.query(TrabajoGeneracion.estado, func.count(TrabajoGeneracion.id)).group_by(
+            TrabajoGeneracion.estado
+        ).all()
+        estadisticas["por_estado"] = {estado: total for estado, total in filas}
+        ahora = _ahora()
+        pendientes = db.query(
+            TrabajoGeneracion.prioridad,
+            func.count(TrabajoGeneracion.id),
+            func.min(TrabajoGeneracion.disponible_en)
+        ).filter(TrabajoGeneracion.estado == PENDIENTE).group_by(TrabajoGeneracion.prioridad).all()
+        estadisticas["pendientes_por_prioridad"] = {
+            clase: {
+                "en_cola": total,
+                # desde que el trabajo está disponible (sin contar la espera entre reintentos)
+                "espera_max_s": max(0, int((ahora - mas_antiguo).total_seconds())) if mas_antiguo else 0
+            }
+            for clase, total, mas_antiguo in pendientes
+        }
+    return estadisticas
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
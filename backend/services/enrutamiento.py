@@ -0,0 +1,261 @@
+"""
+Política de enrutamiento entre LLMMaestro: reintentos, failover y hedging
+Cada LLM puede declarar en configuracion['enrutamiento']:
+
+    {
+        "fallback": [3, 5],          # ids de LLMMaestro a probar en orden si este falla
+        "timeout_s": 20,             # límite por intento (sin límite si no se indica)
+        "reintentos": 2,             # reintentos en el mismo LLM ante 429/5xx/timeout
+        "backoff_base_s": 0.5,       # espera exponencial con jitter entre reintentos
+        "backoff_max_s": 8,
+        "hedging": true,             # lanza una segunda petición al primer fallback si
+        "hedging_retraso_s": 10      # la primera tarda más que su p95 (o este valor
+    }                                # mientras no haya muestras suficientes)
+
+La primera respuesta correcta gana y las demás peticiones se cancelan. Sin esta
+clave el comportamiento es el de siempre: un único intento contra el LLM.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+POLITICA_POR_DEFECTO = {
+    "fallback": [],
+    "timeout_s": None,
+    "reintentos": 0,
+    "backoff_base_s": 0.5,
+    "backoff_max_s": 8.0,
+    "hedging": False,
+    "hedging_retraso_s": 10.0
+}
+
+# Latencias recientes por LLM para calcular el p95 del hedging
+MUESTRAS_LATENCIA = 200
+MIN_MUESTRAS_P95 = 20
+
+# Nombres de excepción de los SDK que indican un fallo transitorio
+_ERRORES_TRANSITORIOS = {
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "OverloadedError", "ServiceUnavailableError", "ConnectError", "ReadTimeout",
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded"
+}
+
+_latencias: Dict[Any, Deque[float]] = {}
+_lock = Lock()
+_estadisticas = {"reintentos": 0, "timeouts": 0, "failovers": 0, "hedges": 0, "hedges_ganados": 0}
+
+
+class FalloEnrutamiento(Exception):
+    """Todos los LLM candidatos fallaron; errores = [(llm, excepción), ...] en orden"""
+
+    def __init__(self, errores: List[Tuple[Any, BaseException]]):
+        self.errores = errores
+        super().__init__("; ".join(f"{getattr(llm, 'nombre', llm)}: {e}" for llm, e in errores))
+
+    @property
+    def ultimo(self) -> Tuple[Any, BaseException]:
+        return self.errores[-1]
+
+
+def _contar(clave: str) -> None:
+    with _lock:
+        _estadisticas[clave] += 1
+
+
+def get_politica(llm: Any) -> Dict[str, Any]:
+    """Política del LLM (configuracion['enrutamiento']) completada con los valores por defecto"""
+    config = getattr(llm, 'configuracion', None) or {}
+    propia = config.get('enrutamiento') or {}
+    politica = dict(POLITICA_POR_DEFECTO)
+    if not isinstance(propia, dict):
+        return politica
+    try:
+        fallback = [int(x) for x in propia.get('fallback') or []]
+        politica["fallback"] = [x for x in dict.fromkeys(fallback) if x != getattr(llm, 'id', None)]
+        if propia.get('timeout_s'):
+            politica["timeout_s"] = float(propia['timeout_s'])
+        politica["reintentos"] = max(0, int(propia.get('reintentos') or 0))
+        for clave in ("backoff_base_s", "backoff_max_s", "hedging_retraso_s"):
+            if propia.get(clave) is not None:
+                politica[clave] = max(0.0, float(propia[clave]))
+        politica["hedging"] = bool(propia.get('hedging'))
+    except (TypeError, ValueError):
+        logger.warning("⚠️ Política de enrutamiento inválida en %s, se ignora", getattr(llm, 'nombre', llm))
+        return dict(POLITICA_POR_DEFECTO)
+    return politica
+
+
+def politica_activa(politica: Dict[str, Any]) -> bool:
+    """False si la política equivale a un único intento sin límite de tiempo"""
+    return bool(politica["fallback"] or politica["timeout_s"] or politica["reintentos"])
+
+
+def es_reintentable(error: BaseException) -> bool:
+    """429, 5xx, timeouts y errores de conexión (el resto no mejora reintentando)"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    for estado in (
+        getattr(error, "status_code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+        getattr(error, "code", None)
+    ):
+        if isinstance(estado, int):
+            return estado in (408, 429) or estado >= 500
+    return type(error).__name__ in _ERRORES_TRANSITORIOS
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Segundos indicados por el proveedor en la cabecera Retry-After (si la hay)"""
+    cabeceras = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        valor = cabeceras.get("retry-after") if cabeceras is not None else None
+        return float(valor) if valor is not None else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def espera_backoff(intento: int, politica: Dict[str, Any], error: Optional[BaseException] = None) -> float:
+    """Backoff exponencial con jitter completo, respetando Retry-After hasta backoff_max_s"""
+    techo = min(politica["backoff_max_s"], politica["backoff_base_s"] * (2 ** intento))
+    espera = random.uniform(0, techo)
+    sugerida = _retry_after(error) if error is not None else None
+    if sugerida is not None:
+        espera = max(espera, min(sugerida, politica["backoff_max_s"]))
+    return espera
+
+
+def registrar_latencia(llm_id: Any, segundos: float) -> None:
+    with _lock:
+        _latencias.setdefault(llm_id, deque(maxlen=MUESTRAS_LATENCIA)).append(segundos)
+
+
+def latencia_p95(llm_id: Any) -> Optional[float]:
+    """p95 de las últimas respuestas correctas del LLM (None con pocas muestras)"""
+    with _lock:
+        muestras = sorted(_latencias.get(llm_id, ()))
+    if len(muestras) < MIN_MUESTRAS_P95:
+        return None
+    return muestras[min(len(muestras) - 1, int(round(0.95 * (len(muestras) - 1))))]
+
+
+def retraso_hedging(llm: Any, politica: Dict[str, Any]) -> float:
+    p95 = latencia_p95(llm.id)
+    return p95 if p95 is not None else politica["hedging_retraso_s"]
+
+
+async def _intentar_con_reintentos(
+    llm: Any,
+    intentar: Callable[[Any], Awaitable[Any]],
+    politica: Dict[str, Any]
+) -> Any:
+    """Intentos contra un mismo LLM: timeout por intento y backoff ante errores transitorios"""
+    intento = 0
+    while True:
+        inicio = time.monotonic()
+        try:
+            if politica["timeout_s"]:
+                resultado = await asyncio.wait_for(intentar(llm), timeout=politica["timeout_s"])
+            else:
+                resultado = await intentar(llm)
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                _contar("timeouts")
+                e = asyncio.TimeoutError(f"sin respuesta en {politica['timeout_s']}s")
+            if intento >= politica["reintentos"] or not es_reintentable(e):
+                raise e
+            espera = espera_backoff(intento, politica, e)
+            intento += 1
+            _contar("reintentos")
+            logger.info("🔁 %s: reintento %s/%s en %.2fs (%s)", llm.nombre, intento, politica['reintentos'], espera, e)
+            await asyncio.sleep(espera)
+            continue
+        registrar_latencia(llm.id, time.monotonic() - inicio)
+        return resultado
+
+
+async def ejecutar(
+    candidatos: List[Any],
+    intentar: Callable[[Any], Awaitable[Any]],
+    politica: Dict[str, Any]
+) -> Tuple[Any, Any]:
+    """
+    Ejecuta intentar(llm) siguiendo la política: candidatos[0] es el LLM pedido y el
+    resto sus fallbacks en orden
+
+    Con hedging, si el primer LLM no respondió tras su p95 se lanza en paralelo el
+    siguiente candidato; si un intento falla se pasa al siguiente que no esté en curso.
+
+    Returns:
+        Tupla (resultado, llm que respondió)
+
+    Raises:
+        FalloEnrutamiento: si fallaron todos los candidatos
+    """
+    errores: List[Tuple[Any, BaseException]] = []
+    en_curso: Dict[asyncio.Task, Any] = {}
+    siguiente = 0
+    hedge_pendiente = politica["hedging"] and len(candidatos) > 1
+
+    def lanzar() -> None:
+        nonlocal siguiente
+        llm = candidatos[siguiente]
+        siguiente += 1
+        en_curso[asyncio.ensure_future(_intentar_con_reintentos(llm, intentar, politica))] = llm
+
+    lanzar()
+    try:
+        while en_curso:
+            espera = retraso_hedging(candidatos[0], politica) if hedge_pendiente and siguiente < len(candidatos) else None
+            terminadas, _ = await asyncio.wait(en_curso, timeout=espera, return_when=asyncio.FIRST_COMPLETED)
+            if not terminadas:
+                hedge_pendiente = False
+                _contar("hedges")
+                logger.info("⏱️ %s supera %.1fs: petición de respaldo a %s", candidatos[0].nombre, espera, candidatos[siguiente].nombre)
+                lanzar()
+                continue
+
+            for tarea in terminadas:
+                llm = en_curso.pop(tarea)
+                if tarea.exception() is None:
+                    if llm is not candidatos[0]:
+                        _contar("hedges_ganados" if not errores else "failovers")
+                    return tarea.result(), llm
+                errores.append((llm, tarea.exception()))
+                logger.warning("⚠️ %s falló: %s", llm.nombre, tarea.exception())
+
+            if not en_curso and siguiente < len(candidatos):
+                hedge_pendiente = False
+                lanzar()
+    finally:
+        for tarea in en_curso:
+            tarea.cancel()
+        if en_curso:
+            await asyncio.gather(*en_curso, return_exceptions=True)
+
+    raise FalloEnrutamiento(errores)
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    """Reintentos, timeouts, failovers, hedges y p95 reciente (ms) por LLM"""
+    with _lock:
+        estadisticas = dict(_estadisticas)
+        llm_ids = list(_latencias)
+    p95_por_llm = {llm_id: latencia_p95(llm_id) for llm_id in llm_ids}
+    estadisticas["latencia_p95_ms"] = {
+        llm_id: int(p95 * 1000) for llm_id, p95 in p95_por_llm.items() if p95 is not None
+    }
+    return estadisticas
+
+
+def reiniciar_estadisticas() -> None:
+    """Pone los contadores a cero y olvida las latencias"""
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
+        _latencias.clear()
@@ -0,0 +1,170 @@
+"""
+Selección de reglas de estilo relevantes (BM25 local sobre los EstiloItem)
+Cada prompt lleva solo las k reglas más relevantes para la noticia y la salida
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+from threading import Lock
+from typing import Any, Dict, List, Tuple
+
+from services import presupuesto_prompt
+
+# Tamaño objetivo de un fragmento: las reglas cortas consecutivas se agrupan hasta aquí
+TAMANO_FRAGMENTO = 600
+
+# Una regla empieza en una línea numerada tipo "1.2.3." o en un párrafo nuevo
+_PATRON_CORTE = re.compile(r'\n\s*\n|\n(?=\s*\d+(?:\.\d+)+\.?\s)')
+_PATRON_TERMINO = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes asi aun bajo cada como con contra cual cuales
+cuando de del desde donde dos el ella ellas ellos en entre era es esa esas ese eso esos esta estan estas
+este esto estos fue fueron ha han hasta hay la las le les lo los mas me mi mismo mucho muy nada ni no nos
+o otra otras otro otros para pero poco por porque que quien se sea ser si sin sobre solo son su sus tambien
+tan tanto te tiene tienen todo todos tras tu un una unas uno unos y ya
+""".split())
+
+
+def normalizar(texto: str) -> List[str]:
+    """Términos del texto: minúsculas, sin tildes ni stopwords y sin plural simple"""
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    terminos = []
+    for termino in _PATRON_TERMINO.findall(texto):
+        if len(termino) < 3 or termino in STOPWORDS:
+            continue
+        if len(termino) > 4 and termino.endswith("es"):
+            termino = termino[:-2]
+        elif len(termino) > 3 and termino.endswith("s"):
+            termino = termino[:-1]
+        terminos.append(termino)
+    return terminos
+
+
+def fragmentar(texto: str) -> List[str]:
+    """Parte un item en reglas, agrupando las cortas consecutivas hasta TAMANO_FRAGMENTO"""
+    partes: List[str] = []
+    for parte in _PATRON_CORTE.split(texto or ""):
+        # Bloques largos sin numeración ni párrafos: se cortan por líneas
+        partes.extend(parte.split("\n") if len(parte) > 2 * TAMANO_FRAGMENTO else [parte])
+
+    fragmentos: List[str] = []
+    actual = ""
+    for parte in partes:
+        parte = parte.strip()
+        if not parte:
+            continue
+        if actual and len(actual) + len(parte) > TAMANO_FRAGMENTO:
+            fragmentos.append(actual)
+            actual = parte
+        else:
+            actual = f"{actual}\n{parte}" if actual else parte
+    if actual:
+        fragmentos.append(actual)
+    return fragmentos
+
+
+class IndiceBM25:
+    """BM25 Okapi sobre documentos ya normalizados"""
+
+    def __init__(self, documentos: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.frecuencias = [Counter(doc) for doc in documentos]
+        self.longitudes = [len(doc) for doc in documentos]
+        self.longitud_media = (sum(self.longitudes) / len(documentos)) if documentos else 0.0
+        df: Counter = Counter()
+        for frecuencia in self.frecuencias:
+            df.update(frecuencia.keys())
+        n = len(documentos)
+        self.idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def puntuar(self, consulta: List[str]) -> List[float]:
+        terminos = [t for t in set(consulta) if t in self.idf]
+        puntuaciones = []
+        for frecuencia, longitud in zip(self.frecuencias, self.longitudes):
+            total = 0.0
+            norma = self.k1 * (1 - self.b + self.b * longitud / (self.longitud_media or 1))
+            for termino in terminos:
+                tf = frecuencia.get(termino)
+                if tf:
+                    total += self.idf[termino] * tf * (self.k1 + 1) / (tf + norma)
+            puntuaciones.append(total)
+        return puntuaciones
+
+
+class Fragmento:
+    """Regla de estilo indexada; posicion = (orden del item, índice dentro del item)"""
+
+    __slots__ = ("item_id", "posicion", "texto", "tokens")
+
+    def __init__(self, item_id: Any, posicion: Tuple[int, int], texto: str):
+        self.item_id = item_id
+        self.posicion = posicion
+        self.texto = texto
+        self.tokens = presupuesto_prompt.contar_tokens(texto)
+
+
+class IndiceEstilo:
+    """Fragmentos de los EstiloItem de un estilo y su índice BM25"""
+
+    def __init__(self, items: List[Any]):
+        self.fijos: List[Fragmento] = []
+        self.fragmentos: List[Fragmento] = []
+        for n, item in enumerate(items):
+            contenido = (item.contenido or "").strip()
+            orden = getattr(item, 'orden', None) or n
+            if getattr(item, 'incluir_siempre', False):
+                self.fijos.append(Fragmento(getattr(item, 'id', None), (orden, 0), contenido))
+                continue
+            for i, texto in enumerate(fragmentar(contenido)):
+                self.fragmentos.append(Fragmento(getattr(item, 'id', None), (orden, i), texto))
+        self.bm25 = IndiceBM25([normalizar(f.texto) for f in self.fragmentos])
+        self.tokens_total = sum(f.tokens for f in self.fijos + self.fragmentos)
+
+    def seleccionar(self, consulta: str, k: int) -> List[Fragmento]:
+        """
+        Las k reglas más relevantes para la consulta, de mayor a menor puntuación
+
+        Reglas sin ningún término en común no se envían aunque sobre hueco.
+        """
+        puntuaciones = self.bm25.puntuar(normalizar(consulta))
+        candidatos = sorted(
+            (i for i, p in enumerate(puntuaciones) if p > 0),
+            key=lambda i: (-puntuaciones[i], self.fragmentos[i].posicion)
+        )
+        return [self.fragmentos[i] for i in candidatos[:k]]
+
+
+_lock = Lock()
+_estadisticas = {"generaciones": 0, "tokens_manual": 0, "tokens_enviados": 0, "tokens_ahorrados": 0}
+
+
+def registrar_ahorro(tokens_manual: int, tokens_enviados: int) -> int:
+    """Acumula el ahorro de una generación; devuelve los tokens ahorrados"""
+    ahorrados = max(0, tokens_manual - tokens_enviados)
+    with _lock:
+        _estadisticas["generaciones"] += 1
+        _estadisticas["tokens_manual"] += tokens_manual
+        _estadisticas["tokens_enviados"] += tokens_enviados
+        _estadisticas["tokens_ahorrados"] += ahorrados
+    return ahorrados
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    """Tokens del manual completo frente a los enviados y ahorro medio por generación"""
+    with _lock:
+        estadisticas = dict(_estadisticas)
+    generaciones = estadisticas["generaciones"]
+    estadisticas["ahorro_medio_por_generacion"] = (
+        round(estadisticas["tokens_ahorrados"] / generaciones) if generaciones else 0
+    )
+    return estadisticas
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
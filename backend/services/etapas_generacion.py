@@ -0,0 +1,163 @@
+"""
+Latencia por etapa de la generación de una salida
+
+tiempo_generacion_ms solo cubre la llamada al LLM. Cada generación
+(generar_para_salida / generar_para_salida_temporal, sync, async y streaming)
+abre una medición y sus etapas van sumando milisegundos:
+
+    orm      carga de sección, prompt, estilo y sus items
+    prompt   procesar_prompt (render de la plantilla)
+    estilo   bloque de estilo y presupuesto de tokens (aplicar_estilo / _armar_mensajes)
+    cola     espera de turno en el planificador del LLM
+    ttft     hasta el primer fragmento (solo streaming)
+    llm      llamada completa al proveedor
+    parseo   _parsear_respuesta_estructurada
+    post     merge_configs y post-procesado (emojis, max_caracteres)
+    commit   commit de la NoticiaSalida
+
+Al cerrar la medición cada etapa entra en un histograma por (etapa, proveedor,
+modelo, tipo de salida) y el desglose se guarda en NoticiaSalida.etapas_ms (todas
+las etapas salvo commit, que termina después de escribir la fila); también se
+exportan a /metrics (core/metricas_prometheus.py). La medición
+actual viaja en un ContextVar: cada salida de un asyncio.gather tiene la suya.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core import metricas_prometheus
+
+ETAPAS = ("orm", "prompt", "estilo", "cola", "ttft", "llm", "parseo", "post", "commit")
+
+# Límites superiores (ms) de los buckets del histograma; el último es +inf
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class MedicionEtapas:
+    """Milisegundos acumulados por etapa de una generación"""
+
+    __slots__ = ("proveedor", "modelo", "tipo_salida", "ms")
+
+    def __init__(self, proveedor: str, modelo: str, tipo_salida: str):
+        self.proveedor = proveedor
+        self.modelo = modelo
+        self.tipo_salida = tipo_salida
+        self.ms: Dict[str, float] = {}
+
+    def sumar(self, etapa: str, ms: float) -> None:
+        self.ms[etapa] = self.ms.get(etapa, 0.0) + ms
+
+    def compacto(self) -> Dict[str, int]:
+        """Desglose para NoticiaSalida.etapas_ms: ms enteros en el orden de ETAPAS"""
+        return {etapa: int(round(self.ms[etapa])) for etapa in ETAPAS if etapa in self.ms}
+
+
+_actual: ContextVar[Optional[MedicionEtapas]] = ContextVar("medicion_etapas", default=None)
+
+_lock = Lock()
+# (etapa, proveedor, modelo, tipo_salida) -> [conteos por bucket (+inf al final), suma ms, n]
+_histogramas: Dict[Tuple[str, str, str, str], List[Any]] = {}
+
+
+def actual() -> Optional[MedicionEtapas]:
+    return _actual.get()
+
+
+@contextmanager
+def medir(llm: Any, salida: Any) -> Iterator[MedicionEtapas]:
+    """Abre la medición de una generación; al terminar sin error entra en los histogramas"""
+    medicion = MedicionEtapas(
+        str(getattr(llm, 'proveedor', None) or "-"),
+        str(getattr(llm, 'modelo_id', None) or "-"),
+        str(getattr(salida, 'tipo_salida', None) or "-")
+    )
+    token = _actual.set(medicion)
+    try:
+        yield medicion
+    finally:
+        _actual.reset(token)
+    observar(medicion)
+
+
+@contextmanager
+def etapa(nombre: str) -> Iterator[None]:
+    """Suma a la medición actual lo que tarda el bloque (sin medición abierta no hace nada)"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(nombre, inicio)
+
+
+def registrar(nombre: str, desde: float) -> None:
+    """Suma a la etapa el tiempo transcurrido desde `desde` (time.perf_counter())"""
+    medicion = _actual.get()
+    if medicion is not None:
+        medicion.sumar(nombre, (time.perf_counter() - desde) * 1000)
+
+
+def observar(medicion: MedicionEtapas) -> None:
+    with _lock:
+        for nombre, ms in medicion.ms.items():
+            clave = (nombre, medicion.proveedor, medicion.modelo, medicion.tipo_salida)
+            histograma = _histogramas.get(clave)
+            if histograma is None:
+                histograma = _histogramas[clave] = [[0] * (len(BUCKETS_MS) + 1), 0.0, 0]
+            histograma[0][bisect_left(BUCKETS_MS, ms)] += 1
+            histograma[1] += ms
+            histograma[2] += 1
+    for nombre, ms in medicion.ms.items():
+        metricas_prometheus.observar_etapa(nombre, medicion.proveedor, medicion.modelo, medicion.tipo_salida, ms)
+
+
+def _percentil(conteos: List[int], n: int, p: float) -> float:
+    """Percentil aproximado: límite superior del bucket donde cae (el último bucket usa el anterior)"""
+    objetivo = p / 100.0 * n
+    acumulado = 0
+    for i, conteo in enumerate(conteos):
+        acumulado += conteo
+        if acumulado >= objetivo:
+            return float(BUCKETS_MS[min(i, len(BUCKETS_MS) - 1)])
+    return float(BUCKETS_MS[-1])
+
+
+def histogramas() -> List[Dict[str, Any]]:
+    """Copia de los histogramas con sus etiquetas (buckets acumulados, como Prometheus)"""
+    with _lock:
+        copia = [(clave, list(h[0]), h[1], h[2]) for clave, h in _histogramas.items()]
+    resultado = []
+    for (nombre, proveedor, modelo, tipo_salida), conteos, suma, n in sorted(copia):
+        acumulados, total = [], 0
+        for conteo in conteos:
+            total += conteo
+            acumulados.append(total)
+        resultado.append({
+            "etapa": nombre,
+            "proveedor": proveedor,
+            "modelo": modelo,
+            "tipo_salida": tipo_salida,
+            "buckets_ms": list(BUCKETS_MS),
+            "acumulados": acumulados,
+            "suma_ms": round(suma, 3),
+            "n": n,
+            "p50_ms": _percentil(conteos, n, 50),
+            "p95_ms": _percentil(conteos, n, 95),
+            "p99_ms": _percentil(conteos, n, 99)
+        })
+    return resultado
+
+
+def get_estadisticas() -> List[Dict[str, Any]]:
+    """Resumen por etapa y etiquetas (sin los buckets)"""
+    return [
+        {clave: valor for clave, valor in h.items() if clave not in ("buckets_ms", "acumulados")}
+        for h in histogramas()
+    ]
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        _histogramas.clear()
@@ -2,30 +2,22 @@
 Servicio de Generación IA Multi-LLM
 Gestiona la generación de contenido con diferentes proveedores (Claude, GPT, Gemini)
 """
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from anthropic import Anthropic
+import asyncio
+import logging
 import time
 import re
 from datetime import datetime
 
-# Importaciones opcionales de otros proveedores
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-
-try:
-    import google.generativeai as genai
-    GOOGLE_AVAILABLE = True
-except ImportError:
-    GOOGLE_AVAILABLE = False
-
 from models.orm_models import (
     LLMMaestro,
     PromptMaestro,
+    PromptItem,
     EstiloMaestro,
+    EstiloItem,
     Seccion,
     SalidaMaestro,
     Noticia,
@@ -34,7 +26,53 @@ from models.orm_models import (
 )
 from models.schemas import MetricasValorResumen
 from config import settings
+from core import logs
+from core import metricas_prometheus
 from services import runtime_settings
+from services import proveedores_llm
+from services import plantillas
+from services import cache_respuestas
+from services import coalescencia
+from services import enrutamiento
+from services import presupuesto_tokens
+from services import ventanas_tokens
+from services import presupuesto_prompt
+from services import estilo_relevante
+from services import prioridad_generacion
+from services import huella_entradas
+from services import etapas_generacion
+
+logger = logging.getLogger(__name__)
+
+
+# Marca de bloque por salida en las respuestas del modo combinado
+MARCA_SALIDA = "SALIDA"
+
+
+# ==================== CONCURRENCIA POR LLM ====================
+
+def get_limite_concurrencia(llm: LLMMaestro) -> int:
+    """
+    Máximo de llamadas simultáneas permitidas para un LLM.
+    Se puede ajustar por modelo con configuracion['max_concurrencia'].
+    """
+    config = getattr(llm, 'configuracion', None) or {}
+    try:
+        limite = int(config.get('max_concurrencia') or settings.LLM_MAX_CONCURRENCIA)
+    except (TypeError, ValueError):
+        limite = settings.LLM_MAX_CONCURRENCIA
+    return max(1, limite)
+
+
+def get_semaforo_llm(llm: LLMMaestro, clase: Optional[str] = None) -> Any:
+    """
+    Turno (async with) en el planificador que acota la concurrencia hacia un LLMMaestro.
+
+    El planificador reparte las plazas por clase de prioridad (urgente, normal,
+    lote; ver services/prioridad_generacion.py) y se recrea si cambia el límite
+    configurado, las reservas o el event loop en ejecución.
+    """
+    return prioridad_generacion.get_planificador(llm, get_limite_concurrencia(llm)).turno(clase)
 
 
 class GeneradorIA:
@@ -43,9 +81,16 @@ class GeneradorIA:
     Soporta múltiples proveedores: Anthropic (Claude), OpenAI (GPT), Google (Gemini)
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, usuario: Any = None, prioridad: Optional[str] = None):
         self.db = db
+        self.usuario = usuario  # Para el presupuesto diario de tokens del usuario
+        self.usuario_id = getattr(usuario, 'id', None)
+        # Clase de prioridad frente a otras generaciones hacia el mismo LLM
+        self.prioridad = prioridad or prioridad_generacion.clasificar(rol=getattr(usuario, 'role', None))
+        # Regenerar omite las salidas cuyas entradas no cambiaron (forzar lo desactiva)
+        self.incremental = settings.REGENERAR_INCREMENTAL
         self._clientes = {}  # Cache de clientes API
+        self._clientes_async = {}  # Cache de clientes async (ver services/proveedores_llm.py)
         # Máximo de caracteres permitidos en el prompt final (protección contra prompts excesivamente largos)
         # Tomado desde la configuración central si está disponible
         try:
@@ -59,46 +104,42 @@ class GeneradorIA:
         """
         Obtiene o crea un cliente para el proveedor LLM
         
+        El cliente se comparte entre requests (registro por proceso en
+        services/proveedores_llm.py), así se reutiliza su pool de conexiones.
+        
         Args:
             llm: Instancia de LLMMaestro
             
         Returns:
-            Cliente API configurado
+            Cliente API configurado (None para modo simulado)
         """
         # Usar cache si ya existe
-        if llm.id in self._clientes:
-            return self._clientes[llm.id]
-        
-        # Crear cliente según proveedor
+        if llm.id not in self._clientes:
+            self._clientes[llm.id] = proveedores_llm.obtener_cliente(
+                llm, asincrono=False, crear=self._crear_cliente_llm
+            )
+        return self._clientes[llm.id]
+
+    def _crear_cliente_llm(self, llm: LLMMaestro) -> Any:
+        """Crea el cliente síncrono del proveedor (ver proveedores_llm.crear_cliente)"""
         if llm.proveedor == "Anthropic":
             if not llm.api_key or llm.api_key == "":
-                print(f"⚠️  API Key no configurada para {llm.nombre}. Usando modo simulado.")
+                logger.warning("⚠️  API Key no configurada para %s. Usando modo simulado.", llm.nombre)
                 return None  # Modo simulado
-            cliente = Anthropic(api_key=llm.api_key)
-            
-        elif llm.proveedor == "OpenAI":
-            if not OPENAI_AVAILABLE:
-                raise ImportError(
-                    "OpenAI no está instalado. Instala con: pip install openai --break-system-packages"
-                )
-            openai.api_key = llm.api_key
-            cliente = openai
-            
-        elif llm.proveedor == "Google":
-            if not GOOGLE_AVAILABLE:
-                raise ImportError(
-                    "Google Generative AI no está instalado. Instala con: pip install google-generativeai --break-system-packages"
-                )
-            genai.configure(api_key=llm.api_key)
-            cliente = genai
-            
-        else:
-            raise ValueError(f"Proveedor no soportado: {llm.proveedor}")
-        
-        # Guardar en cache
-        self._clientes[llm.id] = cliente
-        return cliente
+            return Anthropic(api_key=llm.api_key, http_client=proveedores_llm.crear_http_client(asincrono=False))
+        return proveedores_llm.crear_cliente(llm)
     
+    def _get_cliente_llm_async(self, llm: LLMMaestro) -> Any:
+        """
+        Obtiene el cliente async para el proveedor LLM (compartido por el proceso)
+
+        Returns:
+            Cliente async o None para modo simulado
+        """
+        if llm.id not in self._clientes_async:
+            self._clientes_async[llm.id] = proveedores_llm.obtener_cliente(llm)
+        return self._clientes_async[llm.id]
+
     # ==================== GENERACIÓN DE CONTENIDO ====================
     
     def generar_contenido(
@@ -118,70 +159,378 @@ class GeneradorIA:
             temperature: Temperatura para la generación (0.0-1.0)
             
         Returns:
-            Dict con 'contenido', 'tokens_usados', 'tiempo_ms'
+            Dict con 'contenido', 'tokens_usados', 'tiempo_ms' y los tokens de entrada
+            leídos/escritos en la caché de prompts del proveedor ('tokens_cache_lectura',
+            'tokens_cache_escritura')
+        """
+        resultado, tokens_a_registrar = self._invocar_llm(llm, prompt_contenido, max_tokens, temperature)
+        self._marcar_llm_respuesta(resultado, llm)
+        self._registrar_tokens(llm, tokens_a_registrar)
+        ventanas_tokens.registrar(llm.id, self.usuario_id, None, tokens_a_registrar)
+        metricas_prometheus.contar_tokens(llm, tokens_a_registrar)
+        return resultado
+
+    async def generar_contenido_async(
+        self,
+        llm: LLMMaestro,
+        prompt_contenido,
+        max_tokens: int = 2000,
+        temperature: float = 0.7,
+        usar_cache: bool = True,
+        config_postproceso: Optional[Dict[str, Any]] = None,
+        seccion_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Versión async de generar_contenido
+
+        La llamada al proveedor usa los clientes async de cada SDK (no bloquea el
+        event loop) y queda acotada por el semáforo del LLM; el registro de tokens
+        (BD) se hace al terminar, por lo que varias llamadas concurrentes pueden
+        compartir la misma sesión.
+
+        Una petición idéntica a otra reciente se sirve desde la caché de respuestas
+        (services/cache_respuestas.py) sin llamar al proveedor; usar_cache=False
+        (p.ej. 'regenerar') la salta. config_postproceso entra en la clave. Si una
+        petición idéntica ya está en curso, se espera su resultado en lugar de
+        lanzar otra llamada (services/coalescencia.py).
+
+        Si el LLM tiene política de enrutamiento (configuracion['enrutamiento'], ver
+        services/enrutamiento.py) se aplican reintentos, failover y hedging; el LLM
+        que respondió queda en 'llm_respuesta_id' / 'modelo_respuesta'.
+
+        Antes de la llamada se reserva el presupuesto diario de tokens (ver
+        services/presupuesto_tokens.py); un LLM sin presupuesto cede el paso a sus
+        fallbacks y, si no queda ninguno, se lanza PresupuestoExcedido.
+        """
+        clave, cacheado = await self._consultar_cache(
+            llm, prompt_contenido, max_tokens, temperature, usar_cache, config_postproceso
+        )
+        if cacheado:
+            return cacheado
+
+        async def _generar() -> Dict[str, Any]:
+            politica = enrutamiento.get_politica(llm)
+            reserva, candidatos = await self._reservar_presupuesto(
+                self._candidatos_enrutamiento(llm, politica), prompt_contenido, max_tokens
+            )
+            try:
+                if enrutamiento.politica_activa(politica):
+                    resultado, tokens_a_registrar, llm_respuesta = await self._ainvocar_con_politica(
+                        candidatos, politica, prompt_contenido, max_tokens, temperature
+                    )
+                else:
+                    # Copia desacoplada de la sesión: un commit concurrente expira el ORM y su
+                    # recarga no debe ocurrir en mitad de la llamada al proveedor
+                    llm_respuesta = candidatos[0]
+                    llm_snapshot = self._snapshot_llm(llm_respuesta)
+                    espera = time.perf_counter()
+                    async with get_semaforo_llm(llm_respuesta, self.prioridad):
+                        etapas_generacion.registrar("cola", espera)
+                        resultado, tokens_a_registrar = await self._ainvocar_llm(
+                            llm_snapshot, prompt_contenido, max_tokens, temperature
+                        )
+            except asyncio.CancelledError:
+                asyncio.ensure_future(presupuesto_tokens.conciliar(reserva, 0))
+                raise
+            except Exception:
+                await presupuesto_tokens.conciliar(reserva, 0)
+                raise
+            self._marcar_llm_respuesta(resultado, llm_respuesta)
+            await self._conciliar_tokens(reserva, llm_respuesta, tokens_a_registrar, seccion_id)
+            await self._guardar_en_cache(clave if usar_cache else None, resultado, tokens_a_registrar)
+            return resultado
+
+        resultado, compartido = await coalescencia.compartir(clave, _generar)
+        if compartido:
+            logger.info("🔗 Generación idéntica en curso: se reutiliza su resultado (%s)", llm.nombre)
+            return self._resultado_reutilizado(resultado, coalescida=True)
+        return resultado
+
+    async def generar_contenido_stream(
+        self,
+        llm: LLMMaestro,
+        prompt_contenido,
+        max_tokens: int = 2000,
+        temperature: float = 0.7,
+        usar_cache: bool = True,
+        config_postproceso: Optional[Dict[str, Any]] = None,
+        seccion_id: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Versión en streaming de generar_contenido_async
+
+        Yields:
+            {"tipo": "delta", "texto": str} por cada fragmento del proveedor y, al
+            final, {"tipo": "resultado", "resultado": Dict} con el mismo formato
+            que generar_contenido ('contenido', 'titulo', 'tokens_usados', 'tiempo_ms',
+            'tokens_cache_lectura', 'tokens_cache_escritura'). Un acierto en la caché de
+            respuestas o una generación idéntica en curso se entregan como un único delta.
+        """
+        clave, cacheado = await self._consultar_cache(
+            llm, prompt_contenido, max_tokens, temperature, usar_cache, config_postproceso
+        )
+        if cacheado:
+            yield {"tipo": "delta", "texto": cacheado["contenido"]}
+            yield {"tipo": "resultado", "resultado": cacheado}
+            return
+
+        # Coalescencia solo dentro del proceso: el texto parcial no se comparte entre workers
+        futuro = coalescencia.en_curso(clave)
+        if futuro is not None:
+            compartido = await coalescencia.esperar(futuro)
+            if compartido is not None:
+                resultado = self._resultado_reutilizado(compartido, coalescida=True)
+                yield {"tipo": "delta", "texto": resultado["contenido"]}
+                yield {"tipo": "resultado", "resultado": resultado}
+                return
+
+        reserva, _ = await self._reservar_presupuesto([llm], prompt_contenido, max_tokens)
+        futuro = coalescencia.registrar(clave)
+        resultado = None
+        try:
+            llm_snapshot = self._snapshot_llm(llm)
+            tokens_a_registrar = 0
+            espera = time.perf_counter()
+            async with get_semaforo_llm(llm, self.prioridad):
+                etapas_generacion.registrar("cola", espera)
+                inicio = time.time()
+                inicio_llamada = time.perf_counter()
+                partes: List[str] = []
+                uso = proveedores_llm.uso_tokens()
+                try:
+                    cliente = self._get_cliente_llm_async(llm_snapshot)
+                    if cliente is None:
+                        resultado, tokens_a_registrar = self._respuesta_simulada(llm_snapshot, prompt_contenido, inicio)
+                    else:
+                        async for evento in proveedores_llm.stream_async(
+                            cliente, llm_snapshot, prompt_contenido, max_tokens, temperature
+                        ):
+                            if evento["tipo"] == "delta":
+                                if not partes:
+                                    etapas_generacion.registrar("ttft", inicio_llamada)
+                                partes.append(evento["texto"])
+                                yield evento
+                            else:
+                                uso = evento["uso"]
+                        etapas_generacion.registrar("llm", inicio_llamada)
+                        resultado, tokens_a_registrar = self._procesar_respuesta("".join(partes), uso, inicio)
+                except Exception as e:
+                    # Con texto ya enviado al cliente no se puede sustituir por una respuesta simulada
+                    if partes:
+                        raise Exception(f"Error al generar contenido con {llm_snapshot.nombre}: {str(e)}")
+                    resultado, tokens_a_registrar = self._respuesta_error(llm_snapshot, prompt_contenido, inicio, e)
+
+            if not partes:
+                yield {"tipo": "delta", "texto": resultado["contenido"]}
+            # Sin failover: con texto ya enviado no se puede cambiar de modelo a mitad
+            self._marcar_llm_respuesta(resultado, llm)
+            await self._conciliar_tokens(reserva, llm, tokens_a_registrar, seccion_id)
+            await self._guardar_en_cache(clave if usar_cache else None, resultado, tokens_a_registrar)
+        except Exception as e:
+            coalescencia.liberar(clave, futuro, error=e)
+            await presupuesto_tokens.conciliar(reserva, 0)
+            raise
+        finally:
+            # Cierre del stream a medias (cliente desconectado): los que esperaban generan por su cuenta
+            if resultado is None and not futuro.done():
+                asyncio.ensure_future(presupuesto_tokens.conciliar(reserva, 0))
+            coalescencia.liberar(clave, futuro, resultado=resultado)
+        yield {"tipo": "resultado", "resultado": resultado}
+
+    async def _consultar_cache(
+        self,
+        llm: LLMMaestro,
+        prompt_contenido,
+        max_tokens: int,
+        temperature: float,
+        usar_cache: bool,
+        config_postproceso: Optional[Dict[str, Any]]
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Busca la petición en la caché de respuestas
+
+        Returns:
+            Tupla (clave de la petición, también usada para la coalescencia;
+            resultado cacheado sin tokens consumidos o None si no hay acierto o
+            se salta la caché)
         """
         inicio = time.time()
+        clave = cache_respuestas.calcular_clave(llm.modelo_id, prompt_contenido, max_tokens, temperature, config_postproceso)
+        if not usar_cache:
+            cache_respuestas.registrar_omision()
+            return clave, None
+        cacheado = await cache_respuestas.obtener(clave)
+        if not cacheado:
+            return clave, None
+        logger.info("♻️ Respuesta servida desde caché para %s", llm.nombre)
+        return clave, self._resultado_reutilizado(
+            cacheado,
+            tiempo_ms=int((time.time() - inicio) * 1000),
+            desde_cache=True
+        )
+
+    @staticmethod
+    def _resultado_reutilizado(resultado: Dict[str, Any], **extra) -> Dict[str, Any]:
+        """Resultado de otra llamada (caché o generación en curso): no consume tokens propios"""
+        return {
+            **resultado,
+            "tokens_usados": 0,
+            "tokens_cache_lectura": 0,
+            "tokens_cache_escritura": 0,
+            **extra
+        }
+
+    async def _guardar_en_cache(self, clave: Optional[str], resultado: Dict[str, Any], tokens_registrados: int) -> None:
+        """Guarda solo respuestas reales del proveedor (no simuladas ni de error)"""
+        if not clave or not tokens_registrados or resultado["contenido"].startswith("[SIMULADO"):
+            return
+        await cache_respuestas.guardar(clave, resultado)
+
+    @staticmethod
+    def _snapshot_llm(llm: LLMMaestro) -> Any:
+        """Copia en memoria de los campos del LLM que necesita la llamada al proveedor"""
+        from types import SimpleNamespace
+        return SimpleNamespace(
+            id=llm.id,
+            nombre=llm.nombre,
+            proveedor=llm.proveedor,
+            modelo_id=llm.modelo_id,
+            api_key=llm.api_key,
+            url_api=getattr(llm, 'url_api', None),
+            configuracion=dict(getattr(llm, 'configuracion', None) or {})
+        )
+
+    @staticmethod
+    def _seccion_id(noticia: Any) -> Optional[int]:
+        """Sección de la noticia (BD o temporal) para las ventanas de uso de tokens"""
+        seccion_id = getattr(noticia, 'seccion_id', None)
+        if seccion_id is None:
+            seccion_id = getattr(getattr(noticia, 'seccion', None), 'id', None)
+        return seccion_id if isinstance(seccion_id, int) else None
+
+    @staticmethod
+    def _marcar_llm_respuesta(resultado: Dict[str, Any], llm: LLMMaestro) -> None:
+        """Anota qué LLM generó realmente el resultado (puede ser un fallback)"""
+        resultado["llm_respuesta_id"] = llm.id
+        resultado["modelo_respuesta"] = llm.modelo_id
+
+    @staticmethod
+    def modelo_predominante(resultados: List[Any], por_defecto: str) -> str:
+        """
+        Modelo que respondió la mayoría de las salidas (dicts temporales o NoticiaSalida),
+        para calcular el costo con el modelo real y no con el pedido
+        """
+        conteo: Dict[str, int] = {}
+        for r in resultados:
+            modelo = r.get("modelo_respuesta") if isinstance(r, dict) else getattr(r, "modelo_respuesta", None)
+            if modelo:
+                conteo[modelo] = conteo.get(modelo, 0) + 1
+        return max(conteo, key=conteo.get) if conteo else por_defecto
+
+    def _candidatos_enrutamiento(self, llm: LLMMaestro, politica: Dict[str, Any]) -> List[LLMMaestro]:
+        """El LLM pedido seguido de sus fallbacks activos, en el orden de la política"""
+        if not politica["fallback"] or self.db is None:
+            return [llm]
+        respaldo = {
+            x.id: x for x in self.db.query(LLMMaestro).filter(
+                LLMMaestro.id.in_(politica["fallback"]),
+                LLMMaestro.activo == True
+            ).all()
+        }
+        return [llm] + [respaldo[llm_id] for llm_id in politica["fallback"] if llm_id in respaldo]
+
+    def _registrar_tokens(self, llm: LLMMaestro, tokens_usados: int) -> None:
+        """
+        Acumula los tokens consumidos por una llamada real (no simulada) sin reserva
+        previa; llegan a tokens_usados_hoy en el próximo volcado (ver presupuesto_tokens)
+        """
+        if not tokens_usados:
+            return
+        presupuesto_tokens.registrar(llm.id, self.usuario_id, tokens_usados)
+
+    async def _reservar_presupuesto(
+        self,
+        candidatos: List[LLMMaestro],
+        prompt_contenido,
+        max_tokens: int
+    ) -> Tuple[Optional[Dict[str, Any]], List[LLMMaestro]]:
+        """
+        Reserva tokens en el primer candidato con presupuesto (degradación a fallbacks)
+
+        Returns:
+            Tupla (reserva o None sin BD, candidatos desde el que tiene la reserva)
+
+        Raises:
+            PresupuestoExcedido: sin presupuesto del usuario o de ningún candidato
+        """
+        if self.db is None:
+            return None, candidatos
+        estimado = presupuesto_tokens.estimar_tokens(prompt_contenido, max_tokens)
+        excedido = None
+        for i, candidato in enumerate(candidatos):
+            try:
+                reserva = await presupuesto_tokens.reservar(candidato, self.usuario, estimado)
+            except presupuesto_tokens.PresupuestoExcedido as e:
+                if e.ambito == presupuesto_tokens.AMBITO_USUARIO:
+                    raise
+                excedido = e
+                continue
+            if i:
+                presupuesto_tokens.contar_degradacion()
+                logger.info("⬇️ %s sin presupuesto de tokens: se usa %s", candidatos[0].nombre, candidato.nombre)
+            return reserva, candidatos[i:]
+        raise excedido
+
+    async def _conciliar_tokens(
+        self,
+        reserva: Optional[Dict[str, Any]],
+        llm: LLMMaestro,
+        tokens_usados: int,
+        seccion_id: Optional[int] = None
+    ) -> None:
+        """Ajusta la reserva al consumo real del LLM que respondió y lo suma a las ventanas de uso"""
+        ventanas_tokens.registrar(llm.id, self.usuario_id, seccion_id, tokens_usados)
+        metricas_prometheus.contar_tokens(llm, tokens_usados)
+        if reserva is None:
+            self._registrar_tokens(llm, tokens_usados)
+            return
+        await presupuesto_tokens.conciliar(reserva, tokens_usados, llm.id)
+
+    def _invocar_llm(
+        self,
+        llm: LLMMaestro,
+        prompt_contenido,
+        max_tokens: int = 2000,
+        temperature: float = 0.7
+    ) -> Tuple[Dict[str, Any], int]:
+        """
+        Llama al proveedor sin tocar la base de datos (seguro para ejecutarse en un hilo)
+
+        Returns:
+            Tupla (resultado, tokens a registrar en el LLM). Las respuestas simuladas
+            no registran tokens.
+        """
+        inicio = time.time()
+        inicio_llamada = time.perf_counter()
         cliente = self._get_cliente_llm(llm)
-        
+
         try:
-            print("[DEBUG] Prompt enviado al LLM:\n", prompt_contenido)
-            
+            logger.debug(
+                "Prompt enviado a %s: %s", llm.nombre, logs.truncar(prompt_contenido), extra=logs.MUESTREO
+            )
+
             # Modo simulado si no hay cliente API
             if cliente is None:
-                print(f"🤖 Modo simulado activado para {llm.nombre}")
-                tiempo_ms = int((time.time() - inicio) * 1000)
-                
-                # Extraer información del prompt para simular mejor
-                titulo_original = "Título de la noticia"
-                contenido_original = "Contenido original de la noticia"
-                
-                # Intentar extraer datos reales del prompt si es posible
-                if isinstance(prompt_contenido, str):
-                    # Buscar patrones en el prompt
-                    titulo_match = re.search(r'TÍTULO:\s*(.+)', prompt_contenido)
-                    if titulo_match:
-                        titulo_original = titulo_match.group(1).strip()
-                    
-                    contenido_match = re.search(r'CONTENIDO ORIGINAL:\s*(.+?)(?:\nSECCIÓN:|$)', prompt_contenido, re.DOTALL)
-                    if contenido_match:
-                        contenido_original = contenido_match.group(1).strip()
-                
-                # Si no pudo extraer del prompt, usar contenido genérico pero útil
-                if contenido_original == "Contenido original de la noticia":
-                    contenido_original = "Este es el contenido procesado por IA en modo simulado. El contenido original ha sido optimizado según el prompt y estilo configurados para esta salida."
-                
-                # Generar título simulado DIFERENTE al original
-                prefijos_simulados = [
-                    "IA optimiza:", "Nuevo enfoque:", "Transformado:", "Actualización:", 
-                    "Versión IA:", "Mejorado:", "Adaptado:", "Rediseñado:"
-                ]
-                import random
-                titulo_simulado = f"{random.choice(prefijos_simulados)} {titulo_original[:150]}"
-                
-                # Generar respuesta simulada con formato estructurado
-                respuesta_simulada = f"""TÍTULO: {titulo_simulado}
+                return self._respuesta_simulada(llm, prompt_contenido, inicio)
 
-CONTENIDO:
-{contenido_original}
-
----
-*✨ Contenido optimizado con IA ({llm.nombre}) - MODO SIMULADO*
-*🔧 Configura API key para usar IA real*
-*📅 Procesado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*"""
-                
-                # Parsear la respuesta simulada para extraer título y contenido
-                resultado_parseado = self._parsear_respuesta_estructurada(respuesta_simulada)
-                
-                return {
-                    "contenido": resultado_parseado["contenido"],
-                    "titulo": resultado_parseado["titulo"],
-                    "tokens_usados": 150,  # Simulado
-                    "tiempo_ms": tiempo_ms
-                }
-            
             # prompt_contenido puede ser un string (caso legacy) o una lista de mensajes (nuevo)
             messages = prompt_contenido if isinstance(prompt_contenido, list) else [{"role": "user", "content": prompt_contenido}]
-            if llm.proveedor == "Anthropic":
+            if llm.proveedor == "Mock":
+                contenido, entrada, salida = cliente.completar_sync(
+                    proveedores_llm.mensajes_a_texto(prompt_contenido), max_tokens
+                )
+                uso = proveedores_llm.uso_tokens(entrada + salida)
+            elif llm.proveedor == "Anthropic":
                 respuesta = cliente.messages.create(
                     model=llm.modelo_id,
                     max_tokens=max_tokens,
@@ -189,112 +538,266 @@ CONTENIDO:
                     messages=messages
                 )
                 contenido = respuesta.content[0].text
-                tokens_usados = respuesta.usage.input_tokens + respuesta.usage.output_tokens
+                uso = proveedores_llm.uso_anthropic(respuesta.usage)
             elif llm.proveedor == "OpenAI":
-                if not OPENAI_AVAILABLE:
+                if not proveedores_llm.OPENAI_AVAILABLE:
                     raise ImportError("OpenAI no está disponible")
-                respuesta = cliente.ChatCompletion.create(
+                # SDK legacy (<1.0) o cliente openai.OpenAI
+                crear = cliente.ChatCompletion.create if isinstance(cliente, proveedores_llm.ClienteOpenAILegacy) else cliente.chat.completions.create
+                respuesta = crear(
                     model=llm.modelo_id,
-                    messages=messages,
+                    messages=proveedores_llm.aplanar_mensajes(messages),
                     max_tokens=max_tokens,
                     temperature=temperature
                 )
                 contenido = respuesta.choices[0].message.content
-                tokens_usados = respuesta.usage.total_tokens
+                uso = proveedores_llm.uso_openai(respuesta.usage)
             elif llm.proveedor == "Google":
-                if not GOOGLE_AVAILABLE:
+                if not proveedores_llm.GOOGLE_AVAILABLE:
                     raise ImportError("Google Gemini no está disponible")
-                
+
                 # Usar exactamente el modelo configurado en BD
-                print(f"[DEBUG] Usando modelo Gemini configurado: {llm.modelo_id}")
-                
+                logger.debug("Usando modelo Gemini configurado: %s", llm.modelo_id)
                 model = cliente.GenerativeModel(llm.modelo_id)
-                
-                # Simplificar prompt para Gemini (aprendido del código de referencia)
-                if isinstance(prompt_contenido, list):
-                    # Convertir mensajes a string simple para Gemini
-                    prompt_str = ""
-                    for msg in prompt_contenido:
-                        if msg.get('role') == 'system':
-                            prompt_str += f"Instrucciones del sistema: {msg['content']}\n\n"
-                        elif msg.get('role') == 'user':
-                            prompt_str += f"Usuario: {msg['content']}\n"
-                        elif msg.get('role') == 'assistant':
-                            prompt_str += f"Asistente: {msg['content']}\n"
-                        else:
-                            prompt_str += f"{msg['content']}\n"
-                else:
-                    prompt_str = str(prompt_contenido)
-                
-                print(f"[DEBUG] Prompt para Gemini (primeros 300 chars):\n{prompt_str[:300]}...")
-                print(f"[DEBUG] API Key válida: {bool(llm.api_key and len(llm.api_key) > 10)}")
-                
+                prompt_str = proveedores_llm.mensajes_a_texto(prompt_contenido)
+                logger.debug("Prompt para Gemini: %s", logs.truncar(prompt_str, 300), extra=logs.MUESTREO)
+                logger.debug("API Key válida: %s", bool(llm.api_key and len(llm.api_key) > 10))
+
                 try:
-                    print(f"[DEBUG] Iniciando llamada a Gemini...")
+                    logger.debug("Iniciando llamada a Gemini...")
                     respuesta = model.generate_content(prompt_str)
-                    print(f"[DEBUG] Respuesta de Gemini recibida")
+                    logger.debug("Respuesta de Gemini recibida")
                     contenido = respuesta.text
-                    tokens_usados = len(prompt_str.split()) + len(contenido.split())
-                    print(f"[DEBUG] Gemini respuesta exitosa. Tokens estimados: {tokens_usados}")
-                    print(f"[DEBUG] Contenido generado (primeros 200 chars): {contenido[:200]}...")
+                    uso = proveedores_llm.uso_tokens(len(prompt_str.split()) + len(contenido.split()))
+                    logger.debug("Gemini respuesta exitosa. Tokens estimados: %s", uso['tokens'])
+                    logger.debug("Contenido generado: %s", logs.truncar(contenido, 200), extra=logs.MUESTREO)
                 except Exception as e:
-                    print(f"[ERROR] Error en Gemini API: {str(e)}")
-                    print(f"[DEBUG] Modelo usado: {llm.modelo_id}")
-                    print(f"[DEBUG] API Key (últimos 8 chars): ...{llm.api_key[-8:] if llm.api_key else 'None'}")
-                    print(f"[DEBUG] Tipo de error: {type(e).__name__}")
-                    
-                    # Activar modo simulación para debug
-                    print(f"[DEBUG] Activando modo simulación debido a error de Gemini")
-                    contenido = f"[SIMULADO - Error Gemini] Contenido generado optimizado para salida. Error: {str(e)[:100]}"
-                    tokens_usados = 50
+                    contenido, uso = self._contenido_error_gemini(llm, e)
             else:
                 raise ValueError(f"Proveedor no soportado: {llm.proveedor}")
-            tiempo_ms = int((time.time() - inicio) * 1000)
-            llm.tokens_usados_hoy += tokens_usados
-            self.db.commit()
-            print("[DEBUG] Contenido generado por el LLM:\n", contenido)
-            if not contenido or len(contenido.strip()) < 10:
-                raise Exception("El LLM devolvió un contenido vacío o muy corto. Revisa el prompt y la configuración del modelo.")
-            
-            # Parsear la respuesta estructurada para extraer título y contenido
-            resultado_parseado = self._parsear_respuesta_estructurada(contenido)
-            
-            return {
-                "contenido": resultado_parseado["contenido"],
-                "titulo": resultado_parseado["titulo"],
-                "tokens_usados": tokens_usados,
-                "tiempo_ms": tiempo_ms
-            }
         except Exception as e:
-            error_str = str(e)
-            print(f"[ERROR] Error al generar contenido con {llm.nombre}: {error_str}")
-            
-            # Si es error de autenticación o API key, caer a modo simulado
-            if any(keyword in error_str.lower() for keyword in ['authentication', 'api_key', 'invalid', '401', 'unauthorized']):
-                print(f"🔄 Error de autenticación detectado. Activando modo simulado para {llm.nombre}")
-                tiempo_ms = int((time.time() - inicio) * 1000)
-                
-                # Intentar extraer datos del prompt para simular mejor
-                titulo_extraido = "Título de la noticia"
-                contenido_original = "Contenido original de la noticia"
-                
-                if isinstance(prompt_contenido, str):
-                    titulo_match = re.search(r'TÍTULO:\s*(.+)', prompt_contenido)
-                    if titulo_match:
-                        titulo_extraido = titulo_match.group(1).strip()
-                    
-                    contenido_match = re.search(r'CONTENIDO ORIGINAL:\s*(.+?)(?:\nSECCIÓN:|$)', prompt_contenido, re.DOTALL)
-                    if contenido_match:
-                        contenido_original = contenido_match.group(1).strip()
-                
-                if contenido_original == "Contenido original de la noticia":
-                    contenido_original = "Este es el contenido procesado por IA en modo simulado. El contenido original ha sido optimizado según el prompt y estilo configurados para esta salida."
-                
-                # Generar título simulado DIFERENTE al original para modo error
-                titulo_error = f"Error API - {titulo_extraido[:150]}"
-                
-                # Generar respuesta simulada con formato estructurado para error
-                respuesta_error = f"""TÍTULO: {titulo_error}
+            metricas_prometheus.observar_llamada_llm(llm, inicio_llamada, e)
+            return self._respuesta_error(llm, prompt_contenido, inicio, e)
+        etapas_generacion.registrar("llm", inicio_llamada)
+        metricas_prometheus.observar_llamada_llm(llm, inicio_llamada)
+        try:
+            return self._procesar_respuesta(contenido, uso, inicio)
+        except Exception as e:
+            return self._respuesta_error(llm, prompt_contenido, inicio, e)
+
+    async def _ainvocar_llm(
+        self,
+        llm: LLMMaestro,
+        prompt_contenido,
+        max_tokens: int = 2000,
+        temperature: float = 0.7
+    ) -> Tuple[Dict[str, Any], int]:
+        """
+        Versión no bloqueante de _invocar_llm: usa los clientes async de cada SDK
+        (ver services/proveedores_llm.py), así el worker sigue atendiendo otras
+        peticiones mientras la generación está en curso
+        """
+        inicio = time.time()
+        inicio_llamada = time.perf_counter()
+        cliente = self._get_cliente_llm_async(llm)
+
+        try:
+            if cliente is None:
+                return self._respuesta_simulada(llm, prompt_contenido, inicio)
+
+            if llm.proveedor == "Google":
+                try:
+                    contenido, uso = await proveedores_llm.completar_async(
+                        cliente, llm, prompt_contenido, max_tokens, temperature
+                    )
+                except Exception as e:
+                    contenido, uso = self._contenido_error_gemini(llm, e)
+            else:
+                contenido, uso = await proveedores_llm.completar_async(
+                    cliente, llm, prompt_contenido, max_tokens, temperature
+                )
+            etapas_generacion.registrar("llm", inicio_llamada)
+            return self._procesar_respuesta(contenido, uso, inicio)
+        except Exception as e:
+            return self._respuesta_error(llm, prompt_contenido, inicio, e)
+
+    async def _ainvocar_con_politica(
+        self,
+        candidatos: List[LLMMaestro],
+        politica: Dict[str, Any],
+        prompt_contenido,
+        max_tokens: int = 2000,
+        temperature: float = 0.7
+    ) -> Tuple[Dict[str, Any], int, LLMMaestro]:
+        """
+        Igual que _ainvocar_llm pero repartiendo los intentos entre candidatos según la
+        política de enrutamiento (ver services/enrutamiento.py). Cada intento respeta
+        el semáforo de su LLM. Un error de Gemini también pasa al siguiente candidato.
+
+        Returns:
+            Tupla (resultado, tokens a registrar, LLMMaestro que respondió)
+        """
+        inicio = time.time()
+        snapshots = [self._snapshot_llm(c) for c in candidatos]
+        orm_por_id = {c.id: c for c in candidatos}
+        con_cliente = [s for s in snapshots if self._get_cliente_llm_async(s) is not None]
+        if not con_cliente:
+            resultado, tokens = self._respuesta_simulada(snapshots[0], prompt_contenido, inicio)
+            return resultado, tokens, candidatos[0]
+
+        async def _intentar(llm_snapshot: Any) -> Tuple[Dict[str, Any], int]:
+            espera = time.perf_counter()
+            async with get_semaforo_llm(llm_snapshot, self.prioridad):
+                etapas_generacion.registrar("cola", espera)
+                inicio_intento = time.time()
+                inicio_llamada = time.perf_counter()
+                contenido, uso = await proveedores_llm.completar_async(
+                    self._get_cliente_llm_async(llm_snapshot), llm_snapshot,
+                    prompt_contenido, max_tokens, temperature
+                )
+                etapas_generacion.registrar("llm", inicio_llamada)
+            return self._procesar_respuesta(contenido, uso, inicio_intento)
+
+        try:
+            (resultado, tokens), respondio = await enrutamiento.ejecutar(con_cliente, _intentar, politica)
+        except enrutamiento.FalloEnrutamiento as fallo:
+            # Agotados los candidatos: mismo tratamiento que sin política para el último error
+            ultimo_llm, error = fallo.ultimo
+            resultado, tokens = self._respuesta_error(ultimo_llm, prompt_contenido, inicio, error)
+            return resultado, tokens, orm_por_id[ultimo_llm.id]
+        # Tiempo percibido: incluye reintentos y esperas
+        resultado["tiempo_ms"] = int((time.time() - inicio) * 1000)
+        return resultado, tokens, orm_por_id[respondio.id]
+
+    def _procesar_respuesta(
+        self,
+        contenido: str,
+        uso: Dict[str, int],
+        inicio: float
+    ) -> Tuple[Dict[str, Any], int]:
+        """Valida y parsea la respuesta del proveedor (título + contenido)"""
+        tiempo_ms = int((time.time() - inicio) * 1000)
+        logger.debug("Contenido generado por el LLM: %s", logs.truncar(contenido), extra=logs.MUESTREO)
+        if not contenido or len(contenido.strip()) < 10:
+            raise Exception("El LLM devolvió un contenido vacío o muy corto. Revisa el prompt y la configuración del modelo.")
+
+        # Parsear la respuesta estructurada para extraer título y contenido
+        with etapas_generacion.etapa("parseo"):
+            resultado_parseado = self._parsear_respuesta_estructurada(contenido)
+
+        return {
+            "contenido": resultado_parseado["contenido"],
+            "titulo": resultado_parseado["titulo"],
+            "tokens_usados": uso["tokens"],
+            "tiempo_ms": tiempo_ms,
+            "tokens_cache_lectura": uso["tokens_cache_lectura"],
+            "tokens_cache_escritura": uso["tokens_cache_escritura"]
+        }, uso["tokens"]
+
+    def _contenido_error_gemini(self, llm: LLMMaestro, e: Exception) -> Tuple[str, Dict[str, int]]:
+        """Contenido de reemplazo cuando falla la llamada a Gemini (modo simulación para debug)"""
+        logger.error("Error en Gemini API: %s", e)
+        logger.debug("Modelo usado: %s", llm.modelo_id)
+        logger.debug("Tipo de error: %s", type(e).__name__)
+
+        # Activar modo simulación para debug
+        logger.debug("Activando modo simulación debido a error de Gemini")
+        return f"[SIMULADO - Error Gemini] Contenido generado optimizado para salida. Error: {str(e)[:100]}", proveedores_llm.uso_tokens(50)
+
+    def _extraer_datos_prompt(self, prompt_contenido) -> Tuple[str, str]:
+        """Intenta extraer título y contenido original del prompt para simular mejor"""
+        titulo_original = "Título de la noticia"
+        contenido_original = "Contenido original de la noticia"
+
+        if isinstance(prompt_contenido, list):
+            prompt_contenido = "\n\n".join(
+                proveedores_llm.texto_contenido(msg.get("content", "")) for msg in prompt_contenido
+            )
+
+        if isinstance(prompt_contenido, str):
+            # Buscar patrones en el prompt
+            titulo_match = re.search(r'TÍTULO:\s*(.+)', prompt_contenido)
+            if titulo_match:
+                titulo_original = titulo_match.group(1).strip()
+
+            contenido_match = re.search(r'CONTENIDO ORIGINAL:\s*(.+?)(?:\nSECCIÓN:|$)', prompt_contenido, re.DOTALL)
+            if contenido_match:
+                contenido_original = contenido_match.group(1).strip()
+
+        # Si no pudo extraer del prompt, usar contenido genérico pero útil
+        if contenido_original == "Contenido original de la noticia":
+            contenido_original = "Este es el contenido procesado por IA en modo simulado. El contenido original ha sido optimizado según el prompt y estilo configurados para esta salida."
+        return titulo_original, contenido_original
+
+    def _respuesta_simulada(
+        self,
+        llm: LLMMaestro,
+        prompt_contenido,
+        inicio: float
+    ) -> Tuple[Dict[str, Any], int]:
+        """Respuesta en modo simulado (sin API key configurada)"""
+        logger.info("🤖 Modo simulado activado para %s", llm.nombre)
+        tiempo_ms = int((time.time() - inicio) * 1000)
+
+        titulo_original, contenido_original = self._extraer_datos_prompt(prompt_contenido)
+
+        # Generar título simulado DIFERENTE al original
+        prefijos_simulados = [
+            "IA optimiza:", "Nuevo enfoque:", "Transformado:", "Actualización:",
+            "Versión IA:", "Mejorado:", "Adaptado:", "Rediseñado:"
+        ]
+        import random
+        titulo_simulado = f"{random.choice(prefijos_simulados)} {titulo_original[:150]}"
+
+        # Generar respuesta simulada con formato estructurado
+        respuesta_simulada = f"""TÍTULO: {titulo_simulado}
+
+CONTENIDO:
+{contenido_original}
+
+---
+*✨ Contenido optimizado con IA ({llm.nombre}) - MODO SIMULADO*
+*🔧 Configura API key para usar IA real*
+*📅 Procesado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*"""
+
+        # Parsear la respuesta simulada para extraer título y contenido
+        resultado_parseado = self._parsear_respuesta_estructurada(respuesta_simulada)
+
+        return {
+            "contenido": resultado_parseado["contenido"],
+            "titulo": resultado_parseado["titulo"],
+            "tokens_usados": 150,  # Simulado
+            "tiempo_ms": tiempo_ms,
+            "tokens_cache_lectura": 0,
+            "tokens_cache_escritura": 0
+        }, 0
+
+    def _respuesta_error(
+        self,
+        llm: LLMMaestro,
+        prompt_contenido,
+        inicio: float,
+        e: Exception
+    ) -> Tuple[Dict[str, Any], int]:
+        """
+        Manejo de errores del proveedor: los de autenticación caen a modo simulado,
+        el resto se propaga
+        """
+        error_str = str(e)
+        logger.error("Error al generar contenido con %s: %s", llm.nombre, error_str)
+
+        # Si es error de autenticación o API key, caer a modo simulado
+        if any(keyword in error_str.lower() for keyword in ['authentication', 'api_key', 'invalid', '401', 'unauthorized']):
+            logger.info("🔄 Error de autenticación detectado. Activando modo simulado para %s", llm.nombre)
+            tiempo_ms = int((time.time() - inicio) * 1000)
+
+            titulo_extraido, contenido_original = self._extraer_datos_prompt(prompt_contenido)
+
+            # Generar título simulado DIFERENTE al original para modo error
+            titulo_error = f"Error API - {titulo_extraido[:150]}"
+
+            # Generar respuesta simulada con formato estructurado para error
+            respuesta_error = f"""TÍTULO: {titulo_error}
 
 CONTENIDO:
 {contenido_original}
@@ -303,20 +806,21 @@ CONTENIDO:
 *✨ Contenido optimizado con IA ({llm.nombre}) - MODO SIMULADO*
 *🔧 Error de API detectado - Configura API key válida para usar IA real*
 *📅 Procesado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*"""
-                
-                # Parsear la respuesta de error
-                resultado_error = self._parsear_respuesta_estructurada(respuesta_error)
-                
-                return {
-                    "contenido": resultado_error["contenido"],
-                    "titulo": resultado_error["titulo"],
-                    "tokens_usados": 150,  # Simulado
-                    "tiempo_ms": tiempo_ms
-                }
-            else:
-                # Para otros errores, fallar completamente
-                raise Exception(f"Error al generar contenido con {llm.nombre}: {error_str}")
-    
+
+            # Parsear la respuesta de error
+            resultado_error = self._parsear_respuesta_estructurada(respuesta_error)
+
+            return {
+                "contenido": resultado_error["contenido"],
+                "titulo": resultado_error["titulo"],
+                "tokens_usados": 150,  # Simulado
+                "tiempo_ms": tiempo_ms,
+                "tokens_cache_lectura": 0,
+                "tokens_cache_escritura": 0
+            }, 0
+        # Para otros errores, fallar completamente
+        raise Exception(f"Error al generar contenido con {llm.nombre}: {error_str}")
+
     # ==================== PROCESAMIENTO DE PROMPTS ====================
     
     def procesar_prompt(
@@ -334,7 +838,21 @@ CONTENIDO:
         Returns:
             Prompt procesado con variables reemplazadas
         """
-        # Concatenar el contenido de TODOS los PromptItem ordenados por 'orden'
+        # Plantilla compilada (items unidos + variables parseadas), cacheada por versión
+        contenido = self._plantilla_prompt(prompt).renderizar(variables)
+        
+        # Validación final: asegurar que el prompt tenga contenido mínimo
+        if not contenido or len(contenido.strip()) < 20:
+            raise ValueError(f"El prompt procesado es demasiado corto o está vacío. Verifica la configuración del prompt '{prompt.nombre}'")
+
+        # El tamaño se controla al armar el mensaje final (presupuesto de tokens por segmento)
+        return contenido
+
+    def _unir_items_prompt(self, prompt: PromptMaestro) -> str:
+        """
+        Concatena el contenido de TODOS los PromptItem ordenados por 'orden'
+        (o el prompt por defecto si no hay contenido suficiente)
+        """
         contenido = ""
         if getattr(prompt, 'items', None) and len(prompt.items) > 0:
             # Ordenar por 'orden' si existe, si no por id
@@ -349,13 +867,13 @@ CONTENIDO:
                     partes.append(it.contenido.strip())
 
             contenido = "\n\n---\n\n".join(partes).strip()
-            print(f"[DEBUG] Contenido del prompt '{prompt.nombre}': concatenados {len(partes)} items -> {len(contenido)} caracteres")
+            logger.debug("Contenido del prompt '%s': concatenados %s items -> %s caracteres", prompt.nombre, len(partes), len(contenido))
         else:
-            print(f"[DEBUG] No se encontraron items para el prompt '{prompt.nombre}'")
+            logger.debug("No se encontraron items para el prompt '%s'", prompt.nombre)
         
         # Si no hay contenido suficiente, usar prompt por defecto
         if not contenido or len(contenido.strip()) < 10:
-            print(f"[WARNING] Prompt '{prompt.nombre}' vacío o muy corto. Usando prompt por defecto.")
+            logger.warning("Prompt '%s' vacío o muy corto. Usando prompt por defecto.", prompt.nombre)
             contenido = f"""Eres un redactor profesional de noticias. 
 
 Tu tarea es reescribir la siguiente noticia optimizándola para {prompt.nombre}.
@@ -372,48 +890,112 @@ Instrucciones:
 - Respeta la longitud apropiada para {{tipo_salida}}
 
 Genera el contenido optimizado:"""
-        
-        # Reemplazar cada variable
-        for nombre_var, valor in variables.items():
-            placeholder = f"{{{nombre_var}}}"
-            contenido = contenido.replace(placeholder, str(valor))
-        
-        # Verificar que no queden variables sin reemplazar
-        variables_faltantes = re.findall(r'\{([a-zA-Z_][a-zA-Z0-9_]*)\}', contenido)
-        if variables_faltantes:
-            raise ValueError(
-                f"Variables faltantes en el prompt: {', '.join(variables_faltantes)}"
-            )
-        
-        # Validación final: asegurar que el prompt tenga contenido mínimo
-        if not contenido or len(contenido.strip()) < 20:
-            raise ValueError(f"El prompt procesado es demasiado corto o está vacío. Verifica la configuración del prompt '{prompt.nombre}'")
-
-        # Protección: truncar prompt si excede el tamaño máximo permitido
-        current_limit = runtime_settings.get_max_prompt_chars() or getattr(self, 'max_prompt_chars', 50000)
-        if len(contenido) > current_limit:
-            print(f"[WARNING] Prompt procesado demasiado largo ({len(contenido)} chars). Truncando a {current_limit} chars.")
-            contenido = contenido[:current_limit]
-        
         return contenido
+
+    def _plantilla_prompt(self, prompt: PromptMaestro) -> plantillas.PlantillaCompilada:
+        """Plantilla compilada del prompt, reutilizada mientras no cambien el prompt ni sus items"""
+        def compilar():
+            return plantillas.PlantillaCompilada(self._unir_items_prompt(prompt))
+
+        version = self._version_plantilla(prompt, PromptItem, PromptItem.prompt_id)
+        if version is None:
+            return compilar()
+        return plantillas.obtener('prompt', prompt.id, version, compilar)
+
+    def _version_plantilla(self, maestro: Any, modelo_item: Any, columna_padre: Any) -> Optional[Tuple]:
+        """
+        Huella de versión de un Prompt/Estilo y sus items para la caché de plantillas
+
+        updated_at solo cambia en los UPDATE, así que además de max(updated_at) se
+        usan la cantidad de items y max(id) para detectar altas y bajas. Es una sola
+        consulta agregada, sin cargar los items.
+
+        Returns:
+            Tupla comparable o None si no hay BD / el maestro no está persistido
+        """
+        if self.db is None or not isinstance(getattr(maestro, 'id', None), int):
+            return None
+        fila = self.db.query(
+            func.count(modelo_item.id),
+            func.max(modelo_item.id),
+            func.max(func.coalesce(modelo_item.updated_at, modelo_item.created_at))
+        ).filter(columna_padre == maestro.id).one()
+        return (getattr(maestro, 'updated_at', None), tuple(fila))
     
     # ==================== APLICACIÓN DE ESTILOS ====================
     
     def aplicar_estilo(
         self,
         prompt_base: str,
-        estilo: EstiloMaestro
+        estilo: EstiloMaestro,
+        salida: Optional[SalidaMaestro] = None
     ) -> str:
         """
         Aplica directivas de estilo al prompt
         
         Args:
-            prompt_base: Prompt base
+            prompt_base: Prompt base (con la noticia: se usa para elegir las reglas relevantes)
             estilo: EstiloMaestro con configuración de estilo
+            salida: Salida destino (su estilo_top_k decide cuántas reglas entran)
             
         Returns:
             Prompt con directivas de estilo añadidas
         """
+        # Directivas + items fijos + reglas relevantes (o el bloque compilado completo);
+        # si no cabe en el presupuesto de tokens se descartan primero las reglas
+        top_k = self._top_k_estilo([salida]) if salida is not None else settings.ESTILO_TOP_K
+        prompt_base, bloque, reglas = self._ajustar_presupuesto(prompt_base, estilo, top_k=top_k)
+        prompt_final = f"{prompt_base}{bloque}{reglas}"
+
+        # Protección: truncar prompt si excede el tamaño máximo permitido
+        current_limit = runtime_settings.get_max_prompt_chars() or getattr(self, 'max_prompt_chars', 50000)
+        if len(prompt_final) > current_limit:
+            logger.warning("Prompt con estilo demasiado largo (%s chars). Truncando a %s chars.", len(prompt_final), current_limit)
+            prompt_final = prompt_final[:current_limit]
+        
+        return prompt_final
+
+    def _cacheado_estilo(self, tipo: str, estilo: EstiloMaestro, version: Optional[Tuple], construir: Any) -> Any:
+        """
+        Valor compilado de un estilo en la caché de plantillas
+
+        Args:
+            version: huella de _version_plantilla; None = consultarla (sin BD no se cachea)
+        """
+        if version is None:
+            version = self._version_plantilla(estilo, EstiloItem, EstiloItem.estilo_id)
+        if version is None:
+            return construir()
+        return plantillas.obtener(tipo, estilo.id, version, construir)
+
+    def _bloque_estilo(self, estilo: EstiloMaestro, version: Optional[Tuple] = None) -> str:
+        """Texto que aplicar_estilo anexa al prompt, reutilizado mientras no cambien el estilo ni sus items"""
+        return self._cacheado_estilo('estilo', estilo, version, lambda: self._compilar_bloque_estilo(estilo))
+
+    def _partes_presupuesto(self, estilo: EstiloMaestro, version: Optional[Tuple] = None) -> presupuesto_prompt.PartesEstilo:
+        """Directivas e items del estilo con sus tokens contados, reutilizados mientras no cambie el estilo"""
+        def compilar():
+            directivas, items = self._partes_estilo(estilo)
+            partes = []
+            for n, it in enumerate(items):
+                item_id = getattr(it, 'id', None)
+                texto = it.contenido.strip()
+                partes.append((item_id or n + 1, texto, presupuesto_prompt.contar_tokens_cacheado("estilo_item", item_id, texto)))
+            texto = "\n".join(directivas)
+            return presupuesto_prompt.PartesEstilo(
+                directivas, presupuesto_prompt.contar_tokens_cacheado("estilo", getattr(estilo, 'id', None), texto), partes
+            )
+
+        return self._cacheado_estilo('partes_estilo', estilo, version, compilar)
+
+    def _compilar_bloque_estilo(self, estilo: EstiloMaestro) -> str:
+        """Arma las directivas de configuración y los EstiloItem ordenados de un estilo"""
+        directivas_estilo, items = self._partes_estilo(estilo)
+        return self._componer_bloque_estilo(directivas_estilo, [it.contenido.strip() for it in items])
+
+    @staticmethod
+    def _partes_estilo(estilo: EstiloMaestro) -> Tuple[List[str], List[Any]]:
+        """Directivas de la configuración del estilo y sus EstiloItem con contenido, ordenados"""
         directivas_estilo = []
         
         # Extraer configuración del estilo
@@ -439,36 +1021,231 @@ Genera el contenido optimizado:"""
         for key, value in config.items():
             if key not in ["tono", "longitud", "formato", "estructura"]:
                 directivas_estilo.append(f"{key.title()}: {value}")
-        
-        # Construir prompt final
-        if directivas_estilo:
-            estilo_texto = "\n".join([f"- {d}" for d in directivas_estilo])
-            prompt_final = f"{prompt_base}\n\n**ESTILO Y DIRECTIVAS:**\n{estilo_texto}"
-        else:
-            prompt_final = prompt_base
 
-        # Concatenar todos los EstiloItem si existen (ejemplos, reglas, fragmentos)
-        estilo_items_text = ""
+        # Todos los EstiloItem si existen (ejemplos, reglas, fragmentos)
+        items = []
         if getattr(estilo, 'items', None) and len(estilo.items) > 0:
             try:
-                estilo_items_ordenados = sorted(estilo.items, key=lambda it: getattr(it, 'orden', 0) or 0)
+                items = sorted(estilo.items, key=lambda it: getattr(it, 'orden', 0) or 0)
             except Exception:
-                estilo_items_ordenados = list(estilo.items)
+                items = list(estilo.items)
+        return directivas_estilo, [it for it in items if it and getattr(it, 'contenido', None)]
+
+    @staticmethod
+    def _componer_bloque_estilo(directivas_estilo: List[str], partes_items: List[str]) -> str:
+        """Texto del bloque de estilo a partir de sus directivas y el contenido de sus items"""
+        bloque = ""
+        if directivas_estilo:
+            estilo_texto = "\n".join([f"- {d}" for d in directivas_estilo])
+            bloque = f"\n\n**ESTILO Y DIRECTIVAS:**\n{estilo_texto}"
 
-            partes_items = [it.contenido.strip() for it in estilo_items_ordenados if it and getattr(it, 'contenido', None)]
-            if partes_items:
-                estilo_items_text = "\n\n".join(partes_items)
-                # Anexar los ejemplos/reglas al prompt final
-                prompt_final = f"{prompt_final}\n\n**EJEMPLOS Y REGLAS DE ESTILO:**\n{estilo_items_text}"
-                print(f"[DEBUG] Se anexaron {len(partes_items)} estilo.items al prompt (chars añadidos: {len(estilo_items_text)})")
+        if partes_items:
+            estilo_items_text = "\n\n".join(partes_items)
+            # Anexar los ejemplos/reglas al prompt final
+            bloque = f"{bloque}\n\n**EJEMPLOS Y REGLAS DE ESTILO:**\n{estilo_items_text}"
+            logger.debug("Se anexaron %s estilo.items al prompt (chars añadidos: %s)", len(partes_items), len(estilo_items_text))
+        return bloque
 
-        # Protección: truncar prompt si excede el tamaño máximo permitido
+    @staticmethod
+    def _componer_reglas_estilo(reglas: List[str]) -> str:
+        """Texto de las reglas de estilo elegidas para la noticia (fuera del prefijo cacheable)"""
+        if not reglas:
+            return ""
+        return "\n\n**REGLAS DE ESTILO RELEVANTES:**\n" + "\n\n".join(reglas)
+
+    def _ajustar_presupuesto(
+        self,
+        prompt_variable: str,
+        estilo: Optional[EstiloMaestro],
+        llm: Optional[LLMMaestro] = None,
+        noticia_texto: Optional[str] = None,
+        instrucciones: Optional[str] = None,
+        top_k: Optional[int] = None
+    ) -> Tuple[str, str, str]:
+        """
+        Ajusta el prompt al presupuesto de tokens del LLM (ver services/presupuesto_prompt.py)
+
+        Args:
+            prompt_variable: Prompt procesado con la noticia y las instrucciones de salida
+            noticia_texto: Cuerpo de la noticia dentro de prompt_variable (se puede recortar)
+            instrucciones: Instrucciones de la salida dentro de prompt_variable (no se tocan)
+            top_k: Reglas de estilo relevantes a incluir (None o 0 = todos los items)
+
+        Returns:
+            Tupla (prompt_variable, bloque de estilo, reglas relevantes). El bloque solo
+            lleva directivas e items fijos (o el manual completo compilado y cacheado),
+            así que no cambia entre noticias; las reglas elegidas para la noticia van
+            aparte ("" si se envía el manual completo).
+        """
+        presupuesto = presupuesto_prompt.get_presupuesto(llm)
+        segmentos = []
+        if instrucciones and instrucciones in prompt_variable:
+            segmentos.append(presupuesto_prompt.Segmento(
+                "salida", instrucciones, presupuesto_prompt.PRIORIDAD_SALIDA, obligatorio=True,
+                tokens=presupuesto_prompt.contar_tokens_cacheado("salida", None, instrucciones)
+            ))
+        noticia = None
+        if noticia_texto and noticia_texto in prompt_variable:
+            noticia = presupuesto_prompt.Segmento(
+                "noticia", noticia_texto, presupuesto_prompt.PRIORIDAD_NOTICIA, obligatorio=True,
+                minimo=presupuesto_prompt.MIN_TOKENS_NOTICIA, veces=prompt_variable.count(noticia_texto)
+            )
+            segmentos.append(noticia)
+        resto = presupuesto_prompt.contar_tokens(prompt_variable) - sum(s.tokens for s in segmentos)
+        segmentos.append(presupuesto_prompt.Segmento(
+            "prompt", "", presupuesto_prompt.PRIORIDAD_PROMPT, tokens=max(0, resto), obligatorio=True
+        ))
+
+        # Una sola consulta de versión para las partes, el índice de reglas y el bloque compilado
+        version = self._version_plantilla(estilo, EstiloItem, EstiloItem.estilo_id) if estilo else None
+        partes = self._partes_presupuesto(estilo, version) if estilo else None
+        directivas = partes.directivas if partes else []
+        config = None
+        if directivas:
+            config = presupuesto_prompt.Segmento(
+                "estilo_config", "\n".join(directivas), presupuesto_prompt.PRIORIDAD_ESTILO_CONFIG,
+                tokens=partes.tokens_directivas
+            )
+            segmentos.append(config)
+        # (segmento, posición en el documento, regla elegida para la noticia)
+        segmentos_items = []
+        seleccion = self._seleccionar_reglas_estilo(
+            estilo, f"{noticia_texto or prompt_variable}\n{instrucciones or ''}", top_k, version
+        ) if estilo and top_k else None
+        if seleccion is None:
+            for n, (item_id, texto, tokens) in enumerate(partes.items if partes else []):
+                segmentos_items.append((presupuesto_prompt.Segmento(
+                    f"estilo_item:{item_id}", texto, presupuesto_prompt.PRIORIDAD_ESTILO_ITEM, tokens=tokens
+                ), n, False))
+        else:
+            fijos, reglas = seleccion
+            for fragmento in fijos:
+                segmentos_items.append((presupuesto_prompt.Segmento(
+                    f"estilo_item:{fragmento.item_id}", fragmento.texto,
+                    presupuesto_prompt.PRIORIDAD_ESTILO_FIJO, tokens=fragmento.tokens
+                ), fragmento.posicion, False))
+            for fragmento in reglas:
+                segmentos_items.append((presupuesto_prompt.Segmento(
+                    f"estilo_regla:{fragmento.item_id}.{fragmento.posicion[1]}", fragmento.texto,
+                    presupuesto_prompt.PRIORIDAD_ESTILO_ITEM, tokens=fragmento.tokens
+                ), fragmento.posicion, True))
+        segmentos.extend(s for s, _, _ in segmentos_items)
+
+        if seleccion is None and sum(s.tokens for s in segmentos) <= presupuesto:
+            return prompt_variable, self._bloque_estilo(estilo, version) if estilo else "", ""
+
+        informe = {"ajustado": True}
+        if sum(s.tokens for s in segmentos) > presupuesto:
+            informe = presupuesto_prompt.planificar(segmentos, presupuesto)
+            logger.warning(
+                "Prompt de %s tokens supera el presupuesto de %s: descartados %s, recortados %s -> %s tokens",
+                informe['tokens'], presupuesto, informe['descartados'] or '-', informe['recortados'] or '-',
+                informe['tokens_finales']
+            )
+
+        if noticia is not None and noticia.recortado:
+            prompt_variable = prompt_variable.replace(noticia_texto, noticia.texto)
+        bloque, reglas = "", ""
+        if estilo:
+            vigentes = [(s, relevante) for s, _, relevante in sorted(segmentos_items, key=lambda t: t[1]) if not s.descartado]
+            bloque = self._componer_bloque_estilo(
+                directivas if config is not None and not config.descartado else [],
+                [s.texto for s, relevante in vigentes if not relevante]
+            )
+            reglas = self._componer_reglas_estilo([s.texto for s, relevante in vigentes if relevante])
+        if not informe["ajustado"]:
+            # Último recurso: recortar el texto variable (prompt de la sección incluido)
+            disponible = presupuesto - presupuesto_prompt.contar_tokens(bloque + reglas)
+            prompt_variable = presupuesto_prompt.recortar_texto(prompt_variable, max(disponible, 0))
+        return prompt_variable, bloque, reglas
+
+    def _indice_estilo(self, estilo: EstiloMaestro, version: Optional[Tuple] = None) -> estilo_relevante.IndiceEstilo:
+        """Índice BM25 de las reglas del estilo, reconstruido solo cuando cambian sus items"""
+        return self._cacheado_estilo(
+            'indice_estilo', estilo, version, lambda: estilo_relevante.IndiceEstilo(self._partes_estilo(estilo)[1])
+        )
+
+    def _seleccionar_reglas_estilo(
+        self,
+        estilo: EstiloMaestro,
+        consulta: str,
+        top_k: int,
+        version: Optional[Tuple] = None
+    ) -> Optional[Tuple[List[Any], List[Any]]]:
+        """
+        Items incluir_siempre y las top_k reglas más relevantes para la consulta
+
+        Returns:
+            Tupla (fragmentos fijos, reglas de mayor a menor relevancia), o None si el
+            estilo no tiene más reglas que top_k (se envía completo)
+        """
+        indice = self._indice_estilo(estilo, version)
+        if len(indice.fragmentos) <= top_k:
+            return None
+        reglas = indice.seleccionar(consulta, top_k)
+        enviados = sum(f.tokens for f in indice.fijos + reglas)
+        ahorrados = estilo_relevante.registrar_ahorro(indice.tokens_total, enviados)
+        logger.debug(
+            "✂️ Estilo '%s': %s de %s reglas relevantes + %s items fijos (%s tokens ahorrados)",
+            getattr(estilo, 'nombre', estilo.id), len(reglas), len(indice.fragmentos), len(indice.fijos), ahorrados
+        )
+        return indice.fijos, reglas
+
+    @staticmethod
+    def _top_k_estilo(salidas: List[Any]) -> int:
+        """Reglas de estilo a incluir: estilo_top_k de la salida o ESTILO_TOP_K (0 = manual completo)"""
+        valores = []
+        for salida in salidas:
+            k = getattr(salida, 'estilo_top_k', None)
+            valores.append(settings.ESTILO_TOP_K if k is None else k)
+        if not valores or 0 in valores:
+            return 0
+        return max(valores)
+
+    def _armar_mensajes(
+        self,
+        prompt_variable: str,
+        estilo: Optional[EstiloMaestro],
+        llm: Optional[LLMMaestro] = None,
+        noticia_texto: Optional[str] = None,
+        instrucciones: Optional[str] = None,
+        top_k: Optional[int] = None
+    ) -> Any:
+        """
+        Arma el mensaje como bloques de contenido ordenados para la caché de prompts
+        del proveedor: primero el bloque de estilo (directivas e items fijos, idéntico
+        entre noticias) con un breakpoint cache_control y al final la parte variable
+        (reglas de estilo relevantes, prompt procesado, instrucciones de salida y noticia).
+
+        Del estilo solo entran las top_k reglas relevantes para la noticia y el
+        prompt se ajusta al presupuesto de tokens del LLM (_ajustar_presupuesto); después,
+        como red de seguridad, cada bloque se trunca por separado a MAX_PROMPT_CHARS.
+        Sin estilo se devuelve el prompt como texto plano.
+        """
+        prompt_variable, prefijo, reglas = self._ajustar_presupuesto(
+            prompt_variable, estilo, llm, noticia_texto, instrucciones, top_k
+        )
+        if reglas:
+            # Cambian con cada noticia y salida: fuera del prefijo cacheable
+            prompt_variable = f"{reglas.strip()}\n\n{prompt_variable}"
+        prefijo = prefijo.strip()
         current_limit = runtime_settings.get_max_prompt_chars() or getattr(self, 'max_prompt_chars', 50000)
-        if len(prompt_final) > current_limit:
-            print(f"[WARNING] Prompt con estilo demasiado largo ({len(prompt_final)} chars). Truncando a {current_limit} chars.")
-            prompt_final = prompt_final[:current_limit]
-        
-        return prompt_final
+        if len(prompt_variable) > current_limit:
+            logger.warning("Prompt demasiado largo (%s chars). Truncando a %s chars.", len(prompt_variable), current_limit)
+            prompt_variable = prompt_variable[:current_limit]
+        if not prefijo:
+            return prompt_variable
+        if len(prefijo) > current_limit:
+            logger.warning("Bloque de estilo demasiado largo (%s chars). Truncando a %s chars.", len(prefijo), current_limit)
+            prefijo = prefijo[:current_limit]
+
+        return [{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prefijo, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt_variable}
+            ]
+        }]
 
     # ==================== CONFIGURACIONES Y MERGE ====================
 
@@ -599,92 +1376,160 @@ Genera el contenido optimizado:"""
         return text[:max_caracteres]
     
     # ==================== GENERACIÓN PARA SALIDA ====================
-    
-    def generar_para_salida(
+
+    def _reutilizar_salida_existente(
+        self,
+        noticia: Noticia,
+        salida: SalidaMaestro
+    ) -> Optional[NoticiaSalida]:
+        """
+        Devuelve la NoticiaSalida ya generada (si existe) garantizando contenido mínimo
+        """
+        existente = self.db.query(NoticiaSalida).filter(
+            NoticiaSalida.noticia_id == noticia.id,
+            NoticiaSalida.salida_id == salida.id
+        ).first()
+        if existente:
+            # Validar que el contenido existente tenga al menos 10 caracteres
+            if not existente.contenido_generado or len(existente.contenido_generado.strip()) < 10:
+                existente.contenido_generado = "Contenido generado automáticamente (simulado) para esta salida."
+                self.db.commit()
+        return existente
+
+    def _preparar_prompt_salida(
         self,
         noticia: Noticia,
         salida: SalidaMaestro,
-        llm: LLMMaestro,
         prompt: Optional[PromptMaestro] = None,
         estilo: Optional[EstiloMaestro] = None,
-        regenerar: bool = False
-    ) -> NoticiaSalida:
+        llm: Optional[LLMMaestro] = None
+    ) -> Tuple[Any, Optional[EstiloMaestro]]:
         """
-        Genera contenido optimizado para una salida específica
-        
-        Args:
-            noticia: Noticia fuente
-            salida: Canal de salida (web, print, social, etc.)
-            llm: Modelo LLM a usar
-            prompt: Prompt a usar (usa el de la sección si no se especifica)
-            estilo: Estilo a usar (usa el de la sección si no se especifica)
-            regenerar: Si True, regenera incluso si ya existe
-            
+        Construye el prompt final (estilo + prompt + instrucciones de salida) de una noticia en BD
+
         Returns:
-            NoticiaSalida con el contenido generado
+            Tupla (prompt_final, estilo efectivo); con estilo, prompt_final es una lista
+            de mensajes con bloques cacheables (ver _armar_mensajes)
         """
-        # Verificar si ya existe y no queremos regenerar
-        if not regenerar:
-            existente = self.db.query(NoticiaSalida).filter(
-                NoticiaSalida.noticia_id == noticia.id,
-                NoticiaSalida.salida_id == salida.id
-            ).first()
-            if existente:
-                # Validar que el contenido existente tenga al menos 10 caracteres
-                if not existente.contenido_generado or len(existente.contenido_generado.strip()) < 10:
-                    existente.contenido_generado = "Contenido generado automáticamente (simulado) para esta salida."
-                    self.db.commit()
-                return existente
-        
-        # Obtener prompt y estilo de la sección si no se especificaron
+        with etapas_generacion.etapa("orm"):
+            prompt, estilo = self._resolver_prompt_estilo(noticia, prompt, estilo)
+
+            # Validar que tengamos un prompt
+            if not prompt:
+                raise ValueError("Se requiere un prompt para generar contenido")
+
+            # Preparar variables para el prompt
+            variables = {
+                "titulo": noticia.titulo,
+                "contenido": noticia.contenido,
+                "autor": noticia.autor_nombre,  # Usar la propiedad que obtiene el username
+                "seccion": noticia.seccion.nombre if noticia.seccion else "General",
+                "tipo_salida": salida.tipo_salida,
+                "nombre_salida": salida.nombre,
+                "fecha": noticia.fecha.strftime("%d/%m/%Y") if noticia.fecha else "",
+                # Añadido para prompts que requieren {tema}
+                "tema": noticia.titulo
+            }
+
+            # Añadir configuración específica de la salida
+            if salida.configuracion:
+                for key, value in salida.configuracion.items():
+                    variables[f"salida_{key}"] = str(value)
+
+        with etapas_generacion.etapa("prompt"):
+            # Procesar prompt con variables
+            prompt_final = self.procesar_prompt(prompt, variables)
+
+            # Añadir instrucciones específicas del tipo de salida
+            instrucciones_salida = self._get_instrucciones_salida(salida)
+            if instrucciones_salida:
+                prompt_final = f"{prompt_final}\n\n{instrucciones_salida}"
+        # El estilo (si existe) va delante como prefijo cacheable
+        with etapas_generacion.etapa("estilo"):
+            return self._armar_mensajes(
+                prompt_final, estilo, llm, noticia.contenido, instrucciones_salida, self._top_k_estilo([salida])
+            ), estilo
+
+    @staticmethod
+    def _resolver_prompt_estilo(
+        noticia: Noticia,
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None
+    ) -> Tuple[Optional[PromptMaestro], Optional[EstiloMaestro]]:
+        """Prompt y estilo efectivos: los indicados o, si no, los de la sección"""
         if not prompt and noticia.seccion and noticia.seccion.prompt:
             prompt = noticia.seccion.prompt
-        
         if not estilo and noticia.seccion and noticia.seccion.estilo:
             estilo = noticia.seccion.estilo
-        
-        # Validar que tengamos un prompt
-        if not prompt:
-            raise ValueError("Se requiere un prompt para generar contenido")
-        
-        # Preparar variables para el prompt
-        variables = {
-            "titulo": noticia.titulo,
-            "contenido": noticia.contenido,
-            "autor": noticia.autor_nombre,  # Usar la propiedad que obtiene el username
-            "seccion": noticia.seccion.nombre if noticia.seccion else "General",
-            "tipo_salida": salida.tipo_salida,
-            "nombre_salida": salida.nombre,
-            "fecha": noticia.fecha.strftime("%d/%m/%Y") if noticia.fecha else "",
-            # Añadido para prompts que requieren {tema}
-            "tema": noticia.titulo
+        return prompt, estilo
+
+    def _huella_entradas(
+        self,
+        noticia: Noticia,
+        salida: SalidaMaestro,
+        llm: LLMMaestro,
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None
+    ) -> Dict[str, str]:
+        """Huella de las entradas de la generación (ver services/huella_entradas.py)"""
+        prompt, estilo = self._resolver_prompt_estilo(noticia, prompt, estilo)
+        version_prompt = (
+            prompt.id, self._version_plantilla(prompt, PromptItem, PromptItem.prompt_id)
+        ) if prompt else None
+        version_estilo = (
+            estilo.id, self._version_plantilla(estilo, EstiloItem, EstiloItem.estilo_id)
+        ) if estilo else None
+        ajustes = {
+            "top_k": self._top_k_estilo([salida]),
+            "presupuesto": presupuesto_prompt.get_presupuesto(llm)
         }
-        
-        # Añadir configuración específica de la salida
-        if salida.configuracion:
-            for key, value in salida.configuracion.items():
-                variables[f"salida_{key}"] = str(value)
-        
-        # Procesar prompt con variables
-        prompt_procesado = self.procesar_prompt(prompt, variables)
-        
-        # Aplicar estilo si existe
-        if estilo:
-            prompt_final = self.aplicar_estilo(prompt_procesado, estilo)
-        else:
-            prompt_final = prompt_procesado
-        # Añadir instrucciones específicas del tipo de salida
-        instrucciones_salida = self._get_instrucciones_salida(salida)
-        if instrucciones_salida:
-            prompt_final = f"{prompt_final}\n\n{instrucciones_salida}"
-        # Generar contenido
-        resultado = self.generar_contenido(
-            llm=llm,
-            prompt_contenido=prompt_final,
-            max_tokens=self._get_max_tokens_salida(salida),
-            temperature=0.7
-        )
-        # Aplicar configuración merged (Estilo + Salida) en post-procesamiento
+        return huella_entradas.calcular(noticia, salida, llm, version_prompt, version_estilo, ajustes)
+
+    def _salida_sin_cambios(
+        self,
+        noticia: Noticia,
+        salida: SalidaMaestro,
+        huella: Dict[str, str]
+    ) -> Optional[NoticiaSalida]:
+        """
+        NoticiaSalida existente si ninguna de sus entradas cambió (la regeneración
+        se omite); None si hay que llamar al LLM
+        """
+        if not self.incremental or self.db is None:
+            return None
+        existente = self.db.query(NoticiaSalida).filter(
+            NoticiaSalida.noticia_id == noticia.id,
+            NoticiaSalida.salida_id == salida.id
+        ).first()
+        if existente is None or huella_entradas.diferencias(existente.huella_entradas, huella):
+            return None
+        existente.omitida = True
+        existente.entradas_cambiadas = []
+        huella_entradas.registrar([], omitida=True)
+        logger.info("⏭️ Salida %s de la noticia %s sin cambios en sus entradas: no se regenera", salida.nombre, noticia.id)
+        return existente
+
+    @staticmethod
+    def _config_postproceso(salida: SalidaMaestro, estilo: Optional[EstiloMaestro]) -> Dict[str, Any]:
+        """Configuraciones que _postprocesar_resultado aplica a la respuesta (parte de la clave de caché)"""
+        return {
+            "estilo": getattr(estilo, 'configuracion', None) or {},
+            "salida": getattr(salida, 'configuracion', None) or {}
+        }
+
+    def _postprocesar_resultado(
+        self,
+        resultado: Dict[str, Any],
+        salida: SalidaMaestro,
+        estilo: Optional[EstiloMaestro]
+    ) -> Dict[str, Any]:
+        """
+        Aplica la configuración merged (Estilo + Salida) al contenido generado
+
+        Returns:
+            merge_metadata (solo con datos cuando modo_fusion='combine')
+        """
+        inicio = time.perf_counter()
         merged_raw = self.merge_configs(getattr(estilo, 'configuracion', {}) if estilo else {}, getattr(salida, 'configuracion', {}) or {})
         # merge_configs puede devolver {'_merged':..., '_metadata':...} cuando modo='combine'
         if isinstance(merged_raw, dict) and '_merged' in merged_raw:
@@ -708,55 +1553,54 @@ Genera el contenido optimizado:"""
                     pass
             resultado['contenido'] = contenido_proc
         except Exception as e:
-            print(f"[WARNING] Error post-procesando contenido según configuración de salida: {e}")
+            logger.warning("Error post-procesando contenido según configuración de salida: %s", e)
+        etapas_generacion.registrar("post", inicio)
+        return merge_metadata
+
+    def _guardar_noticia_salida(
+        self,
+        noticia: Noticia,
+        salida: SalidaMaestro,
+        resultado: Dict[str, Any],
+        regenerar: bool,
+        huella: Optional[Dict[str, str]] = None
+    ) -> NoticiaSalida:
+        """
+        Crea o actualiza la NoticiaSalida con el resultado generado
+
+        Con huella, la guarda y anota en entradas_cambiadas qué entradas cambiaron
+        respecto a la versión regenerada. Dentro de una medición (etapas_generacion.medir)
+        guarda también el desglose por etapa en etapas_ms
+        """
+        medicion = etapas_generacion.actual()
+        etapas_ms = medicion.compacto() if medicion else None
         # Validar que el contenido generado tenga al menos 10 caracteres
         if not resultado["contenido"] or len(resultado["contenido"].strip()) < 10:
             resultado["contenido"] = "Contenido generado automáticamente (simulado) para esta salida."
 
-        # Aplicar configuración merged (Estilo + Salida) en post-procesamiento (temporal)
-        merged_raw = self.merge_configs(getattr(estilo, 'configuracion', {}) if estilo else {}, getattr(salida, 'configuracion', {}) or {})
-        if isinstance(merged_raw, dict) and '_merged' in merged_raw:
-            merged_config = merged_raw.get('_merged', {})
-            merge_metadata = merged_raw.get('_metadata', {})
-        else:
-            merged_config = merged_raw or {}
-            merge_metadata = {}
-        try:
-            contenido_proc = resultado.get('contenido', '')
-            if merged_config.get('permite_emojis') is False:
-                contenido_proc = self._remove_emojis(contenido_proc)
-            if 'max_caracteres' in merged_config and merged_config.get('max_caracteres'):
-                try:
-                    mc = int(merged_config.get('max_caracteres'))
-                    estrategia = merged_config.get('truncar_estrategia', 'smart')
-                    contenido_proc = self._apply_max_caracteres(contenido_proc, mc, estrategia)
-                except Exception:
-                    pass
-            resultado['contenido'] = contenido_proc
-        except Exception as e:
-            print(f"[WARNING] Error post-procesando contenido temporal según configuración de salida: {e}")
-        # Crear o actualizar NoticiaSalida
+        noticia_salida = None
         if regenerar:
             noticia_salida = self.db.query(NoticiaSalida).filter(
                 NoticiaSalida.noticia_id == noticia.id,
                 NoticiaSalida.salida_id == salida.id
             ).first()
-            if noticia_salida:
-                noticia_salida.titulo = resultado["titulo"]  # ← CAMBIO: usar título generado por IA
-                noticia_salida.contenido_generado = resultado["contenido"]
-                noticia_salida.tokens_usados = resultado["tokens_usados"]
-                noticia_salida.tiempo_generacion_ms = resultado["tiempo_ms"]
-                noticia_salida.generado_en = datetime.utcnow()
-            else:
-                noticia_salida = NoticiaSalida(
-                    noticia_id=noticia.id,
-                    salida_id=salida.id,
-                    titulo=resultado["titulo"],  # ← CAMBIO: usar título generado por IA
-                    contenido_generado=resultado["contenido"],
-                    tokens_usados=resultado["tokens_usados"],
-                    tiempo_generacion_ms=resultado["tiempo_ms"]
-                )
-                self.db.add(noticia_salida)
+        cambios = None
+        if noticia_salida:
+            if huella is not None:
+                cambios = huella_entradas.diferencias(noticia_salida.huella_entradas, huella)
+                huella_entradas.registrar(cambios)
+            noticia_salida.titulo = resultado["titulo"]  # ← CAMBIO: usar título generado por IA
+            noticia_salida.contenido_generado = resultado["contenido"]
+            noticia_salida.tokens_usados = resultado["tokens_usados"]
+            noticia_salida.tiempo_generacion_ms = resultado["tiempo_ms"]
+            noticia_salida.tokens_cache_lectura = resultado.get("tokens_cache_lectura", 0)
+            noticia_salida.tokens_cache_escritura = resultado.get("tokens_cache_escritura", 0)
+            noticia_salida.llm_respuesta_id = resultado.get("llm_respuesta_id")
+            noticia_salida.modelo_respuesta = resultado.get("modelo_respuesta")
+            noticia_salida.generado_en = datetime.utcnow()
+            noticia_salida.etapas_ms = etapas_ms
+            if huella is not None:
+                noticia_salida.huella_entradas = huella
         else:
             noticia_salida = NoticiaSalida(
                 noticia_id=noticia.id,
@@ -764,15 +1608,182 @@ Genera el contenido optimizado:"""
                 titulo=resultado["titulo"],  # ← CAMBIO: usar título generado por IA
                 contenido_generado=resultado["contenido"],
                 tokens_usados=resultado["tokens_usados"],
-                tiempo_generacion_ms=resultado["tiempo_ms"]
+                tiempo_generacion_ms=resultado["tiempo_ms"],
+                tokens_cache_lectura=resultado.get("tokens_cache_lectura", 0),
+                tokens_cache_escritura=resultado.get("tokens_cache_escritura", 0),
+                llm_respuesta_id=resultado.get("llm_respuesta_id"),
+                modelo_respuesta=resultado.get("modelo_respuesta"),
+                huella_entradas=huella,
+                etapas_ms=etapas_ms
             )
             self.db.add(noticia_salida)
-        self.db.commit()
+        with etapas_generacion.etapa("commit"):
+            self.db.commit()
         self.db.refresh(noticia_salida)
+        noticia_salida.omitida = False
+        noticia_salida.entradas_cambiadas = cambios
         return noticia_salida
-    
+
+    # ==================== LOTES (REGENERACIÓN MASIVA) ====================
+
+    @staticmethod
+    def copia_llm(llm: LLMMaestro) -> Any:
+        """Copia del LLM utilizable fuera de su sesión (llamadas en segundo plano, lotes)"""
+        return GeneradorIA._snapshot_llm(llm)
+
+    def preparar_peticion_lote(
+        self,
+        noticia: Noticia,
+        salida: SalidaMaestro,
+        llm: LLMMaestro
+    ) -> Optional[Tuple[Any, int, Dict[str, str]]]:
+        """
+        Prompt de una salida para enviarla en un lote de la API batch
+
+        Returns:
+            Tupla (prompt_final, max_tokens, huella de entradas), o None si ninguna
+            entrada cambió desde la última generación (no hace falta regenerarla)
+
+        Raises:
+            ValueError: si no hay prompt para la noticia
+        """
+        huella = self._huella_entradas(noticia, salida, llm)
+        if self._salida_sin_cambios(noticia, salida, huella):
+            return None
+        prompt_final, _ = self._preparar_prompt_salida(noticia, salida, llm=llm)
+        return prompt_final, self._get_max_tokens_salida(salida), huella
+
+    async def guardar_respuesta_lote(
+        self,
+        noticia: Noticia,
+        salida: SalidaMaestro,
+        llm: Any,
+        contenido: str,
+        uso: Dict[str, int],
+        huella: Optional[Dict[str, str]] = None
+    ) -> NoticiaSalida:
+        """
+        Guarda como regeneración la respuesta de un lote para una salida (con el
+        post-proceso de la salida y del estilo de la sección) y registra sus tokens
+        """
+        resultado, tokens = self._procesar_respuesta(contenido, uso, time.time())
+        self._marcar_llm_respuesta(resultado, llm)
+        estilo = noticia.seccion.estilo if noticia.seccion else None
+        self._postprocesar_resultado(resultado, salida, estilo)
+        noticia_salida = self._guardar_noticia_salida(noticia, salida, resultado, regenerar=True, huella=huella)
+        await self._conciliar_tokens(None, llm, tokens, noticia.seccion_id)
+        return noticia_salida
+
+    async def invocar_llm_async(
+        self,
+        llm: Any,
+        prompt_contenido: Any,
+        max_tokens: int,
+        temperature: float = 0.7
+    ) -> Tuple[Dict[str, Any], int]:
+        """
+        Una llamada al proveedor (simulada sin API key) acotada por el semáforo del
+        LLM con la prioridad del generador; sin caché, coalescencia ni presupuesto
+
+        Returns:
+            Tupla (resultado, tokens usados)
+        """
+        async with get_semaforo_llm(llm, self.prioridad):
+            return await self._ainvocar_llm(llm, prompt_contenido, max_tokens, temperature)
+
+    def generar_para_salida(
+        self,
+        noticia: Noticia,
+        salida: SalidaMaestro,
+        llm: LLMMaestro,
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None,
+        regenerar: bool = False
+    ) -> NoticiaSalida:
+        """
+        Genera contenido optimizado para una salida específica
+
+        Args:
+            noticia: Noticia fuente
+            salida: Canal de salida (web, print, social, etc.)
+            llm: Modelo LLM a usar
+            prompt: Prompt a usar (usa el de la sección si no se especifica)
+            estilo: Estilo a usar (usa el de la sección si no se especifica)
+            regenerar: Si True, regenera incluso si ya existe (salvo que ninguna de sus
+                entradas haya cambiado; ver services/huella_entradas.py)
+
+        Returns:
+            NoticiaSalida con el contenido generado (etapas_ms: latencia por etapa,
+            ver services/etapas_generacion.py)
+        """
+        # Verificar si ya existe y no queremos regenerar
+        if not regenerar:
+            existente = self._reutilizar_salida_existente(noticia, salida)
+            if existente:
+                return existente
+
+        with etapas_generacion.medir(llm, salida):
+            with etapas_generacion.etapa("orm"):
+                huella = self._huella_entradas(noticia, salida, llm, prompt, estilo)
+            if regenerar:
+                sin_cambios = self._salida_sin_cambios(noticia, salida, huella)
+                if sin_cambios:
+                    return sin_cambios
+
+            prompt_final, estilo = self._preparar_prompt_salida(noticia, salida, prompt, estilo, llm)
+            # Generar contenido
+            resultado = self.generar_contenido(
+                llm=llm,
+                prompt_contenido=prompt_final,
+                max_tokens=self._get_max_tokens_salida(salida),
+                temperature=0.7
+            )
+            # Aplicar configuración merged (Estilo + Salida) en post-procesamiento
+            self._postprocesar_resultado(resultado, salida, estilo)
+            # Crear o actualizar NoticiaSalida
+            return self._guardar_noticia_salida(noticia, salida, resultado, regenerar, huella)
+
+    async def generar_para_salida_async(
+        self,
+        noticia: Noticia,
+        salida: SalidaMaestro,
+        llm: LLMMaestro,
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None,
+        regenerar: bool = False
+    ) -> NoticiaSalida:
+        """
+        Versión async de generar_para_salida: solo la llamada al LLM se espera,
+        el acceso a BD sigue ocurriendo en el hilo del event loop
+        """
+        if not regenerar:
+            existente = self._reutilizar_salida_existente(noticia, salida)
+            if existente:
+                return existente
+
+        with etapas_generacion.medir(llm, salida):
+            with etapas_generacion.etapa("orm"):
+                huella = self._huella_entradas(noticia, salida, llm, prompt, estilo)
+            if regenerar:
+                sin_cambios = self._salida_sin_cambios(noticia, salida, huella)
+                if sin_cambios:
+                    return sin_cambios
+
+            prompt_final, estilo = self._preparar_prompt_salida(noticia, salida, prompt, estilo, llm)
+            resultado = await self.generar_contenido_async(
+                llm=llm,
+                prompt_contenido=prompt_final,
+                max_tokens=self._get_max_tokens_salida(salida),
+                temperature=0.7,
+                usar_cache=not regenerar,
+                config_postproceso=self._config_postproceso(salida, estilo),
+                seccion_id=self._seccion_id(noticia)
+            )
+            self._postprocesar_resultado(resultado, salida, estilo)
+            return self._guardar_noticia_salida(noticia, salida, resultado, regenerar, huella)
+
     # ==================== GENERACIÓN MÚLTIPLE ====================
-    
+
     def generar_multiples_salidas(
         self,
         noticia: Noticia,
@@ -784,7 +1795,7 @@ Genera el contenido optimizado:"""
     ) -> List[NoticiaSalida]:
         """
         Genera contenido para múltiples salidas
-        
+
         Args:
             noticia: Noticia fuente
             salidas: Lista de salidas a generar
@@ -792,20 +1803,20 @@ Genera el contenido optimizado:"""
             prompt: Prompt opcional
             estilo: Estilo opcional
             regenerar: Si True, regenera incluso si ya existen
-            
+
         Returns:
             Lista de NoticiaSalida generadas
         """
         resultados = []
         errores = []
-        
-        print(f"🔄 Iniciando generación para {len(salidas)} salidas:")
+
+        logger.info("🔄 Iniciando generación para %s salidas:", len(salidas))
         for i, salida in enumerate(salidas):
-            print(f"  {i+1}. {salida.nombre} (ID: {salida.id})")
-        
+            logger.debug("  %s. %s (ID: %s)", i+1, salida.nombre, salida.id)
+
         for salida in salidas:
             try:
-                print(f"🎯 Generando para salida: {salida.nombre}")
+                logger.debug("🎯 Generando para salida: %s", salida.nombre)
                 noticia_salida = self.generar_para_salida(
                     noticia=noticia,
                     salida=salida,
@@ -814,24 +1825,137 @@ Genera el contenido optimizado:"""
                     estilo=estilo,
                     regenerar=regenerar
                 )
-                print(f"✅ Salida generada exitosamente: {salida.nombre}")
+                logger.info("✅ Salida generada exitosamente: %s", salida.nombre)
                 resultados.append(noticia_salida)
             except Exception as e:
-                print(f"❌ Error generando salida {salida.nombre}: {str(e)}")
+                logger.error("❌ Error generando salida %s: %s", salida.nombre, e)
                 errores.append({
                     "salida_id": salida.id,
                     "salida_nombre": salida.nombre,
                     "error": str(e)
                 })
-        
+
         if errores:
-            print(f"⚠️ Errores al generar {len(errores)} salidas:")
+            logger.warning("⚠️ Errores al generar %s salidas:", len(errores))
             for err in errores:
-                print(f"  - {err['salida_nombre']}: {err['error']}")
-        
-        print(f"📊 Resumen: {len(resultados)} salidas generadas exitosamente, {len(errores)} errores")
+                logger.warning("  - %s: %s", err['salida_nombre'], err['error'])
+
+        logger.info("📊 Resumen: %s salidas generadas exitosamente, %s errores", len(resultados), len(errores))
         return resultados
-    
+
+    async def generar_multiples_salidas_async(
+        self,
+        noticia: Noticia,
+        salidas: List[SalidaMaestro],
+        llm: LLMMaestro,
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None,
+        regenerar: bool = False,
+        modo_combinado: bool = False
+    ) -> List[NoticiaSalida]:
+        """
+        Genera contenido para múltiples salidas en paralelo
+
+        Mismo contrato que generar_multiples_salidas, pero las llamadas al LLM de
+        todas las salidas se lanzan a la vez (acotadas por el semáforo del LLM),
+        de modo que el tiempo total se acerca al de la salida más lenta.
+        Con modo_combinado=True se intenta primero una única llamada para todas.
+        """
+        resultados, _ = await self.generar_salidas_con_errores_async(
+            noticia, salidas, llm, prompt, estilo, regenerar, modo_combinado
+        )
+        return resultados
+
+    async def generar_salidas_con_errores_async(
+        self,
+        noticia: Noticia,
+        salidas: List[SalidaMaestro],
+        llm: LLMMaestro,
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None,
+        regenerar: bool = False,
+        modo_combinado: bool = False
+    ) -> Tuple[List[NoticiaSalida], List[Dict[str, Any]]]:
+        """
+        Como generar_multiples_salidas_async, pero devuelve también los errores por
+        salida (la cola de trabajos los guarda para reintentar solo las fallidas)
+        """
+        logger.info("🔄 Iniciando generación concurrente para %s salidas (máx. %s simultáneas)", len(salidas), get_limite_concurrencia(llm))
+
+        partes, estilo_combinado, huellas, omitidas = {}, None, {}, {}
+        if modo_combinado:
+            pendientes = []
+            for salida in salidas:
+                if not regenerar:
+                    if not self._reutilizar_salida_existente(noticia, salida):
+                        pendientes.append(salida)
+                    continue
+                # Las salidas sin cambios en sus entradas no entran en la llamada combinada
+                huellas[salida.id] = self._huella_entradas(noticia, salida, llm, prompt, estilo)
+                sin_cambios = self._salida_sin_cambios(noticia, salida, huellas[salida.id])
+                if sin_cambios:
+                    omitidas[salida.id] = sin_cambios
+                else:
+                    pendientes.append(salida)
+            if len(pendientes) > 1:
+                partes, estilo_combinado = await self._intentar_generacion_combinada(
+                    noticia, pendientes, llm, prompt, estilo
+                )
+
+        async def _generar(salida: SalidaMaestro) -> NoticiaSalida:
+            if salida.id in omitidas:
+                return omitidas[salida.id]
+            if salida.id in partes:
+                resultado = partes[salida.id]
+                self._postprocesar_resultado(resultado, salida, estilo_combinado)
+                huella = huellas.get(salida.id) or self._huella_entradas(noticia, salida, llm, prompt, estilo)
+                return self._guardar_noticia_salida(noticia, salida, resultado, regenerar, huella)
+            return await self.generar_para_salida_async(
+                noticia=noticia,
+                salida=salida,
+                llm=llm,
+                prompt=prompt,
+                estilo=estilo,
+                regenerar=regenerar
+            )
+
+        respuestas = await asyncio.gather(
+            *[_generar(salida) for salida in salidas],
+            return_exceptions=True
+        )
+
+        resultados, errores = self._separar_resultados(salidas, respuestas)
+        if errores:
+            logger.warning("⚠️ Errores al generar %s salidas:", len(errores))
+            for err in errores:
+                logger.warning("  - %s: %s", err['salida_nombre'], err['error'])
+
+        logger.info("📊 Resumen: %s salidas generadas exitosamente, %s errores", len(resultados), len(errores))
+        return resultados, errores
+
+    def _separar_resultados(
+        self,
+        salidas: List[SalidaMaestro],
+        respuestas: List[Any]
+    ) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        """
+        Separa resultados y errores de un asyncio.gather(return_exceptions=True),
+        conservando el orden de las salidas
+        """
+        resultados = []
+        errores = []
+        for salida, respuesta in zip(salidas, respuestas):
+            if isinstance(respuesta, BaseException):
+                logger.error("❌ Error generando salida %s: %s", salida.nombre, respuesta)
+                errores.append({
+                    "salida_id": salida.id,
+                    "salida_nombre": salida.nombre,
+                    "error": str(respuesta)
+                })
+            else:
+                resultados.append(respuesta)
+        return resultados, errores
+
     def generar_multiples_salidas_temporal(
         self,
         noticia_temporal: Any,  # SimpleNamespace con datos de noticia
@@ -845,7 +1969,7 @@ Genera el contenido optimizado:"""
         """
         Genera contenido para múltiples salidas usando datos temporales
         NO guarda en BD, solo devuelve resultados
-        
+
         Args:
             noticia_temporal: Objeto con datos de noticia (no guardada en BD)
             salidas: Lista de salidas a generar
@@ -854,76 +1978,300 @@ Genera el contenido optimizado:"""
             usuario_id: ID del usuario (para métricas admin)
             capturar_metricas: Si capturar métricas de valor periodístico
             session_id: ID de sesión para métricas temporales
-            
+
         Returns:
             Dict con resultados temporales y métricas (si es admin)
         """
         resultados = []
         errores = []
-        
+
         # Identificador único para detectar llamadas duplicadas
         import uuid
         llamada_id = str(uuid.uuid4())[:8]
-        print(f"🚀 INICIO generar_multiples_salidas_temporal - Llamada ID: {llamada_id}")
-        print(f"🔍 Params: noticia_id={getattr(noticia_temporal, 'id', None)}, salidas={len(salidas)}, capturar_metricas={capturar_metricas}")
-        
+        logger.debug("🚀 INICIO generar_multiples_salidas_temporal - Llamada ID: %s", llamada_id)
+        logger.debug("🔍 Params: noticia_id=%s, salidas=%s, capturar_metricas=%s", getattr(noticia_temporal, 'id', None), len(salidas), capturar_metricas)
+
         # Captura de tiempo inicio para métricas
         inicio_total = time.time()
-        tokens_totales = 0
-        contenido_total = ""
-        
-        print(f"🔄 Iniciando generación TEMPORAL para {len(salidas)} salidas:")
+
+        logger.info("🔄 Iniciando generación TEMPORAL para %s salidas:", len(salidas))
         for i, salida in enumerate(salidas):
-            print(f"  {i+1}. {salida.nombre} (ID: {salida.id}) - MODO TEMPORAL")
-        
+            logger.debug("  %s. %s (ID: %s) - MODO TEMPORAL", i+1, salida.nombre, salida.id)
+
         for salida in salidas:
             try:
-                print(f"🎯 Generando temporalmente para salida: {salida.nombre}")
-                
+                logger.debug("🎯 Generando temporalmente para salida: %s", salida.nombre)
+
                 # Capturar tiempo por salida individual
                 inicio_salida = time.time()
-                
+
                 resultado_temporal = self.generar_para_salida_temporal(
                     noticia_temporal=noticia_temporal,
                     salida=salida,
                     llm=llm
                 )
-                
+
                 fin_salida = time.time()
                 tiempo_salida = fin_salida - inicio_salida
-                
+
                 # Añadir tiempo de esta salida al resultado
                 resultado_temporal["tiempo_generacion"] = tiempo_salida
-                
-                # Acumular para métricas
-                if capturar_metricas:
-                    tokens_salida = resultado_temporal.get("tokens_usados", 0)
-                    print(f"🔍 Debug tokens - Salida {salida.nombre}: tokens_salida={tokens_salida}")
-                    tokens_totales += tokens_salida
-                    contenido_total += f"{resultado_temporal.get('titulo', '')} {resultado_temporal.get('contenido', '')} "
-                    print(f"🔍 Debug tokens - Total acumulado: {tokens_totales}")
-                
-                print(f"✅ Salida temporal generada: {salida.nombre} ({tiempo_salida:.2f}s)")
+
+                logger.info("✅ Salida temporal generada: %s (%.2fs)", salida.nombre, tiempo_salida)
                 resultados.append(resultado_temporal)
-                
+
             except Exception as e:
-                print(f"❌ Error generando salida temporal {salida.nombre}: {str(e)}")
+                logger.error("❌ Error generando salida temporal %s: %s", salida.nombre, e)
                 errores.append({
                     "salida_id": salida.id,
                     "salida_nombre": salida.nombre,
                     "error": str(e)
                 })
-        
+
+        return self._completar_respuesta_temporal(
+            noticia_temporal=noticia_temporal,
+            llm=llm,
+            resultados=resultados,
+            errores=errores,
+            inicio_total=inicio_total,
+            usuario_id=usuario_id,
+            capturar_metricas=capturar_metricas,
+            session_id=session_id,
+            llamada_id=llamada_id
+        )
+
+    async def generar_multiples_salidas_temporal_async(
+        self,
+        noticia_temporal: Any,
+        salidas: List[SalidaMaestro],
+        llm: LLMMaestro,
+        regenerar: bool = True,
+        usuario_id: Optional[int] = None,
+        capturar_metricas: bool = False,
+        session_id: Optional[str] = None,
+        modo_combinado: bool = False,
+        usar_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Versión concurrente de generar_multiples_salidas_temporal
+
+        Lanza todas las salidas a la vez (acotadas por el semáforo del LLM) y
+        devuelve la misma estructura: salidas_generadas en el orden pedido, errores
+        por salida, tiempo_generacion / tiempo_generacion_ms por salida y métricas.
+
+        Con modo_combinado=True se pide primero una única respuesta con todas las
+        salidas (ver _generar_combinado_async); las que no se puedan extraer se
+        generan con su propia llamada.
+
+        usar_cache=False fuerza llamadas nuevas aunque haya respuestas idénticas en caché.
+        """
+        import uuid
+        llamada_id = str(uuid.uuid4())[:8]
+        logger.debug("🚀 INICIO generar_multiples_salidas_temporal_async - Llamada ID: %s", llamada_id)
+        logger.info("🔄 Iniciando generación TEMPORAL concurrente para %s salidas (máx. %s simultáneas)", len(salidas), get_limite_concurrencia(llm))
+
+        inicio_total = time.time()
+
+        partes, estilo_combinado = {}, None
+        if modo_combinado and len(salidas) > 1:
+            partes, estilo_combinado = await self._intentar_generacion_combinada(noticia_temporal, salidas, llm)
+
+        async def _generar(salida: SalidaMaestro) -> Dict[str, Any]:
+            if salida.id in partes:
+                resultado_temporal = self._armar_resultado_temporal(
+                    noticia_temporal, salida, estilo_combinado, partes[salida.id]
+                )
+                resultado_temporal["tiempo_generacion"] = resultado_temporal["tiempo_generacion_ms"] / 1000.0
+                return resultado_temporal
+
+            inicio_salida = time.time()
+            resultado_temporal = await self.generar_para_salida_temporal_async(
+                noticia_temporal=noticia_temporal,
+                salida=salida,
+                llm=llm,
+                usar_cache=usar_cache
+            )
+            resultado_temporal["tiempo_generacion"] = time.time() - inicio_salida
+            logger.info("✅ Salida temporal generada: %s (%.2fs)", salida.nombre, resultado_temporal['tiempo_generacion'])
+            return resultado_temporal
+
+        respuestas = await asyncio.gather(
+            *[_generar(salida) for salida in salidas],
+            return_exceptions=True
+        )
+        resultados, errores = self._separar_resultados(salidas, respuestas)
+
+        return self._completar_respuesta_temporal(
+            noticia_temporal=noticia_temporal,
+            llm=llm,
+            resultados=resultados,
+            errores=errores,
+            inicio_total=inicio_total,
+            usuario_id=usuario_id,
+            capturar_metricas=capturar_metricas,
+            session_id=session_id,
+            llamada_id=llamada_id
+        )
+
+    async def generar_multiples_salidas_temporal_stream(
+        self,
+        noticia_temporal: Any,
+        salidas: List[SalidaMaestro],
+        llm: LLMMaestro,
+        usuario_id: Optional[int] = None,
+        capturar_metricas: bool = False,
+        usar_cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Variante en streaming de generar_multiples_salidas_temporal_async
+
+        Todas las salidas se generan a la vez y sus eventos se entregan según
+        llegan, de modo que una salida lenta no retiene a las demás.
+
+        Yields:
+            Eventos con clave 'evento':
+            - inicio: la salida empezó a generarse
+            - delta: fragmento de texto recibido del proveedor
+            - titulo: título detectado en el texto parcial
+            - completado: resultado temporal final (tokens_usados, tiempo_generacion_ms)
+            - error: la salida falló (el resto continúa)
+            - fin: resumen (total_tokens, tiempo_total_ms, errores, métricas)
+        """
+        import uuid
+        llamada_id = str(uuid.uuid4())[:8]
+        logger.debug("🚀 INICIO generar_multiples_salidas_temporal_stream - Llamada ID: %s", llamada_id)
+
+        inicio_total = time.time()
+        cola: asyncio.Queue = asyncio.Queue()
+
+        async def _generar(salida: SalidaMaestro) -> Dict[str, Any]:
+            inicio_salida = time.time()
+            cola.put_nowait({"evento": "inicio", "salida_id": salida.id, "nombre_salida": salida.nombre})
+            try:
+                with etapas_generacion.medir(llm, salida):
+                    prompt_final, estilo = self._preparar_prompt_temporal(noticia_temporal, salida, llm=llm)
+                    texto = ""
+                    titulo_enviado = False
+                    resultado = None
+                    async for evento in self.generar_contenido_stream(
+                        llm=llm,
+                        prompt_contenido=prompt_final,
+                        max_tokens=self._get_max_tokens_salida(salida),
+                        temperature=0.7,
+                        usar_cache=usar_cache,
+                        config_postproceso=self._config_postproceso(salida, estilo),
+                        seccion_id=self._seccion_id(noticia_temporal)
+                    ):
+                        if evento["tipo"] == "resultado":
+                            resultado = evento["resultado"]
+                            continue
+                        texto += evento["texto"]
+                        cola.put_nowait({"evento": "delta", "salida_id": salida.id, "texto": evento["texto"]})
+                        if not titulo_enviado:
+                            titulo = self._extraer_titulo_parcial(texto)
+                            if titulo:
+                                titulo_enviado = True
+                                cola.put_nowait({"evento": "titulo", "salida_id": salida.id, "titulo": titulo})
+
+                    resultado_temporal = self._armar_resultado_temporal(noticia_temporal, salida, estilo, resultado)
+                    resultado_temporal["tiempo_generacion"] = time.time() - inicio_salida
+                    if not titulo_enviado:
+                        cola.put_nowait({"evento": "titulo", "salida_id": salida.id, "titulo": resultado_temporal["titulo"]})
+                    cola.put_nowait({
+                        "evento": "completado",
+                        "salida_id": salida.id,
+                        "tokens_usados": resultado_temporal["tokens_usados"],
+                        "tiempo_generacion_ms": resultado_temporal["tiempo_generacion_ms"],
+                        "salida": resultado_temporal
+                    })
+                    logger.info("✅ Salida temporal generada (stream): %s (%.2fs)", salida.nombre, resultado_temporal['tiempo_generacion'])
+                    return resultado_temporal
+            except Exception as e:
+                cola.put_nowait({"evento": "error", "salida_id": salida.id, "nombre_salida": salida.nombre, "error": str(e)})
+                raise
+
+        tarea = asyncio.ensure_future(asyncio.gather(
+            *[_generar(salida) for salida in salidas],
+            return_exceptions=True
+        ))
+        tarea.add_done_callback(lambda _: cola.put_nowait(None))
+        try:
+            while True:
+                evento = await cola.get()
+                if evento is None:
+                    break
+                yield evento
+        finally:
+            # Cliente desconectado: no seguir consumiendo tokens
+            if not tarea.done():
+                tarea.cancel()
+
+        resultados, errores = self._separar_resultados(salidas, tarea.result())
+        respuesta = self._completar_respuesta_temporal(
+            noticia_temporal=noticia_temporal,
+            llm=llm,
+            resultados=resultados,
+            errores=errores,
+            inicio_total=inicio_total,
+            usuario_id=usuario_id,
+            capturar_metricas=capturar_metricas,
+            llamada_id=llamada_id
+        )
+        fin = {
+            "evento": "fin",
+            "total_tokens": sum(r.get("tokens_usados", 0) or 0 for r in resultados),
+            "tiempo_total_ms": respuesta["tiempo_total"] * 1000,
+            "cantidad_salidas": respuesta["cantidad_salidas"],
+            "errores": errores
+        }
+        if respuesta.get("metricas_valor"):
+            fin["metricas_valor"] = respuesta["metricas_valor"]
+        yield fin
+
+    @staticmethod
+    def _extraer_titulo_parcial(texto: str) -> Optional[str]:
+        """Devuelve el título de una respuesta parcial en cuanto la línea TÍTULO: está completa"""
+        match = re.search(r'TÍTULO:\s*(.+?)\n\s*(?:CONTENIDO:|\n)', texto, re.IGNORECASE)
+        return match.group(1).strip() if match else None
+
+    def _completar_respuesta_temporal(
+        self,
+        noticia_temporal: Any,
+        llm: LLMMaestro,
+        resultados: List[Dict[str, Any]],
+        errores: List[Dict[str, Any]],
+        inicio_total: float,
+        usuario_id: Optional[int] = None,
+        capturar_metricas: bool = False,
+        session_id: Optional[str] = None,
+        llamada_id: str = ""
+    ) -> Dict[str, Any]:
+        """
+        Arma la respuesta de la generación temporal y calcula/guarda las métricas de valor
+        """
+        # Acumular para métricas
+        tokens_totales = 0
+        tokens_cache_lectura = 0
+        tokens_cache_escritura = 0
+        contenido_total = ""
+        if capturar_metricas:
+            for resultado_temporal in resultados:
+                tokens_totales += resultado_temporal.get("tokens_usados", 0) or 0
+                tokens_cache_lectura += resultado_temporal.get("tokens_cache_lectura", 0) or 0
+                tokens_cache_escritura += resultado_temporal.get("tokens_cache_escritura", 0) or 0
+                contenido_total += f"{resultado_temporal.get('titulo', '')} {resultado_temporal.get('contenido', '')} "
+            logger.debug("🔍 Debug tokens - Total acumulado: %s", tokens_totales)
+
         # Tiempo total transcurrido
         fin_total = time.time()
         tiempo_total = fin_total - inicio_total
         
         if errores:
-            print(f"⚠️ Errores al generar {len(errores)} salidas temporales:")
+            logger.warning("⚠️ Errores al generar %s salidas temporales:", len(errores))
             for err in errores:
-                print(f"  - {err['salida_nombre']}: {err['error']}")
+                logger.warning("  - %s: %s", err['salida_nombre'], err['error'])
         
-        print(f"📊 Resumen temporal: {len(resultados)} salidas generadas, {len(errores)} errores en {tiempo_total:.2f}s")
+        logger.info("📊 Resumen temporal: %s salidas generadas, %s errores en %.2fs", len(resultados), len(errores), tiempo_total)
         
         # Preparar respuesta
         response = {
@@ -934,56 +2282,60 @@ Genera el contenido optimizado:"""
         }
         
         # Calcular y añadir métricas si es solicitado (solo admin)
-        print(f"🔍 Debug métricas: capturar_metricas={capturar_metricas}, len(resultados)={len(resultados)}")
+        logger.debug("🔍 Debug métricas: capturar_metricas=%s, len(resultados)=%s", capturar_metricas, len(resultados))
         if capturar_metricas and len(resultados) > 0:
             try:
-                print("📈 Iniciando cálculo de métricas...")
-                print(f"🔍 Debug métricas - tokens_totales={tokens_totales}, contenido_total_len={len(contenido_total)}")
+                logger.debug("📈 Iniciando cálculo de métricas...")
+                logger.debug("🔍 Debug métricas - tokens_totales=%s, contenido_total_len=%s", tokens_totales, len(contenido_total))
                 tipo_noticia = getattr(noticia_temporal, 'tipo', 'feature')
                 complejidad = 'media'  # Se puede hacer más sofisticado
                 
                 tokens_estimados = len(contenido_total.split()) * 1.3
                 tokens_finales = max(tokens_totales, tokens_estimados)
-                print(f"🔍 Debug métricas DETALLADO:")
-                print(f"  - tokens_totales (acumulado): {tokens_totales}")
-                print(f"  - contenido_total_len: {len(contenido_total)} chars")
-                print(f"  - contenido_total palabras: {len(contenido_total.split())} palabras")
-                print(f"  - tokens_estimados: {tokens_estimados}")
-                print(f"  - tokens_finales (max): {tokens_finales}")
-                print(f"  - tiempo_total: {tiempo_total} segundos")
-                print(f"  - cantidad_salidas: {len(resultados)}")
-                print(f"  - modelo_usado: {llm.modelo_id}")
+                logger.debug("🔍 Debug métricas DETALLADO:")
+                logger.debug("  - tokens_totales (acumulado): %s", tokens_totales)
+                logger.debug("  - contenido_total_len: %s chars", len(contenido_total))
+                logger.debug("  - contenido_total palabras: %s palabras", len(contenido_total.split()))
+                logger.debug("  - tokens_estimados: %s", tokens_estimados)
+                logger.debug("  - tokens_finales (max): %s", tokens_finales)
+                logger.debug("  - tiempo_total: %s segundos", tiempo_total)
+                logger.debug("  - cantidad_salidas: %s", len(resultados))
+                # Con failover el modelo que respondió puede no ser el pedido
+                modelo_usado = self.modelo_predominante(resultados, llm.modelo_id)
+                logger.debug("  - modelo_usado: %s", modelo_usado)
                 
                 metricas = self.calcular_metricas_valor(
                     tiempo_generacion_total=tiempo_total,
                     tokens_totales=tokens_finales,
                     cantidad_salidas=len(resultados),
-                    modelo_usado=llm.modelo_id,  # Corregido: modelo_id en lugar de modelo
+                    modelo_usado=modelo_usado,
                     contenido_total=contenido_total,
                     tipo_noticia=tipo_noticia,
-                    complejidad=complejidad
+                    complejidad=complejidad,
+                    tokens_cache_lectura=tokens_cache_lectura,
+                    tokens_cache_escritura=tokens_cache_escritura
                 )
                 
-                print(f"🔍 Debug métricas CALCULADAS:")
-                print(f"  - tokens_total: {metricas.get('tokens_total', 'NO EXISTE')}")
-                print(f"  - costo_generacion: {metricas.get('costo_generacion', 'NO EXISTE')}")
-                print(f"  - costo_estimado_manual: {metricas.get('costo_estimado_manual', 'NO EXISTE')}")
-                print(f"  - roi_porcentaje: {metricas.get('roi_porcentaje', 'NO EXISTE')}")
+                logger.debug("🔍 Debug métricas CALCULADAS:")
+                logger.debug("  - tokens_total: %s", metricas.get('tokens_total', 'NO EXISTE'))
+                logger.debug("  - costo_generacion: %s", metricas.get('costo_generacion', 'NO EXISTE'))
+                logger.debug("  - costo_estimado_manual: %s", metricas.get('costo_estimado_manual', 'NO EXISTE'))
+                logger.debug("  - roi_porcentaje: %s", metricas.get('roi_porcentaje', 'NO EXISTE'))
                 
                 # Añadir resumen de métricas a la respuesta
                 response["metricas_valor"] = self.obtener_resumen_metricas(metricas).dict()
                 
-                print(f"📈 Métricas calculadas - ROI: {metricas['roi_porcentaje']}%, Ahorro: {metricas['ahorro_tiempo_minutos']} min")
-                print(f"🔍 Debug métricas finales - tokens_total: {metricas['tokens_total']}, costo_generacion: {metricas['costo_generacion']}")
+                logger.info("📈 Métricas calculadas - ROI: %s%%, Ahorro: %s min", metricas['roi_porcentaje'], metricas['ahorro_tiempo_minutos'])
+                logger.debug("🔍 Debug métricas finales - tokens_total: %s, costo_generacion: %s", metricas['tokens_total'], metricas['costo_generacion'])
                 
                 # Determinar si se debe guardar en BD
                 es_noticia_existente = hasattr(noticia_temporal, 'id') and noticia_temporal.id
                 tiene_usuario_id = usuario_id is not None
                 
-                print(f"🔍 Evaluación guardado BD:")
-                print(f"  - es_noticia_existente: {es_noticia_existente}")
-                print(f"  - tiene_usuario_id: {tiene_usuario_id}")
-                print(f"  - noticia_temporal.id: {getattr(noticia_temporal, 'id', 'NO EXISTE')}")
+                logger.debug("🔍 Evaluación guardado BD:")
+                logger.debug("  - es_noticia_existente: %s", es_noticia_existente)
+                logger.debug("  - tiene_usuario_id: %s", tiene_usuario_id)
+                logger.debug("  - noticia_temporal.id: %s", getattr(noticia_temporal, 'id', 'NO EXISTE'))
                 
                 # Guardar métricas si: es noticia existente O si tenemos usuario_id (admin generando temporal)
                 if es_noticia_existente or tiene_usuario_id:
@@ -991,16 +2343,16 @@ Genera el contenido optimizado:"""
                         # Determinar el noticia_id para guardar
                         if es_noticia_existente:
                             noticia_id_para_guardar = noticia_temporal.id
-                            print(f"💾 Guardando métricas para noticia existente ID: {noticia_id_para_guardar}")
+                            logger.info("💾 Guardando métricas para noticia existente ID: %s", noticia_id_para_guardar)
                         else:
                             # Es generación temporal pero queremos guardar métricas (admin)
                             # Necesitamos crear una entrada temporal o usar un ID especial
-                            print(f"💾 Generación temporal con métricas para usuario {usuario_id}")
-                            print(f"⚠️ SKIP: No se puede guardar métricas sin noticia_id válido")
+                            logger.info("💾 Generación temporal con métricas para usuario %s", usuario_id)
+                            logger.warning("⚠️ SKIP: No se puede guardar métricas sin noticia_id válido")
                             noticia_id_para_guardar = None
                         
                         if noticia_id_para_guardar:
-                            print(f"🔍 Valores consolidados a guardar: tokens={metricas['tokens_total']}, costo={metricas['costo_generacion']}")
+                            logger.debug("🔍 Valores consolidados a guardar: tokens=%s, costo=%s", metricas['tokens_total'], metricas['costo_generacion'])
                             
                             # Primero limpiar duplicados existentes
                             self.limpiar_metricas_duplicadas(noticia_id_para_guardar)
@@ -1018,11 +2370,13 @@ Genera el contenido optimizado:"""
                                 metrica_existente.created_at and 
                                 (now - metrica_existente.created_at) < timedelta(minutes=5)):
                                 
-                                print(f"🔄 Actualizando métrica existente ID: {metrica_existente.id} (creada hace {(now - metrica_existente.created_at).total_seconds():.0f}s)")
+                                logger.debug("🔄 Actualizando métrica existente ID: %s (creada hace %.0fs)", metrica_existente.id, (now - metrica_existente.created_at).total_seconds())
                                 
                                 # Actualizar con nuevos valores consolidados
                                 metrica_existente.tiempo_generacion_total = metricas["tiempo_generacion_total"]
                                 metrica_existente.tokens_total = metricas["tokens_total"]
+                                metrica_existente.tokens_cache_lectura = metricas["tokens_cache_lectura"]
+                                metrica_existente.tokens_cache_escritura = metricas["tokens_cache_escritura"]
                                 metrica_existente.costo_generacion = metricas["costo_generacion"]
                                 metrica_existente.costo_estimado_manual = metricas["costo_estimado_manual"]
                                 metrica_existente.ahorro_costo = metricas["ahorro_costo"]
@@ -1035,94 +2389,90 @@ Genera el contenido optimizado:"""
                                 self.db.commit()
                                 self.db.refresh(metrica_existente)
                                 metrica_guardada = metrica_existente
-                                print(f"✅ Métrica actualizada en BD con ID: {metrica_guardada.id}")
+                                logger.info("✅ Métrica actualizada en BD con ID: %s", metrica_guardada.id)
                             else:
                                 # Crear nueva métrica
-                                print(f"📝 Creando nueva métrica para noticia {noticia_id_para_guardar} o session {session_id}")
+                                logger.debug("📝 Creando nueva métrica para noticia %s o session %s", noticia_id_para_guardar, session_id)
                                 metrica_guardada = self.guardar_metricas_valor(
                                     noticia_id=noticia_id_para_guardar,
                                     usuario_id=usuario_id,
                                     metricas=metricas,
                                     session_id=session_id  # Pasar session_id para métricas temporales
                                 )
-                                print(f"✅ Nueva métrica creada en BD con ID: {metrica_guardada.id}")
+                                logger.info("✅ Nueva métrica creada en BD con ID: %s", metrica_guardada.id)
                             
                             # Verificar que se guardó correctamente
                             if metrica_guardada:
-                                print(f"🔍 Verificación final: BD tokens={metrica_guardada.tokens_total}, BD costo={metrica_guardada.costo_generacion}")
+                                logger.debug("🔍 Verificación final: BD tokens=%s, BD costo=%s", metrica_guardada.tokens_total, metrica_guardada.costo_generacion)
                     except Exception as save_error:
-                        print(f"⚠️ Error guardando métricas en BD: {save_error}")
+                        logger.warning("⚠️ Error guardando métricas en BD: %s", save_error)
                         import traceback
                         traceback.print_exc()
                         # No fallar la respuesta por errores de guardado
                 
             except Exception as e:
-                print(f"⚠️ Error calculando métricas: {e}")
+                logger.warning("⚠️ Error calculando métricas: %s", e)
                 import traceback
                 traceback.print_exc()
                 # No fallar la respuesta por errores de métricas
         else:
-            print(f"❌ No se calcularán métricas: capturar_metricas={capturar_metricas}, len(resultados)={len(resultados)}")
+            logger.debug("No se calcularán métricas: capturar_metricas=%s, len(resultados)=%s", capturar_metricas, len(resultados))
         
-        print(f"🏁 FIN generar_multiples_salidas_temporal - Llamada ID: {llamada_id}")
+        logger.debug("🏁 FIN generar_multiples_salidas_temporal - Llamada ID: %s", llamada_id)
         return response
-    
-    def generar_para_salida_temporal(
+
+    def _preparar_prompt_temporal(
         self,
         noticia_temporal: Any,
         salida: SalidaMaestro,
-        llm: LLMMaestro,
         prompt: Optional[PromptMaestro] = None,
-        estilo: Optional[EstiloMaestro] = None
-    ) -> Dict[str, Any]:
+        estilo: Optional[EstiloMaestro] = None,
+        llm: Optional[LLMMaestro] = None
+    ) -> Tuple[Any, Optional[EstiloMaestro]]:
         """
-        Genera contenido para una salida específica usando datos temporales
-        NO guarda en BD, solo procesa y devuelve resultado
-        
+        Construye el prompt final para una noticia temporal (no guardada en BD)
+
         Returns:
-            Dict con resultado temporal (similar a NoticiaSalida pero sin BD)
+            Tupla (prompt_final, estilo efectivo); con estilo, prompt_final es una lista
+            de mensajes con bloques cacheables (ver _armar_mensajes)
         """
-        # Obtener prompt y estilo de la sección si no se especificaron
-        if not prompt and hasattr(noticia_temporal, 'seccion') and noticia_temporal.seccion.prompt:
-            prompt = noticia_temporal.seccion.prompt
-        
-        if not estilo and hasattr(noticia_temporal, 'seccion') and noticia_temporal.seccion.estilo:
-            estilo = noticia_temporal.seccion.estilo
-        
-        # Validar que tengamos un prompt
-        if not prompt:
-            raise ValueError("Se requiere un prompt para generar contenido")
-        
-        # Preparar variables para el prompt
-        variables = {
-            "titulo": noticia_temporal.titulo,
-            "contenido": noticia_temporal.contenido,
-            "autor": getattr(noticia_temporal, 'autor_nombre', 'Redacción'),  # Usar autor_nombre
-            "seccion": noticia_temporal.seccion.nombre if hasattr(noticia_temporal, 'seccion') else "General",
-            "tipo_salida": salida.tipo_salida,
-            "nombre_salida": salida.nombre,
-            "fecha": noticia_temporal.fecha.strftime("%d/%m/%Y") if hasattr(noticia_temporal, 'fecha') else "",
-            "tema": noticia_temporal.titulo
-        }
-        
-        # Añadir configuración específica de la salida
-        if salida.configuracion:
-            for key, value in salida.configuracion.items():
-                variables[f"salida_{key}"] = str(value)
-        
-        # Procesar prompt con variables
-        prompt_procesado = self.procesar_prompt(prompt, variables)
-        
-        # Aplicar estilo si existe
-        if estilo:
-            prompt_final = self.aplicar_estilo(prompt_procesado, estilo)
-        else:
-            prompt_final = prompt_procesado
-            
-        # Añadir instrucciones específicas del tipo de salida
-        instrucciones_salida = self._get_instrucciones_salida(salida)
-        if instrucciones_salida:
-            prompt_final = f"{prompt_final}\n\n{instrucciones_salida}"
+        with etapas_generacion.etapa("orm"):
+            # Obtener prompt y estilo de la sección si no se especificaron
+            if not prompt and hasattr(noticia_temporal, 'seccion') and noticia_temporal.seccion.prompt:
+                prompt = noticia_temporal.seccion.prompt
+
+            if not estilo and hasattr(noticia_temporal, 'seccion') and noticia_temporal.seccion.estilo:
+                estilo = noticia_temporal.seccion.estilo
+
+            # Validar que tengamos un prompt
+            if not prompt:
+                raise ValueError("Se requiere un prompt para generar contenido")
+
+            # Preparar variables para el prompt
+            variables = {
+                "titulo": noticia_temporal.titulo,
+                "contenido": noticia_temporal.contenido,
+                "autor": getattr(noticia_temporal, 'autor_nombre', 'Redacción'),  # Usar autor_nombre
+                "seccion": noticia_temporal.seccion.nombre if hasattr(noticia_temporal, 'seccion') else "General",
+                "tipo_salida": salida.tipo_salida,
+                "nombre_salida": salida.nombre,
+                "fecha": noticia_temporal.fecha.strftime("%d/%m/%Y") if hasattr(noticia_temporal, 'fecha') else "",
+                "tema": noticia_temporal.titulo
+            }
+
+            # Añadir configuración específica de la salida
+            if salida.configuracion:
+                for key, value in salida.configuracion.items():
+                    variables[f"salida_{key}"] = str(value)
+
+        with etapas_generacion.etapa("prompt"):
+            # Procesar prompt con variables
+            prompt_final = self.procesar_prompt(prompt, variables)
+
+            # Añadir instrucciones específicas del tipo de salida
+            instrucciones_salida = self._get_instrucciones_salida(salida)
+            if instrucciones_salida:
+                prompt_final = f"{prompt_final}\n\n{instrucciones_salida}"
         
         # 🔧 SOLUCIÓN: Asegurar que el contenido de la noticia esté incluido
         # Si el prompt no incluye las variables de noticia, agregarlas automáticamente
@@ -1140,49 +2490,34 @@ CONTENIDO ORIGINAL:
 ---
 
 Con base en la noticia anterior, genera el contenido optimizado para {salida.nombre} ({salida.tipo_salida}) siguiendo todas las directrices mencionadas."""
-            print(f"[DEBUG] ✅ Contenido de noticia agregado automáticamente al prompt")
+            logger.debug("✅ Contenido de noticia agregado automáticamente al prompt")
         else:
-            print(f"[DEBUG] ❌ Prompt ya contiene variables de noticia")
-        
-        print(f"[DEBUG] Prompt COMPLETO enviado al LLM ({len(prompt_final)} chars):")
-        print(f"[DEBUG] Primeros 500 chars: {prompt_final[:500]}...")
-        print(f"[DEBUG] Últimos 300 chars: ...{prompt_final[-300:]}")
-        print(f"[DEBUG] ¿Contiene título de noticia '{noticia_temporal.titulo[:30]}'? {noticia_temporal.titulo[:30] in prompt_final}")
-            
-        # Generar contenido
-        resultado = self.generar_contenido(
-            llm=llm,
-            prompt_contenido=prompt_final,
-            max_tokens=self._get_max_tokens_salida(salida),
-            temperature=0.7
-        )
-        
+            logger.debug("Prompt ya contiene variables de noticia")
+        
+        logger.debug("Prompt enviado al LLM (%d chars): %s", len(prompt_final), logs.truncar(prompt_final), extra=logs.MUESTREO)
+        logger.debug("¿Contiene título de noticia '%s'? %s", noticia_temporal.titulo[:30], noticia_temporal.titulo[:30] in prompt_final)
+        # El estilo (si existe) va delante como prefijo cacheable
+        with etapas_generacion.etapa("estilo"):
+            return self._armar_mensajes(
+                prompt_final, estilo, llm, noticia_temporal.contenido, instrucciones_salida, self._top_k_estilo([salida])
+            ), estilo
+
+    def _armar_resultado_temporal(
+        self,
+        noticia_temporal: Any,
+        salida: SalidaMaestro,
+        estilo: Optional[EstiloMaestro],
+        resultado: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Valida y post-procesa el resultado del LLM y lo devuelve con formato de NoticiaSalida temporal
+        """
         # Validar que el contenido generado tenga al menos 10 caracteres
         if not resultado["contenido"] or len(resultado["contenido"].strip()) < 10:
             resultado["contenido"] = "Contenido generado automáticamente (simulado) para esta salida."
         # Aplicar post-procesamiento según configuración (Estilo + Salida)
-        merged_raw = self.merge_configs(getattr(estilo, 'configuracion', {}) if estilo else {}, getattr(salida, 'configuracion', {}) or {})
-        if isinstance(merged_raw, dict) and '_merged' in merged_raw:
-            merged_config = merged_raw.get('_merged', {})
-            merge_metadata = merged_raw.get('_metadata', {})
-        else:
-            merged_config = merged_raw or {}
-            merge_metadata = {}
-
-        try:
-            contenido_proc = resultado.get('contenido', '')
-            if merged_config.get('permite_emojis') is False:
-                contenido_proc = self._remove_emojis(contenido_proc)
-            if 'max_caracteres' in merged_config and merged_config.get('max_caracteres'):
-                try:
-                    mc = int(merged_config.get('max_caracteres'))
-                    estrategia = merged_config.get('truncar_estrategia', 'smart')
-                    contenido_proc = self._apply_max_caracteres(contenido_proc, mc, estrategia)
-                except Exception:
-                    pass
-            resultado['contenido'] = contenido_proc
-        except Exception as e:
-            print(f"[WARNING] Error post-procesando contenido temporal según configuración de salida: {e}")
+        merge_metadata = self._postprocesar_resultado(resultado, salida, estilo)
+        medicion = etapas_generacion.actual()
 
         # Devolver resultado temporal (formato similar a NoticiaSalida)
         return {
@@ -1193,12 +2528,259 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
             "contenido_generado": resultado["contenido"],
             "tokens_usados": resultado["tokens_usados"],
             "tiempo_generacion_ms": resultado["tiempo_ms"],
+            "tokens_cache_lectura": resultado.get("tokens_cache_lectura", 0),
+            "tokens_cache_escritura": resultado.get("tokens_cache_escritura", 0),
+            "llm_respuesta_id": resultado.get("llm_respuesta_id"),
+            "modelo_respuesta": resultado.get("modelo_respuesta"),
             "generado_en": datetime.now().isoformat(),
             "nombre_salida": salida.nombre,
             "temporal": True,  # Marca que es temporal
-            "merge_metadata": merge_metadata
+            "merge_metadata": merge_metadata,
+            "etapas_ms": medicion.compacto() if medicion else None
         }
-    
+
+    def generar_para_salida_temporal(
+        self,
+        noticia_temporal: Any,
+        salida: SalidaMaestro,
+        llm: LLMMaestro,
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None
+    ) -> Dict[str, Any]:
+        """
+        Genera contenido para una salida específica usando datos temporales
+        NO guarda en BD, solo procesa y devuelve resultado
+
+        Returns:
+            Dict con resultado temporal (similar a NoticiaSalida pero sin BD)
+        """
+        with etapas_generacion.medir(llm, salida):
+            prompt_final, estilo = self._preparar_prompt_temporal(noticia_temporal, salida, prompt, estilo, llm)
+
+            # Generar contenido
+            resultado = self.generar_contenido(
+                llm=llm,
+                prompt_contenido=prompt_final,
+                max_tokens=self._get_max_tokens_salida(salida),
+                temperature=0.7
+            )
+            return self._armar_resultado_temporal(noticia_temporal, salida, estilo, resultado)
+
+    async def generar_para_salida_temporal_async(
+        self,
+        noticia_temporal: Any,
+        salida: SalidaMaestro,
+        llm: LLMMaestro,
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None,
+        usar_cache: bool = True
+    ) -> Dict[str, Any]:
+        """Versión async de generar_para_salida_temporal (ver generar_contenido_async)"""
+        with etapas_generacion.medir(llm, salida):
+            prompt_final, estilo = self._preparar_prompt_temporal(noticia_temporal, salida, prompt, estilo, llm)
+
+            resultado = await self.generar_contenido_async(
+                llm=llm,
+                prompt_contenido=prompt_final,
+                max_tokens=self._get_max_tokens_salida(salida),
+                temperature=0.7,
+                usar_cache=usar_cache,
+                config_postproceso=self._config_postproceso(salida, estilo),
+                seccion_id=self._seccion_id(noticia_temporal)
+            )
+            return self._armar_resultado_temporal(noticia_temporal, salida, estilo, resultado)
+
+    # ==================== MODO COMBINADO ====================
+
+    def _preparar_prompt_combinado(
+        self,
+        noticia: Any,
+        salidas: List[SalidaMaestro],
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None,
+        llm: Optional[LLMMaestro] = None
+    ) -> Tuple[Any, Optional[EstiloMaestro]]:
+        """
+        Construye un único prompt que pide todas las salidas a la vez
+
+        La parte común (prompt de la sección, estilo y noticia) se envía una sola
+        vez; cada salida solo aporta sus instrucciones y su configuración.
+        Sirve tanto para noticias en BD como temporales.
+
+        Returns:
+            Tupla (prompt_final, estilo efectivo); con estilo, prompt_final es una lista
+            de mensajes con bloques cacheables (ver _armar_mensajes)
+        """
+        seccion = getattr(noticia, 'seccion', None)
+        if not prompt and seccion and seccion.prompt:
+            prompt = seccion.prompt
+
+        if not estilo and seccion and seccion.estilo:
+            estilo = seccion.estilo
+
+        if not prompt:
+            raise ValueError("Se requiere un prompt para generar contenido")
+
+        fecha = getattr(noticia, 'fecha', None)
+        variables = {
+            "titulo": noticia.titulo,
+            "contenido": noticia.contenido,
+            "autor": getattr(noticia, 'autor_nombre', 'Redacción'),
+            "seccion": seccion.nombre if seccion else "General",
+            "tipo_salida": ", ".join(dict.fromkeys(s.tipo_salida for s in salidas)),
+            "nombre_salida": ", ".join(s.nombre for s in salidas),
+            "fecha": fecha.strftime("%d/%m/%Y") if fecha else "",
+            "tema": noticia.titulo
+        }
+
+        prompt_final = self.procesar_prompt(prompt, variables)
+
+        # Instrucciones y configuración propias de cada salida
+        bloques = []
+        for salida in salidas:
+            lineas = [f"### SALIDA {salida.id}: {salida.nombre} ({salida.tipo_salida})"]
+            instrucciones_salida = self._get_instrucciones_salida(salida)
+            if instrucciones_salida:
+                lineas.append(instrucciones_salida)
+            for key, value in (salida.configuracion or {}).items():
+                lineas.append(f"- {key}: {value}")
+            lineas.append(f"- Extensión máxima aproximada: {self._get_max_tokens_salida(salida)} tokens")
+            bloques.append("\n".join(lineas))
+        prompt_final = f"{prompt_final}\n\n---\n**SALIDAS A GENERAR:**\n\n" + "\n\n".join(bloques)
+
+        # Incluir la noticia si el prompt de la sección no la trae ya
+        if noticia.contenido not in prompt_final:
+            prompt_final = f"""{prompt_final}
+
+---
+**NOTICIA A PROCESAR:**
+
+TÍTULO: {noticia.titulo}
+
+CONTENIDO ORIGINAL:
+{noticia.contenido}"""
+
+        formato = "\n\n".join(
+            f"==={MARCA_SALIDA} {s.id}===\nTÍTULO: ...\n\nCONTENIDO:\n...\n===FIN {MARCA_SALIDA} {s.id}==="
+            for s in salidas
+        )
+        prompt_final = f"""{prompt_final}
+
+---
+
+Con base en la noticia anterior, genera el contenido optimizado para CADA una de las salidas indicadas siguiendo todas las directrices mencionadas.
+Responde únicamente con un bloque por salida, exactamente con este formato:
+
+{formato}"""
+        return self._armar_mensajes(
+            prompt_final, estilo, llm, noticia.contenido, "\n\n".join(bloques), self._top_k_estilo(salidas)
+        ), estilo
+
+    def _parsear_respuesta_combinada(
+        self,
+        contenido_respuesta: str,
+        salidas: List[SalidaMaestro]
+    ) -> Dict[int, Dict[str, str]]:
+        """
+        Extrae el bloque de cada salida de una respuesta combinada
+
+        Returns:
+            {salida_id: {'titulo', 'contenido'}} solo para los bloques completos
+            (con marca de cierre, TÍTULO y CONTENIDO); el resto queda fuera
+        """
+        partes = {}
+        for salida in salidas:
+            match = re.search(
+                rf'===\s*{MARCA_SALIDA}\s+{salida.id}\s*===\s*(.+?)\s*===\s*FIN\s+{MARCA_SALIDA}\s+{salida.id}\s*===',
+                contenido_respuesta,
+                re.DOTALL | re.IGNORECASE
+            )
+            if not match:
+                continue
+            bloque = match.group(1)
+            if not re.search(r'TÍTULO:', bloque, re.IGNORECASE) or not re.search(r'CONTENIDO:', bloque, re.IGNORECASE):
+                continue
+            partes[salida.id] = self._parsear_respuesta_estructurada(bloque)
+        return partes
+
+    async def _generar_combinado_async(
+        self,
+        noticia: Any,
+        salidas: List[SalidaMaestro],
+        llm: LLMMaestro,
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None
+    ) -> Tuple[Dict[int, Dict[str, Any]], Optional[EstiloMaestro]]:
+        """
+        Genera varias salidas con una sola llamada al LLM
+
+        Returns:
+            Tupla ({salida_id: resultado con el formato de generar_contenido}, estilo efectivo).
+            Los tokens de la llamada se reparten a partes iguales entre las salidas extraídas.
+            En modo simulado no se genera nada (las salidas caen al modo por salida).
+        """
+        prompt_final, estilo = self._preparar_prompt_combinado(noticia, salidas, prompt, estilo, llm)
+        max_tokens = min(
+            sum(self._get_max_tokens_salida(salida) for salida in salidas),
+            settings.LLM_MODO_COMBINADO_MAX_TOKENS
+        )
+
+        inicio = time.time()
+        llm_snapshot = self._snapshot_llm(llm)
+        cliente = self._get_cliente_llm_async(llm_snapshot)
+        if cliente is None:
+            return {}, estilo
+        reserva, _ = await self._reservar_presupuesto([llm], prompt_final, max_tokens)
+        try:
+            async with get_semaforo_llm(llm, self.prioridad):
+                contenido, uso = await proveedores_llm.completar_async(
+                    cliente, llm_snapshot, prompt_final, max_tokens, 0.7
+                )
+        except Exception:
+            await presupuesto_tokens.conciliar(reserva, 0)
+            raise
+        await self._conciliar_tokens(reserva, llm, uso["tokens"], self._seccion_id(noticia))
+        tiempo_ms = int((time.time() - inicio) * 1000)
+
+        partes = self._parsear_respuesta_combinada(contenido or "", salidas)
+        resultados = {}
+        for i, (salida_id, parte) in enumerate(partes.items()):
+            # La primera salida se queda con el resto de la división
+            reparto = {
+                clave: total // len(partes) + (total % len(partes) if i == 0 else 0)
+                for clave, total in uso.items()
+            }
+            resultados[salida_id] = {
+                "contenido": parte["contenido"],
+                "titulo": parte["titulo"],
+                "tokens_usados": reparto["tokens"],
+                "tiempo_ms": tiempo_ms,
+                "tokens_cache_lectura": reparto["tokens_cache_lectura"],
+                "tokens_cache_escritura": reparto["tokens_cache_escritura"]
+            }
+            self._marcar_llm_respuesta(resultados[salida_id], llm)
+        return resultados, estilo
+
+    async def _intentar_generacion_combinada(
+        self,
+        noticia: Any,
+        salidas: List[SalidaMaestro],
+        llm: LLMMaestro,
+        prompt: Optional[PromptMaestro] = None,
+        estilo: Optional[EstiloMaestro] = None
+    ) -> Tuple[Dict[int, Dict[str, Any]], Optional[EstiloMaestro]]:
+        """Modo combinado tolerante a fallos: ante cualquier error todas las salidas caen al modo por salida"""
+        try:
+            partes, estilo = await self._generar_combinado_async(noticia, salidas, llm, prompt, estilo)
+        except Exception as e:
+            logger.warning("Falló la generación combinada, se genera por salida: %s", e)
+            return {}, None
+        faltantes = [salida.nombre for salida in salidas if salida.id not in partes]
+        logger.info("🧩 Generación combinada: %s/%s salidas extraídas", len(partes), len(salidas))
+        if faltantes:
+            logger.info("🔁 Se generan por separado: %s", ', '.join(faltantes))
+        return partes, estilo
+
     # ==================== UTILIDADES ====================
     
     def _get_instrucciones_salida(self, salida: SalidaMaestro) -> str:
@@ -1255,7 +2837,7 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
         
         # Si no se pudo parsear el formato, usar fallbacks
         if not titulo_extraido or not contenido_extraido:
-            print(f"[WARNING] No se pudo parsear respuesta estructurada. Usando fallbacks.")
+            logger.warning("No se pudo parsear respuesta estructurada. Usando fallbacks.")
             
             # Fallback: usar las primeras líneas como título si no hay estructura
             lineas = contenido_respuesta.strip().split('\n')
@@ -1289,9 +2871,9 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
         if len(contenido_extraido) < 50:
             contenido_extraido = f"{titulo_extraido}\n\n{contenido_extraido}" if contenido_extraido else f"Contenido generado automáticamente para {titulo_extraido}"
         
-        print(f"[DEBUG] Parsing completado:")
-        print(f"[DEBUG] - Título extraído: '{titulo_extraido[:50]}...'")
-        print(f"[DEBUG] - Contenido extraído: {len(contenido_extraido)} caracteres")
+        logger.debug("Parsing completado:")
+        logger.debug("- Título extraído: '%s...'", titulo_extraido[:50])
+        logger.debug("- Contenido extraído: %s caracteres", len(contenido_extraido))
         
         return {
             "titulo": titulo_extraido,
@@ -1308,7 +2890,9 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
         modelo_usado: str,
         contenido_total: str,
         tipo_noticia: str = "feature",
-        complejidad: str = "media"
+        complejidad: str = "media",
+        tokens_cache_lectura: int = 0,
+        tokens_cache_escritura: int = 0
     ) -> Dict[str, Any]:
         """
         Calcula métricas de valor periodístico para administradores
@@ -1321,24 +2905,26 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
             contenido_total: Todo el contenido generado
             tipo_noticia: Tipo de noticia (breaking, feature, opinion)
             complejidad: Complejidad estimada (simple, media, compleja)
+            tokens_cache_lectura: Tokens de entrada servidos desde la caché de prompts
+            tokens_cache_escritura: Tokens de entrada escritos en la caché de prompts
             
         Returns:
             Dict con métricas calculadas
         """
         
-        print(f"📊 INICIO calcular_metricas_valor:")
-        print(f"  - tiempo_generacion_total: {tiempo_generacion_total}")
-        print(f"  - tokens_totales: {tokens_totales}")
-        print(f"  - cantidad_salidas: {cantidad_salidas}")
-        print(f"  - modelo_usado: {modelo_usado}")
-        print(f"  - contenido_total_len: {len(contenido_total)}")
+        logger.debug("📊 INICIO calcular_metricas_valor:")
+        logger.debug("  - tiempo_generacion_total: %s", tiempo_generacion_total)
+        logger.debug("  - tokens_totales: %s", tokens_totales)
+        logger.debug("  - cantidad_salidas: %s", cantidad_salidas)
+        logger.debug("  - modelo_usado: %s", modelo_usado)
+        logger.debug("  - contenido_total_len: %s", len(contenido_total))
         
         # Cálculos base
         palabras_totales = len(contenido_total.split())
         velocidad_palabras_segundo = palabras_totales / max(tiempo_generacion_total, 0.1)
         
-        print(f"  - palabras_totales: {palabras_totales}")
-        print(f"  - velocidad_palabras_segundo: {velocidad_palabras_segundo}")
+        logger.debug("  - palabras_totales: %s", palabras_totales)
+        logger.debug("  - velocidad_palabras_segundo: %s", velocidad_palabras_segundo)
         
         # Estimaciones de tiempo manual basadas en tipo y complejidad
         tiempos_base_manual = {
@@ -1365,24 +2951,34 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
         
         precio_modelo = precios_modelo.get(modelo_usado, precios_modelo["claude-3-5-sonnet-20241022"])
         
-        print(f"  - modelo_usado buscado: '{modelo_usado}'")
-        print(f"  - precio_modelo encontrado: {precio_modelo}")
+        logger.debug("  - modelo_usado buscado: '%s'", modelo_usado)
+        logger.debug("  - precio_modelo encontrado: %s", precio_modelo)
         
         # Estimación conservadora: 70% input, 30% output
         tokens_input = int(tokens_totales * 0.7)
         tokens_output = int(tokens_totales * 0.3)
         
-        print(f"  - tokens_input (70%): {tokens_input}")
-        print(f"  - tokens_output (30%): {tokens_output}")
+        logger.debug("  - tokens_input (70%%): %s", tokens_input)
+        logger.debug("  - tokens_output (30%%): %s", tokens_output)
+        
+        # Caché de prompts: las lecturas cuestan ~10% del precio de entrada y las escrituras ~125%
+        tokens_cache = min(tokens_input, tokens_cache_lectura + tokens_cache_escritura)
+        tokens_input_equivalentes = (
+            (tokens_input - tokens_cache) +
+            tokens_cache_lectura * 0.1 +
+            tokens_cache_escritura * 1.25
+        )
+        logger.debug("  - tokens_cache_lectura: %s", tokens_cache_lectura)
+        logger.debug("  - tokens_cache_escritura: %s", tokens_cache_escritura)
         
         costo_generacion = (
-            (tokens_input / 1000) * precio_modelo["input"] +
+            (tokens_input_equivalentes / 1000) * precio_modelo["input"] +
             (tokens_output / 1000) * precio_modelo["output"]
         )
         
-        print(f"  - costo_input: {(tokens_input / 1000) * precio_modelo['input']}")
-        print(f"  - costo_output: {(tokens_output / 1000) * precio_modelo['output']}")
-        print(f"  - costo_generacion TOTAL: {costo_generacion}")
+        logger.debug("  - costo_input: %s", (tokens_input_equivalentes / 1000) * precio_modelo['input'])
+        logger.debug("  - costo_output: %s", (tokens_output / 1000) * precio_modelo['output'])
+        logger.debug("  - costo_generacion TOTAL: %s", costo_generacion)
         
         # Costo manual: $15/hora promedio periodista
         costo_manual = (tiempo_manual_total / 60) * 15.0
@@ -1408,6 +3004,8 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
             "tiempo_estimado_manual": tiempo_manual_total,
             "ahorro_tiempo_minutos": int(ahorro_tiempo_minutos),
             "tokens_total": tokens_totales,
+            "tokens_cache_lectura": tokens_cache_lectura,
+            "tokens_cache_escritura": tokens_cache_escritura,
             "costo_generacion": round(costo_generacion, 4),
             "costo_estimado_manual": round(costo_manual, 2),
             "ahorro_costo": round(ahorro_costo, 2),
@@ -1420,11 +3018,11 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
             "complejidad_estimada": complejidad
         }
         
-        print(f"📊 FIN calcular_metricas_valor - RESULTADO:")
-        print(f"  - tokens_total: {resultado['tokens_total']}")
-        print(f"  - costo_generacion: {resultado['costo_generacion']}")
-        print(f"  - costo_estimado_manual: {resultado['costo_estimado_manual']}")
-        print(f"  - roi_porcentaje: {resultado['roi_porcentaje']}")
+        logger.debug("📊 FIN calcular_metricas_valor - RESULTADO:")
+        logger.debug("  - tokens_total: %s", resultado['tokens_total'])
+        logger.debug("  - costo_generacion: %s", resultado['costo_generacion'])
+        logger.debug("  - costo_estimado_manual: %s", resultado['costo_estimado_manual'])
+        logger.debug("  - roi_porcentaje: %s", resultado['roi_porcentaje'])
         
         return resultado
     
@@ -1439,20 +3037,20 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
             ).order_by(MetricasValorPeriodistico.created_at.desc()).all()
             
             if len(metricas) > 1:
-                print(f"🧹 Limpiando {len(metricas)-1} métricas duplicadas para noticia {noticia_id}")
+                logger.info("🧹 Limpiando %s métricas duplicadas para noticia %s", len(metricas)-1, noticia_id)
                 
                 # Mantener solo la más reciente, eliminar el resto
                 metricas_a_eliminar = metricas[1:]  # Todas excepto la primera (más reciente)
                 
                 for metrica in metricas_a_eliminar:
-                    print(f"🗑️ Eliminando métrica duplicada ID: {metrica.id}")
+                    logger.debug("🗑️ Eliminando métrica duplicada ID: %s", metrica.id)
                     self.db.delete(metrica)
                 
                 self.db.commit()
-                print(f"✅ Métricas duplicadas eliminadas. Quedó solo ID: {metricas[0].id}")
+                logger.info("✅ Métricas duplicadas eliminadas. Quedó solo ID: %s", metricas[0].id)
                 
         except Exception as e:
-            print(f"⚠️ Error limpiando métricas duplicadas: {e}")
+            logger.warning("⚠️ Error limpiando métricas duplicadas: %s", e)
             self.db.rollback()
 
     def guardar_metricas_valor(
@@ -1469,21 +3067,21 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
         """
         import uuid
         save_id = str(uuid.uuid4())[:8]
-        print(f"💾 INICIO guardar_metricas_valor - Save ID: {save_id}")
-        print(f"💾 Input metricas dict keys: {list(metricas.keys())}")
-        print(f"💾 Guardando para noticia_id={noticia_id}")
+        logger.debug("💾 INICIO guardar_metricas_valor - Save ID: %s", save_id)
+        logger.debug("💾 Input metricas dict keys: %s", list(metricas.keys()))
+        logger.debug("💾 Guardando para noticia_id=%s", noticia_id)
         
         # Validar que tenga noticia_id
         if not noticia_id:
-            print(f"⚠️ ERROR: Necesita noticia_id para guardar métricas")
+            logger.warning("⚠️ ERROR: Necesita noticia_id para guardar métricas")
             return None
-        print(f"💾 tokens_total: {metricas.get('tokens_total', 'MISSING')}")
-        print(f"💾 costo_generacion: {metricas.get('costo_generacion', 'MISSING')}")
+        logger.debug("💾 tokens_total: %s", metricas.get('tokens_total', 'MISSING'))
+        logger.debug("💾 costo_generacion: %s", metricas.get('costo_generacion', 'MISSING'))
         
         try:
-            print(f"🔎 Dump metricas dict antes de asignar:")
+            logger.debug("🔎 Dump metricas dict antes de asignar:")
             for k, v in metricas.items():
-                print(f"    {k}: {v} (type={type(v)})")
+                logger.debug("    %s: %s (type=%s)", k, v, type(v))
 
                 metrica_obj = MetricasValorPeriodistico(
                     noticia_id=noticia_id,
@@ -1492,6 +3090,8 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
                     tiempo_estimado_manual=metricas.get("tiempo_estimado_manual", 30),
                     ahorro_tiempo_minutos=metricas.get("ahorro_tiempo_minutos", 0),
                     tokens_total=metricas.get("tokens_total", 0),
+                    tokens_cache_lectura=metricas.get("tokens_cache_lectura", 0),
+                    tokens_cache_escritura=metricas.get("tokens_cache_escritura", 0),
                     costo_generacion=metricas.get("costo_generacion", 0.0),
                     costo_estimado_manual=metricas.get("costo_estimado_manual", 0),
                     ahorro_costo=metricas.get("ahorro_costo", 0.0),
@@ -1505,20 +3105,20 @@ Con base en la noticia anterior, genera el contenido optimizado para {salida.nom
                     roi_porcentaje=metricas.get("roi_porcentaje", 0.0)
                 )
 
-            print(f"🔎 Dump metrica_obj antes de commit:")
-            print(f"    tokens_total: {metrica_obj.tokens_total} (type={type(metrica_obj.tokens_total)})")
-            print(f"    costo_generacion: {metrica_obj.costo_generacion} (type={type(metrica_obj.costo_generacion)})")
+            logger.debug("🔎 Dump metrica_obj antes de commit:")
+            logger.debug("    tokens_total: %s (type=%s)", metrica_obj.tokens_total, type(metrica_obj.tokens_total))
+            logger.debug("    costo_generacion: %s (type=%s)", metrica_obj.costo_generacion, type(metrica_obj.costo_generacion))
 
             self.db.add(metrica_obj)
             self.db.commit()
             self.db.refresh(metrica_obj)
 
-            print(f"💾 FIN guardar_metricas_valor - Save ID: {save_id} - BD ID: {metrica_obj.id}")
-            print(f"💾 Verificación post-commit: tokens={metrica_obj.tokens_total}, costo={metrica_obj.costo_generacion}")
+            logger.debug("💾 FIN guardar_metricas_valor - Save ID: %s - BD ID: %s", save_id, metrica_obj.id)
+            logger.debug("💾 Verificación post-commit: tokens=%s, costo=%s", metrica_obj.tokens_total, metrica_obj.costo_generacion)
             return metrica_obj
 
         except Exception as e:
-            print(f"❌ Error guardando métricas de valor (Save ID: {save_id}): {e}")
+            logger.error("❌ Error guardando métricas de valor (Save ID: %s): %s", save_id, e)
             self.db.rollback()
             return None
     
@@ -0,0 +1,99 @@
+"""
+Huella de las entradas de cada NoticiaSalida (regeneración incremental)
+Una salida cuyas entradas no cambiaron no se vuelve a generar
+"""
+import hashlib
+import json
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+COMPONENTES = ("noticia", "prompt", "estilo", "salida", "modelo", "ajustes")
+SIN_VALOR = "-"
+
+_lock = Lock()
+_estadisticas = {
+    "omitidas": 0,
+    "regeneradas": 0,
+    "cambios": {componente: 0 for componente in COMPONENTES}
+}
+
+
+def _hash(valor: Any) -> str:
+    texto = valor if isinstance(valor, str) else json.dumps(valor, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def calcular(
+    noticia: Any,
+    salida: Any,
+    llm: Any,
+    version_prompt: Any = None,
+    version_estilo: Any = None,
+    ajustes: Optional[Dict[str, Any]] = None
+) -> Dict[str, str]:
+    """
+    Huella por componente de una generación
+
+    Args:
+        version_prompt / version_estilo: Identifican la versión efectiva (None = sin
+            prompt/estilo); ver GeneradorIA._huella_entradas
+        ajustes: Parámetros efectivos que cambian el prompt sin tocar las plantillas
+            (top_k de estilo, presupuesto de tokens)
+    """
+    seccion = getattr(noticia, 'seccion', None)
+    fecha = getattr(noticia, 'fecha', None)
+    return {
+        "noticia": _hash([
+            getattr(noticia, 'titulo', None),
+            getattr(noticia, 'contenido', None),
+            getattr(noticia, 'autor_nombre', None),
+            getattr(seccion, 'nombre', None),
+            fecha.strftime("%d/%m/%Y") if fecha else None
+        ]),
+        "prompt": _hash(version_prompt) if version_prompt is not None else SIN_VALOR,
+        "estilo": _hash(version_estilo) if version_estilo is not None else SIN_VALOR,
+        "salida": _hash([
+            getattr(salida, 'tipo_salida', None),
+            getattr(salida, 'nombre', None),
+            getattr(salida, 'configuracion', None) or {}
+        ]),
+        "modelo": getattr(llm, 'modelo_id', None) or SIN_VALOR,
+        "ajustes": _hash(ajustes) if ajustes else SIN_VALOR
+    }
+
+
+def diferencias(anterior: Optional[Dict[str, str]], actual: Dict[str, str]) -> List[str]:
+    """Componentes que cambiaron; sin huella anterior (salida antigua) cuentan todos"""
+    if not anterior:
+        return list(COMPONENTES)
+    return [componente for componente in COMPONENTES if anterior.get(componente) != actual.get(componente)]
+
+
+def registrar(cambios: List[str], omitida: bool = False) -> None:
+    """Cuenta una salida omitida (sin cambios) o regenerada y qué entradas cambiaron"""
+    with _lock:
+        if omitida:
+            _estadisticas["omitidas"] += 1
+            return
+        _estadisticas["regeneradas"] += 1
+        for componente in cambios:
+            _estadisticas["cambios"][componente] += 1
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    with _lock:
+        total = _estadisticas["omitidas"] + _estadisticas["regeneradas"]
+        return {
+            "omitidas": _estadisticas["omitidas"],
+            "regeneradas": _estadisticas["regeneradas"],
+            "porcentaje_omitidas": round(100 * _estadisticas["omitidas"] / total, 1) if total else 0.0,
+            "cambios": dict(_estadisticas["cambios"])
+        }
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        _estadisticas["omitidas"] = 0
+        _estadisticas["regeneradas"] = 0
+        for componente in COMPONENTES:
+            _estadisticas["cambios"][componente] = 0
@@ -0,0 +1,291 @@
+"""
+Perfilador por muestreo de pilas del proceso (sin cProfile)
+Agrega las pilas en formato "collapsed stack" (flamegraph.pl, speedscope)
+"""
+import asyncio
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CABECERA_PERFILAR = "X-Perfilar"
+CABECERA_RESUMEN = "X-Perfil-Resumen"
+MAX_PROFUNDIDAD = 128
+# Perfiles por petición simultáneos por worker (cada uno es un hilo muestreador)
+MAX_PERFILES_PETICION = 2
+
+# Frame más interno de un hilo que espera: (archivo, función)
+_INACTIVOS = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("handlers.py", "_monitor")
+}
+
+_lock = Lock()
+_estadisticas = {"perfiles": 0, "perfiles_peticion": 0, "peticiones_omitidas": 0}
+_en_curso = {"proceso": False, "peticiones": 0}
+
+
+def _contar(clave: str, n: int = 1) -> None:
+    with _lock:
+        _estadisticas[clave] += n
+
+
+def _archivo(ruta: str) -> str:
+    """Ruta legible: relativa al backend, a site-packages o a la stdlib"""
+    if ruta.startswith(_RAIZ) and "site-packages" not in ruta:
+        return os.path.relpath(ruta, _RAIZ)
+    if "site-packages" in ruta:
+        return ruta.split("site-packages" + os.sep, 1)[-1]
+    partes = ruta.split(os.sep)
+    return os.sep.join(partes[-2:]) if len(partes) > 1 else ruta
+
+
+def apilar(frame: Any, inactivos: bool = False) -> Optional[List[str]]:
+    """
+    Pila de un frame de la más externa a la más interna, como "función (archivo:línea)"
+
+    Returns:
+        Lista de frames, o None si el hilo está esperando y no se piden inactivos
+    """
+    if not inactivos and (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _INACTIVOS:
+        return None
+    pila = []
+    actual = frame
+    while actual is not None and len(pila) < MAX_PROFUNDIDAD:
+        codigo = actual.f_code
+        pila.append(f"{codigo.co_name} ({_archivo(codigo.co_filename)}:{actual.f_lineno})")
+        actual = actual.f_back
+    pila.reverse()
+    return pila
+
+
+class Perfil:
+    """Hilo que muestrea las pilas del proceso hasta detener()"""
+
+    __slots__ = ("intervalo_s", "filtro", "inactivos", "pilas", "muestras", "inicio", "duracion_s", "_hilo", "_detener")
+
+    def __init__(
+        self,
+        intervalo_ms: Optional[float] = None,
+        filtro: Optional[Callable[[int, Any], bool]] = None,
+        inactivos: bool = False
+    ):
+        """
+        Args:
+            intervalo_ms: tiempo entre muestras (por defecto PERFILADOR_INTERVALO_MS)
+            filtro: (id del hilo, frame) -> si la pila cuenta; sin él, todos los hilos
+            inactivos: incluir hilos que esperan
+        """
+        self.intervalo_s = max(0.001, (intervalo_ms or settings.PERFILADOR_INTERVALO_MS) / 1000)
+        self.filtro = filtro
+        self.inactivos = inactivos
+        self.pilas: Counter = Counter()
+        self.muestras = 0
+        self.inicio = 0.0
+        self.duracion_s = 0.0
+        self._hilo: Optional[threading.Thread] = None
+        self._detener = threading.Event()
+
+    def iniciar(self) -> "Perfil":
+        self.inicio = time.perf_counter()
+        self._hilo = threading.Thread(target=self._muestrear, name="perfilador", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self) -> "Perfil":
+        """Para el muestreo (espera a lo sumo una muestra en curso); idempotente"""
+        if not self._detener.is_set():
+            self._detener.set()
+            if self._hilo is not None:
+                self._hilo.join()
+            self.duracion_s = time.perf_counter() - self.inicio
+        return self
+
+    def _muestrear(self) -> None:
+        propio = threading.get_ident()
+        while not self._detener.wait(self.intervalo_s):
+            nombres = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == propio or (self.filtro is not None and not self.filtro(ident, frame)):
+                    continue
+                pila = apilar(frame, self.inactivos)
+                if pila is not None:
+                    self.pilas[";".join([nombres.get(ident, str(ident)), *pila])] += 1
+            self.muestras += 1
+            del frames
+
+    def colapsado(self) -> str:
+        """Formato collapsed stack: "hilo;frame;...;frame N" por línea, de más a menos muestras"""
+        return "".join(f"{pila} {n}\n" for pila, n in sorted(list(self.pilas.items()), key=lambda item: -item[1]))
+
+    def resumen(self, limite: int = 5) -> Dict[str, Any]:
+        """Muestras, duración y las funciones con más muestras propias (frame más interno)"""
+        propias: Counter = Counter()
+        # Copia atómica: el hilo muestreador puede seguir añadiendo pilas
+        for pila, n in list(self.pilas.items()):
+            propias[pila.rsplit(";", 1)[-1]] += n
+        total = sum(propias.values())
+        return {
+            "muestras": self.muestras,
+            "pilas": total,
+            "duracion_ms": round(self.duracion_s * 1000, 1),
+            "pid": os.getpid(),
+            "top": [(frame, round(100.0 * n / total, 1)) for frame, n in propias.most_common(limite)]
+        }
+
+
+# ==================== PERFIL DEL PROCESO ====================
+
+class PerfilEnCurso(RuntimeError):
+    """Ya hay un perfil del proceso en marcha en este worker"""
+
+
+async def perfilar_proceso(
+    segundos: float,
+    intervalo_ms: Optional[float] = None,
+    inactivos: bool = False
+) -> Perfil:
+    """
+    Muestrea todo el proceso durante `segundos` sin ocupar el loop (uno a la vez por worker)
+
+    Raises:
+        ValueError: duración fuera de (0, PERFILADOR_MAX_S]
+        PerfilEnCurso: otro perfil del proceso en curso
+    """
+    if not 0 < segundos <= settings.PERFILADOR_MAX_S:
+        raise ValueError(f"segundos debe estar entre 0 y {settings.PERFILADOR_MAX_S}")
+    with _lock:
+        if _en_curso["proceso"]:
+            raise PerfilEnCurso("Ya hay un perfil en curso en este worker")
+        _en_curso["proceso"] = True
+        _estadisticas["perfiles"] += 1
+    perfil = Perfil(intervalo_ms, inactivos=inactivos).iniciar()
+    try:
+        await asyncio.sleep(segundos)
+    finally:
+        perfil.detener()
+        with _lock:
+            _en_curso["proceso"] = False
+    logger.info("🔬 Perfil del proceso %d: %d muestras en %.1f s", os.getpid(), perfil.muestras, perfil.duracion_s)
+    return perfil
+
+
+# ==================== PERFIL POR PETICIÓN ====================
+
+def _contiene(frame: Any, condicion: Callable[[Any], bool]) -> bool:
+    while frame is not None:
+        if condicion(frame):
+            return True
+        frame = frame.f_back
+    return False
+
+
+def filtro_peticion(loop_hilo: int, frame_peticion: Any, scope: Dict[str, Any]) -> Callable[[int, Any], bool]:
+    """
+    Pilas de una petición: en el hilo del loop, las que pasan por su frame del
+    middleware; en otros hilos, las que ejecutan su endpoint (rutas def; otras
+    peticiones simultáneas al mismo endpoint también cuentan)
+    """
+    def filtro(ident: int, frame: Any) -> bool:
+        if ident == loop_hilo:
+            return _contiene(frame, lambda f: f is frame_peticion)
+        codigo = getattr(getattr(scope.get("route"), "endpoint", None), "__code__", None)
+        return codigo is not None and _contiene(frame, lambda f: f.f_code is codigo)
+    return filtro
+
+
+def _autorizado(scope: Dict[str, Any]) -> bool:
+    clave = settings.PERFILADOR_CLAVE
+    if not clave:
+        return False
+    cabecera = CABECERA_PERFILAR.lower().encode("latin-1")
+    recibido = next((valor for nombre, valor in scope.get("headers", []) if nombre == cabecera), None)
+    return recibido is not None and hmac.compare_digest(recibido, clave.encode("utf-8"))
+
+
+def formatear_resumen(resumen: Dict[str, Any]) -> str:
+    """Valor de X-Perfil-Resumen: "muestras=43 duracion_ms=431.2 pid=12 | 38.0% f (a.py:10), ..." """
+    top = ", ".join(f"{porcentaje}% {frame}" for frame, porcentaje in resumen["top"])
+    return f"muestras={resumen['pilas']} duracion_ms={resumen['duracion_ms']} pid={resumen['pid']} | {top}"
+
+
+class MiddlewarePerfil:
+    """Middleware ASGI: perfila la petición si trae X-Perfilar con la PERFILADOR_CLAVE"""
+
+    __slots__ = ("app",)
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _autorizado(scope):
+            await self.app(scope, receive, send)
+            return
+
+        with _lock:
+            if _en_curso["peticiones"] >= MAX_PERFILES_PETICION:
+                _estadisticas["peticiones_omitidas"] += 1
+                omitir = True
+            else:
+                _en_curso["peticiones"] += 1
+                _estadisticas["perfiles_peticion"] += 1
+                omitir = False
+        if omitir:
+            await self.app(scope, receive, send)
+            return
+
+        filtro = filtro_peticion(threading.get_ident(), sys._getframe(), scope)
+        perfil = Perfil(filtro=filtro).iniciar()
+
+        async def _send(mensaje):
+            if mensaje["type"] == "http.response.start":
+                # El resumen cubre hasta las cabeceras: toda la petición salvo en streaming
+                resumen = formatear_resumen(perfil.resumen())
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [
+                    (CABECERA_RESUMEN.lower().encode("latin-1"), resumen.encode("latin-1", "replace"))
+                ]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            perfil.detener()
+            with _lock:
+                _en_curso["peticiones"] -= 1
+            logger.info(
+                "🔬 Perfil de %s %s (%d muestras, pid %d):\n%s",
+                scope["method"], scope["path"], perfil.muestras, os.getpid(), perfil.colapsado()
+            )
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "perfil_proceso_en_curso": _en_curso["proceso"],
+            "perfiles_peticion_en_curso": _en_curso["peticiones"],
+            "perfil_por_peticion": bool(settings.PERFILADOR_CLAVE),
+            "intervalo_ms": settings.PERFILADOR_INTERVALO_MS,
+            "pid": os.getpid(),
+            **_estadisticas
+        }
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
@@ -0,0 +1,116 @@
+"""
+Caché de plantillas compiladas de Prompt y Estilo
+Evita re-ordenar y re-unir los PromptItem / EstiloItem en cada generación: el texto
+estático se arma una sola vez por versión y las variables {nombre} quedan
+pre-parseadas, de modo que renderizar es una sola pasada sobre segmentos.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, List
+import re
+
+# Mismo patrón de variable que usa procesar_prompt
+PATRON_VARIABLE = re.compile(r'\{([a-zA-Z_][a-zA-Z0-9_]*)\}')
+
+# Máximo de entradas (prompts + estilos) en memoria
+MAX_ENTRADAS = 256
+
+
+class PlantillaCompilada:
+    """
+    Texto de prompt partido en literales y variables
+
+    literales tiene siempre un elemento más que variables:
+    literales[0] + valor(variables[0]) + literales[1] + ... + literales[-1]
+    """
+    __slots__ = ("texto", "literales", "variables")
+
+    def __init__(self, texto: str):
+        self.texto = texto
+        self.literales: List[str] = []
+        self.variables: List[str] = []
+        posicion = 0
+        for match in PATRON_VARIABLE.finditer(texto):
+            self.literales.append(texto[posicion:match.start()])
+            self.variables.append(match.group(1))
+            posicion = match.end()
+        self.literales.append(texto[posicion:])
+
+    def renderizar(self, valores: Dict[str, Any]) -> str:
+        """
+        Sustituye las variables en una sola pasada
+
+        Raises:
+            ValueError: si falta alguna variable usada por la plantilla
+        """
+        faltantes = [nombre for nombre in self.variables if nombre not in valores]
+        if faltantes:
+            raise ValueError(f"Variables faltantes en el prompt: {', '.join(faltantes)}")
+
+        partes = [self.literales[0]]
+        for nombre, literal in zip(self.variables, self.literales[1:]):
+            partes.append(str(valores[nombre]))
+            partes.append(literal)
+        return "".join(partes)
+
+
+# {(tipo, id): (version, valor)}
+_cache: "OrderedDict[tuple[str, int], tuple[Any, Any]]" = OrderedDict()
+_lock = Lock()
+_estadisticas = {"aciertos": 0, "fallos": 0}
+
+
+def obtener(tipo: str, objeto_id: int, version: Any, construir: Callable[[], Any]) -> Any:
+    """
+    Devuelve el valor compilado para (tipo, id) si la versión coincide; si no, lo construye
+
+    Args:
+        tipo: 'prompt', 'estilo', 'partes_estilo' o 'indice_estilo'
+        objeto_id: id del PromptMaestro / EstiloMaestro
+        version: huella de la versión actual (ver GeneradorIA._version_plantilla)
+        construir: función que compila el valor cuando no está en caché
+    """
+    clave = (tipo, objeto_id)
+    with _lock:
+        entrada = _cache.get(clave)
+        if entrada is not None and entrada[0] == version:
+            _cache.move_to_end(clave)
+            _estadisticas["aciertos"] += 1
+            return entrada[1]
+        _estadisticas["fallos"] += 1
+
+    valor = construir()
+    with _lock:
+        _cache[clave] = (version, valor)
+        _cache.move_to_end(clave)
+        while len(_cache) > MAX_ENTRADAS:
+            _cache.popitem(last=False)
+    return valor
+
+
+def invalidar_prompt(prompt_id: int) -> None:
+    """Descarta la plantilla compilada de un prompt (llamar tras escribir el prompt o sus items)"""
+    with _lock:
+        _cache.pop(("prompt", prompt_id), None)
+
+
+def invalidar_estilo(estilo_id: int) -> None:
+    """Descarta el bloque compilado, las partes y el índice de reglas de un estilo (llamar tras escribir el estilo o sus items)"""
+    with _lock:
+        _cache.pop(("estilo", estilo_id), None)
+        _cache.pop(("partes_estilo", estilo_id), None)
+        _cache.pop(("indice_estilo", estilo_id), None)
+
+
+def limpiar() -> None:
+    """Vacía la caché completa"""
+    with _lock:
+        _cache.clear()
+        _estadisticas["aciertos"] = 0
+        _estadisticas["fallos"] = 0
+
+
+def get_estadisticas() -> Dict[str, int]:
+    """Aciertos, fallos y entradas actuales de la caché"""
+    with _lock:
+        return {**_estadisticas, "entradas": len(_cache)}
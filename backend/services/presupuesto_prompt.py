@@ -0,0 +1,253 @@
+"""
+Presupuesto de tokens del prompt enviado al LLM
+
+Sustituye al recorte por caracteres (MAX_PROMPT_CHARS), que podía cortar la noticia
+o las instrucciones de la salida a mitad de frase. El prompt se describe como
+segmentos con prioridad (instrucciones de la salida, prompt de la sección, noticia,
+directivas del estilo, EstiloItem) y, si no cabe en el presupuesto del LLM, se
+descartan o recortan primero los de menor prioridad:
+
+    EstiloItem / reglas relevantes (del último o menos relevante al primero) → items
+    incluir_siempre → directivas del estilo → cuerpo de la noticia
+    (recortado en un fin de frase, nunca por debajo de MIN_TOKENS_NOTICIA)
+
+El prompt de la sección y las instrucciones de la salida no se tocan.
+
+Los tokens se cuentan con tiktoken si está instalado (cl100k_base, buena
+aproximación también para Claude y Gemini) y si no con CARACTERES_POR_TOKEN.
+Los conteos de textos estables (items, directivas, instrucciones) se cachean.
+"""
+import hashlib
+import logging
+import math
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from services import runtime_settings
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CARACTERES_POR_TOKEN = 4
+MIN_TOKENS_NOTICIA = 200
+MAX_CONTEOS_CACHEADOS = 5000
+MARCA_RECORTE = " […]"
+
+# Menor prioridad = se sacrifica antes
+PRIORIDAD_ESTILO_ITEM = 10
+PRIORIDAD_ESTILO_FIJO = 15
+PRIORIDAD_ESTILO_CONFIG = 20
+PRIORIDAD_NOTICIA = 30
+PRIORIDAD_PROMPT = 40
+PRIORIDAD_SALIDA = 50
+
+_codificador = None
+_conteos: "OrderedDict[tuple, int]" = OrderedDict()
+_lock = Lock()
+_estadisticas = {
+    "planificados": 0,
+    "ajustados": 0,
+    "excedidos": 0,
+    "tokens_recortados": 0,
+    "segmentos_descartados": 0,
+    "conteos_cacheados": 0,
+    "conteos_calculados": 0
+}
+
+
+def _get_codificador():
+    """Codificador de tiktoken (None si no está instalado o no se pudo cargar)"""
+    global _codificador
+    if _codificador is None and TIKTOKEN_AVAILABLE:
+        try:
+            _codificador = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:  # p. ej. sin acceso para descargar el vocabulario
+            logger.warning("⚠️ tiktoken no disponible, se estiman los tokens por caracteres: %s", e)
+            _codificador = False
+    return _codificador or None
+
+
+def tokenizador() -> str:
+    return "tiktoken:cl100k_base" if _get_codificador() else f"aproximado:{CARACTERES_POR_TOKEN}_caracteres"
+
+
+def contar_tokens(texto: Optional[str]) -> int:
+    """Tokens de un texto"""
+    if not texto:
+        return 0
+    codificador = _get_codificador()
+    if codificador:
+        return len(codificador.encode(texto, disallowed_special=()))
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def contar_tokens_cacheado(tipo: str, item_id: Any, texto: Optional[str]) -> int:
+    """
+    Tokens de un texto estable (EstiloItem, directivas, instrucciones de salida)
+
+    La clave incluye un hash del texto: editar el item invalida su conteo sin
+    depender de updated_at.
+    """
+    if not texto:
+        return 0
+    clave = (tipo, item_id, hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16])
+    with _lock:
+        if clave in _conteos:
+            _conteos.move_to_end(clave)
+            _estadisticas["conteos_cacheados"] += 1
+            return _conteos[clave]
+    tokens = contar_tokens(texto)
+    with _lock:
+        _conteos[clave] = tokens
+        _estadisticas["conteos_calculados"] += 1
+        while len(_conteos) > MAX_CONTEOS_CACHEADOS:
+            _conteos.popitem(last=False)
+    return tokens
+
+
+def recortar_texto(texto: str, max_tokens: int) -> str:
+    """Recorta el texto a max_tokens, retrocediendo al último fin de frase o párrafo"""
+    if contar_tokens(texto) <= max_tokens:
+        return texto
+    limite = max_tokens - contar_tokens(MARCA_RECORTE)
+    if limite <= 0:
+        return ""
+    codificador = _get_codificador()
+    if codificador:
+        corte = codificador.decode(codificador.encode(texto, disallowed_special=())[:limite])
+    else:
+        corte = texto[:limite * CARACTERES_POR_TOKEN]
+    fin = max(corte.rfind(". "), corte.rfind(".\n"), corte.rfind("\n\n"))
+    if fin >= len(corte) * 0.8:  # solo si no se pierde demasiado texto
+        corte = corte[:fin + 1]
+    return corte.rstrip() + MARCA_RECORTE
+
+
+class Segmento:
+    """
+    Parte del prompt para el planificador
+
+    Args:
+        minimo: Tokens mínimos al recortar (None = no se recorta, solo se descarta)
+        obligatorio: No se descarta nunca
+        veces: Apariciones del texto en el prompt (la noticia puede ir repetida)
+    """
+
+    __slots__ = ("nombre", "texto", "prioridad", "tokens", "minimo", "obligatorio", "veces", "descartado", "recortado")
+
+    def __init__(
+        self,
+        nombre: str,
+        texto: str,
+        prioridad: int,
+        tokens: Optional[int] = None,
+        minimo: Optional[int] = None,
+        obligatorio: bool = False,
+        veces: int = 1
+    ):
+        self.nombre = nombre
+        self.texto = texto
+        self.prioridad = prioridad
+        self.veces = max(1, veces)
+        self.tokens = (contar_tokens(texto) if tokens is None else tokens) * self.veces
+        self.minimo = minimo
+        self.obligatorio = obligatorio
+        self.descartado = False
+        self.recortado = False
+
+
+class PartesEstilo:
+    """
+    Directivas e items de un estilo con sus tokens ya contados
+
+    Se cachea por versión del estilo (services/plantillas.py): cada generación arma
+    sus Segmento sin recorrer, ordenar ni contar el manual.
+    """
+
+    __slots__ = ("directivas", "tokens_directivas", "items")
+
+    def __init__(self, directivas: List[str], tokens_directivas: int, items: List[Tuple[Any, str, int]]):
+        self.directivas = directivas
+        self.tokens_directivas = tokens_directivas
+        # (id del item, texto, tokens) en el orden del estilo
+        self.items = items
+
+
+def planificar(segmentos: List[Segmento], presupuesto: int) -> Dict[str, Any]:
+    """
+    Ajusta los segmentos (in situ) para que la suma de tokens quepa en el presupuesto
+
+    Con igual prioridad se sacrifica antes el último segmento de la lista.
+
+    Returns:
+        Informe con tokens antes/después, segmentos descartados y recortados y si cupo
+    """
+    total = sum(s.tokens for s in segmentos)
+    informe = {"presupuesto": presupuesto, "tokens": total, "descartados": [], "recortados": []}
+    orden = sorted(range(len(segmentos)), key=lambda i: (segmentos[i].prioridad, -i))
+    for i in orden:
+        exceso = total - presupuesto
+        if exceso <= 0:
+            break
+        s = segmentos[i]
+        if s.descartado or not s.tokens:
+            continue
+        if s.minimo is not None and s.tokens > s.minimo * s.veces:
+            objetivo = max(s.minimo, (s.tokens - exceso) // s.veces)
+            s.texto = recortar_texto(s.texto, objetivo)
+            nuevos = contar_tokens(s.texto) * s.veces
+            total -= s.tokens - nuevos
+            s.tokens, s.recortado = nuevos, True
+            informe["recortados"].append(s.nombre)
+        elif not s.obligatorio:
+            total -= s.tokens
+            s.texto, s.tokens, s.descartado = "", 0, True
+            informe["descartados"].append(s.nombre)
+
+    informe["tokens_finales"] = total
+    informe["ajustado"] = total <= presupuesto
+    with _lock:
+        _estadisticas["planificados"] += 1
+        _estadisticas["ajustados" if informe["ajustado"] else "excedidos"] += 1
+        _estadisticas["tokens_recortados"] += informe["tokens"] - total
+        _estadisticas["segmentos_descartados"] += len(informe["descartados"])
+    return informe
+
+
+def get_presupuesto_global() -> int:
+    """MAX_PROMPT_TOKENS: override runtime del admin o valor de config"""
+    override = runtime_settings.get_max_prompt_tokens()
+    return int(override if override is not None else settings.MAX_PROMPT_TOKENS)
+
+
+def get_presupuesto(llm: Any = None) -> int:
+    """Presupuesto del LLM (configuracion['max_tokens_prompt']) o el global"""
+    config = getattr(llm, 'configuracion', None) or {}
+    try:
+        propio = int(config.get('max_tokens_prompt') or 0)
+    except (TypeError, ValueError):
+        propio = 0
+    return propio if propio > 0 else get_presupuesto_global()
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    with _lock:
+        estadisticas = dict(_estadisticas)
+        estadisticas["conteos_en_cache"] = len(_conteos)
+    estadisticas["tokenizador"] = tokenizador()
+    return estadisticas
+
+
+def reiniciar_estadisticas() -> None:
+    """Pone los contadores a cero y vacía la caché de conteos"""
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
+        _conteos.clear()
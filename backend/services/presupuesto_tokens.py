@@ -0,0 +1,336 @@
+"""
+Presupuesto diario de tokens por LLM y por usuario
+Contadores atómicos por día en Redis o en la tabla consumo_tokens_diario
+"""
+import asyncio
+import logging
+from datetime import date
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from core.cache import get_cache_service
+from core.database import SessionLocal
+from models.orm_models import ConsumoTokensDiario, LLMMaestro
+from services import proveedores_llm
+from services import presupuesto_prompt
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_CLAVE = "tokens:dia:"
+TTL_CLAVE_S = 2 * 24 * 3600  # el día en curso más margen para el volcado
+
+AMBITO_LLM = "llm"
+AMBITO_USUARIO = "usuario"
+
+# Consumos registrados desde código síncrono, pendientes de pasar a los contadores
+_pendientes: Dict[Tuple[str, int, date], int] = {}
+_lock = Lock()
+_estadisticas = {"reservas": 0, "rechazos": 0, "degradaciones": 0, "volcados": 0}
+
+
+class PresupuestoExcedido(Exception):
+    """La generación superaría el límite diario del LLM o del usuario"""
+
+    def __init__(self, ambito: str, entidad_id: int, limite: int, usados: int):
+        self.ambito = ambito
+        self.entidad_id = entidad_id
+        self.limite = limite
+        self.usados = usados
+        quien = "del LLM" if ambito == AMBITO_LLM else "del usuario"
+        super().__init__(f"Límite diario de tokens {quien} alcanzado ({usados}/{limite})")
+
+
+def _contar(clave: str) -> None:
+    with _lock:
+        _estadisticas[clave] += 1
+
+
+def contar_degradacion() -> None:
+    """Una generación pasó a un LLM de respaldo por falta de presupuesto"""
+    _contar("degradaciones")
+
+
+# ==================== CONTADORES ====================
+
+class ContadorRedis:
+    """Contadores diarios en Redis (INCRBY atómico; la clave expira sola)"""
+
+    def __init__(self, redis: Any):
+        self.redis = redis
+
+    @staticmethod
+    def _clave(ambito: str, entidad_id: int, fecha: date) -> str:
+        return f"{PREFIJO_CLAVE}{ambito}:{entidad_id}:{fecha:%Y%m%d}"
+
+    async def incrementar(self, ambito: str, entidad_id: int, fecha: date, tokens: int) -> int:
+        clave = self._clave(ambito, entidad_id, fecha)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incrby(clave, tokens)
+            pipe.expire(clave, TTL_CLAVE_S)
+            total, _ = await pipe.execute()
+        return int(total)
+
+    async def leer(self, ambito: str, entidad_id: int, fecha: date) -> int:
+        return int(await self.redis.get(self._clave(ambito, entidad_id, fecha)) or 0)
+
+    async def poner(self, ambito: str, entidad_id: int, fecha: date, tokens: int) -> None:
+        await self.redis.set(self._clave(ambito, entidad_id, fecha), tokens, ex=TTL_CLAVE_S)
+
+
+class ContadorBD:
+    """
+    Contadores diarios en la tabla consumo_tokens_diario (sin Redis)
+
+    Usa su propia sesión para no hacer commit en la del request; el UPDATE con
+    tokens = tokens + n es atómico en la BD. Las consultas corren en el pool de hilos.
+    """
+
+    def __init__(self, fabrica_sesiones=SessionLocal):
+        self.fabrica_sesiones = fabrica_sesiones
+
+    @staticmethod
+    def _filtro(ambito: str, entidad_id: int, fecha: date):
+        return (
+            ConsumoTokensDiario.ambito == ambito,
+            ConsumoTokensDiario.entidad_id == entidad_id,
+            ConsumoTokensDiario.fecha == fecha
+        )
+
+    def _incrementar(self, ambito: str, entidad_id: int, fecha: date, tokens: int) -> int:
+        db = self.fabrica_sesiones()
+        try:
+            filtro = self._filtro(ambito, entidad_id, fecha)
+            incremento = {ConsumoTokensDiario.tokens: ConsumoTokensDiario.tokens + tokens}
+            if not db.query(ConsumoTokensDiario).filter(*filtro).update(incremento, synchronize_session=False):
+                try:
+                    db.add(ConsumoTokensDiario(ambito=ambito, entidad_id=entidad_id, fecha=fecha, tokens=tokens))
+                    db.flush()
+                except IntegrityError:
+                    # Otro worker creó la fila entre medias
+                    db.rollback()
+                    db.query(ConsumoTokensDiario).filter(*filtro).update(incremento, synchronize_session=False)
+            total = db.query(ConsumoTokensDiario.tokens).filter(*filtro).scalar()
+            db.commit()
+            return int(total or 0)
+        finally:
+            db.close()
+
+    def _leer(self, ambito: str, entidad_id: int, fecha: date) -> int:
+        db = self.fabrica_sesiones()
+        try:
+            return int(db.query(ConsumoTokensDiario.tokens).filter(*self._filtro(ambito, entidad_id, fecha)).scalar() or 0)
+        finally:
+            db.close()
+
+    def _poner(self, ambito: str, entidad_id: int, fecha: date, tokens: int) -> None:
+        db = self.fabrica_sesiones()
+        try:
+            fila = db.query(ConsumoTokensDiario).filter(*self._filtro(ambito, entidad_id, fecha)).first()
+            if fila:
+                fila.tokens = tokens
+            else:
+                db.add(ConsumoTokensDiario(ambito=ambito, entidad_id=entidad_id, fecha=fecha, tokens=tokens))
+            db.commit()
+        finally:
+            db.close()
+
+    async def incrementar(self, ambito: str, entidad_id: int, fecha: date, tokens: int) -> int:
+        return await proveedores_llm.ejecutar_en_executor(self._incrementar, ambito, entidad_id, fecha, tokens)
+
+    async def leer(self, ambito: str, entidad_id: int, fecha: date) -> int:
+        return await proveedores_llm.ejecutar_en_executor(self._leer, ambito, entidad_id, fecha)
+
+    async def poner(self, ambito: str, entidad_id: int, fecha: date, tokens: int) -> None:
+        await proveedores_llm.ejecutar_en_executor(self._poner, ambito, entidad_id, fecha, tokens)
+
+
+_contador_bd = ContadorBD()
+
+
+def get_contador() -> Any:
+    """Redis si hay conexión; si no, la tabla consumo_tokens_diario"""
+    redis = get_cache_service().redis
+    return ContadorRedis(redis) if redis is not None else _contador_bd
+
+
+# ==================== RESERVA Y CONCILIACIÓN ====================
+
+def estimar_tokens(prompt_contenido: Any, max_tokens: int) -> int:
+    """Cota para la reserva: tokens de entrada (mismo conteo que el presupuesto del prompt) más la salida máxima"""
+    return presupuesto_prompt.contar_tokens(proveedores_llm.mensajes_a_texto(prompt_contenido)) + max_tokens
+
+
+async def reservar(llm: Any, usuario: Any = None, estimado: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    Reserva tokens en los contadores del LLM y del usuario antes de la llamada
+
+    Returns:
+        Reserva para conciliar(), o None si los contadores no están disponibles
+        (la generación sigue sin control de presupuesto)
+
+    Raises:
+        PresupuestoExcedido: si la reserva supera el límite diario del LLM o del usuario
+    """
+    fecha = date.today()
+    usuario_id = getattr(usuario, "id", None)
+    ambitos = [(AMBITO_LLM, llm.id, getattr(llm, "limite_diario_tokens", None))]
+    if usuario_id is not None:
+        ambitos.append((AMBITO_USUARIO, usuario_id, getattr(usuario, "limite_tokens_diario", None)))
+
+    contador = get_contador()
+    aplicados = []
+    try:
+        for ambito, entidad_id, limite in ambitos:
+            total = await contador.incrementar(ambito, entidad_id, fecha, estimado)
+            aplicados.append((ambito, entidad_id))
+            if settings.TOKENS_PRESUPUESTO_ACTIVO and limite and total > limite:
+                for ambito_aplicado, entidad_aplicada in aplicados:
+                    await contador.incrementar(ambito_aplicado, entidad_aplicada, fecha, -estimado)
+                _contar("rechazos")
+                raise PresupuestoExcedido(ambito, entidad_id, limite, total - estimado)
+    except PresupuestoExcedido:
+        raise
+    except Exception as e:
+        logger.warning("⚠️ Presupuesto de tokens no disponible (%s), se genera sin control", e)
+        return None
+
+    _contar("reservas")
+    return {"llm_id": llm.id, "usuario_id": usuario_id, "tokens": estimado, "fecha": fecha}
+
+
+async def conciliar(reserva: Optional[Dict[str, Any]], tokens_reales: int, llm_id: Optional[int] = None) -> None:
+    """
+    Sustituye la reserva por el consumo real (0 si la llamada falló)
+
+    Args:
+        reserva: Devuelta por reservar()
+        tokens_reales: Tokens consumidos
+        llm_id: LLM que respondió, si no es el de la reserva (failover/degradación)
+    """
+    if reserva is None:
+        return
+    contador = get_contador()
+    fecha = reserva["fecha"]
+    reservado = reserva["tokens"]
+    llm_real = llm_id if llm_id is not None else reserva["llm_id"]
+    try:
+        if llm_real == reserva["llm_id"]:
+            if tokens_reales != reservado:
+                await contador.incrementar(AMBITO_LLM, llm_real, fecha, tokens_reales - reservado)
+        else:
+            await contador.incrementar(AMBITO_LLM, reserva["llm_id"], fecha, -reservado)
+            if tokens_reales:
+                await contador.incrementar(AMBITO_LLM, llm_real, fecha, tokens_reales)
+        if reserva["usuario_id"] is not None and tokens_reales != reservado:
+            await contador.incrementar(AMBITO_USUARIO, reserva["usuario_id"], fecha, tokens_reales - reservado)
+    except Exception as e:
+        logger.warning("⚠️ No se pudo conciliar el consumo de tokens: %s", e)
+
+
+def registrar(llm_id: int, usuario_id: Optional[int], tokens: int) -> None:
+    """Consumo de una ruta síncrona (sin reserva): se suma a los contadores en el próximo volcado"""
+    if not tokens:
+        return
+    fecha = date.today()
+    with _lock:
+        for ambito, entidad_id in ((AMBITO_LLM, llm_id), (AMBITO_USUARIO, usuario_id)):
+            if entidad_id is not None:
+                clave = (ambito, entidad_id, fecha)
+                _pendientes[clave] = _pendientes.get(clave, 0) + tokens
+
+
+# ==================== CONSULTA, REINICIO Y VOLCADO ====================
+
+async def consumo_hoy(ambito: str, entidad_id: int) -> int:
+    """Tokens consumidos hoy según el contador (incluye reservas en curso)"""
+    return await get_contador().leer(ambito, entidad_id, date.today())
+
+
+async def reiniciar(ambito: str, entidad_id: int) -> None:
+    """Pone a cero el contador de hoy (p.ej. reset-tokens del LLM)"""
+    fecha = date.today()
+    with _lock:
+        _pendientes.pop((ambito, entidad_id, fecha), None)
+    await get_contador().poner(ambito, entidad_id, fecha, 0)
+
+
+async def volcar() -> int:
+    """
+    Pasa los consumos pendientes a los contadores y copia el total de hoy a
+    llm_maestro.tokens_usados_hoy en un único commit
+
+    Returns:
+        Número de LLM actualizados
+    """
+    with _lock:
+        pendientes = dict(_pendientes)
+        _pendientes.clear()
+    contador = get_contador()
+    try:
+        for clave in list(pendientes):
+            ambito, entidad_id, fecha = clave
+            await contador.incrementar(ambito, entidad_id, fecha, pendientes[clave])
+            del pendientes[clave]
+    except Exception:
+        # Lo no volcado vuelve a pendientes para el próximo volcado (no se pierde consumo)
+        with _lock:
+            for clave, tokens in pendientes.items():
+                _pendientes[clave] = _pendientes.get(clave, 0) + tokens
+        raise
+
+    fecha = date.today()
+    ids = await proveedores_llm.ejecutar_en_executor(_ids_llm)
+    totales = {llm_id: await contador.leer(AMBITO_LLM, llm_id, fecha) for llm_id in ids}
+    await proveedores_llm.ejecutar_en_executor(_guardar_tokens_hoy, totales)
+    _contar("volcados")
+    return len(totales)
+
+
+def _ids_llm() -> List[int]:
+    db = SessionLocal()
+    try:
+        return [llm_id for (llm_id,) in db.query(LLMMaestro.id).all()]
+    finally:
+        db.close()
+
+
+def _guardar_tokens_hoy(totales: Dict[int, int]) -> None:
+    db = SessionLocal()
+    try:
+        db.bulk_update_mappings(LLMMaestro, [
+            {"id": llm_id, "tokens_usados_hoy": tokens} for llm_id, tokens in totales.items()
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def volcar_periodicamente() -> None:
+    """Tarea de fondo del ciclo de vida de la app (ver main.py)"""
+    while True:
+        await asyncio.sleep(settings.TOKENS_VOLCADO_S)
+        try:
+            await volcar()
+        except Exception as e:
+            logger.error("⚠️ Error volcando consumo de tokens: %s", e)
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    """Reservas, rechazos, degradaciones, volcados y consumos pendientes de volcar"""
+    with _lock:
+        estadisticas = dict(_estadisticas)
+        estadisticas["pendientes"] = len(_pendientes)
+    estadisticas["activo"] = bool(settings.TOKENS_PRESUPUESTO_ACTIVO)
+    estadisticas["almacen"] = "redis" if get_cache_service().redis is not None else "bd"
+    return estadisticas
+
+
+def reiniciar_estadisticas() -> None:
+    """Pone los contadores a cero y descarta los consumos pendientes"""
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
+        _pendientes.clear()
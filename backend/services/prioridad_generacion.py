@@ -0,0 +1,263 @@
+"""
+Carriles de prioridad (urgente, normal, lote) en la concurrencia hacia cada LLM
+Plazas reservadas por clase y cola atendida por prioridad y orden de llegada
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+
+URGENTE = "urgente"
+NORMAL = "normal"
+LOTE = "lote"
+CLASES = (URGENTE, NORMAL, LOTE)  # de mayor a menor prioridad
+RANGO = {clase: i for i, clase in enumerate(CLASES)}
+
+TIPOS_URGENTES = ("breaking",)
+MUESTRAS_ESPERA = 500
+
+_lock = Lock()
+# {(llm_id, clase): {...}} — sobrevive a la recreación del planificador
+_estadisticas: Dict[Tuple[Any, str], Dict[str, Any]] = {}
+
+
+def roles_urgentes() -> set:
+    return {rol.strip() for rol in (settings.PRIORIDAD_ROLES_URGENTES or "").split(",") if rol.strip()}
+
+
+def clasificar(tipo_noticia: Optional[str] = None, rol: Optional[str] = None, lote: bool = False) -> str:
+    """
+    Clase de prioridad de una generación
+
+    Args:
+        tipo_noticia: breaking, feature u opinion
+        rol: Rol del usuario que la pide (None = sistema)
+        lote: Trabajo en segundo plano o regeneración masiva
+    """
+    if (tipo_noticia or "").lower() in TIPOS_URGENTES and (rol is None or rol in roles_urgentes()):
+        return URGENTE
+    return LOTE if lote else NORMAL
+
+
+def clasificar_noticia(noticia: Any, usuario: Any = None, lote: bool = False) -> str:
+    """Clase de una generación a partir de la noticia (tipo) y del usuario (role)"""
+    return clasificar(getattr(noticia, 'tipo', None), getattr(usuario, 'role', None), lote)
+
+
+def rango(clase: Optional[str]) -> int:
+    """Orden de la clase (0 = urgente); las desconocidas cuentan como normal"""
+    return RANGO.get(clase or NORMAL, RANGO[NORMAL])
+
+
+def get_reservas(llm: Any, limite: int) -> Dict[str, int]:
+    """
+    Plazas reservadas por clase para un LLM
+
+    Siempre queda al menos una plaza sin reservar para que el lote avance; si las
+    reservas no caben se recortan empezando por la de menor prioridad.
+    """
+    config = getattr(llm, 'configuracion', None) or {}
+    propias = config.get('reservas_prioridad') or {}
+    reservas = {}
+    for clase, por_defecto in ((URGENTE, settings.PRIORIDAD_RESERVA_URGENTE), (NORMAL, settings.PRIORIDAD_RESERVA_NORMAL)):
+        try:
+            reservas[clase] = max(0, int(propias.get(clase, por_defecto)))
+        except (TypeError, ValueError):
+            reservas[clase] = max(0, int(por_defecto))
+    sobrante = sum(reservas.values()) - (limite - 1)
+    for clase in (NORMAL, URGENTE):
+        if sobrante <= 0:
+            break
+        recorte = min(sobrante, reservas[clase])
+        reservas[clase] -= recorte
+        sobrante -= recorte
+    reservas[LOTE] = 0
+    return reservas
+
+
+def _stats(llm_id: Any, clase: str) -> Dict[str, Any]:
+    clave = (llm_id, clase)
+    if clave not in _estadisticas:
+        _estadisticas[clave] = {
+            "adquisiciones": 0,
+            "adelantamientos": 0,
+            "espera_total_ms": 0.0,
+            "espera_max_ms": 0.0,
+            "esperas": deque(maxlen=MUESTRAS_ESPERA)
+        }
+    return _estadisticas[clave]
+
+
+class _Turno:
+    """Context manager async de una plaza del planificador"""
+
+    __slots__ = ("planificador", "clase")
+
+    def __init__(self, planificador: "Planificador", clase: str):
+        self.planificador = planificador
+        self.clase = clase
+
+    async def __aenter__(self):
+        await self.planificador.adquirir(self.clase)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.planificador.liberar(self.clase)
+        return False
+
+
+class Planificador:
+    """
+    Semáforo con clases de prioridad y plazas reservadas (un event loop)
+
+    Una clase puede ocupar una plaza libre si después quedan libres las reservadas
+    no usadas de las clases superiores. Las esperas se atienden por (clase, llegada).
+    """
+
+    def __init__(self, llm_id: Any, limite: int, reservas: Dict[str, int]):
+        self.llm_id = llm_id
+        self.limite = limite
+        self.reservas = reservas
+        self.en_uso = {clase: 0 for clase in CLASES}
+        self.en_cola = {clase: 0 for clase in CLASES}
+        self._espera: List[Tuple[int, int, str, asyncio.Future, float]] = []
+        self._secuencia = itertools.count()
+
+    def _puede(self, clase: str) -> bool:
+        libres = self.limite - sum(self.en_uso.values())
+        if libres <= 0:
+            return False
+        reservadas_ajenas = sum(
+            max(0, self.reservas.get(otra, 0) - self.en_uso[otra])
+            for otra in CLASES if RANGO[otra] < RANGO[clase]
+        )
+        return libres > reservadas_ajenas
+
+    def _registrar(self, clase: str, inicio: float, adelanto: bool) -> None:
+        espera_ms = (time.monotonic() - inicio) * 1000
+        with _lock:
+            stats = _stats(self.llm_id, clase)
+            stats["adquisiciones"] += 1
+            stats["espera_total_ms"] += espera_ms
+            stats["espera_max_ms"] = max(stats["espera_max_ms"], espera_ms)
+            stats["esperas"].append(espera_ms)
+            if adelanto:
+                stats["adelantamientos"] += 1
+
+    def _despertar(self) -> None:
+        # Las clases inferiores tienen más restricciones: si la primera no cabe, ninguna
+        while self._espera:
+            _, secuencia, clase, futuro, inicio = self._espera[0]
+            if futuro.done():  # cancelada mientras esperaba
+                heapq.heappop(self._espera)
+                continue
+            if not self._puede(clase):
+                break
+            heapq.heappop(self._espera)
+            adelanto = any(
+                s < secuencia and RANGO[c] > RANGO[clase] and not f.done()
+                for _, s, c, f, _ in self._espera
+            )
+            self.en_cola[clase] -= 1
+            self.en_uso[clase] += 1
+            futuro.set_result(True)
+            self._registrar(clase, inicio, adelanto)
+
+    async def adquirir(self, clase: str) -> None:
+        clase = clase if clase in RANGO else NORMAL
+        inicio = time.monotonic()
+        # Sin colarse: si ya espera alguien de igual o mayor prioridad, a la cola
+        esperando_antes = any(RANGO[c] <= RANGO[clase] and not f.done() for _, _, c, f, _ in self._espera)
+        if not esperando_antes and self._puede(clase):
+            self.en_uso[clase] += 1
+            adelanto = any(RANGO[c] > RANGO[clase] and not f.done() for _, _, c, f, _ in self._espera)
+            self._registrar(clase, inicio, adelanto)
+            return
+        futuro = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._espera, (RANGO[clase], next(self._secuencia), clase, futuro, inicio))
+        self.en_cola[clase] += 1
+        try:
+            await futuro
+        except asyncio.CancelledError:
+            if futuro.done() and not futuro.cancelled():
+                self.liberar(clase)  # se le dio la plaza justo al cancelarse
+            else:
+                self.en_cola[clase] -= 1
+                self._despertar()
+            raise
+
+    def liberar(self, clase: str) -> None:
+        clase = clase if clase in RANGO else NORMAL
+        self.en_uso[clase] = max(0, self.en_uso[clase] - 1)
+        self._despertar()
+
+    def turno(self, clase: Optional[str] = None) -> _Turno:
+        return _Turno(self, clase or NORMAL)
+
+    def estado(self) -> Dict[str, Any]:
+        return {
+            "limite": self.limite,
+            "reservas": dict(self.reservas),
+            "en_uso": dict(self.en_uso),
+            "en_cola": dict(self.en_cola)
+        }
+
+
+# Planificadores compartidos por proceso: {llm_id: (loop, limite, reservas, planificador)}
+_planificadores: Dict[Any, Tuple[Any, int, Dict[str, int], Planificador]] = {}
+
+
+def get_planificador(llm: Any, limite: int) -> Planificador:
+    """
+    Planificador del LLM; se recrea si cambia el límite, las reservas o el event loop
+    """
+    loop = asyncio.get_running_loop()
+    reservas = get_reservas(llm, limite)
+    entrada = _planificadores.get(llm.id)
+    if entrada is None or entrada[0] is not loop or entrada[1] != limite or entrada[2] != reservas:
+        entrada = (loop, limite, reservas, Planificador(llm.id, limite, reservas))
+        _planificadores[llm.id] = entrada
+    return entrada[3]
+
+
+def _percentil(muestras: List[float], p: float) -> float:
+    if not muestras:
+        return 0.0
+    ordenadas = sorted(muestras)
+    return ordenadas[min(len(ordenadas) - 1, int(round(p * (len(ordenadas) - 1))))]
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    """Por LLM y clase: plazas reservadas, en uso, profundidad de cola y esperas"""
+    resultado: Dict[str, Any] = {}
+    with _lock:
+        for (llm_id, clase), stats in _estadisticas.items():
+            esperas = list(stats["esperas"])
+            n = stats["adquisiciones"]
+            resultado.setdefault(str(llm_id), {"clases": {}})["clases"][clase] = {
+                "adquisiciones": n,
+                "adelantamientos": stats["adelantamientos"],
+                "espera_media_ms": round(stats["espera_total_ms"] / n, 1) if n else 0.0,
+                "espera_p95_ms": round(_percentil(esperas, 0.95), 1),
+                "espera_max_ms": round(stats["espera_max_ms"], 1)
+            }
+    for llm_id, (_, _, _, planificador) in list(_planificadores.items()):
+        entrada = resultado.setdefault(str(llm_id), {"clases": {}})
+        estado = planificador.estado()
+        entrada["limite"] = estado["limite"]
+        for clase in CLASES:
+            clase_stats = entrada["clases"].setdefault(clase, {"adquisiciones": 0})
+            clase_stats["reservadas"] = estado["reservas"].get(clase, 0)
+            clase_stats["en_uso"] = estado["en_uso"][clase]
+            clase_stats["en_cola"] = estado["en_cola"][clase]
+    return resultado
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        _estadisticas.clear()
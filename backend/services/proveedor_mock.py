@@ -0,0 +1,240 @@
+"""
+Proveedor LLM simulado para pruebas de carga (LLMMaestro.proveedor = "Mock")
+Latencia, errores y tokens configurables en configuracion['mock'] (ver CONFIG_POR_DEFECTO)
+"""
+import asyncio
+import hashlib
+import itertools
+import math
+import random
+import re
+import time
+from threading import Lock
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from services import presupuesto_prompt
+
+DISTRIBUCIONES = ("fija", "normal", "cola_larga")
+_Z_P99 = 2.326  # cuantil 0.99 de la normal estándar
+
+CONFIG_POR_DEFECTO = {
+    "latencia": {"distribucion": "fija", "ms": 300, "desviacion_ms": 0, "p99_ms": None},
+    "tokens_por_segundo": 80,
+    "tokens_salida": [200, 600],
+    "tasa_429": 0.0,
+    "tasa_500": 0.0,
+    "tasa_timeout": 0.0,
+    "timeout_ms": 30000,
+    "semilla": 0
+}
+
+# Tokens de salida por fragmento en streaming
+TOKENS_POR_FRAGMENTO = 4
+
+_VOCABULARIO = (
+    "según", "fuentes", "oficiales", "la", "medida", "entrará", "en", "vigor", "durante",
+    "las", "próximas", "semanas", "y", "afectará", "a", "miles", "de", "ciudadanos", "del",
+    "distrito", "autoridades", "confirmaron", "que", "el", "proceso", "continúa", "con",
+    "normalidad", "mientras", "expertos", "advierten", "sobre", "posibles", "retrasos",
+    "sector", "informe", "gobierno", "comunidad", "anuncio", "datos", "región", "año"
+)
+
+_lock = Lock()
+_estadisticas = {
+    "llamadas": 0,
+    "errores_429": 0,
+    "errores_500": 0,
+    "timeouts": 0,
+    "tokens_entrada": 0,
+    "tokens_salida": 0
+}
+
+
+def _contar(clave: str, cantidad: int = 1) -> None:
+    with _lock:
+        _estadisticas[clave] += cantidad
+
+
+class ErrorMock(Exception):
+    """Error HTTP inyectado; status_code lo clasifica enrutamiento.es_reintentable"""
+
+    def __init__(self, status_code: int, mensaje: str):
+        super().__init__(f"Error {status_code} (mock): {mensaje}")
+        self.status_code = status_code
+
+
+def configuracion_mock(llm: Any) -> Dict[str, Any]:
+    """configuracion['mock'] del LLM completada con los valores por defecto"""
+    propia = (getattr(llm, "configuracion", None) or {}).get("mock") or {}
+    config = {**CONFIG_POR_DEFECTO, **propia}
+    config["latencia"] = {**CONFIG_POR_DEFECTO["latencia"], **(propia.get("latencia") or {})}
+    if config["latencia"]["distribucion"] not in DISTRIBUCIONES:
+        raise ValueError(f"Distribución de latencia no soportada: {config['latencia']['distribucion']}")
+    return config
+
+
+def muestrear_latencia_ms(latencia: Dict[str, Any], rng: random.Random) -> float:
+    """Latencia hasta el primer token según la distribución configurada"""
+    ms = float(latencia.get("ms") or 0)
+    distribucion = latencia["distribucion"]
+    if distribucion == "normal":
+        return max(0.0, rng.gauss(ms, float(latencia.get("desviacion_ms") or 0)))
+    if distribucion == "cola_larga":
+        if ms <= 0:
+            return 0.0
+        # Lognormal: mediana = ms y percentil 99 = p99_ms (por defecto 10x la mediana)
+        p99 = float(latencia.get("p99_ms") or ms * 10)
+        sigma = math.log(max(p99, ms) / ms) / _Z_P99
+        return rng.lognormvariate(math.log(ms), sigma)
+    return ms
+
+
+def _extraer_noticia(prompt: str) -> Tuple[str, str]:
+    """Título y contenido original del prompt (mismos marcadores que las plantillas)"""
+    titulo = re.search(r'TÍTULO:\s*(.+)', prompt)
+    contenido = re.search(r'CONTENIDO ORIGINAL:\s*(.+?)(?:\nSECCIÓN:|$)', prompt, re.DOTALL)
+    return (
+        titulo.group(1).strip() if titulo else "Noticia",
+        contenido.group(1).strip() if contenido else ""
+    )
+
+
+class ClienteMock:
+    """Cliente del proveedor Mock (mismo objeto para las rutas síncrona y async)"""
+
+    __slots__ = ("nombre", "modelo_id", "config", "_secuencia", "_secuencia_lock")
+
+    def __init__(self, llm: Any):
+        self.nombre = getattr(llm, "nombre", "Mock")
+        self.modelo_id = getattr(llm, "modelo_id", None) or "mock"
+        self.config = configuracion_mock(llm)
+        self._secuencia = itertools.count()
+        self._secuencia_lock = Lock()
+
+    # ---------- sorteos ----------
+
+    def _rng_contenido(self, prompt: str) -> random.Random:
+        semilla = f"{self.config['semilla']}|{self.modelo_id}|{prompt}"
+        return random.Random(int(hashlib.sha256(semilla.encode("utf-8")).hexdigest()[:16], 16))
+
+    def _rng_llamada(self) -> random.Random:
+        with self._secuencia_lock:
+            n = next(self._secuencia)
+        return random.Random(f"{self.config['semilla']}|{self.modelo_id}|{n}")
+
+    def _sortear_fallo(self, rng: random.Random) -> Optional[str]:
+        """None, '429', '500' o 'timeout'"""
+        tirada = rng.random()
+        for tipo in ("429", "500", "timeout"):
+            tasa = float(self.config[f"tasa_{tipo}"] or 0)
+            if tirada < tasa:
+                return tipo
+            tirada -= tasa
+        return None
+
+    # ---------- respuesta ----------
+
+    def respuesta(self, prompt: str, max_tokens: int) -> Tuple[str, int, int]:
+        """
+        Respuesta determinista para el prompt
+
+        Returns:
+            Tupla (texto, tokens de entrada, tokens de salida)
+        """
+        rng = self._rng_contenido(prompt)
+        minimo, maximo = self.config["tokens_salida"]
+        objetivo = max(1, min(max_tokens, rng.randint(int(minimo), int(maximo))))
+
+        titulo, original = _extraer_noticia(prompt)
+        palabras: List[str] = original.split()[:objetivo]
+        cuerpo = []
+        while len(palabras) + len(cuerpo) < objetivo * 3 // 4:  # ~0,75 palabras por token
+            cuerpo.append(rng.choice(_VOCABULARIO))
+        texto = f"TÍTULO: {titulo[:150]}\n\nCONTENIDO:\n{' '.join(palabras + cuerpo)}"
+        return (
+            texto,
+            presupuesto_prompt.contar_tokens(prompt),
+            presupuesto_prompt.contar_tokens(texto)
+        )
+
+    def _preparar(self, prompt: str, max_tokens: int) -> Tuple[Optional[str], float, float, Tuple[str, int, int]]:
+        """Fallo sorteado, latencia al primer token (s), duración de la generación (s) y respuesta"""
+        rng = self._rng_llamada()
+        fallo = self._sortear_fallo(rng)
+        primer_token_s = muestrear_latencia_ms(self.config["latencia"], rng) / 1000
+        generada = self.respuesta(prompt, max_tokens)
+        tps = float(self.config["tokens_por_segundo"] or 0)
+        generacion_s = generada[2] / tps if tps > 0 else 0.0
+        _contar("llamadas")
+        return fallo, primer_token_s, generacion_s, generada
+
+    def _error(self, fallo: str) -> Exception:
+        if fallo == "timeout":
+            _contar("timeouts")
+            return asyncio.TimeoutError(f"{self.nombre} (mock) sin respuesta en {self.config['timeout_ms']} ms")
+        _contar(f"errores_{fallo}")
+        if fallo == "429":
+            return ErrorMock(429, "rate limit exceeded")
+        return ErrorMock(500, "internal server error")
+
+    def _registrar_uso(self, entrada: int, salida: int) -> None:
+        _contar("tokens_entrada", entrada)
+        _contar("tokens_salida", salida)
+
+    # ---------- llamadas ----------
+
+    async def completar(self, prompt: str, max_tokens: int) -> Tuple[str, int, int]:
+        fallo, primer_token_s, generacion_s, (texto, entrada, salida) = self._preparar(prompt, max_tokens)
+        if fallo == "timeout":
+            await asyncio.sleep(self.config["timeout_ms"] / 1000)
+        if fallo:
+            raise self._error(fallo)
+        await asyncio.sleep(primer_token_s + generacion_s)
+        self._registrar_uso(entrada, salida)
+        return texto, entrada, salida
+
+    def completar_sync(self, prompt: str, max_tokens: int) -> Tuple[str, int, int]:
+        """Ruta legacy síncrona (GeneradorIA.generar_contenido)"""
+        fallo, primer_token_s, generacion_s, (texto, entrada, salida) = self._preparar(prompt, max_tokens)
+        if fallo == "timeout":
+            time.sleep(self.config["timeout_ms"] / 1000)
+        if fallo:
+            raise self._error(fallo)
+        time.sleep(primer_token_s + generacion_s)
+        self._registrar_uso(entrada, salida)
+        return texto, entrada, salida
+
+    async def stream(self, prompt: str, max_tokens: int) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields:
+            {"tipo": "delta", "texto": str} al ritmo de tokens_por_segundo y, al final,
+            {"tipo": "fin", "entrada": int, "salida": int}
+        """
+        fallo, primer_token_s, generacion_s, (texto, entrada, salida) = self._preparar(prompt, max_tokens)
+        if fallo == "timeout":
+            await asyncio.sleep(self.config["timeout_ms"] / 1000)
+        if fallo:
+            raise self._error(fallo)
+        await asyncio.sleep(primer_token_s)
+
+        # Fragmentos de ~TOKENS_POR_FRAGMENTO tokens; la pausa reparte generacion_s según su tamaño
+        piezas = re.findall(r'\S+\s*', texto)
+        tamano = max(1, round(len(piezas) * TOKENS_POR_FRAGMENTO / max(salida, 1)))
+        for i in range(0, len(piezas), tamano):
+            fragmento = "".join(piezas[i:i + tamano])
+            if i:
+                await asyncio.sleep(generacion_s * len(fragmento) / len(texto))
+            yield {"tipo": "delta", "texto": fragmento}
+        self._registrar_uso(entrada, salida)
+        yield {"tipo": "fin", "entrada": entrada, "salida": salida}
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    with _lock:
+        return dict(_estadisticas)
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
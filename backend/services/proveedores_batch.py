@@ -0,0 +1,265 @@
+"""
+APIs batch de los proveedores LLM (para la regeneración masiva)
+
+Anthropic (Message Batches) y OpenAI (Batch API) procesan lotes de peticiones en
+diferido (hasta 24 h, normalmente minutos) con un 50% de descuento y sin competir con
+los límites de las llamadas interactivas. Para el resto de proveedores, o con
+BULK_BATCH_LOCAL, se usa un sustituto local que ejecuta las peticiones en segundo
+plano con la función que se le pase (también lo usan los tests).
+
+El flujo es siempre: enviar → consultar hasta "terminado" → resultados. El id
+devuelto por enviar se guarda en BD, así que un lote enviado sobrevive a un
+reinicio del worker (salvo los del sustituto local, que viven en memoria:
+consultar devuelve "desconocido" y el llamador debe reenviarlo).
+"""
+import asyncio
+import io
+import json
+import logging
+import uuid
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from services import proveedores_llm
+
+logger = logging.getLogger(__name__)
+
+PROVEEDOR_LOCAL = "local"
+
+# Descuento de las APIs batch de Anthropic y OpenAI frente a la llamada normal
+DESCUENTO_BATCH = 0.5
+
+EN_PROCESO = "en_proceso"
+TERMINADO = "terminado"
+DESCONOCIDO = "desconocido"
+
+_lock = Lock()
+_estadisticas = {"lotes_enviados": 0, "peticiones_enviadas": 0, "resultados_ok": 0, "resultados_error": 0}
+# Lotes del sustituto local: {batch_id: {"tarea", "resultados"}}
+_lotes_locales: Dict[str, Dict[str, Any]] = {}
+
+
+class PeticionBatch:
+    """Una generación dentro de un lote; custom_id la identifica en los resultados"""
+
+    __slots__ = ("custom_id", "mensajes", "max_tokens", "temperature")
+
+    def __init__(self, custom_id: str, mensajes: Any, max_tokens: int, temperature: float = 0.7):
+        self.custom_id = custom_id
+        self.mensajes = mensajes if isinstance(mensajes, list) else [{"role": "user", "content": mensajes}]
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+
+# Resultado por custom_id: {"contenido": str, "uso": {...}} o {"error": str}
+Resultados = Dict[str, Dict[str, Any]]
+EjecutorLocal = Callable[[PeticionBatch], Awaitable[Tuple[str, Dict[str, int]]]]
+
+
+def _contar(clave: str, n: int = 1) -> None:
+    with _lock:
+        _estadisticas[clave] += n
+
+
+def proveedor_batch(llm: Any) -> str:
+    """API batch que se usará para el LLM: Anthropic, OpenAI o el sustituto local"""
+    if settings.BULK_BATCH_LOCAL or not getattr(llm, 'api_key', None):
+        return PROVEEDOR_LOCAL
+    if llm.proveedor == "Anthropic" and proveedores_llm.ANTHROPIC_ASYNC_AVAILABLE:
+        return "Anthropic"
+    if llm.proveedor == "OpenAI" and proveedores_llm.OPENAI_ASYNC_AVAILABLE:
+        return "OpenAI"
+    return PROVEEDOR_LOCAL
+
+
+async def enviar(
+    llm: Any,
+    peticiones: List[PeticionBatch],
+    ejecutor_local: Optional[EjecutorLocal] = None
+) -> Tuple[str, str]:
+    """
+    Envía un lote de peticiones
+
+    Args:
+        ejecutor_local: Genera una petición en el sustituto local (obligatorio si
+            el LLM no tiene API batch)
+
+    Returns:
+        Tupla (proveedor del lote, batch_id)
+    """
+    proveedor = proveedor_batch(llm)
+    if proveedor == "Anthropic":
+        batch_id = await _enviar_anthropic(llm, peticiones)
+    elif proveedor == "OpenAI":
+        batch_id = await _enviar_openai(llm, peticiones)
+    else:
+        if ejecutor_local is None:
+            raise ValueError(f"El LLM {llm.nombre} no tiene API batch y no se indicó un ejecutor local")
+        batch_id = _enviar_local(peticiones, ejecutor_local)
+    _contar("lotes_enviados")
+    _contar("peticiones_enviadas", len(peticiones))
+    logger.info("📦 Lote %s enviado a %s (%s peticiones)", batch_id, proveedor, len(peticiones))
+    return proveedor, batch_id
+
+
+async def consultar(llm: Any, proveedor: str, batch_id: str) -> str:
+    """Estado del lote: en_proceso, terminado o desconocido"""
+    if proveedor == "Anthropic":
+        lote = await proveedores_llm.obtener_cliente(llm).messages.batches.retrieve(batch_id)
+        return TERMINADO if lote.processing_status == "ended" else EN_PROCESO
+    if proveedor == "OpenAI":
+        lote = await proveedores_llm.obtener_cliente(llm).batches.retrieve(batch_id)
+        if lote.status in ("completed", "failed", "expired", "cancelled"):
+            return TERMINADO
+        return EN_PROCESO
+    entrada = _lotes_locales.get(batch_id)
+    if entrada is None:
+        return DESCONOCIDO
+    return TERMINADO if entrada["tarea"].done() else EN_PROCESO
+
+
+async def resultados(llm: Any, proveedor: str, batch_id: str) -> Resultados:
+    """Resultados de un lote terminado, por custom_id"""
+    if proveedor == "Anthropic":
+        salida = await _resultados_anthropic(llm, batch_id)
+    elif proveedor == "OpenAI":
+        salida = await _resultados_openai(llm, batch_id)
+    else:
+        entrada = _lotes_locales.pop(batch_id, None)
+        salida = entrada["resultados"] if entrada else {}
+    ok = sum(1 for r in salida.values() if "error" not in r)
+    _contar("resultados_ok", ok)
+    _contar("resultados_error", len(salida) - ok)
+    return salida
+
+
+# ==================== ANTHROPIC ====================
+
+async def _enviar_anthropic(llm: Any, peticiones: List[PeticionBatch]) -> str:
+    cliente = proveedores_llm.obtener_cliente(llm)
+    lote = await cliente.messages.batches.create(requests=[
+        {
+            "custom_id": p.custom_id,
+            "params": {
+                "model": llm.modelo_id,
+                "max_tokens": p.max_tokens,
+                "temperature": p.temperature,
+                "messages": p.mensajes
+            }
+        }
+        for p in peticiones
+    ])
+    return lote.id
+
+
+async def _resultados_anthropic(llm: Any, batch_id: str) -> Resultados:
+    cliente = proveedores_llm.obtener_cliente(llm)
+    salida: Resultados = {}
+    async for entrada in await cliente.messages.batches.results(batch_id):
+        resultado = entrada.result
+        if resultado.type == "succeeded":
+            salida[entrada.custom_id] = {
+                "contenido": resultado.message.content[0].text,
+                "uso": proveedores_llm.uso_anthropic(resultado.message.usage)
+            }
+        else:
+            detalle = getattr(getattr(resultado, "error", None), "error", None)
+            salida[entrada.custom_id] = {"error": f"{resultado.type}: {getattr(detalle, 'message', '') or resultado.type}"}
+    return salida
+
+
+# ==================== OPENAI ====================
+
+async def _enviar_openai(llm: Any, peticiones: List[PeticionBatch]) -> str:
+    cliente = proveedores_llm.obtener_cliente(llm)
+    lineas = "\n".join(
+        json.dumps({
+            "custom_id": p.custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": llm.modelo_id,
+                "messages": proveedores_llm.aplanar_mensajes(p.mensajes),
+                "max_tokens": p.max_tokens,
+                "temperature": p.temperature
+            }
+        }, ensure_ascii=False)
+        for p in peticiones
+    )
+    archivo = await cliente.files.create(
+        file=("lote.jsonl", io.BytesIO(lineas.encode("utf-8"))),
+        purpose="batch"
+    )
+    lote = await cliente.batches.create(
+        input_file_id=archivo.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return lote.id
+
+
+async def _resultados_openai(llm: Any, batch_id: str) -> Resultados:
+    cliente = proveedores_llm.obtener_cliente(llm)
+    lote = await cliente.batches.retrieve(batch_id)
+    salida: Resultados = {}
+    for campo, es_error in (("output_file_id", False), ("error_file_id", True)):
+        archivo_id = getattr(lote, campo, None)
+        if not archivo_id:
+            continue
+        contenido = await cliente.files.content(archivo_id)
+        for linea in contenido.text.splitlines():
+            if not linea.strip():
+                continue
+            entrada = json.loads(linea)
+            respuesta = entrada.get("response") or {}
+            cuerpo = respuesta.get("body") or {}
+            if es_error or entrada.get("error") or respuesta.get("status_code") != 200:
+                error = entrada.get("error") or cuerpo.get("error") or {}
+                salida[entrada["custom_id"]] = {"error": error.get("message") or "error en el lote"}
+                continue
+            uso = cuerpo.get("usage") or {}
+            salida[entrada["custom_id"]] = {
+                "contenido": cuerpo["choices"][0]["message"]["content"],
+                "uso": proveedores_llm.uso_tokens(
+                    uso.get("total_tokens", 0),
+                    (uso.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+                )
+            }
+    return salida
+
+
+# ==================== SUSTITUTO LOCAL ====================
+
+def _enviar_local(peticiones: List[PeticionBatch], ejecutor: EjecutorLocal) -> str:
+    batch_id = f"local_{uuid.uuid4().hex[:12]}"
+    salida: Resultados = {}
+    semaforo = asyncio.Semaphore(max(1, settings.BULK_BATCH_LOCAL_CONCURRENCIA))
+
+    async def _una(peticion: PeticionBatch) -> None:
+        async with semaforo:
+            try:
+                contenido, uso = await ejecutor(peticion)
+                salida[peticion.custom_id] = {"contenido": contenido, "uso": uso}
+            except Exception as e:
+                salida[peticion.custom_id] = {"error": str(e)}
+
+    async def _procesar() -> None:
+        await asyncio.gather(*[_una(p) for p in peticiones])
+
+    _lotes_locales[batch_id] = {"tarea": asyncio.create_task(_procesar()), "resultados": salida}
+    return batch_id
+
+
+def get_estadisticas() -> Dict[str, Any]:
+    with _lock:
+        estadisticas = dict(_estadisticas)
+    estadisticas["lotes_locales_en_memoria"] = len(_lotes_locales)
+    estadisticas["descuento_batch"] = DESCUENTO_BATCH
+    return estadisticas
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
@@ -0,0 +1,567 @@
+"""
+Capa async de proveedores LLM
+Llamadas no bloqueantes (y en streaming) a Anthropic, OpenAI y Gemini para usar desde los endpoints async.
+Los SDK sin cliente async se ejecutan en un pool de hilos acotado (LLM_EXECUTOR_WORKERS).
+El proveedor "Mock" (services/proveedor_mock.py) responde sin red para pruebas de carga.
+"""
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+
+from config import settings
+from core import metricas_prometheus
+from services import proveedor_mock
+
+from anthropic import Anthropic
+
+try:
+    from anthropic import AsyncAnthropic
+    ANTHROPIC_ASYNC_AVAILABLE = True
+except ImportError:
+    ANTHROPIC_ASYNC_AVAILABLE = False
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+try:
+    import openai
+    OPENAI_AVAILABLE = True
+    OPENAI_ASYNC_AVAILABLE = hasattr(openai, "AsyncOpenAI")
+except ImportError:
+    OPENAI_AVAILABLE = False
+    OPENAI_ASYNC_AVAILABLE = False
+
+try:
+    import google.generativeai as genai
+    GOOGLE_AVAILABLE = True
+except ImportError:
+    GOOGLE_AVAILABLE = False
+
+try:
+    from google.ai import generativelanguage as glm
+    from google.api_core.client_options import ClientOptions
+    GOOGLE_CLIENTES_AVAILABLE = True
+except ImportError:
+    GOOGLE_CLIENTES_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== EXECUTOR ACOTADO ====================
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Pool de hilos compartido para llamadas a SDK síncronos.
+    Acotado para que una ráfaga de generaciones no agote el pool por defecto
+    del event loop (que también usan las dependencias síncronas de FastAPI).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.LLM_EXECUTOR_WORKERS),
+                thread_name_prefix="llm"
+            )
+        return _executor
+
+
+async def ejecutar_en_executor(func, *args) -> Any:
+    """Ejecuta una función bloqueante en el pool de LLM sin bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), lambda: func(*args))
+
+
+def cerrar_executor() -> None:
+    """Libera el pool de hilos (apagado de la aplicación)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+# ==================== CLIENTES ====================
+
+class ClienteOpenAILegacy:
+    """
+    SDK legacy de OpenAI (<1.0) ligado a una API key
+
+    Evita asignar openai.api_key (global al proceso): la key viaja en cada llamada.
+    """
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self.ChatCompletion = self
+
+    def create(self, **kwargs) -> Any:
+        return openai.ChatCompletion.create(api_key=self.api_key, **kwargs)
+
+
+class ClienteGemini:
+    """
+    Cliente de Gemini ligado a una API key
+
+    genai.configure() es global al proceso: dos LLM de Google con keys distintas
+    generando a la vez podían salir con la key equivocada. Cada modelo creado aquí
+    recibe clientes GAPIC propios configurados con la key de este cliente.
+    """
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._clientes: Dict[bool, Any] = {}
+        self._lock = threading.Lock()
+
+    def _cliente_gapic(self, asincrono: bool) -> Any:
+        with self._lock:
+            if asincrono not in self._clientes:
+                opciones = ClientOptions(api_key=self.api_key)
+                clase = glm.GenerativeServiceAsyncClient if asincrono else glm.GenerativeServiceClient
+                self._clientes[asincrono] = clase(client_options=opciones)
+            return self._clientes[asincrono]
+
+    def GenerativeModel(self, modelo_id: str) -> Any:
+        modelo = genai.GenerativeModel(modelo_id)
+        modelo._client = self._cliente_gapic(False)
+        try:
+            # El canal gRPC async se liga al event loop: solo se crea dentro de uno
+            asyncio.get_running_loop()
+            modelo._async_client = self._cliente_gapic(True)
+        except RuntimeError:
+            pass
+        return modelo
+
+
+def crear_http_client(asincrono: bool = True) -> Any:
+    """Cliente HTTP con pool keep-alive para los SDK basados en httpx (None sin httpx: pool por defecto del SDK)"""
+    if not HTTPX_AVAILABLE:
+        return None
+    clase = httpx.AsyncClient if asincrono else httpx.Client
+    return clase(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONEXIONES,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_CONEXIONES,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_S
+        ),
+        timeout=httpx.Timeout(settings.LLM_HTTP_TIMEOUT_S, connect=10.0)
+    )
+
+
+def _crear_cliente_gemini(llm: Any) -> Any:
+    if not GOOGLE_AVAILABLE:
+        raise ImportError(
+            "Google Generative AI no está instalado. Instala con: pip install google-generativeai --break-system-packages"
+        )
+    if GOOGLE_CLIENTES_AVAILABLE:
+        return ClienteGemini(llm.api_key)
+    genai.configure(api_key=llm.api_key)
+    return genai
+
+
+def crear_cliente_async(llm: Any) -> Any:
+    """
+    Crea el cliente async para el proveedor del LLM
+
+    Returns:
+        Cliente async, un cliente síncrono ligado a la key (si el SDK solo tiene
+        API síncrona) o None para modo simulado (Anthropic sin API key)
+    """
+    if llm.proveedor == "Mock":
+        return proveedor_mock.ClienteMock(llm)
+
+    if llm.proveedor == "Anthropic":
+        if not llm.api_key:
+            logger.warning("⚠️ API Key no configurada para %s. Usando modo simulado.", llm.nombre)
+            return None
+        if not ANTHROPIC_ASYNC_AVAILABLE:
+            raise ImportError("El SDK de Anthropic instalado no incluye AsyncAnthropic")
+        return AsyncAnthropic(api_key=llm.api_key, http_client=crear_http_client())
+
+    if llm.proveedor == "OpenAI":
+        if not OPENAI_AVAILABLE:
+            raise ImportError(
+                "OpenAI no está instalado. Instala con: pip install openai --break-system-packages"
+            )
+        if OPENAI_ASYNC_AVAILABLE:
+            return openai.AsyncOpenAI(api_key=llm.api_key, http_client=crear_http_client())
+        # SDK legacy (<1.0): solo existe la API de módulo síncrona
+        return ClienteOpenAILegacy(llm.api_key)
+
+    if llm.proveedor == "Google":
+        return _crear_cliente_gemini(llm)
+
+    raise ValueError(f"Proveedor no soportado: {llm.proveedor}")
+
+
+def crear_cliente(llm: Any) -> Any:
+    """Versión síncrona de crear_cliente_async (ruta legacy GeneradorIA.generar_contenido)"""
+    if llm.proveedor == "Mock":
+        return proveedor_mock.ClienteMock(llm)
+
+    if llm.proveedor == "Anthropic":
+        if not llm.api_key:
+            logger.warning("⚠️ API Key no configurada para %s. Usando modo simulado.", llm.nombre)
+            return None
+        return Anthropic(api_key=llm.api_key, http_client=crear_http_client(asincrono=False))
+
+    if llm.proveedor == "OpenAI":
+        if not OPENAI_AVAILABLE:
+            raise ImportError(
+                "OpenAI no está instalado. Instala con: pip install openai --break-system-packages"
+            )
+        if OPENAI_ASYNC_AVAILABLE:
+            return openai.OpenAI(api_key=llm.api_key, http_client=crear_http_client(asincrono=False))
+        return ClienteOpenAILegacy(llm.api_key)
+
+    if llm.proveedor == "Google":
+        return _crear_cliente_gemini(llm)
+
+    raise ValueError(f"Proveedor no soportado: {llm.proveedor}")
+
+
+# ==================== REGISTRO DE CLIENTES ====================
+# Un cliente por (proveedor, hash de la api_key, url_api, async) para todo el proceso:
+# GeneradorIA se crea por request y antes cada request abría su propio pool HTTP
+# (y su handshake TLS). Los clientes async quedan ligados al event loop del worker.
+
+_registro: Dict[Tuple[str, str, str, bool], Any] = {}
+_claves_por_llm: Dict[Any, Set[Tuple[str, str, str, bool]]] = {}
+_registro_lock = threading.Lock()
+
+
+def _clave_registro(llm: Any, asincrono: bool) -> Tuple[str, str, str, bool]:
+    huella = hashlib.sha256((llm.api_key or "").encode("utf-8")).hexdigest()[:16]
+    return (llm.proveedor, huella, str(getattr(llm, "url_api", None) or ""), asincrono)
+
+
+def obtener_cliente(llm: Any, asincrono: bool = True, crear: Optional[Callable[[Any], Any]] = None) -> Any:
+    """
+    Cliente compartido por el proceso para el LLM (lo crea la primera vez)
+
+    Args:
+        llm: LLMMaestro (o su snapshot)
+        asincrono: cliente async (endpoints) o síncrono (ruta legacy)
+        crear: fábrica alternativa a crear_cliente_async / crear_cliente
+
+    Returns:
+        Igual que crear_cliente_async / crear_cliente (None para modo simulado)
+    """
+    clave = _clave_registro(llm, asincrono)
+    with _registro_lock:
+        _claves_por_llm.setdefault(getattr(llm, "id", None), set()).add(clave)
+        if clave in _registro:
+            return _registro[clave]
+
+    if crear is None:
+        crear = crear_cliente_async if asincrono else crear_cliente
+    cliente = crear(llm)
+    with _registro_lock:
+        return _registro.setdefault(clave, cliente)
+
+
+def invalidar_clientes_llm(llm_id: Any) -> int:
+    """
+    Descarta los clientes usados por un LLMMaestro (llamar tras editarlo o borrarlo)
+
+    Las llamadas en curso terminan con el cliente anterior; las siguientes crean
+    uno nuevo con la configuración actual.
+
+    Returns:
+        Número de clientes descartados
+    """
+    with _registro_lock:
+        claves = _claves_por_llm.pop(llm_id, set())
+        return sum(1 for clave in claves if _registro.pop(clave, None) is not None)
+
+
+async def cerrar_clientes() -> None:
+    """Cierra los pools HTTP de todos los clientes (apagado de la aplicación)"""
+    with _registro_lock:
+        clientes = list(_registro.items())
+        _registro.clear()
+        _claves_por_llm.clear()
+    for (_, _, _, asincrono), cliente in clientes:
+        cerrar = getattr(cliente, "close", None)
+        if cerrar is None:
+            continue
+        try:
+            if asincrono:
+                await cerrar()
+            else:
+                cerrar()
+        except Exception as e:
+            logger.warning("⚠️ Error cerrando cliente LLM: %s", e)
+
+
+async def precalentar(llms: List[Any]) -> Dict[str, bool]:
+    """
+    Abre la conexión (DNS + TCP + TLS) de los clientes de los LLM indicados con una
+    petición sin coste de tokens (listado de modelos), para que la primera
+    generación no pague el handshake
+
+    Returns:
+        {nombre del LLM: True si la conexión quedó abierta}
+    """
+    async def _precalentar(llm: Any) -> bool:
+        try:
+            cliente = obtener_cliente(llm)
+            modelos = getattr(cliente, "models", None)
+            if cliente is None or modelos is None or not hasattr(modelos, "list"):
+                return False
+            await asyncio.wait_for(modelos.list(), timeout=settings.LLM_PRECALENTAR_TIMEOUT_S)
+            return True
+        except Exception as e:
+            logger.warning("⚠️ No se pudo precalentar %s: %s", llm.nombre, e)
+            return False
+
+    resultados = await asyncio.gather(*[_precalentar(llm) for llm in llms])
+    return {llm.nombre: ok for llm, ok in zip(llms, resultados)}
+
+
+# ==================== MENSAJES Y USO ====================
+
+def texto_contenido(contenido) -> str:
+    """Texto plano del 'content' de un mensaje (string o lista de bloques)"""
+    if isinstance(contenido, list):
+        return "\n\n".join(bloque.get("text", "") for bloque in contenido if isinstance(bloque, dict))
+    return str(contenido)
+
+
+def aplanar_mensajes(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Convierte los bloques de contenido en texto para proveedores que no aceptan
+    cache_control (OpenAI aplica su caché de prefijo automáticamente, por lo que
+    basta con conservar el orden: prefijo estable primero)
+    """
+    return [{**msg, "content": texto_contenido(msg.get("content", ""))} for msg in messages]
+
+
+def mensajes_a_texto(prompt_contenido) -> str:
+    """Convierte una lista de mensajes en un prompt de texto plano (Gemini)"""
+    if not isinstance(prompt_contenido, list):
+        return str(prompt_contenido)
+
+    prompt_str = ""
+    for msg in prompt_contenido:
+        contenido = texto_contenido(msg.get('content', ''))
+        if msg.get('role') == 'system':
+            prompt_str += f"Instrucciones del sistema: {contenido}\n\n"
+        elif msg.get('role') == 'user':
+            prompt_str += f"Usuario: {contenido}\n"
+        elif msg.get('role') == 'assistant':
+            prompt_str += f"Asistente: {contenido}\n"
+        else:
+            prompt_str += f"{contenido}\n"
+    return prompt_str
+
+
+def uso_tokens(tokens: int = 0, cache_lectura: int = 0, cache_escritura: int = 0) -> Dict[str, int]:
+    """Uso de una llamada: tokens totales (entrada + salida) y tokens de entrada servidos/escritos en caché"""
+    return {
+        "tokens": tokens or 0,
+        "tokens_cache_lectura": cache_lectura or 0,
+        "tokens_cache_escritura": cache_escritura or 0
+    }
+
+
+def _entero(usage: Any, campo: str) -> int:
+    """Campo numérico del uso; 0 si el SDK/proxy no lo reporta"""
+    valor = getattr(usage, campo, 0)
+    return valor if isinstance(valor, int) else 0
+
+
+def uso_anthropic(usage: Any) -> Dict[str, int]:
+    """input_tokens de Anthropic excluye lo leído/escrito en caché: se suma para el total"""
+    cache_lectura = _entero(usage, "cache_read_input_tokens")
+    cache_escritura = _entero(usage, "cache_creation_input_tokens")
+    return uso_tokens(
+        usage.input_tokens + usage.output_tokens + cache_lectura + cache_escritura,
+        cache_lectura,
+        cache_escritura
+    )
+
+
+def uso_openai(usage: Any) -> Dict[str, int]:
+    detalles = getattr(usage, "prompt_tokens_details", None)
+    return uso_tokens(usage.total_tokens, _entero(detalles, "cached_tokens"))
+
+
+# ==================== LLAMADAS ====================
+
+async def completar_async(
+    cliente: Any,
+    llm: Any,
+    prompt_contenido,
+    max_tokens: int = 2000,
+    temperature: float = 0.7
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Envía el prompt al proveedor sin bloquear el event loop
+
+    Returns:
+        Tupla (texto generado, uso de tokens; ver uso_tokens)
+    """
+    inicio = time.perf_counter()
+    try:
+        resultado = await _completar_async(cliente, llm, prompt_contenido, max_tokens, temperature)
+    except Exception as e:
+        metricas_prometheus.observar_llamada_llm(llm, inicio, e)
+        raise
+    metricas_prometheus.observar_llamada_llm(llm, inicio)
+    return resultado
+
+
+async def _completar_async(
+    cliente: Any,
+    llm: Any,
+    prompt_contenido,
+    max_tokens: int,
+    temperature: float
+) -> Tuple[str, Dict[str, int]]:
+    messages = prompt_contenido if isinstance(prompt_contenido, list) else [{"role": "user", "content": prompt_contenido}]
+
+    if llm.proveedor == "Mock":
+        contenido, entrada, salida = await cliente.completar(mensajes_a_texto(prompt_contenido), max_tokens)
+        return contenido, uso_tokens(entrada + salida)
+
+    if llm.proveedor == "Anthropic":
+        respuesta = await cliente.messages.create(
+            model=llm.modelo_id,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=messages
+        )
+        return respuesta.content[0].text, uso_anthropic(respuesta.usage)
+
+    if llm.proveedor == "OpenAI":
+        messages = aplanar_mensajes(messages)
+        if not isinstance(cliente, ClienteOpenAILegacy):
+            respuesta = await cliente.chat.completions.create(
+                model=llm.modelo_id,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+        else:
+            respuesta = await ejecutar_en_executor(
+                lambda: cliente.ChatCompletion.create(
+                    model=llm.modelo_id,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
+            )
+        return respuesta.choices[0].message.content, uso_openai(respuesta.usage)
+
+    if llm.proveedor == "Google":
+        model = cliente.GenerativeModel(llm.modelo_id)
+        prompt_str = mensajes_a_texto(prompt_contenido)
+        respuesta = await model.generate_content_async(prompt_str)
+        contenido = respuesta.text
+        # Gemini no reporta uso en todas las versiones: estimación por palabras
+        return contenido, uso_tokens(len(prompt_str.split()) + len(contenido.split()))
+
+    raise ValueError(f"Proveedor no soportado: {llm.proveedor}")
+
+
+async def stream_async(
+    cliente: Any,
+    llm: Any,
+    prompt_contenido,
+    max_tokens: int = 2000,
+    temperature: float = 0.7
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Envía el prompt usando la API de streaming del proveedor
+
+    Yields:
+        {"tipo": "delta", "texto": str} por cada fragmento recibido y, al final,
+        {"tipo": "fin", "uso": Dict} con el uso total (ver uso_tokens)
+    """
+    inicio = time.perf_counter()
+    try:
+        async for evento in _stream_async(cliente, llm, prompt_contenido, max_tokens, temperature):
+            yield evento
+    except Exception as e:
+        metricas_prometheus.observar_llamada_llm(llm, inicio, e)
+        raise
+    metricas_prometheus.observar_llamada_llm(llm, inicio)
+
+
+async def _stream_async(
+    cliente: Any,
+    llm: Any,
+    prompt_contenido,
+    max_tokens: int,
+    temperature: float
+) -> AsyncIterator[Dict[str, Any]]:
+    messages = prompt_contenido if isinstance(prompt_contenido, list) else [{"role": "user", "content": prompt_contenido}]
+
+    if llm.proveedor == "Mock":
+        async for evento in cliente.stream(mensajes_a_texto(prompt_contenido), max_tokens):
+            if evento["tipo"] == "delta":
+                yield evento
+            else:
+                yield {"tipo": "fin", "uso": uso_tokens(evento["entrada"] + evento["salida"])}
+        return
+
+    if llm.proveedor == "Anthropic":
+        async with cliente.messages.stream(
+            model=llm.modelo_id,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=messages
+        ) as stream:
+            async for texto in stream.text_stream:
+                yield {"tipo": "delta", "texto": texto}
+            final = await stream.get_final_message()
+        yield {"tipo": "fin", "uso": uso_anthropic(final.usage)}
+        return
+
+    if llm.proveedor == "OpenAI":
+        if isinstance(cliente, ClienteOpenAILegacy):
+            # SDK legacy: sin streaming async, se entrega la respuesta completa de una vez
+            contenido, uso = await _completar_async(cliente, llm, prompt_contenido, max_tokens, temperature)
+            yield {"tipo": "delta", "texto": contenido}
+            yield {"tipo": "fin", "uso": uso}
+            return
+        respuesta = await cliente.chat.completions.create(
+            model=llm.modelo_id,
+            messages=aplanar_mensajes(messages),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        uso = uso_tokens()
+        async for chunk in respuesta:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield {"tipo": "delta", "texto": chunk.choices[0].delta.content}
+            if getattr(chunk, "usage", None):
+                uso = uso_openai(chunk.usage)
+        yield {"tipo": "fin", "uso": uso}
+        return
+
+    if llm.proveedor == "Google":
+        model = cliente.GenerativeModel(llm.modelo_id)
+        prompt_str = mensajes_a_texto(prompt_contenido)
+        respuesta = await model.generate_content_async(prompt_str, stream=True)
+        contenido = ""
+        async for chunk in respuesta:
+            if chunk.text:
+                contenido += chunk.text
+                yield {"tipo": "delta", "texto": chunk.text}
+        yield {"tipo": "fin", "uso": uso_tokens(len(prompt_str.split()) + len(contenido.split()))}
+        return
+
+    raise ValueError(f"Proveedor no soportado: {llm.proveedor}")
@@ -0,0 +1,682 @@
+"""
+Regeneración masiva de salidas por sección, proyecto, estado o rango de fechas
+Avanza en segundo plano encolando trabajos (modo cola) o por la API batch del proveedor (modo batch)
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from config import settings
+from core import logs
+from core.database import SessionLocal
+from models.cargas import NOTICIA_PARA_GENERAR
+from models.orm_models import (
+    RegeneracionMasiva,
+    TrabajoGeneracion,
+    Noticia,
+    NoticiaSalida,
+    SalidaMaestro,
+    LLMMaestro,
+    Usuario
+)
+from services.generador_ia import GeneradorIA
+from services import cola_generacion
+from services import prioridad_generacion
+from services import proveedores_batch
+from services import proveedores_llm
+
+logger = logging.getLogger(__name__)
+
+MODO_COLA = "cola"
+MODO_BATCH = "batch"
+MODOS = (MODO_COLA, MODO_BATCH)
+
+EN_CURSO = "en_curso"
+PAUSADA = "pausada"
+COMPLETADA = "completada"
+CANCELADA = "cancelada"
+ERROR = "error"
+ESTADOS_FINALES = (COMPLETADA, CANCELADA, ERROR)
+
+# Estado de cada lote en lotes_batch ("enviando": reservado, aún sin batch_id)
+LOTE_ENVIANDO = "enviando"
+LOTE_EN_PROCESO = proveedores_batch.EN_PROCESO
+LOTE_PROCESADO = "procesado"
+LOTE_REENVIADO = "reenviado"
+PREFIJO_ENVIANDO = "enviando-"
+
+_lock = Lock()
+_estadisticas = {
+    "creadas": 0,
+    "pasos": 0,
+    "noticias_encoladas": 0,
+    "lotes_enviados": 0,
+    "lotes_reenviados": 0,
+    "salidas_batch_ok": 0,
+    "salidas_batch_reencoladas": 0,
+    "salidas_batch_error": 0,
+    "tokens_batch": 0
+}
+
+
+def _contar(clave: str, n: int = 1) -> None:
+    with _lock:
+        _estadisticas[clave] += n
+
+
+def _ahora() -> datetime:
+    return datetime.utcnow()
+
+
+def _fecha(valor: Any) -> Optional[datetime]:
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor))
+
+
+# ==================== SELECCIÓN DE NOTICIAS ====================
+
+def consulta_noticias(db: Session, filtro: Dict[str, Any]):
+    """
+    Noticias que cumplen el filtro (sin estado se excluyen las eliminadas)
+
+    filtro: seccion_id, proyecto_id, estado, desde y hasta (sobre Noticia.fecha)
+    """
+    consulta = db.query(Noticia)
+    if filtro.get("seccion_id") is not None:
+        consulta = consulta.filter(Noticia.seccion_id == filtro["seccion_id"])
+    if filtro.get("proyecto_id") is not None:
+        consulta = consulta.filter(Noticia.proyecto_id == filtro["proyecto_id"])
+    if filtro.get("estado"):
+        consulta = consulta.filter(Noticia.estado == filtro["estado"])
+    else:
+        consulta = consulta.filter(Noticia.estado != 'eliminado')
+    if filtro.get("desde"):
+        consulta = consulta.filter(Noticia.fecha >= _fecha(filtro["desde"]))
+    if filtro.get("hasta"):
+        consulta = consulta.filter(Noticia.fecha <= _fecha(filtro["hasta"]))
+    return consulta
+
+
+def _siguientes(db: Session, regeneracion: RegeneracionMasiva, limite: int) -> List[Noticia]:
+    return consulta_noticias(db, regeneracion.filtro or {}).filter(
+        Noticia.id > regeneracion.cursor_noticia_id
+    ).order_by(Noticia.id).limit(limite).all()
+
+
+def _salidas_por_noticia(db: Session, regeneracion: RegeneracionMasiva, noticias_ids: List[int]) -> Dict[int, List[int]]:
+    """Salidas a regenerar de cada noticia: las pedidas o, sin ellas, las que ya tiene"""
+    if regeneracion.salidas_ids:
+        return {noticia_id: list(regeneracion.salidas_ids) for noticia_id in noticias_ids}
+    salidas: Dict[int, List[int]] = {}
+    filas = db.query(NoticiaSalida.noticia_id, NoticiaSalida.salida_id).join(
+        SalidaMaestro, SalidaMaestro.id == NoticiaSalida.salida_id
+    ).filter(
+        NoticiaSalida.noticia_id.in_(noticias_ids),
+        SalidaMaestro.activo == True
+    ).order_by(NoticiaSalida.salida_id).all()
+    for noticia_id, salida_id in filas:
+        salidas.setdefault(noticia_id, []).append(salida_id)
+    return salidas
+
+
+# ==================== CREAR / CONTROLAR ====================
+
+def crear(
+    db: Session,
+    filtro: Dict[str, Any],
+    llm_id: int,
+    usuario_id: Optional[int] = None,
+    salidas_ids: Optional[List[int]] = None,
+    modo: str = MODO_COLA,
+    modo_combinado: bool = False
+) -> RegeneracionMasiva:
+    """Crea la regeneración en curso; el supervisor la hace avanzar"""
+    if modo not in MODOS:
+        raise ValueError(f"Modo no soportado: {modo}")
+    filtro = {clave: valor.isoformat() if isinstance(valor, datetime) else valor
+              for clave, valor in filtro.items() if valor is not None}
+    regeneracion = RegeneracionMasiva(
+        usuario_id=usuario_id,
+        llm_id=llm_id,
+        filtro=filtro,
+        salidas_ids=list(dict.fromkeys(salidas_ids)) if salidas_ids else None,
+        modo=modo,
+        modo_combinado=modo_combinado,
+        estado=EN_CURSO,
+        total_noticias=consulta_noticias(db, filtro).count(),
+        noticias_enviadas=0,
+        cursor_noticia_id=0,
+        cursor_agotado=False,
+        salidas_completadas=0,
+        salidas_con_error=0,
+        salidas_omitidas=0,
+        lotes_batch={}
+    )
+    db.add(regeneracion)
+    db.commit()
+    db.refresh(regeneracion)
+    _contar("creadas")
+    logger.info("🔁 Regeneración masiva %s creada: %s noticias (modo %s)", regeneracion.id, regeneracion.total_noticias, modo)
+    return regeneracion
+
+
+def pausar(db: Session, regeneracion: RegeneracionMasiva) -> bool:
+    """Deja de enviar noticias (los trabajos ya encolados siguen; los lotes se recogen al reanudar)"""
+    if regeneracion.estado != EN_CURSO:
+        return False
+    regeneracion.estado = PAUSADA
+    db.commit()
+    return True
+
+
+def reanudar(db: Session, regeneracion: RegeneracionMasiva) -> bool:
+    if regeneracion.estado != PAUSADA:
+        return False
+    regeneracion.estado = EN_CURSO
+    db.commit()
+    return True
+
+
+def cancelar(db: Session, regeneracion: RegeneracionMasiva) -> bool:
+    """Cancela la regeneración y sus trabajos aún pendientes (los en curso terminan)"""
+    if regeneracion.estado in ESTADOS_FINALES:
+        return False
+    regeneracion.estado = CANCELADA
+    regeneracion.terminado_en = _ahora()
+    pendientes = db.query(TrabajoGeneracion).filter(
+        TrabajoGeneracion.regeneracion_id == regeneracion.id,
+        TrabajoGeneracion.estado == cola_generacion.PENDIENTE
+    ).all()
+    for trabajo in pendientes:
+        trabajo.estado = cola_generacion.CANCELADO
+        trabajo.terminado_en = _ahora()
+    db.commit()
+    return True
+
+
+# ==================== AVANCE ====================
+
+def _trabajos_en_vuelo(db: Session, regeneracion: RegeneracionMasiva) -> int:
+    return db.query(func.count(TrabajoGeneracion.id)).filter(
+        TrabajoGeneracion.regeneracion_id == regeneracion.id,
+        TrabajoGeneracion.estado.in_((cola_generacion.PENDIENTE, cola_generacion.EN_CURSO))
+    ).scalar() or 0
+
+
+def _encolar(db: Session, regeneracion: RegeneracionMasiva, noticia_id: int, salidas_ids: List[int]) -> None:
+    """Trabajo de la regeneración (sin commit: va en la transacción del paso)"""
+    cola_generacion.encolar(
+        db,
+        noticia_id=noticia_id,
+        salidas_ids=salidas_ids,
+        llm_id=regeneracion.llm_id,
+        usuario_id=regeneracion.usuario_id,
+        regenerar=True,
+        modo_combinado=regeneracion.modo_combinado,
+        prioridad=prioridad_generacion.LOTE,
+        regeneracion_id=regeneracion.id,
+        confirmar=False
+    )
+
+
+def _avanzar_cola(db: Session, regeneracion: RegeneracionMasiva) -> int:
+    """Encola noticias hasta completar BULK_MAX_EN_VUELO trabajos en vuelo"""
+    if regeneracion.cursor_agotado:
+        return 0
+    huecos = settings.BULK_MAX_EN_VUELO - _trabajos_en_vuelo(db, regeneracion)
+    if huecos <= 0:
+        return 0
+    noticias = _siguientes(db, regeneracion, huecos)
+    salidas = _salidas_por_noticia(db, regeneracion, [n.id for n in noticias])
+    encoladas = 0
+    for noticia in noticias:
+        if salidas.get(noticia.id):
+            _encolar(db, regeneracion, noticia.id, salidas[noticia.id])
+            encoladas += 1
+        regeneracion.cursor_noticia_id = noticia.id
+        regeneracion.noticias_enviadas += 1
+    if len(noticias) < huecos:
+        regeneracion.cursor_agotado = True
+    _contar("noticias_encoladas", encoladas)
+    return encoladas
+
+
+async def _completar_local(llm: Any, peticion: proveedores_batch.PeticionBatch) -> Tuple[str, Dict[str, int]]:
+    """
+    Ejecutor del sustituto local: una llamada normal (o simulada sin API key) con
+    prioridad lote, devuelta en el formato de respuesta del LLM (TÍTULO/CONTENIDO)
+    """
+    generador = GeneradorIA(None, prioridad=prioridad_generacion.LOTE)
+    resultado, tokens = await generador.invocar_llm_async(
+        llm, peticion.mensajes, peticion.max_tokens, peticion.temperature
+    )
+    texto = f"TÍTULO: {resultado['titulo']}\n\nCONTENIDO:\n{resultado['contenido']}"
+    return texto, proveedores_llm.uso_tokens(
+        tokens, resultado.get("tokens_cache_lectura", 0), resultado.get("tokens_cache_escritura", 0)
+    )
+
+
+def _id_peticion(noticia_id: int, salida_id: int) -> str:
+    return f"n{noticia_id}-s{salida_id}"
+
+
+def _leer_id_peticion(custom_id: str) -> Tuple[int, int]:
+    noticia, salida = custom_id.split("-")
+    return int(noticia[1:]), int(salida[1:])
+
+
+def _construir_lote(
+    db: Session,
+    regeneracion: RegeneracionMasiva,
+    llm: LLMMaestro,
+    noticias: List[Noticia],
+    generador: GeneradorIA
+) -> Tuple[List[proveedores_batch.PeticionBatch], Dict[str, Any]]:
+    """
+    Peticiones de un lote nuevo (una por noticia y salida) y su entrada en lotes_batch
+
+    Returns:
+        (peticiones, entrada con estado "enviando"); sin peticiones no hay nada que enviar
+    """
+    salidas_por_noticia = _salidas_por_noticia(db, regeneracion, [n.id for n in noticias])
+    salidas = {
+        s.id: s for s in db.query(SalidaMaestro).filter(
+            SalidaMaestro.id.in_({sid for ids in salidas_por_noticia.values() for sid in ids})
+        ).all()
+    }
+    peticiones, huellas = [], {}
+    for noticia in noticias:
+        for salida_id in salidas_por_noticia.get(noticia.id, []):
+            salida = salidas.get(salida_id)
+            try:
+                if salida is None:
+                    raise ValueError(f"Salida {salida_id} no encontrada")
+                preparada = generador.preparar_peticion_lote(noticia, salida, llm)
+            except Exception as e:
+                # Sin prompt en la sección o salida borrada: fallaría igual en la cola
+                logger.warning("⚠️ Regeneración %s: noticia %s salida %s descartada: %s", regeneracion.id, noticia.id, salida_id, e)
+                regeneracion.salidas_con_error += 1
+                _contar("salidas_batch_error")
+                continue
+            if preparada is None:
+                regeneracion.salidas_omitidas += 1
+                continue
+            prompt_final, max_tokens, huella = preparada
+            custom_id = _id_peticion(noticia.id, salida_id)
+            huellas[custom_id] = huella
+            peticiones.append(proveedores_batch.PeticionBatch(custom_id, prompt_final, max_tokens))
+    return peticiones, {
+        "noticias": [n.id for n in noticias],
+        "peticiones": [p.custom_id for p in peticiones],
+        # Huella de las entradas al construir el prompt (no al recoger el lote)
+        "huellas": huellas,
+        "estado": LOTE_ENVIANDO
+    }
+
+
+def _reconstruir_peticiones(db: Session, lote: Dict[str, Any], llm: Any) -> List[proveedores_batch.PeticionBatch]:
+    """Peticiones de un lote ya registrado que hay que volver a enviar (sin tocar contadores)"""
+    generador = GeneradorIA(db, prioridad=prioridad_generacion.LOTE)
+    generador.incremental = False  # ya se decidió regenerarlas al construir el lote
+    ids = [_leer_id_peticion(custom_id) for custom_id in lote["peticiones"]]
+    noticias = {
+        n.id: n for n in db.query(Noticia).options(*NOTICIA_PARA_GENERAR).filter(Noticia.id.in_({n for n, _ in ids})).all()
+    }
+    salidas = {s.id: s for s in db.query(SalidaMaestro).filter(SalidaMaestro.id.in_({s for _, s in ids})).all()}
+    peticiones = []
+    for custom_id, (noticia_id, salida_id) in zip(lote["peticiones"], ids):
+        noticia, salida = noticias.get(noticia_id), salidas.get(salida_id)
+        if noticia is None or salida is None:
+            continue
+        try:
+            prompt_final, max_tokens, _ = generador.preparar_peticion_lote(noticia, salida, llm)
+        except Exception as e:
+            logger.warning("⚠️ %s no se puede reenviar: %s", custom_id, e)
+            continue
+        peticiones.append(proveedores_batch.PeticionBatch(custom_id, prompt_final, max_tokens))
+    return peticiones
+
+
+def _planificar_batch(
+    db: Session,
+    regeneracion: RegeneracionMasiva,
+    llm: LLMMaestro
+) -> List[Tuple[str, List[proveedores_batch.PeticionBatch]]]:
+    """
+    Reserva los lotes a enviar en este paso: avanza el cursor y deja cada lote en
+    lotes_batch como "enviando" (sin commit: va en la transacción del reclamo)
+
+    Los "enviando" que quedaron de un paso anterior (error del proveedor o proceso
+    caído antes de registrar el batch_id) se vuelven a enviar.
+
+    Returns:
+        [(clave provisional en lotes_batch, peticiones)]
+    """
+    generador = GeneradorIA(db, prioridad=prioridad_generacion.LOTE)
+    lotes = dict(regeneracion.lotes_batch or {})
+    envios = []
+    for clave, lote in list(lotes.items()):
+        if lote["estado"] != LOTE_ENVIANDO:
+            continue
+        logger.warning("⚠️ Regeneración %s: se reenvía el lote %s, cuyo envío no llegó a registrarse", regeneracion.id, clave)
+        peticiones = _reconstruir_peticiones(db, lote, llm)
+        if peticiones:
+            envios.append((clave, peticiones))
+        else:
+            del lotes[clave]
+
+    ocupados = sum(1 for lote in lotes.values() if lote["estado"] in (LOTE_EN_PROCESO, LOTE_ENVIANDO))
+    while ocupados < settings.BULK_BATCH_MAX_EN_VUELO and not regeneracion.cursor_agotado:
+        noticias = _siguientes(db, regeneracion, settings.BULK_BATCH_TAMANO)
+        if len(noticias) < settings.BULK_BATCH_TAMANO:
+            regeneracion.cursor_agotado = True
+        if not noticias:
+            break
+        peticiones, entrada = _construir_lote(db, regeneracion, llm, noticias, generador)
+        regeneracion.cursor_noticia_id = noticias[-1].id
+        regeneracion.noticias_enviadas += len(noticias)
+        if peticiones:
+            clave = f"{PREFIJO_ENVIANDO}{uuid.uuid4().hex}"
+            lotes[clave] = entrada
+            envios.append((clave, peticiones))
+            ocupados += 1
+    regeneracion.lotes_batch = lotes
+    return envios
+
+
+async def _aplicar_resultados(
+    regeneracion_id: int,
+    usuario_id: Optional[int],
+    llm: Any,
+    lote: Dict[str, Any],
+    resultados: proveedores_batch.Resultados,
+    fabrica_sesiones: Any
+) -> Tuple[int, Dict[int, List[int]]]:
+    """
+    Guarda las salidas generadas por el lote (commit por salida, sin la fila de la
+    regeneración bloqueada). Si el proceso cae antes de registrar el lote como
+    procesado, se vuelve a aplicar (regenerar sobrescribe la misma salida).
+
+    Returns:
+        (salidas guardadas, {noticia_id: salidas que fallaron o no vinieron en los resultados})
+    """
+    ids = [_leer_id_peticion(custom_id) for custom_id in lote["peticiones"]]
+    fallidas: Dict[int, List[int]] = {}
+    guardadas = 0
+    sesion = fabrica_sesiones()
+    try:
+        usuario = sesion.get(Usuario, usuario_id) if usuario_id else None
+        generador = GeneradorIA(sesion, usuario=usuario, prioridad=prioridad_generacion.LOTE)
+        noticias = {
+            n.id: n for n in sesion.query(Noticia).options(*NOTICIA_PARA_GENERAR).filter(Noticia.id.in_({n for n, _ in ids})).all()
+        }
+        salidas = {s.id: s for s in sesion.query(SalidaMaestro).filter(SalidaMaestro.id.in_({s for _, s in ids})).all()}
+        for custom_id, (noticia_id, salida_id) in zip(lote["peticiones"], ids):
+            noticia, salida = noticias.get(noticia_id), salidas.get(salida_id)
+            if noticia is None or salida is None:
+                continue  # borrada mientras el lote estaba en proceso
+            resultado_batch = resultados.get(custom_id) or {"error": "sin resultado en el lote"}
+            try:
+                if "error" in resultado_batch:
+                    raise Exception(resultado_batch["error"])
+                noticia_salida = await generador.guardar_respuesta_lote(
+                    noticia, salida, llm, resultado_batch["contenido"], resultado_batch["uso"],
+                    huella=(lote.get("huellas") or {}).get(custom_id)
+                )
+                guardadas += 1
+                _contar("tokens_batch", noticia_salida.tokens_usados or 0)
+            except Exception as e:
+                sesion.rollback()
+                logger.warning("⚠️ Regeneración %s: %s falló en el lote (%s); se reintenta en la cola", regeneracion_id, custom_id, e)
+                fallidas.setdefault(noticia_id, []).append(salida_id)
+    finally:
+        sesion.close()
+    return guardadas, fallidas
+
+
+async def _ejecutar_batch(
+    regeneracion_id: int,
+    usuario_id: Optional[int],
+    llm: Any,
+    lotes: Dict[str, Dict[str, Any]],
+    envios: List[Tuple[str, List[proveedores_batch.PeticionBatch]]],
+    fabrica_sesiones: Any,
+    ejecutor_local: Any
+) -> Dict[str, Any]:
+    """
+    Parte de red del paso, sin la fila bloqueada ni transacción abierta: envía los
+    lotes reservados, consulta los que están en proceso y aplica los terminados
+
+    Un error en un lote no impide registrar lo que ya se hizo con los demás.
+
+    Returns:
+        Cambios para _registrar_batch: "enviados" {clave: (batch_id, proveedor)},
+        "procesados" {batch_id: (guardadas, fallidas)} y "reenviados" {batch_id: (nuevo, proveedor)}
+    """
+    cambios: Dict[str, Any] = {"enviados": {}, "procesados": {}, "reenviados": {}}
+    for clave, peticiones in envios:
+        try:
+            proveedor, batch_id = await proveedores_batch.enviar(llm, peticiones, ejecutor_local)
+        except Exception as e:
+            logger.warning("⚠️ Regeneración %s: no se pudo enviar el lote (%s); se reintenta en el siguiente paso", regeneracion_id, e)
+            continue
+        cambios["enviados"][clave] = (batch_id, proveedor)
+        _contar("lotes_enviados")
+
+    for batch_id, lote in lotes.items():
+        if lote["estado"] != LOTE_EN_PROCESO:
+            continue
+        try:
+            estado = await proveedores_batch.consultar(llm, lote["proveedor"], batch_id)
+            if estado == proveedores_batch.DESCONOCIDO:
+                # Lote del sustituto local perdido en un reinicio: se envía otra vez
+                sesion = fabrica_sesiones()
+                try:
+                    peticiones = _reconstruir_peticiones(sesion, lote, llm)
+                finally:
+                    sesion.close()
+                nuevo = await proveedores_batch.enviar(llm, peticiones, ejecutor_local) if peticiones else None
+                cambios["reenviados"][batch_id] = (nuevo[1], nuevo[0]) if nuevo else None
+                _contar("lotes_reenviados")
+            elif estado == proveedores_batch.TERMINADO:
+                resultados = await proveedores_batch.resultados(llm, lote["proveedor"], batch_id)
+                cambios["procesados"][batch_id] = await _aplicar_resultados(
+                    regeneracion_id, usuario_id, llm, lote, resultados, fabrica_sesiones
+                )
+        except Exception as e:
+            logger.warning("⚠️ Regeneración %s: error con el lote %s: %s", regeneracion_id, batch_id, e)
+    return cambios
+
+
+def _registrar_batch(db: Session, regeneracion: RegeneracionMasiva, cambios: Dict[str, Any]) -> None:
+    """Anota en lotes_batch los batch_id enviados y los lotes procesados; reencola las fallidas"""
+    lotes = dict(regeneracion.lotes_batch or {})
+    for clave, (batch_id, proveedor) in cambios["enviados"].items():
+        entrada = lotes.pop(clave, None)
+        if entrada is None:
+            continue
+        lotes[batch_id] = {**entrada, "proveedor": proveedor, "estado": LOTE_EN_PROCESO, "enviado_en": _ahora().isoformat()}
+    for batch_id, nuevo in cambios["reenviados"].items():
+        lote = lotes[batch_id]
+        lotes[batch_id] = {**lote, "estado": LOTE_REENVIADO}
+        if nuevo:
+            nuevo_id, proveedor = nuevo
+            lotes[nuevo_id] = {**lote, "proveedor": proveedor, "estado": LOTE_EN_PROCESO, "enviado_en": _ahora().isoformat()}
+    for batch_id, (guardadas, fallidas) in cambios["procesados"].items():
+        for noticia_id, salidas_ids in fallidas.items():
+            _encolar(db, regeneracion, noticia_id, salidas_ids)
+        reencoladas = sum(len(ids) for ids in fallidas.values())
+        regeneracion.salidas_completadas += guardadas
+        lotes[batch_id] = {**lotes[batch_id], "estado": LOTE_PROCESADO, "guardadas": guardadas, "reencoladas": reencoladas}
+        _contar("salidas_batch_ok", guardadas)
+        _contar("salidas_batch_reencoladas", reencoladas)
+    regeneracion.lotes_batch = lotes
+
+
+def _comprobar_fin(db: Session, regeneracion: RegeneracionMasiva) -> None:
+    lotes_pendientes = any(
+        lote["estado"] in (LOTE_EN_PROCESO, LOTE_ENVIANDO) for lote in (regeneracion.lotes_batch or {}).values()
+    )
+    if regeneracion.cursor_agotado and not lotes_pendientes and not _trabajos_en_vuelo(db, regeneracion):
+        regeneracion.estado = COMPLETADA
+        regeneracion.terminado_en = _ahora()
+        logger.info("✅ Regeneración masiva %s completada (%s noticias)", regeneracion.id, regeneracion.noticias_enviadas)
+
+
+async def avanzar(
+    regeneracion_id: int,
+    fabrica_sesiones: Any = None,
+    ejecutor_local: Any = None
+) -> Optional[str]:
+    """
+    Un paso de una regeneración en curso
+
+    En modo cola es una sola transacción con la fila bloqueada. En modo batch la
+    fila solo se bloquea para reclamar el paso (avanza el cursor, reserva los lotes
+    y toma paso_hasta) y para registrar el resultado; las llamadas a la API batch
+    van entre medias sin transacción abierta. paso_hasta impide que otro proceso
+    avance la misma regeneración mientras tanto y caduca si este cae.
+
+    Returns:
+        Estado tras el paso, o None si otro proceso la tiene o ya no está en curso
+    """
+    fabrica = fabrica_sesiones or SessionLocal
+    db = fabrica()
+    try:
+        ahora = _ahora()
+        regeneracion = db.query(RegeneracionMasiva).filter(
+            RegeneracionMasiva.id == regeneracion_id,
+            RegeneracionMasiva.estado == EN_CURSO,
+            or_(RegeneracionMasiva.paso_hasta.is_(None), RegeneracionMasiva.paso_hasta < ahora)
+        ).with_for_update(skip_locked=True).first()
+        if regeneracion is None:
+            return None
+        llm = db.query(LLMMaestro).filter(
+            LLMMaestro.id == regeneracion.llm_id,
+            LLMMaestro.activo == True
+        ).first()
+        if llm is None:
+            regeneracion.estado = ERROR
+            regeneracion.error = "LLM no encontrado o inactivo"
+            regeneracion.terminado_en = _ahora()
+        elif regeneracion.modo == MODO_BATCH:
+            envios = _planificar_batch(db, regeneracion, llm)
+            regeneracion.paso_hasta = ahora + timedelta(seconds=settings.BULK_PASO_EXPIRA_S)
+            usuario_id, lotes, llm = regeneracion.usuario_id, dict(regeneracion.lotes_batch or {}), GeneradorIA.copia_llm(llm)
+            db.commit()  # cursor y lotes "enviando" quedan registrados antes de llamar al proveedor
+            cambios = await _ejecutar_batch(
+                regeneracion_id, usuario_id, llm, lotes, envios, fabrica, ejecutor_local or partial(_completar_local, llm)
+            )
+            regeneracion = db.query(RegeneracionMasiva).filter(
+                RegeneracionMasiva.id == regeneracion_id
+            ).with_for_update().one()
+            _registrar_batch(db, regeneracion, cambios)
+            regeneracion.paso_hasta = None
+        else:
+            _avanzar_cola(db, regeneracion)
+        if regeneracion.estado == EN_CURSO:
+            _comprobar_fin(db, regeneracion)
+        db.commit()
+        _contar("pasos")
+        return regeneracion.estado
+    except Exception as e:
+        # Transitorio (proveedor o BD): lo no registrado se reintenta en el siguiente paso
+        logger.warning("⚠️ Error avanzando la regeneración masiva %s: %s", regeneracion_id, e)
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+async def supervisar(
+    fabrica_sesiones: Any = None,
+    detener: Optional[asyncio.Event] = None,
+    ejecutor_local: Any = None
+) -> None:
+    """Bucle que avanza las regeneraciones en curso cada BULK_INTERVALO_S"""
+    fabrica = fabrica_sesiones or SessionLocal
+    logger.info("🔁 Supervisor de regeneraciones masivas iniciado")
+    while not (detener and detener.is_set()):
+        db = fabrica()
+        try:
+            ids = [
+                regeneracion_id for (regeneracion_id,) in db.query(RegeneracionMasiva.id).filter(
+                    RegeneracionMasiva.estado == EN_CURSO
+                ).order_by(RegeneracionMasiva.id).all()
+            ]
+        except Exception as e:
+            logger.warning("⚠️ Error consultando regeneraciones masivas: %s", e)
+            ids = []
+        finally:
+            db.close()
+        for regeneracion_id in ids:
+            with logs.correlacion(f"regeneracion-{regeneracion_id}"):
+                await avanzar(regeneracion_id, fabrica, ejecutor_local)
+        await asyncio.sleep(settings.BULK_INTERVALO_S)
+
+
+# ==================== CONSULTA ====================
+
+def resumen(db: Session, regeneracion: RegeneracionMasiva) -> Dict[str, Any]:
+    """Progreso de la regeneración: noticias, trabajos de la cola y lotes"""
+    trabajos = {
+        estado: total for estado, total in db.query(
+            TrabajoGeneracion.estado, func.count(TrabajoGeneracion.id)
+        ).filter(TrabajoGeneracion.regeneracion_id == regeneracion.id).group_by(TrabajoGeneracion.estado).all()
+    }
+    lotes = regeneracion.lotes_batch or {}
+    pendientes = [l for l in lotes.values() if l["estado"] in (LOTE_EN_PROCESO, LOTE_ENVIANDO)]
+    noticias_en_lotes = sum(len(l["noticias"]) for l in pendientes)
+    en_vuelo = trabajos.get(cola_generacion.PENDIENTE, 0) + trabajos.get(cola_generacion.EN_CURSO, 0)
+    terminadas = max(0, regeneracion.noticias_enviadas - noticias_en_lotes - en_vuelo)
+    if regeneracion.estado == COMPLETADA or not regeneracion.total_noticias:
+        porcentaje = 100.0 if regeneracion.estado == COMPLETADA else 0.0
+    else:
+        porcentaje = round(min(100.0, 100.0 * terminadas / regeneracion.total_noticias), 1)
+    return {
+        "id": regeneracion.id,
+        "estado": regeneracion.estado,
+        "modo": regeneracion.modo,
+        "filtro": regeneracion.filtro or {},
+        "llm_id": regeneracion.llm_id,
+        "salidas_ids": regeneracion.salidas_ids,
+        "total_noticias": regeneracion.total_noticias,
+        "noticias_enviadas": regeneracion.noticias_enviadas,
+        "porcentaje": porcentaje,
+        "trabajos": trabajos,
+        "lotes_en_proceso": len(pendientes),
+        "salidas_batch_completadas": regeneracion.salidas_completadas,
+        "salidas_con_error": regeneracion.salidas_con_error,
+        "salidas_omitidas": regeneracion.salidas_omitidas,
+        "error": regeneracion.error,
+        "created_at": regeneracion.created_at.isoformat() if regeneracion.created_at else None,
+        "terminado_en": regeneracion.terminado_en.isoformat() if regeneracion.terminado_en else None
+    }
+
+
+def get_estadisticas(db: Optional[Session] = None) -> Dict[str, Any]:
+    """Contadores del proceso, de las APIs batch y, con db, regeneraciones por estado"""
+    with _lock:
+        estadisticas = dict(_estadisticas)
+    estadisticas["batch"] = proveedores_batch.get_estadisticas()
+    if db is not None:
+        filas = db.query(RegeneracionMasiva.estado, func.count(RegeneracionMasiva.id)).group_by(
+            RegeneracionMasiva.estado
+        ).all()
+        estadisticas["por_estado"] = {estado: total for estado, total in filas}
+    return estadisticas
+
+
+def reiniciar_estadisticas() -> None:
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
+    proveedores_batch.reiniciar_estadisticas()
@@ -6,7 +6,8 @@ from threading import Lock
 
 # Valores por defecto (None indica usar el valor de config.settings)
 _store = {
-    "MAX_PROMPT_CHARS": None
+    "MAX_PROMPT_CHARS": None,
+    "MAX_PROMPT_TOKENS": None
 }
 
 _lock = Lock()
@@ -19,6 +20,14 @@ def set_max_prompt_chars(value: int):
     with _lock:
         _store["MAX_PROMPT_CHARS"] = int(value) if value is not None else None
 
+def get_max_prompt_tokens():
+    with _lock:
+        return _store.get("MAX_PROMPT_TOKENS")
+
+def set_max_prompt_tokens(value: int):
+    with _lock:
+        _store["MAX_PROMPT_TOKENS"] = int(value) if value is not None else None
+
 def reset_all():
     with _lock:
         for k in _store.keys():
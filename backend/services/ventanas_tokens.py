@@ -0,0 +1,240 @@
+"""
+Ventanas deslizantes de consumo de tokens (último minuto, última hora, últimas 24 h)
+por LLM, por usuario y por sección
+
+Cada ventana es un anillo de tamaño fijo: 60 ranuras de 1 s, 60 de 1 min y 24 de
+1 h. Registrar un consumo solo suma en la ranura del instante actual (reciclándola
+si guardaba una época anterior), así las ventanas avanzan solas sin cron ni reset
+y sin insertar una fila por llamada.
+
+Los anillos viven en memoria del worker y se sincronizan con la tabla
+ventana_tokens cada TOKENS_VOLCADO_S: se suman los consumos locales pendientes a la
+fila (bajo bloqueo) y se recarga lo que escribieron los demás workers. Al arrancar
+se cargan desde la tabla, por lo que sobreviven a reinicios.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import settings
+from core.database import SessionLocal
+from models.orm_models import VentanaTokens
+from services import proveedores_llm
+
+logger = logging.getLogger(__name__)
+
+# escala: (ranuras, segundos por ranura)
+ESCALAS = {
+    "minuto": (60, 1),
+    "hora": (60, 60),
+    "dia": (24, 3600)
+}
+AMBITOS = ("llm", "usuario", "seccion")
+
+Clave = Tuple[str, int, str]
+
+
+class Anillo:
+    """Anillo de ranuras [época, tokens]; época = instante // segundos por ranura"""
+
+    __slots__ = ("ranuras", "ancho_s", "datos")
+
+    def __init__(self, ranuras: int, ancho_s: int, datos: Optional[List[List[int]]] = None):
+        self.ranuras = ranuras
+        self.ancho_s = ancho_s
+        self.datos = [[0, 0] for _ in range(ranuras)]
+        if datos:
+            self.fusionar(datos)
+
+    def sumar(self, instante: float, tokens: int) -> None:
+        epoca = int(instante // self.ancho_s)
+        self._sumar_en(epoca, tokens)
+
+    def _sumar_en(self, epoca: int, tokens: int) -> None:
+        ranura = self.datos[epoca % self.ranuras]
+        if ranura[0] != epoca:
+            if ranura[0] > epoca:
+                return  # más vieja que lo que ya ocupa la ranura: fuera de la ventana
+            ranura[0], ranura[1] = epoca, 0
+        ranura[1] += tokens
+
+    def fusionar(self, datos: List[List[int]]) -> None:
+        for epoca, tokens in datos:
+            if tokens:
+                self._sumar_en(int(epoca), int(tokens))
+
+    def total(self, instante: float) -> int:
+        actual = int(instante // self.ancho_s)
+        return sum(tokens for epoca, tokens in self.datos if actual - self.ranuras < epoca <= actual)
+
+    def serie(self, instante: float) -> List[Dict[str, Any]]:
+        """Ranuras de la ventana en orden cronológico (inicio de la ranura y tokens)"""
+        actual = int(instante // self.ancho_s)
+        por_epoca = {epoca: tokens for epoca, tokens in self.datos}
+        return [
+            {
+                "inicio": datetime.fromtimestamp(epoca * self.ancho_s).isoformat(),
+                "tokens": por_epoca.get(epoca, 0)
+            }
+            for epoca in range(actual - self.ranuras + 1, actual + 1)
+        ]
+
+    def a_lista(self, instante: float) -> List[List[int]]:
+        """Solo las ranuras vigentes (lo que se persiste)"""
+        actual = int(instante // self.ancho_s)
+        return [[epoca, tokens] for epoca, tokens in self.datos if tokens and actual - self.ranuras < epoca <= actual]
+
+
+_anillos: Dict[Clave, Anillo] = {}
+_pendientes: Dict[Clave, Anillo] = {}  # consumo local aún no sumado a la tabla
+_reinicios: Set[Clave] = set()  # entidades a vaciar también en la tabla
+_lock = Lock()
+
+
+def _nuevo(escala: str, datos: Optional[List[List[int]]] = None) -> Anillo:
+    ranuras, ancho_s = ESCALAS[escala]
+    return Anillo(ranuras, ancho_s, datos)
+
+
+def registrar(
+    llm_id: Optional[int],
+    usuario_id: Optional[int],
+    seccion_id: Optional[int],
+    tokens: int,
+    instante: Optional[float] = None
+) -> None:
+    """Suma el consumo de una llamada en todas las ventanas afectadas (O(1) en memoria)"""
+    if not tokens:
+        return
+    instante = time.time() if instante is None else instante
+    with _lock:
+        for ambito, entidad_id in zip(AMBITOS, (llm_id, usuario_id, seccion_id)):
+            if entidad_id is None:
+                continue
+            for escala in ESCALAS:
+                clave = (ambito, entidad_id, escala)
+                for destino in (_anillos, _pendientes):
+                    anillo = destino.get(clave)
+                    if anillo is None:
+                        anillo = destino[clave] = _nuevo(escala)
+                    anillo.sumar(instante, tokens)
+
+
+def uso(ambito: str, entidad_id: int, escala_serie: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Tokens de la entidad en cada ventana
+
+    Args:
+        escala_serie: Si se indica ('minuto', 'hora' o 'dia'), añade el detalle por ranura
+    """
+    instante = time.time()
+    with _lock:
+        ventanas = {}
+        for escala in ESCALAS:
+            anillo = _anillos.get((ambito, entidad_id, escala))
+            ventanas[escala] = anillo.total(instante) if anillo else 0
+        respuesta = {"ambito": ambito, "entidad_id": entidad_id, "ventanas": ventanas}
+        if escala_serie:
+            anillo = _anillos.get((ambito, entidad_id, escala_serie)) or _nuevo(escala_serie)
+            respuesta["serie"] = anillo.serie(instante)
+    return respuesta
+
+
+def resumen(ambito: str) -> List[Dict[str, Any]]:
+    """Uso de todas las entidades del ámbito con consumo en las últimas 24 h"""
+    with _lock:
+        entidades = sorted({entidad_id for (a, entidad_id, _) in _anillos if a == ambito})
+    return [r for r in (uso(ambito, entidad_id) for entidad_id in entidades) if r["ventanas"]["dia"]]
+
+
+def reiniciar(ambito: str, entidad_id: int) -> None:
+    """Vacía las ventanas de una entidad (también en la tabla en la próxima sincronización)"""
+    with _lock:
+        for escala in ESCALAS:
+            clave = (ambito, entidad_id, escala)
+            _anillos.pop(clave, None)
+            _pendientes.pop(clave, None)
+            _reinicios.add(clave)
+
+
+# ==================== PERSISTENCIA ====================
+
+def _sincronizar(fabrica_sesiones=SessionLocal) -> int:
+    """Suma lo pendiente a la tabla y recarga todas las ventanas; devuelve filas leídas"""
+    with _lock:
+        pendientes = dict(_pendientes)
+        _pendientes.clear()
+        reinicios = set(_reinicios)
+        _reinicios.clear()
+
+    instante = time.time()
+    db = fabrica_sesiones()
+    try:
+        for clave in reinicios | set(pendientes):
+            ambito, entidad_id, escala = clave
+            fila = db.query(VentanaTokens).filter(
+                VentanaTokens.ambito == ambito,
+                VentanaTokens.entidad_id == entidad_id,
+                VentanaTokens.escala == escala
+            ).with_for_update().first()
+            anillo = _nuevo(escala, None if (clave in reinicios or fila is None) else fila.ranuras)
+            if clave in pendientes:
+                anillo.fusionar(pendientes[clave].a_lista(instante))
+            if fila is None:
+                fila = VentanaTokens(ambito=ambito, entidad_id=entidad_id, escala=escala)
+                db.add(fila)
+            fila.ranuras = anillo.a_lista(instante)
+            fila.actualizado_en = datetime.utcnow()
+        db.commit()
+        filas = [(f.ambito, f.entidad_id, f.escala, f.ranuras) for f in db.query(VentanaTokens).all()]
+    except SQLAlchemyError:
+        db.rollback()
+        # Se reintenta en la próxima sincronización
+        with _lock:
+            for clave, anillo in pendientes.items():
+                destino = _pendientes.setdefault(clave, _nuevo(clave[2]))
+                destino.fusionar(anillo.a_lista(instante))
+            _reinicios.update(reinicios)
+        raise
+    finally:
+        db.close()
+
+    with _lock:
+        for ambito, entidad_id, escala, ranuras in filas:
+            if escala not in ESCALAS:
+                continue
+            clave = (ambito, entidad_id, escala)
+            anillo = _nuevo(escala, ranuras)
+            # Lo registrado mientras se sincronizaba sigue pendiente: se conserva en la vista local
+            if clave in _pendientes:
+                anillo.fusionar(_pendientes[clave].a_lista(instante))
+            _anillos[clave] = anillo
+    return len(filas)
+
+
+async def sincronizar() -> int:
+    """Sincroniza las ventanas con la tabla ventana_tokens (en el pool de hilos)"""
+    return await proveedores_llm.ejecutar_en_executor(_sincronizar)
+
+
+async def sincronizar_periodicamente() -> None:
+    """Tarea de fondo del ciclo de vida de la app: carga al arrancar y sincroniza cada TOKENS_VOLCADO_S"""
+    while True:
+        try:
+            await sincronizar()
+        except Exception as e:
+            logger.error("⚠️ Error sincronizando ventanas de tokens: %s", e)
+        await asyncio.sleep(settings.TOKENS_VOLCADO_S)
+
+
+def limpiar() -> None:
+    """Descarta el estado en memoria (tests)"""
+    with _lock:
+        _anillos.clear()
+        _pendientes.clear()
+        _reinicios.clear()
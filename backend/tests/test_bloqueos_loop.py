@@ -0,0 +1,75 @@
+"""
+Tests para el detector de bloqueos del event loop (services/bloqueos_loop.py)
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import bloqueos_loop
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    bloqueos_loop.reiniciar_estadisticas()
+    yield
+    bloqueos_loop.reiniciar_estadisticas()
+
+
+def _bloquear(segundos):
+    time.sleep(segundos)  # trabajo síncrono dentro del loop
+
+
+def test_lag_y_sitio_del_bloqueo():
+    async def escenario():
+        vigilante = await bloqueos_loop.iniciar(umbral_ms=50)
+        await asyncio.sleep(0.1)
+        _bloquear(0.3)
+        await asyncio.sleep(0.1)
+        await bloqueos_loop.detener()
+        return vigilante
+
+    asyncio.run(escenario())
+
+    estadisticas = bloqueos_loop.get_estadisticas()
+    assert not estadisticas["activo"]
+    assert estadisticas["lag"]["max_ms"] >= 200 and estadisticas["lag"]["n"] > 5
+    (bloqueo,) = estadisticas["bloqueos"]
+    assert bloqueo["ruta"] == bloqueos_loop.FUERA_DE_PETICION
+    assert bloqueo["sitio"].startswith("tests/test_bloqueos_loop.py:") and bloqueo["sitio"].endswith(" _bloquear")
+    assert bloqueo["n"] == 1 and bloqueo["max_ms"] >= 200
+    assert any("escenario" in linea for linea in bloqueo["pila"])
+
+
+def test_bloqueo_agregado_por_ruta():
+    @asynccontextmanager
+    async def lifespan(app):
+        await bloqueos_loop.iniciar(app, umbral_ms=40)
+        yield
+        await bloqueos_loop.detener()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/api/lento/{item_id}")
+    async def lento(item_id: int):
+        _bloquear(0.15)
+        return {"id": item_id}
+
+    @app.get("/api/rapido")
+    async def rapido():
+        await asyncio.sleep(0.15)
+        return {}
+
+    with TestClient(app) as cliente:
+        for i in range(2):
+            cliente.get(f"/api/lento/{i}")
+            cliente.get("/api/rapido")
+            time.sleep(0.05)  # deja latir al loop entre peticiones
+
+    bloqueos = bloqueos_loop.get_estadisticas()["bloqueos"]
+    assert [(b["ruta"], b["sitio"].rsplit(" ", 1)[-1], b["n"]) for b in bloqueos] == [
+        ("GET /api/lento/{item_id}", "_bloquear", 2)
+    ]
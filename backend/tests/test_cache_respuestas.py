@@ -0,0 +1,153 @@
+"""
+Tests para la caché de respuestas del LLM (services/cache_respuestas.py)
+"""
+import asyncio
+import json
+import types
+
+import pytest
+
+from services import cache_respuestas
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+class FakeCacheService:
+    """CacheService en memoria (misma interfaz async que core.cache.CacheService)"""
+
+    def __init__(self):
+        self.redis = object()
+        self.datos = {}
+        self.ttls = {}
+
+    async def get_json(self, key):
+        valor = self.datos.get(key)
+        return json.loads(valor) if valor else None
+
+    async def set_json(self, key, value, ttl=3600):
+        self.datos[key] = json.dumps(value)
+        self.ttls[key] = ttl
+        return True
+
+
+class FakeAnthropicContador:
+    def __init__(self):
+        self.messages = self
+        self.llamadas = 0
+
+    async def create(self, model, max_tokens, temperature, messages):
+        self.llamadas += 1
+        texto = f"TÍTULO: Título de la llamada {self.llamadas}\n\nCONTENIDO:\n" + "Contenido generado de prueba " * 3
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=texto)],
+            usage=types.SimpleNamespace(input_tokens=30, output_tokens=10)
+        )
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    fake = FakeCacheService()
+    monkeypatch.setattr(cache_respuestas, "get_cache_service", lambda: fake)
+    cache_respuestas.reiniciar_estadisticas()
+    yield fake
+    cache_respuestas.reiniciar_estadisticas()
+
+
+def make_generador(cliente, llm):
+    gen = GeneradorIA(db=None)
+    gen._clientes_async[llm.id] = cliente
+    gen._registrar_tokens = lambda llm, tokens: None
+    return gen
+
+
+def generar(gen, llm, usar_cache=True, salida_id=1):
+    return asyncio.run(gen.generar_para_salida_temporal_async(
+        make_noticia_temporal(), make_salida(salida_id), llm, usar_cache=usar_cache
+    ))
+
+
+def test_clave_estable_y_sensible_a_cada_parametro():
+    base = ("modelo", [{"role": "user", "content": "hola"}], 500, 0.7, {"salida": {"max_caracteres": 280}})
+    clave = cache_respuestas.calcular_clave(*base)
+
+    assert clave == cache_respuestas.calcular_clave(*base)
+    assert clave.startswith(cache_respuestas.PREFIJO_CLAVE)
+    assert clave != cache_respuestas.calcular_clave("otro", *base[1:])
+    assert clave != cache_respuestas.calcular_clave(base[0], "hola", *base[2:])
+    assert clave != cache_respuestas.calcular_clave(*base[:2], 600, *base[3:])
+    assert clave != cache_respuestas.calcular_clave(*base[:3], 0.2, base[4])
+    assert clave != cache_respuestas.calcular_clave(*base[:4], {"salida": {"max_caracteres": 100}})
+
+
+def test_peticion_repetida_se_sirve_desde_cache(cache):
+    llm = make_llm()
+    cliente = FakeAnthropicContador()
+    gen = make_generador(cliente, llm)
+
+    primera = generar(gen, llm)
+    segunda = generar(gen, llm)
+
+    assert cliente.llamadas == 1
+    assert segunda["titulo"] == primera["titulo"]
+    assert segunda["contenido_generado"] == primera["contenido_generado"]
+    # Un acierto no consume tokens
+    assert primera["tokens_usados"] == 40 and segunda["tokens_usados"] == 0
+    assert list(cache.ttls.values()) == [cache_respuestas.settings.LLM_CACHE_TTL]
+
+    estadisticas = cache_respuestas.get_estadisticas()
+    assert (estadisticas["aciertos"], estadisticas["fallos"]) == (1, 1)
+
+
+def test_regenerar_salta_la_cache(cache):
+    llm = make_llm()
+    cliente = FakeAnthropicContador()
+    gen = make_generador(cliente, llm)
+
+    generar(gen, llm)
+    generar(gen, llm, usar_cache=False)
+
+    assert cliente.llamadas == 2
+    assert cache_respuestas.get_estadisticas()["omitidas"] == 1
+
+
+def test_respuestas_simuladas_no_se_cachean(cache):
+    llm = make_llm()
+    gen = GeneradorIA(db=None)  # sin api_key: modo simulado
+
+    generar(gen, llm)
+
+    assert cache.datos == {}
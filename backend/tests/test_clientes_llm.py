@@ -0,0 +1,125 @@
+"""
+Tests para el registro de clientes LLM compartido por el proceso (services/proveedores_llm.py)
+"""
+import asyncio
+import types
+
+import pytest
+
+from services import proveedores_llm
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+class FakeModelos:
+    def __init__(self, fallar=False):
+        self.fallar = fallar
+        self.listados = 0
+
+    async def list(self):
+        self.listados += 1
+        if self.fallar:
+            raise Exception("sin conexión")
+        return []
+
+
+class FakeCliente:
+    def __init__(self, llm, fallar=False):
+        self.api_key = llm.api_key
+        self.models = FakeModelos(fallar)
+        self.cerrado = False
+
+    async def close(self):
+        self.cerrado = True
+
+
+@pytest.fixture
+def creados(monkeypatch):
+    """Sustituye la creación de clientes async y devuelve la lista de clientes creados"""
+    lista = []
+
+    def crear(llm):
+        cliente = FakeCliente(llm, fallar=llm.api_key == "sk-caida")
+        lista.append(cliente)
+        return cliente
+
+    monkeypatch.setattr(proveedores_llm, "crear_cliente_async", crear)
+    proveedores_llm._registro.clear()
+    proveedores_llm._claves_por_llm.clear()
+    yield lista
+    proveedores_llm._registro.clear()
+    proveedores_llm._claves_por_llm.clear()
+
+
+def make_llm_con_key(api_key="sk-test", llm_id=99):
+    llm = make_llm()
+    llm.api_key = api_key
+    llm.id = llm_id
+    return llm
+
+
+def test_mismo_llm_comparte_cliente_entre_generadores(creados):
+    llm = make_llm_con_key()
+
+    cliente1 = GeneradorIA(db=None)._get_cliente_llm_async(llm)
+    cliente2 = GeneradorIA(db=None)._get_cliente_llm_async(llm)
+
+    assert cliente1 is cliente2
+    assert len(creados) == 1
+
+
+def test_otra_api_key_o_url_crea_otro_cliente(creados):
+    llm = make_llm_con_key("sk-uno")
+    otra_key = make_llm_con_key("sk-dos", llm_id=100)
+    otra_url = make_llm_con_key("sk-uno", llm_id=101)
+    otra_url.url_api = "https://proxy.test"
+
+    clientes = {id(proveedores_llm.obtener_cliente(x)) for x in (llm, otra_key, otra_url)}
+
+    assert len(clientes) == 3
+    # La clave del registro no guarda la api_key en claro
+    assert all("sk-" not in str(clave) for clave in proveedores_llm._registro)
+
+
+def test_invalidar_descarta_el_cliente_del_llm(creados):
+    llm = make_llm_con_key()
+    antes = proveedores_llm.obtener_cliente(llm)
+
+    assert proveedores_llm.invalidar_clientes_llm(llm.id) == 1
+    llm.api_key = "sk-rotada"
+    despues = proveedores_llm.obtener_cliente(llm)
+
+    assert despues is not antes and despues.api_key == "sk-rotada"
+    assert proveedores_llm.invalidar_clientes_llm(12345) == 0
+
+
+def test_precalentar_y_cerrar(creados):
+    ok = make_llm_con_key("sk-ok")
+    caido = make_llm_con_key("sk-caida", llm_id=100)
+    caido.nombre = "LLM Caído"
+
+    async def _ciclo():
+        resultados = await proveedores_llm.precalentar([ok, caido])
+        # La primera generación reutiliza el cliente ya conectado
+        reutilizado = proveedores_llm.obtener_cliente(ok)
+        await proveedores_llm.cerrar_clientes()
+        return resultados, reutilizado
+
+    resultados, reutilizado = asyncio.run(_ciclo())
+
+    assert resultados == {"LLM Test": True, "LLM Caído": False}
+    assert reutilizado is creados[0] and creados[0].models.listados == 1
+    assert all(c.cerrado for c in creados)
+    assert proveedores_llm._registro == {}
@@ -0,0 +1,259 @@
+"""
+Tests para la coalescencia de generaciones idénticas en curso (services/coalescencia.py)
+"""
+import asyncio
+import types
+
+import pytest
+
+from services import coalescencia
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+class FakeStream:
+    def __init__(self, fragmentos, retardo):
+        self.fragmentos = fragmentos
+        self.retardo = retardo
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for fragmento in self.fragmentos:
+            await asyncio.sleep(self.retardo)
+            yield fragmento
+
+    async def get_final_message(self):
+        return types.SimpleNamespace(usage=types.SimpleNamespace(input_tokens=20, output_tokens=len(self.fragmentos)))
+
+
+class FakeAnthropicStreaming:
+    """Cliente con la forma de AsyncAnthropic.messages.stream; retardo por salida según el prompt"""
+
+    def __init__(self, retardos, fallar_en=None):
+        self.messages = self
+        self.retardos = retardos
+        self.fallar_en = fallar_en
+
+    def stream(self, model, max_tokens, temperature, messages):
+        prompt = messages[0]["content"]
+        salida_id = next(i for i in self.retardos if f"Salida {i} " in prompt)
+        if salida_id == self.fallar_en:
+            raise Exception("fallo simulado del proveedor")
+        fragmentos = [
+            "TÍTULO: Título generado ", f"para salida {salida_id}\n\n",
+            "CONTENIDO:\n", "Contenido generado de prueba " * 3
+        ]
+        return FakeStream(fragmentos, self.retardos[salida_id])
+
+
+class FakeAnthropicLento:
+    def __init__(self, retardo=0.05, fallar=False):
+        self.messages = self
+        self.retardo = retardo
+        self.fallar = fallar
+        self.llamadas = 0
+
+    async def create(self, model, max_tokens, temperature, messages):
+        self.llamadas += 1
+        await asyncio.sleep(self.retardo)
+        if self.fallar:
+            raise Exception("fallo simulado del proveedor")
+        texto = "TÍTULO: Título compartido\n\nCONTENIDO:\n" + "Contenido generado de prueba " * 3
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=texto)],
+            usage=types.SimpleNamespace(input_tokens=30, output_tokens=10)
+        )
+
+
+@pytest.fixture(autouse=True)
+def contadores_limpios():
+    coalescencia.reiniciar_estadisticas()
+    yield
+    coalescencia.reiniciar_estadisticas()
+
+
+def make_generador(cliente, llm):
+    gen = GeneradorIA(db=None)
+    gen._clientes_async[llm.id] = cliente
+    gen._registrar_tokens = lambda llm, tokens: None
+    return gen
+
+
+def generar_en_paralelo(gen, llm, salidas):
+    async def _todas():
+        return await asyncio.gather(*[
+            gen.generar_para_salida_temporal_async(make_noticia_temporal(), salida, llm, usar_cache=False)
+            for salida in salidas
+        ], return_exceptions=True)
+    return asyncio.run(_todas())
+
+
+def test_peticiones_identicas_comparten_una_llamada():
+    llm = make_llm(max_concurrencia=4)
+    cliente = FakeAnthropicLento()
+    gen = make_generador(cliente, llm)
+
+    r1, r2, r3 = generar_en_paralelo(gen, llm, [make_salida(1), make_salida(1), make_salida(1)])
+
+    assert cliente.llamadas == 1
+    assert r1["contenido_generado"] == r2["contenido_generado"] == r3["contenido_generado"]
+    # Solo la llamada líder cuenta tokens
+    assert sorted(r["tokens_usados"] for r in (r1, r2, r3)) == [0, 0, 40]
+    estadisticas = coalescencia.get_estadisticas()
+    assert estadisticas["coalescidas"] == 2 and estadisticas["en_curso"] == 0
+
+
+def test_peticiones_distintas_no_se_coalescen():
+    llm = make_llm(max_concurrencia=4)
+    cliente = FakeAnthropicLento()
+    gen = make_generador(cliente, llm)
+
+    generar_en_paralelo(gen, llm, [make_salida(1), make_salida(2)])
+
+    assert cliente.llamadas == 2
+    assert coalescencia.get_estadisticas()["coalescidas"] == 0
+
+
+def test_error_del_lider_llega_a_todos():
+    llm = make_llm(max_concurrencia=4)
+    cliente = FakeAnthropicLento(fallar=True)
+    gen = make_generador(cliente, llm)
+
+    respuestas = generar_en_paralelo(gen, llm, [make_salida(1), make_salida(1)])
+
+    assert cliente.llamadas == 1
+    assert all(isinstance(r, Exception) for r in respuestas)
+
+
+def test_stream_identico_espera_al_que_esta_en_curso():
+    llm = make_llm(max_concurrencia=4)
+    cliente = FakeAnthropicStreaming({1: 0.02})
+    gen = make_generador(cliente, llm)
+    mensajes = "Prompt de la Salida 1 con texto suficiente"
+
+    async def consumir():
+        return [e async for e in gen.generar_contenido_stream(llm, mensajes, usar_cache=False)]
+
+    async def _dos():
+        return await asyncio.gather(consumir(), consumir())
+
+    lider, seguidor = asyncio.run(_dos())
+
+    assert lider[-1]["resultado"]["titulo"] == seguidor[-1]["resultado"]["titulo"]
+    assert len(seguidor) == 2 and seguidor[-1]["resultado"]["coalescida"] is True
+    assert coalescencia.get_estadisticas()["coalescidas"] == 1
+
+
+class FakeRedis:
+    """Lo justo de redis.asyncio para el lock y la publicación del resultado"""
+
+    def __init__(self, fallar=False):
+        self.datos = {}
+        self.fallar = fallar
+
+    async def get(self, clave):
+        if self.fallar:
+            raise ConnectionError("redis caído")
+        return self.datos.get(clave)
+
+    async def set(self, clave, valor, nx=False, px=None):
+        if nx and clave in self.datos:
+            return None
+        self.datos[clave] = valor
+        return True
+
+    async def eval(self, script, numkeys, clave, token):
+        if self.datos.get(clave) == token:
+            del self.datos[clave]
+            return 1
+        return 0
+
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(coalescencia, "get_cache_service", lambda: types.SimpleNamespace(redis=redis))
+    monkeypatch.setattr(coalescencia, "INTERVALO_ESPERA_REDIS", 0.01)
+    return redis
+
+
+def test_workers_distintos_comparten_una_llamada_via_redis(redis_falso):
+    llamadas = []
+
+    async def generar():
+        llamadas.append(1)
+        await asyncio.sleep(0.05)
+        return {"titulo": "Compartido"}
+
+    async def _dos_workers():
+        # Sin pasar por compartir(): cada llamada hace de un worker con su propio proceso
+        return await asyncio.gather(
+            coalescencia._compartir_redis("k", generar),
+            coalescencia._compartir_redis("k", generar)
+        )
+
+    respuestas = asyncio.run(_dos_workers())
+
+    assert len(llamadas) == 1
+    assert sorted(compartido for _, compartido in respuestas) == [False, True]
+    assert all(resultado == {"titulo": "Compartido"} for resultado, _ in respuestas)
+    assert coalescencia.get_estadisticas()["coalescidas_redis"] == 1
+    # El lock queda libre; el resultado publicado caduca por TTL
+    assert coalescencia.PREFIJO_LOCK + "k" not in redis_falso.datos
+
+
+@pytest.mark.parametrize("redis_caido", [False, True])
+def test_fallback_local_no_reintenta_si_generar_falla(redis_falso, monkeypatch, redis_caido):
+    # Lock de otro worker que nunca publica: se agota la espera (o Redis falla) y se genera localmente
+    redis_falso.datos[coalescencia.PREFIJO_LOCK + "k"] = "otro"
+    redis_falso.fallar = redis_caido
+    monkeypatch.setattr(coalescencia.settings, "LLM_COALESCENCIA_LOCK_TTL", 0)
+    llamadas = []
+
+    async def generar():
+        llamadas.append(1)
+        raise ValueError("fallo del proveedor")
+
+    with pytest.raises(ValueError):
+        asyncio.run(coalescencia._compartir_redis("k", generar))
+    assert len(llamadas) == 1
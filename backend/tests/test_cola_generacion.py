@@ -0,0 +1,281 @@
+"""
+Tests para la cola persistente de trabajos de generación (services/cola_generacion.py)
+"""
+import asyncio
+import threading
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import Base
+from models.orm_models import (
+    TrabajoGeneracion,
+    Noticia,
+    SalidaMaestro,
+    LLMMaestro,
+    NoticiaSalida
+)
+from services import cola_generacion
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    cola_generacion.reiniciar_estadisticas()
+    yield
+    cola_generacion.reiniciar_estadisticas()
+
+
+@pytest.fixture
+def sesiones():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    fabrica = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    db = fabrica()
+    db.add(Noticia(id=1, titulo="Noticia", contenido="Contenido de la noticia", usuario_id=1))
+    db.add(LLMMaestro(id=1, nombre="Claude", proveedor="Anthropic", modelo_id="claude", url_api="x", api_key="", activo=True))
+    for salida_id in (1, 2, 3):
+        db.add(SalidaMaestro(id=salida_id, nombre=f"Salida {salida_id}", tipo_salida="digital", activo=True))
+    db.commit()
+    db.close()
+    return fabrica
+
+
+class FakeGenerador:
+    """Guarda una NoticiaSalida por salida salvo las de `fallan`, que devuelve como error"""
+
+    fallan = set()
+    llamadas = []
+
+    def __init__(self, db, usuario=None, prioridad=None):
+        self.db = db
+        self.prioridad = prioridad
+
+    async def generar_salidas_con_errores_async(self, noticia, salidas, llm, prompt=None, estilo=None,
+                                                regenerar=False, modo_combinado=False):
+        FakeGenerador.llamadas.append(sorted(s.id for s in salidas))
+        hechas, errores = [], []
+        for salida in salidas:
+            if salida.id in FakeGenerador.fallan:
+                errores.append({"salida_id": salida.id, "salida_nombre": salida.nombre, "error": "timeout"})
+                continue
+            noticia_salida = NoticiaSalida(
+                noticia_id=noticia.id, salida_id=salida.id, titulo="T",
+                contenido_generado="Contenido generado", tokens_usados=30
+            )
+            self.db.add(noticia_salida)
+            self.db.commit()
+            hechas.append(noticia_salida)
+        return hechas, errores
+
+
+@pytest.fixture
+def generador(monkeypatch):
+    FakeGenerador.fallan = set()
+    FakeGenerador.llamadas = []
+    monkeypatch.setattr(cola_generacion, "GeneradorIA", FakeGenerador)
+    return FakeGenerador
+
+
+def encolar(fabrica, salidas_ids=(1, 2), prioridad="normal"):
+    db = fabrica()
+    try:
+        return cola_generacion.encolar(db, 1, list(salidas_ids), 1, usuario_id=None, prioridad=prioridad).id
+    finally:
+        db.close()
+
+
+def reclamar(fabrica, worker="w1"):
+    db = fabrica()
+    try:
+        trabajo = cola_generacion.reclamar(db, worker)
+        return trabajo.id if trabajo else None
+    finally:
+        db.close()
+
+
+def leer(fabrica, trabajo_id):
+    db = fabrica()
+    try:
+        return cola_generacion.resumen_trabajo(db.get(TrabajoGeneracion, trabajo_id))
+    finally:
+        db.close()
+
+
+def test_un_trabajo_reclamado_no_se_reclama_otra_vez(sesiones):
+    primero = encolar(sesiones)
+    segundo = encolar(sesiones)
+
+    assert reclamar(sesiones, "w1") == primero
+    assert reclamar(sesiones, "w2") == segundo
+    assert reclamar(sesiones, "w3") is None
+
+    resumen = leer(sesiones, primero)
+    assert resumen["estado"] == cola_generacion.EN_CURSO and resumen["intentos"] == 1
+
+
+def test_se_reclama_primero_la_mayor_prioridad(sesiones):
+    lote = encolar(sesiones, prioridad="lote")
+    normal = encolar(sesiones)
+    urgente = encolar(sesiones, prioridad="urgente")
+    db = sesiones()
+    pendientes = cola_generacion.get_estadisticas(db)["pendientes_por_prioridad"]
+    db.close()
+    assert {clase: p["en_cola"] for clase, p in pendientes.items()} == {"lote": 1, "normal": 1, "urgente": 1}
+
+    assert [reclamar(sesiones) for _ in range(3)] == [urgente, normal, lote]
+
+
+def test_ejecutar_guarda_resultado_por_salida(sesiones, generador):
+    trabajo_id = encolar(sesiones)
+    reclamar(sesiones)
+
+    estado = asyncio.run(cola_generacion.ejecutar(trabajo_id, "w1", sesiones))
+
+    resumen = leer(sesiones, trabajo_id)
+    assert estado == cola_generacion.COMPLETADO
+    assert resumen["salidas_completadas"] == 2
+    assert resumen["resultados"]["1"]["tokens_usados"] == 30
+    db = sesiones()
+    assert db.query(NoticiaSalida).filter(NoticiaSalida.noticia_id == 1).count() == 2
+    db.close()
+
+
+def test_reintento_solo_regenera_las_salidas_fallidas(sesiones, generador):
+    generador.fallan = {2}
+    trabajo_id = encolar(sesiones, (1, 2, 3))
+    reclamar(sesiones)
+
+    estado = asyncio.run(cola_generacion.ejecutar(trabajo_id, "w1", sesiones))
+
+    resumen = leer(sesiones, trabajo_id)
+    assert estado == cola_generacion.PENDIENTE
+    assert resumen["resultados"]["2"] == {"estado": cola_generacion.ERROR, "error": "timeout"}
+    # Con backoff: aún no está disponible
+    assert reclamar(sesiones) is None
+
+    db = sesiones()
+    trabajo = db.get(TrabajoGeneracion, trabajo_id)
+    trabajo.disponible_en = cola_generacion._ahora() - timedelta(seconds=1)
+    db.commit()
+    db.close()
+    generador.fallan = set()
+    assert reclamar(sesiones) == trabajo_id
+    asyncio.run(cola_generacion.ejecutar(trabajo_id, "w1", sesiones))
+
+    assert generador.llamadas == [[1, 2, 3], [2]]
+    resumen = leer(sesiones, trabajo_id)
+    assert resumen["estado"] == cola_generacion.COMPLETADO and resumen["intentos"] == 2
+    assert cola_generacion.get_estadisticas()["reintentos"] == 1
+
+
+def test_agotar_intentos_marca_error(sesiones, generador):
+    generador.fallan = {1}
+    trabajo_id = encolar(sesiones, (1,))
+    db = sesiones()
+    db.get(TrabajoGeneracion, trabajo_id).max_intentos = 1
+    db.commit()
+    db.close()
+    reclamar(sesiones)
+
+    assert asyncio.run(cola_generacion.ejecutar(trabajo_id, "w1", sesiones)) == cola_generacion.ERROR
+    assert "1" in leer(sesiones, trabajo_id)["error"]
+
+
+def test_trabajo_sin_latido_vuelve_a_la_cola(sesiones):
+    trabajo_id = encolar(sesiones)
+    reclamar(sesiones, "caido")
+    db = sesiones()
+    trabajo = db.get(TrabajoGeneracion, trabajo_id)
+    trabajo.latido_en = cola_generacion._ahora() - timedelta(hours=1)
+    db.commit()
+
+    assert cola_generacion.recuperar_abandonados(db) == 1
+    db.close()
+    assert reclamar(sesiones, "w2") == trabajo_id
+    assert leer(sesiones, trabajo_id)["intentos"] == 2
+
+
+def test_cancelar_solo_trabajos_pendientes(sesiones):
+    pendiente = encolar(sesiones)
+    en_curso = encolar(sesiones)
+    db = sesiones()
+    db.get(TrabajoGeneracion, en_curso).estado = cola_generacion.EN_CURSO
+    db.commit()
+
+    assert cola_generacion.cancelar(db, db.get(TrabajoGeneracion, pendiente))
+    assert not cola_generacion.cancelar(db, db.get(TrabajoGeneracion, en_curso))
+    db.close()
+    assert leer(sesiones, pendiente)["estado"] == cola_generacion.CANCELADO
+
+
+def test_trabajar_consulta_la_cola_fuera_del_event_loop(sesiones, generador, monkeypatch):
+    monkeypatch.setattr(cola_generacion.settings, "COLA_INTERVALO_S", 0.01)
+    reclamar_original = cola_generacion.reclamar
+    hilos = set()
+
+    def reclamar_registrando(db, worker):
+        hilos.add(threading.get_ident())
+        return reclamar_original(db, worker)
+
+    monkeypatch.setattr(cola_generacion, "reclamar", reclamar_registrando)
+    trabajo_id = encolar(sesiones)
+
+    async def _un_ciclo():
+        detener = asyncio.Event()
+        worker = asyncio.create_task(cola_generacion.trabajar("w1", 1, sesiones, detener))
+        while leer(sesiones, trabajo_id)["estado"] != cola_generacion.COMPLETADO:
+            await asyncio.sleep(0.01)
+        detener.set()
+        await worker
+
+    asyncio.run(_un_ciclo())
+
+    assert hilos and threading.get_ident() not in hilos
+
+
+class FakeGeneradorSinBD(FakeGenerador):
+    """Devuelve las salidas sin tocar la BD; con `bloquear` espera hasta que lo cancelen"""
+
+    bloquear = False
+
+    async def generar_salidas_con_errores_async(self, noticia, salidas, llm, prompt=None, estilo=None,
+                                                regenerar=False, modo_combinado=False):
+        if FakeGeneradorSinBD.bloquear:
+            await asyncio.Event().wait()
+        hechas = [
+            NoticiaSalida(id=10 + salida.id, noticia_id=noticia.id, salida_id=salida.id, tokens_usados=30)
+            for salida in salidas
+        ]
+        return hechas, []
+
+
+@pytest.mark.parametrize("cancelar", [False, True])
+def test_ejecutar_carga_y_cierra_el_trabajo_fuera_del_event_loop(sesiones, monkeypatch, cancelar):
+    FakeGeneradorSinBD.bloquear = cancelar
+    monkeypatch.setattr(cola_generacion, "GeneradorIA", FakeGeneradorSinBD)
+    hilos = set()
+
+    def registrar_hilo(*args):
+        hilos.add(threading.get_ident())
+
+    event.listen(sesiones.kw["bind"], "before_cursor_execute", registrar_hilo)
+    trabajo_id = encolar(sesiones)
+    reclamar(sesiones)
+    hilos.clear()
+
+    async def _ejecutar():
+        tarea = asyncio.create_task(cola_generacion.ejecutar(trabajo_id, "w1", sesiones))
+        if cancelar:
+            await asyncio.sleep(0.05)
+            tarea.cancel()
+        return await asyncio.gather(tarea, return_exceptions=True)
+
+    asyncio.run(_ejecutar())
+    event.remove(sesiones.kw["bind"], "before_cursor_execute", registrar_hilo)
+
+    esperado = cola_generacion.PENDIENTE if cancelar else cola_generacion.COMPLETADO
+    assert leer(sesiones, trabajo_id)["estado"] == esperado
+    assert hilos and threading.get_ident() not in hilos
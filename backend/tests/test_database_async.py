@@ -0,0 +1,147 @@
+"""
+Tests para el engine/sesiones async (core/database.py) y las rutas migradas a AsyncSession
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from core import auth as core_auth
+from core import database
+from core.database import Base
+from models.orm_models import (
+    EstiloItem,
+    EstiloMaestro,
+    Noticia,
+    NoticiaSalida,
+    PromptItem,
+    PromptMaestro,
+    SalidaMaestro,
+    Seccion,
+    Usuario
+)
+from routers import auth as routers_auth
+from routers import noticias, prompts, salidas, secciones
+
+
+@pytest.mark.parametrize("url, esperada", [
+    ("postgresql://u:p@db:5432/noticias", "postgresql+asyncpg://u:p@db:5432/noticias"),
+    ("postgresql+psycopg2://u:p@db/noticias", "postgresql+asyncpg://u:p@db/noticias"),
+    ("postgresql+asyncpg://u:p@db/noticias", "postgresql+asyncpg://u:p@db/noticias"),
+    ("sqlite:///./noticias.db", "sqlite+aiosqlite:///./noticias.db"),
+])
+def test_url_async(url, esperada):
+    assert database.url_async(url) == esperada
+
+
+def test_sesion_async_no_crea_engine_sin_consultas(monkeypatch):
+    def sin_driver():
+        raise ImportError("asyncpg no instalado")
+
+    monkeypatch.setattr(database, "get_async_engine", sin_driver)
+
+    async def usar_dependencia():
+        dependencia = database.get_async_db()
+        db = await dependencia.__anext__()
+        await dependencia.aclose()
+        return db
+
+    # Abrir y cerrar la sesión (p.ej. una petición rechazada por auth) no conecta
+    assert asyncio.run(usar_dependencia()) is not None
+
+
+@pytest.fixture
+def cliente(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    url = f"sqlite:///{tmp_path / 'noticias.db'}"
+    sincrono = create_engine(url)
+    Base.metadata.create_all(sincrono)
+    db = sessionmaker(bind=sincrono)()
+    db.add(Usuario(id=1, email="ana@example.com", username="ana", hashed_password="x", role="admin"))
+    db.add(PromptMaestro(id=1, nombre="Prompt", items=[PromptItem(nombre_archivo="p.md", contenido="P", orden=1)]))
+    db.add(EstiloMaestro(id=1, nombre="Estilo", configuracion={"tono": "formal"}, items=[EstiloItem(nombre_archivo="e.md", contenido="E", orden=1)]))
+    db.add(Seccion(id=1, nombre="Política", prompt_id=1, estilo_id=1))
+    db.add(SalidaMaestro(id=1, nombre="Web", tipo_salida="digital", activo=True))
+    db.add(Noticia(id=1, titulo="Primera", contenido="Texto de la noticia de prueba", seccion_id=1, usuario_id=1, resumen_ia="Resumen"))
+    db.add(Noticia(id=2, titulo="Segunda", contenido="Texto de la noticia de prueba", seccion_id=1, usuario_id=1))
+    db.add(NoticiaSalida(noticia_id=1, salida_id=1, titulo="Primera", contenido_generado=""))
+    db.commit()
+    db.close()
+    sincrono.dispose()
+
+    motor = create_async_engine(database.url_async(url), poolclass=NullPool)
+
+    async def get_async_db_test():
+        async with AsyncSession(motor, expire_on_commit=False) as sesion:
+            yield sesion
+
+    usuario = SimpleNamespace(id=1, role="admin", is_active=True, email="ana@example.com")
+    app = FastAPI()
+    app.include_router(noticias.router, prefix="/api/noticias")
+    for router in (prompts.router, secciones.router, salidas.router):
+        app.include_router(router)
+    app.dependency_overrides[database.get_async_db] = get_async_db_test
+    for dependencia in (core_auth.get_current_user, core_auth.get_current_admin, routers_auth.get_current_active_user):
+        app.dependency_overrides[dependencia] = lambda: usuario
+    with TestClient(app) as cliente:
+        yield cliente
+    asyncio.run(motor.dispose())
+
+
+def test_noticias_con_autor_y_salidas(cliente):
+    listado = cliente.get("/api/noticias/", params={"seccion_id": 1}).json()
+    assert sorted((n["titulo"], n["usuario_id"]) for n in listado) == [("Primera", 1), ("Segunda", 1)]
+
+    # Sin response_model: to_dict() completo, con el autor cargado en la misma consulta
+    noticia = cliente.get("/api/noticias/1").json()
+    assert noticia["autor_nombre"] == "ana" and noticia["salidas_ids"] == [1] and noticia["metricas"] is None
+
+    resumen = cliente.get("/api/noticias/stats/resumen").json()
+    assert resumen["total_noticias"] == 2 and resumen["noticias_con_ia"] == 1
+    assert resumen["noticias_por_seccion"] == {"1": 2}
+
+
+def test_noticias_crear_actualizar_eliminar(cliente):
+    creada = cliente.post("/api/noticias/", json={
+        "titulo": "Tercera", "contenido": "Texto de la noticia de prueba", "seccion_id": 1, "salidas_ids": [1]
+    })
+    assert creada.status_code == 201, creada.text
+    creada = creada.json()
+    assert creada["usuario_id"] == 1 and creada["estado"] == "activo"
+    assert cliente.get(f"/api/noticias/{creada['id']}").json()["salidas_ids"] == [1]
+
+    actualizada = cliente.put(f"/api/noticias/{creada['id']}", json={"titulo": "Tercera bis", "salidas_ids": []}).json()
+    assert actualizada["titulo"] == "Tercera bis"
+    detalle = cliente.get(f"/api/noticias/{creada['id']}").json()
+    assert detalle["autor_nombre"] == "ana" and detalle["salidas_ids"] == []
+
+    assert cliente.delete(f"/api/noticias/{creada['id']}").json()["success"]
+    assert cliente.get(f"/api/noticias/{creada['id']}").status_code == 404
+
+
+def test_secciones_con_plantillas(cliente):
+    (seccion,) = cliente.get("/api/secciones/").json()
+    assert [i["nombre_archivo"] for i in seccion["prompt"]["items"]] == ["p.md"]
+    assert [i["nombre_archivo"] for i in seccion["estilo"]["items"]] == ["e.md"]
+
+    sin_relaciones = cliente.get("/api/secciones/1", params={"con_relaciones": False}).json()
+    assert sin_relaciones["prompt"] is None and sin_relaciones["prompt_id"] == 1
+
+
+def test_prompts_y_salidas(cliente):
+    actualizado = cliente.put("/api/prompts/1", json={
+        "items": [{"nombre_archivo": "a.md", "contenido": "A", "orden": 1}, {"nombre_archivo": "b.md", "contenido": "B", "orden": 2}]
+    })
+    assert actualizado.status_code == 200, actualizado.text
+    assert [i["nombre_archivo"] for i in actualizado.json()["items"]] == ["a.md", "b.md"]
+    assert [i["nombre_archivo"] for i in cliente.get("/api/prompts/activos").json()[0]["items"]] == ["a.md", "b.md"]
+
+    assert [s["nombre"] for s in cliente.get("/api/salidas/", params={"activo": True}).json()] == ["Web"]
+    assert cliente.get("/api/salidas/99").status_code == 404
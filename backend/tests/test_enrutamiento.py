@@ -0,0 +1,183 @@
+"""
+Tests para la política de enrutamiento entre LLM (services/enrutamiento.py)
+"""
+import asyncio
+import types
+
+import pytest
+
+from services import enrutamiento
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+class ErrorProveedor(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+        super().__init__(f"Error code: {status_code}")
+
+
+class FakeAnthropicGuionado:
+    """Responde según un guion: número = retardo en segundos, excepción = se lanza"""
+
+    def __init__(self, guion, titulo):
+        self.messages = self
+        self.guion = list(guion)
+        self.titulo = titulo
+        self.llamadas = 0
+        self.canceladas = 0
+
+    async def create(self, model, max_tokens, temperature, messages):
+        paso = self.guion[min(self.llamadas, len(self.guion) - 1)]
+        self.llamadas += 1
+        if isinstance(paso, Exception):
+            raise paso
+        try:
+            await asyncio.sleep(paso)
+        except asyncio.CancelledError:
+            self.canceladas += 1
+            raise
+        texto = f"TÍTULO: {self.titulo}\n\nCONTENIDO:\n" + "Contenido generado de prueba " * 3
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=texto)],
+            usage=types.SimpleNamespace(input_tokens=30, output_tokens=10)
+        )
+
+
+@pytest.fixture(autouse=True)
+def estadisticas_limpias():
+    enrutamiento.reiniciar_estadisticas()
+    yield
+    enrutamiento.reiniciar_estadisticas()
+
+
+def make_par(politica, guion_principal, guion_respaldo):
+    principal = make_llm()
+    principal.configuracion = {"enrutamiento": {"fallback": [100], **politica}}
+    respaldo = make_llm()
+    respaldo.id, respaldo.nombre, respaldo.modelo_id = 100, "LLM Respaldo", "modelo-respaldo"
+
+    gen = GeneradorIA(db=None)
+    gen._clientes_async[principal.id] = FakeAnthropicGuionado(guion_principal, "Título principal")
+    gen._clientes_async[respaldo.id] = FakeAnthropicGuionado(guion_respaldo, "Título respaldo")
+    gen._candidatos_enrutamiento = lambda llm, politica: [principal, respaldo]
+    registrados = []
+    gen._registrar_tokens = lambda llm, tokens: registrados.append((llm.id, tokens))
+    return gen, principal, respaldo, registrados
+
+
+def generar(gen, llm):
+    return asyncio.run(gen.generar_para_salida_temporal_async(
+        make_noticia_temporal(), make_salida(1), llm, usar_cache=False
+    ))
+
+
+def test_politica_por_defecto_es_un_solo_intento():
+    politica = enrutamiento.get_politica(make_llm())
+
+    assert politica == enrutamiento.POLITICA_POR_DEFECTO
+    assert not enrutamiento.politica_activa(politica)
+
+
+def test_errores_reintentables():
+    assert enrutamiento.es_reintentable(ErrorProveedor(429))
+    assert enrutamiento.es_reintentable(ErrorProveedor(529))
+    assert enrutamiento.es_reintentable(asyncio.TimeoutError())
+    assert not enrutamiento.es_reintentable(ErrorProveedor(400))
+    assert not enrutamiento.es_reintentable(ValueError("prompt inválido"))
+
+
+def test_reintento_con_backoff_en_el_mismo_llm():
+    gen, principal, _, registrados = make_par(
+        {"reintentos": 2, "backoff_base_s": 0}, [ErrorProveedor(429), 0], [0]
+    )
+
+    resultado = generar(gen, principal)
+
+    assert gen._clientes_async[principal.id].llamadas == 2
+    assert resultado["llm_respuesta_id"] == principal.id
+    assert registrados == [(principal.id, 40)]
+    assert enrutamiento.get_estadisticas()["reintentos"] == 1
+
+
+def test_failover_al_respaldo_registra_el_modelo_que_respondio():
+    gen, principal, respaldo, registrados = make_par({}, [ErrorProveedor(503)], [0])
+
+    resultado = generar(gen, principal)
+
+    assert resultado["titulo"] == "Título respaldo"
+    assert (resultado["llm_respuesta_id"], resultado["modelo_respuesta"]) == (respaldo.id, "modelo-respaldo")
+    assert registrados == [(respaldo.id, 40)]
+    assert enrutamiento.get_estadisticas()["failovers"] == 1
+
+
+def test_timeout_por_intento_pasa_al_respaldo():
+    gen, principal, respaldo, _ = make_par({"timeout_s": 0.05}, [5], [0])
+
+    resultado = generar(gen, principal)
+
+    assert resultado["llm_respuesta_id"] == respaldo.id
+    assert gen._clientes_async[principal.id].canceladas == 1
+    assert enrutamiento.get_estadisticas()["timeouts"] == 1
+
+
+def test_hedging_gana_el_primero_y_cancela_el_resto():
+    gen, principal, respaldo, registrados = make_par(
+        {"hedging": True, "hedging_retraso_s": 0.05}, [5], [0]
+    )
+
+    resultado = generar(gen, principal)
+
+    assert resultado["llm_respuesta_id"] == respaldo.id
+    assert gen._clientes_async[principal.id].canceladas == 1
+    assert registrados == [(respaldo.id, 40)]
+    estadisticas = enrutamiento.get_estadisticas()
+    assert estadisticas["hedges"] == 1 and estadisticas["hedges_ganados"] == 1
+
+
+def test_todos_fallan_propaga_el_error():
+    gen, principal, _, _ = make_par({}, [ErrorProveedor(500)], [ErrorProveedor(502)])
+
+    with pytest.raises(Exception, match="LLM Respaldo"):
+        generar(gen, principal)
+
+
+def test_modelo_predominante():
+    resultados = [{"modelo_respuesta": "b"}, {"modelo_respuesta": "b"}, {"modelo_respuesta": "a"}]
+
+    assert GeneradorIA.modelo_predominante(resultados, "x") == "b"
+    assert GeneradorIA.modelo_predominante([{}], "x") == "x"
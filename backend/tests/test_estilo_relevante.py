@@ -0,0 +1,190 @@
+"""
+Tests para la selección de reglas de estilo relevantes (services/estilo_relevante.py)
+"""
+import os
+import types
+
+import pytest
+
+from services import estilo_relevante, plantillas, presupuesto_prompt
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+MANUAL = os.path.join(os.path.dirname(__file__), "..", "..", "estilos", "ManualDeEstilo.txt")
+
+
+@pytest.fixture(autouse=True)
+def limpio(monkeypatch):
+    # Una regla por fragmento para poder contar las reglas enviadas
+    monkeypatch.setattr(estilo_relevante, "TAMANO_FRAGMENTO", 10)
+    plantillas.limpiar()
+    estilo_relevante.reiniciar_estadisticas()
+    yield
+    estilo_relevante.reiniciar_estadisticas()
+
+
+def make_estilo(*items):
+    return types.SimpleNamespace(id=5, nombre="Manual", configuracion={"tono": "formal"}, items=list(items))
+
+
+def make_item(item_id, contenido, orden=1, incluir_siempre=False):
+    return types.SimpleNamespace(id=item_id, contenido=contenido, orden=orden, incluir_siempre=incluir_siempre)
+
+
+def reglas(n):
+    temas = ["siglas", "cifras", "titulares", "comillas", "hashtags", "fechas", "cargos", "mayúsculas"]
+    return "\n".join(
+        f"{i + 1}.1. Regla sobre {temas[i % len(temas)]}: úsalas con criterio en el texto." for i in range(n)
+    )
+
+
+def texto_de(mensajes):
+    return "\n".join(b["text"] for b in mensajes[0]["content"]) if isinstance(mensajes, list) else mensajes
+
+
+def test_fragmentar_por_reglas_numeradas():
+    texto = "1.1. Primera regla.\n1.2. Segunda regla.\n\nPárrafo suelto."
+    assert estilo_relevante.fragmentar(texto) == ["1.1. Primera regla.", "1.2. Segunda regla.", "Párrafo suelto."]
+
+
+def test_bm25_prioriza_el_termino_raro():
+    indice = estilo_relevante.IndiceBM25([
+        estilo_relevante.normalizar("Las siglas se explican la primera vez"),
+        estilo_relevante.normalizar("Las cifras se escriben con números"),
+        estilo_relevante.normalizar("Las cifras y las siglas"),
+    ])
+    puntuaciones = indice.puntuar(estilo_relevante.normalizar("Informe con SIGLAS"))
+    assert puntuaciones[0] > puntuaciones[1] == 0
+    assert puntuaciones[0] > 0 and puntuaciones[2] > 0
+
+
+def test_manual_real_selecciona_la_regla_de_siglas(monkeypatch):
+    monkeypatch.setattr(estilo_relevante, "TAMANO_FRAGMENTO", 600)
+    with open(MANUAL, encoding="utf-8") as f:
+        manual = f.read()
+    indice = estilo_relevante.IndiceEstilo([make_item(1, manual)])
+
+    elegidas = indice.seleccionar("La ONU y la OEA publicaron un informe; explica sus siglas", 3)
+
+    assert len(indice.fragmentos) > 50
+    assert "sigla" in elegidas[0].texto.lower()
+    assert sum(f.tokens for f in elegidas) < indice.tokens_total / 10
+
+
+def test_prompt_incluye_solo_reglas_relevantes_y_las_fijas():
+    noticia = make_noticia_temporal()
+    noticia.contenido = "El gobierno presentó las cifras del presupuesto anual."
+    noticia.seccion.estilo = make_estilo(
+        make_item(1, "REGLA FIJA: cita siempre la fuente.", orden=1, incluir_siempre=True),
+        make_item(2, reglas(40), orden=2)
+    )
+    salida = make_salida(1)
+    salida.estilo_top_k = 3
+
+    mensajes, _ = GeneradorIA(db=None)._preparar_prompt_temporal(noticia, salida, llm=make_llm())
+    texto = texto_de(mensajes)
+
+    assert "REGLA FIJA" in texto
+    assert texto.count("Regla sobre cifras") == 3
+    assert "Regla sobre hashtags" not in texto
+    estadisticas = estilo_relevante.get_estadisticas()
+    assert estadisticas["generaciones"] == 1 and estadisticas["tokens_ahorrados"] > 0
+
+
+def test_top_k_cero_envia_el_manual_completo():
+    noticia = make_noticia_temporal()
+    noticia.seccion.estilo = make_estilo(make_item(2, reglas(40)))
+    salida = make_salida(1)
+    salida.estilo_top_k = 0
+
+    mensajes, _ = GeneradorIA(db=None)._preparar_prompt_temporal(noticia, salida, llm=make_llm())
+
+    assert texto_de(mensajes).count("Regla sobre") == 40
+    assert estilo_relevante.get_estadisticas()["generaciones"] == 0
+
+
+def test_indice_se_reconstruye_solo_al_cambiar_los_items():
+    gen = GeneradorIA(db=None)
+    gen._version_plantilla = lambda maestro, modelo_item, columna_padre: ("v1",)
+    item = make_item(2, reglas(20))
+    estilo = make_estilo(item)
+
+    primero = gen._indice_estilo(estilo)
+    assert gen._indice_estilo(estilo) is primero
+
+    plantillas.invalidar_estilo(estilo.id)
+    assert gen._indice_estilo(estilo) is not primero
+
+
+def test_presupuesto_descarta_primero_las_reglas_menos_relevantes():
+    noticia = make_noticia_temporal()
+    noticia.contenido = "Las cifras y las siglas del informe."
+    noticia.seccion.estilo = make_estilo(make_item(2, reglas(40)))
+    llm = make_llm()
+    gen = GeneradorIA(db=None)
+    salida = make_salida(1)
+    salida.estilo_top_k = 10
+
+    completo = texto_de(gen._preparar_prompt_temporal(noticia, salida, llm=llm)[0])
+    llm.configuracion = {"max_tokens_prompt": presupuesto_prompt.contar_tokens(completo) - 20}
+    ajustado = texto_de(gen._preparar_prompt_temporal(noticia, salida, llm=llm)[0])
+
+    assert ajustado.count("Regla sobre") < completo.count("Regla sobre")
+    assert "Regla sobre cifras" in ajustado and "Regla sobre siglas" in ajustado
+
+
+def test_reglas_elegidas_quedan_fuera_del_prefijo_cacheable():
+    estilo = make_estilo(
+        make_item(1, "REGLA FIJA: cita siempre la fuente.", orden=1, incluir_siempre=True),
+        make_item(2, reglas(40), orden=2)
+    )
+    salida = make_salida(1)
+    salida.estilo_top_k = 3
+    bloques = []
+    for contenido in ("Las cifras del presupuesto anual.", "Los hashtags de la campaña en redes."):
+        noticia = make_noticia_temporal()
+        noticia.contenido = contenido
+        noticia.seccion.estilo = estilo
+        mensajes, _ = GeneradorIA(db=None)._preparar_prompt_temporal(noticia, salida, llm=make_llm())
+        bloques.append(mensajes[0]["content"])
+
+    (prefijo_a, variable_a), (prefijo_b, variable_b) = bloques
+    # El prefijo con cache_control es idéntico entre noticias: solo directivas e items fijos
+    assert prefijo_a == prefijo_b and "cache_control" in prefijo_a
+    assert "REGLA FIJA" in prefijo_a["text"] and "Regla sobre" not in prefijo_a["text"]
+    assert "Regla sobre cifras" in variable_a["text"] and "Regla sobre hashtags" in variable_b["text"]
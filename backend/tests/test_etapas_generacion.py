@@ -0,0 +1,77 @@
+"""
+Tests para la latencia por etapa de la generación (services/etapas_generacion.py)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import Base
+from models.orm_models import Noticia, NoticiaSalida, SalidaMaestro, LLMMaestro
+from services import etapas_generacion, proveedores_llm
+from services.generador_ia import GeneradorIA
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    etapas_generacion.reiniciar_estadisticas()
+    yield
+    etapas_generacion.reiniciar_estadisticas()
+
+
+def test_histograma_por_etapa_y_etiquetas():
+    llm = SimpleNamespace(proveedor="Mock", modelo_id="mock-1")
+    for ms in (3, 40, 40, 700):
+        with etapas_generacion.medir(llm, SimpleNamespace(tipo_salida="digital")) as medicion:
+            medicion.sumar("llm", ms)
+            medicion.sumar("llm", 0.4)
+    # Sin medición abierta no se registra nada
+    with etapas_generacion.etapa("orm"):
+        pass
+    with pytest.raises(RuntimeError):
+        with etapas_generacion.medir(llm, SimpleNamespace(tipo_salida="social")):
+            etapas_generacion.registrar("orm", 0)
+            raise RuntimeError("falló")
+
+    (histograma,) = etapas_generacion.histogramas()
+    assert (histograma["etapa"], histograma["proveedor"], histograma["tipo_salida"]) == ("llm", "Mock", "digital")
+    assert histograma["n"] == 4 and histograma["acumulados"][-1] == 4
+    assert histograma["p50_ms"] == 50.0 and histograma["p99_ms"] == 1000.0
+    assert medicion.compacto() == {"llm": 700}
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    sesion = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    sesion.add(Noticia(id=1, titulo="Lluvias en la costa", contenido="Las lluvias afectaron varios barrios", usuario_id=1))
+    sesion.add(LLMMaestro(id=1, nombre="Mock", proveedor="Mock", modelo_id="mock-1", url_api="mock://", api_key="",
+                          activo=True, configuracion={"mock": {"latencia": {"ms": 20}, "tokens_por_segundo": 0}}))
+    sesion.add(SalidaMaestro(id=1, nombre="Web", tipo_salida="digital", activo=True, configuracion={"max_caracteres": 500}))
+    sesion.commit()
+    yield sesion
+    sesion.close()
+    proveedores_llm.invalidar_clientes_llm(1)
+
+
+def test_generacion_guarda_etapas_en_la_salida(db, monkeypatch):
+    def _preparar(self, noticia, salida, prompt=None, estilo=None, llm=None):
+        with etapas_generacion.etapa("prompt"):
+            return f"TÍTULO: {noticia.titulo}\nCONTENIDO ORIGINAL: {noticia.contenido}", None
+
+    monkeypatch.setattr(GeneradorIA, "_preparar_prompt_salida", _preparar)
+    generador = GeneradorIA(db)
+
+    noticia_salida = asyncio.run(generador.generar_para_salida_async(
+        noticia=db.get(Noticia, 1), salida=db.get(SalidaMaestro, 1), llm=db.get(LLMMaestro, 1)
+    ))
+
+    guardada = db.get(NoticiaSalida, noticia_salida.id)
+    assert list(guardada.etapas_ms) == ["orm", "prompt", "cola", "llm", "parseo", "post"]
+    assert guardada.etapas_ms["llm"] >= 20
+    etapas = {(h["etapa"], h["tipo_salida"]) for h in etapas_generacion.get_estadisticas()}
+    assert ("commit", "digital") in etapas and ("llm", "digital") in etapas
@@ -0,0 +1,130 @@
+"""
+Tests para el modo combinado (varias salidas en una sola llamada al LLM)
+"""
+import asyncio
+import types
+
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+CONTENIDO = "Contenido generado de prueba con longitud suficiente para pasar validaciones. " * 2
+
+
+def bloque(salida_id, cerrar=True):
+    texto = f"===SALIDA {salida_id}===\nTÍTULO: Título combinado salida {salida_id}\n\nCONTENIDO:\n{CONTENIDO}\n"
+    if cerrar:
+        texto += f"===FIN SALIDA {salida_id}===\n"
+    return texto
+
+
+class FakeAnthropicCombinado:
+    """Responde en bloque a los prompts combinados y con formato simple al resto"""
+
+    def __init__(self, respuesta_combinada):
+        self.messages = self
+        self.respuesta_combinada = respuesta_combinada
+        self.prompts = []
+
+    async def create(self, model, max_tokens, temperature, messages):
+        prompt = messages[0]["content"]
+        self.prompts.append(prompt)
+        if "SALIDAS A GENERAR" in prompt:
+            texto = self.respuesta_combinada
+        else:
+            texto = f"TÍTULO: Título individual de la salida\n\nCONTENIDO:\n{CONTENIDO}"
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=texto)],
+            usage=types.SimpleNamespace(input_tokens=90, output_tokens=10)
+        )
+
+
+def make_generador(cliente, llm):
+    gen = GeneradorIA(db=None)
+    gen._clientes_async[llm.id] = cliente
+    gen._registrar_tokens = lambda llm, tokens: None
+    return gen
+
+
+def test_parsear_respuesta_combinada_descarta_bloques_incompletos():
+    gen = GeneradorIA(db=None)
+    salidas = [make_salida(1), make_salida(2), make_salida(3)]
+    respuesta = bloque(1) + bloque(2, cerrar=False) + "===SALIDA 3===\nsolo texto\n===FIN SALIDA 3==="
+
+    partes = gen._parsear_respuesta_combinada(respuesta, salidas)
+
+    assert list(partes) == [1]
+    assert partes[1]["titulo"] == "Título combinado salida 1"
+
+
+def test_modo_combinado_una_llamada_y_fallback_por_salida():
+    llm = make_llm()
+    cliente = FakeAnthropicCombinado(bloque(1) + bloque(2))
+    gen = make_generador(cliente, llm)
+    salidas = [make_salida(1), make_salida(2), make_salida(3)]
+    salidas[1].configuracion = {"max_caracteres": 40}
+
+    respuesta = asyncio.run(gen.generar_multiples_salidas_temporal_async(
+        noticia_temporal=make_noticia_temporal(),
+        salidas=salidas,
+        llm=llm,
+        modo_combinado=True
+    ))
+    generadas = {r["salida_id"]: r for r in respuesta["salidas_generadas"]}
+
+    # Una llamada combinada + una individual para la salida que faltó
+    assert len(cliente.prompts) == 2
+    assert "Salida 3 " in cliente.prompts[1]
+    assert generadas[1]["titulo"] == "Título combinado salida 1"
+    assert generadas[3]["titulo"] == "Título individual de la salida"
+    # Post-procesamiento por salida (max_caracteres de la salida 2)
+    assert len(generadas[2]["contenido_generado"]) <= 40
+    # Los tokens de la llamada combinada se reparten entre las salidas extraídas
+    assert generadas[1]["tokens_usados"] + generadas[2]["tokens_usados"] == 100
+    assert respuesta["errores"] == []
+
+
+def test_prompt_combinado_incluye_noticia_una_sola_vez():
+    gen = GeneradorIA(db=None)
+    noticia = make_noticia_temporal()
+    salidas = [make_salida(1, "print"), make_salida(2, "social")]
+
+    prompt, _ = gen._preparar_prompt_combinado(noticia, salidas)
+
+    assert prompt.count(noticia.contenido) == 1
+    assert "### SALIDA 1: Salida 1 (print)" in prompt
+    assert "===FIN SALIDA 2===" in prompt
@@ -0,0 +1,162 @@
+"""
+Tests para la generación concurrente de salidas (GeneradorIA.*_async)
+"""
+import asyncio
+import types
+
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+def make_generador(retardo=0.2, fallar_en=None):
+    gen = GeneradorIA(db=None)
+    # Llamadas al proveedor en curso y máximo observado
+    gen.en_vuelo = 0
+    gen.pico_en_vuelo = 0
+
+    async def invocar_lento(llm, prompt_contenido, max_tokens=2000, temperature=0.7):
+        if fallar_en and f"Salida {fallar_en} " in prompt_contenido:
+            raise Exception("fallo simulado del proveedor")
+        gen.en_vuelo += 1
+        gen.pico_en_vuelo = max(gen.pico_en_vuelo, gen.en_vuelo)
+        try:
+            await asyncio.sleep(retardo)
+        finally:
+            gen.en_vuelo -= 1
+        return {
+            "contenido": "Contenido generado de prueba " * 5,
+            "titulo": "Título generado de prueba",
+            "tokens_usados": 10,
+            "tiempo_ms": int(retardo * 1000)
+        }, 0
+
+    gen._ainvocar_llm = invocar_lento
+    return gen
+
+
+def test_salidas_temporales_en_paralelo():
+    gen = make_generador(retardo=0.2)
+    salidas = [make_salida(i) for i in range(1, 5)]
+
+    llm = make_llm(max_concurrencia=4)
+    # Sin plazas reservadas para urgentes: las 4 quedan disponibles para esta generación
+    llm.configuracion["reservas_prioridad"] = {"urgente": 0}
+
+    respuesta = asyncio.run(gen.generar_multiples_salidas_temporal_async(
+        noticia_temporal=make_noticia_temporal(),
+        salidas=salidas,
+        llm=llm
+    ))
+
+    # Las 4 salidas llegan a estar en vuelo a la vez, hasta el límite del LLM
+    assert gen.pico_en_vuelo == 4
+    assert [r["salida_id"] for r in respuesta["salidas_generadas"]] == [1, 2, 3, 4]
+    assert all(r["tiempo_generacion_ms"] == 200 for r in respuesta["salidas_generadas"])
+    assert respuesta["errores"] == []
+
+
+def test_limite_de_concurrencia_por_llm():
+    gen = make_generador(retardo=0.1)
+    salidas = [make_salida(i) for i in range(1, 5)]
+
+    asyncio.run(gen.generar_multiples_salidas_temporal_async(
+        noticia_temporal=make_noticia_temporal(),
+        salidas=salidas,
+        llm=make_llm(max_concurrencia=1)
+    ))
+
+    # Con límite 1 las llamadas se serializan
+    assert gen.pico_en_vuelo == 1
+
+
+def test_errores_por_salida_no_bloquean_el_resto():
+    gen = make_generador(retardo=0.05, fallar_en=2)
+    salidas = [make_salida(i) for i in range(1, 4)]
+
+    respuesta = asyncio.run(gen.generar_multiples_salidas_temporal_async(
+        noticia_temporal=make_noticia_temporal(),
+        salidas=salidas,
+        llm=make_llm()
+    ))
+
+    assert [r["salida_id"] for r in respuesta["salidas_generadas"]] == [1, 3]
+    assert len(respuesta["errores"]) == 1
+    assert respuesta["errores"][0]["salida_id"] == 2
+    assert "fallo simulado" in respuesta["errores"][0]["error"]
+
+
+class FakeAnthropicAsync:
+    """Cliente async mínimo con la forma de AsyncAnthropic"""
+
+    def __init__(self, retardo):
+        self.messages = self
+        self.retardo = retardo
+
+    async def create(self, model, max_tokens, temperature, messages):
+        await asyncio.sleep(self.retardo)
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text="TÍTULO: Título async\n\nCONTENIDO:\nContenido generado sin bloquear el loop")],
+            usage=types.SimpleNamespace(input_tokens=12, output_tokens=30)
+        )
+
+
+def test_llamada_async_no_bloquea_event_loop():
+    gen = GeneradorIA(db=None)
+    llm = make_llm()
+    gen._clientes_async[llm.id] = FakeAnthropicAsync(retardo=0.2)
+    gen._registrar_tokens = lambda llm, tokens: None
+
+    async def escenario():
+        ticks = 0
+
+        async def latido():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tarea = asyncio.create_task(latido())
+        resultado = await gen.generar_contenido_async(llm, "Prompt de prueba")
+        tarea.cancel()
+        return resultado, ticks
+
+    resultado, ticks = asyncio.run(escenario())
+
+    assert resultado["titulo"] == "Título async"
+    assert resultado["tokens_usados"] == 42
+    # El loop siguió atendiendo otras tareas durante la llamada (~20 latidos en 0.2s)
+    assert ticks >= 10
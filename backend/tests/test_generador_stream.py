@@ -0,0 +1,144 @@
+"""
+Tests para la generación en streaming de salidas (GeneradorIA.generar_multiples_salidas_temporal_stream)
+"""
+import asyncio
+import types
+
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+class FakeStream:
+    def __init__(self, fragmentos, retardo):
+        self.fragmentos = fragmentos
+        self.retardo = retardo
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for fragmento in self.fragmentos:
+            await asyncio.sleep(self.retardo)
+            yield fragmento
+
+    async def get_final_message(self):
+        return types.SimpleNamespace(usage=types.SimpleNamespace(input_tokens=20, output_tokens=len(self.fragmentos)))
+
+
+class FakeAnthropicStreaming:
+    """Cliente con la forma de AsyncAnthropic.messages.stream; retardo por salida según el prompt"""
+
+    def __init__(self, retardos, fallar_en=None):
+        self.messages = self
+        self.retardos = retardos
+        self.fallar_en = fallar_en
+
+    def stream(self, model, max_tokens, temperature, messages):
+        prompt = messages[0]["content"]
+        salida_id = next(i for i in self.retardos if f"Salida {i} " in prompt)
+        if salida_id == self.fallar_en:
+            raise Exception("fallo simulado del proveedor")
+        fragmentos = [
+            "TÍTULO: Título generado ", f"para salida {salida_id}\n\n",
+            "CONTENIDO:\n", "Contenido generado de prueba " * 3
+        ]
+        return FakeStream(fragmentos, self.retardos[salida_id])
+
+
+def recoger_eventos(gen, salidas, llm):
+    async def _recoger():
+        return [e async for e in gen.generar_multiples_salidas_temporal_stream(
+            noticia_temporal=make_noticia_temporal(),
+            salidas=salidas,
+            llm=llm
+        )]
+    return asyncio.run(_recoger())
+
+
+def make_generador(cliente, llm):
+    gen = GeneradorIA(db=None)
+    gen._clientes_async[llm.id] = cliente
+    gen._registrar_tokens = lambda llm, tokens: None
+    return gen
+
+
+def test_eventos_por_salida_en_orden():
+    llm = make_llm()
+    gen = make_generador(FakeAnthropicStreaming({1: 0.01}), llm)
+
+    eventos = recoger_eventos(gen, [make_salida(1)], llm)
+    tipos = [e["evento"] for e in eventos]
+
+    assert tipos[0] == "inicio"
+    assert tipos[-1] == "fin"
+    assert tipos.count("titulo") == 1
+    assert tipos.index("titulo") < tipos.index("completado")
+    assert "".join(e["texto"] for e in eventos if e["evento"] == "delta").startswith("TÍTULO:")
+
+    titulo = next(e for e in eventos if e["evento"] == "titulo")
+    assert titulo["titulo"] == "Título generado para salida 1"
+
+    completado = next(e for e in eventos if e["evento"] == "completado")
+    assert completado["tokens_usados"] == 24
+    assert completado["salida"]["salida_id"] == 1
+    assert eventos[-1]["total_tokens"] == 24
+
+
+def test_salida_lenta_no_retiene_a_las_demas():
+    llm = make_llm(max_concurrencia=4)
+    gen = make_generador(FakeAnthropicStreaming({1: 0.1, 2: 0.005}), llm)
+
+    eventos = recoger_eventos(gen, [make_salida(1), make_salida(2)], llm)
+    completados = [e["salida_id"] for e in eventos if e["evento"] == "completado"]
+
+    assert completados == [2, 1]
+
+
+def test_error_en_una_salida_se_emite_y_el_resto_continua():
+    llm = make_llm()
+    gen = make_generador(FakeAnthropicStreaming({1: 0.01, 2: 0.01}, fallar_en=2), llm)
+
+    eventos = recoger_eventos(gen, [make_salida(1), make_salida(2)], llm)
+
+    errores = [e for e in eventos if e["evento"] == "error"]
+    assert len(errores) == 1 and errores[0]["salida_id"] == 2
+    assert [e["salida_id"] for e in eventos if e["evento"] == "completado"] == [1]
+    assert eventos[-1]["errores"][0]["salida_id"] == 2
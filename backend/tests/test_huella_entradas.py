@@ -0,0 +1,122 @@
+"""
+Tests para la regeneración incremental por huella de entradas (services/huella_entradas.py)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import Base
+from models.orm_models import Noticia, NoticiaSalida, SalidaMaestro, LLMMaestro, Seccion
+from services import huella_entradas
+from services.generador_ia import GeneradorIA
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    huella_entradas.reiniciar_estadisticas()
+    yield
+    huella_entradas.reiniciar_estadisticas()
+
+
+def test_diferencias_por_componente():
+    noticia = SimpleNamespace(titulo="T", contenido="C")
+    salida = SimpleNamespace(tipo_salida="digital", nombre="Web", configuracion={"max_caracteres": 500})
+    llm = SimpleNamespace(modelo_id="claude")
+    base = huella_entradas.calcular(noticia, salida, llm, ("p", 1), ("e", 1))
+
+    assert huella_entradas.diferencias(base, huella_entradas.calcular(noticia, salida, llm, ("p", 1), ("e", 1))) == []
+    otra_salida = SimpleNamespace(tipo_salida="digital", nombre="Web", configuracion={"max_caracteres": 400})
+    assert huella_entradas.diferencias(base, huella_entradas.calcular(noticia, otra_salida, llm, ("p", 1), ("e", 2))) == [
+        "estilo", "salida"
+    ]
+    # Salida generada antes de guardar huellas: cuentan todas
+    assert huella_entradas.diferencias(None, base) == list(huella_entradas.COMPONENTES)
+
+
+@pytest.fixture
+def entorno(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    db.add(Seccion(id=1, nombre="Política"))
+    db.add(Noticia(id=1, titulo="Noticia", contenido="Contenido de la noticia", usuario_id=1, seccion_id=1))
+    db.add(LLMMaestro(id=1, nombre="Claude", proveedor="Anthropic", modelo_id="claude", url_api="x", api_key="", activo=True))
+    db.add(SalidaMaestro(id=1, nombre="Web", tipo_salida="digital", activo=True))
+    db.add(NoticiaSalida(noticia_id=1, salida_id=1, titulo="Antiguo", contenido_generado="Contenido antiguo"))
+    db.commit()
+
+    llamadas = []
+
+    def _preparar(self, noticia, salida, prompt=None, estilo=None, llm=None):
+        return f"Reescribe: {noticia.contenido}", None
+
+    async def _generar(self, llm, prompt_contenido, max_tokens=2000, temperature=0.7, **kwargs):
+        llamadas.append(prompt_contenido)
+        return {"titulo": f"Versión {len(llamadas)}", "contenido": "Contenido regenerado por el LLM",
+                "tokens_usados": 50, "tiempo_ms": 10}
+
+    monkeypatch.setattr(GeneradorIA, "_preparar_prompt_salida", _preparar)
+    monkeypatch.setattr(GeneradorIA, "generar_contenido_async", _generar)
+    yield SimpleNamespace(db=db, llamadas=llamadas)
+    db.close()
+
+
+def regenerar(entorno, forzar=False):
+    db = entorno.db
+    generador = GeneradorIA(db)
+    generador.incremental = not forzar
+    return asyncio.run(generador.generar_para_salida_async(
+        noticia=db.get(Noticia, 1), salida=db.get(SalidaMaestro, 1), llm=db.get(LLMMaestro, 1), regenerar=True
+    ))
+
+
+def test_regenerar_omite_si_no_cambian_las_entradas(entorno):
+    # Salida antigua sin huella: se regenera y queda guardada
+    primera = regenerar(entorno)
+    assert primera.omitida is False
+    assert primera.entradas_cambiadas == list(huella_entradas.COMPONENTES)
+    assert primera.huella_entradas["modelo"] == "claude"
+
+    segunda = regenerar(entorno)
+    assert segunda.omitida is True and segunda.entradas_cambiadas == []
+    assert segunda.titulo == "Versión 1"
+    assert len(entorno.llamadas) == 1
+
+    # forzar llama al LLM aunque nada haya cambiado
+    assert regenerar(entorno, forzar=True).titulo == "Versión 2"
+    assert huella_entradas.get_estadisticas()["omitidas"] == 1
+
+
+def test_regenerar_informa_que_entradas_cambiaron(entorno):
+    regenerar(entorno)
+    noticia = entorno.db.get(Noticia, 1)
+    noticia.contenido = "Contenido corregido de la noticia"
+    entorno.db.get(LLMMaestro, 1).modelo_id = "claude-nuevo"
+    entorno.db.commit()
+
+    resultado = regenerar(entorno)
+
+    assert resultado.omitida is False
+    assert resultado.entradas_cambiadas == ["noticia", "modelo"]
+    assert len(entorno.llamadas) == 2
+    assert huella_entradas.get_estadisticas()["cambios"]["noticia"] == 2
+
+
+@pytest.mark.parametrize("cambio, componente", [
+    (lambda db: setattr(db.get(SalidaMaestro, 1), "estilo_top_k", 3), "ajustes"),
+    (lambda db: setattr(db.get(Seccion, 1), "nombre", "Nacional"), "noticia"),
+], ids=["estilo_top_k", "seccion"])
+def test_regenerar_si_cambian_variables_o_ajustes_del_prompt(entorno, cambio, componente):
+    regenerar(entorno)
+    cambio(entorno.db)
+    entorno.db.commit()
+
+    resultado = regenerar(entorno)
+
+    assert resultado.omitida is False
+    assert resultado.entradas_cambiadas == [componente]
+    assert len(entorno.llamadas) == 2
@@ -0,0 +1,84 @@
+"""
+Tests para el logging estructurado (core/logs.py)
+"""
+import io
+import logging
+import re
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from core import logs
+from routers import admin_settings
+
+logger = logging.getLogger("services.prueba_logs")
+
+
+@pytest.fixture
+def salida():
+    """Logging configurado sobre un buffer; devuelve una función que lo lee"""
+    nivel_previo = logging.getLogger().level
+    logs.detener()  # por si otro test importó main
+    destino = io.StringIO()
+    logs.configurar(nivel="DEBUG", destino=destino)
+
+    def leer():
+        logs.detener()  # escribe lo que quede en la cola
+        return destino.getvalue()
+
+    yield leer
+    logs.detener()
+    logs.set_muestreo_payload(10)
+    logging.getLogger().setLevel(nivel_previo)
+
+
+def test_truncado_perezoso():
+    prompt = "x" * 50000
+    truncado = logs.truncar(prompt, 100)
+    assert truncado.valor is prompt  # sin copiar ni cortar hasta formatear
+    assert str(truncado) == "x" * 100 + "… [+49900 caracteres]"
+    assert str(logs.truncar([{"role": "user"}], 100)) == "[{'role': 'user'}]"
+
+
+def test_correlacion_por_peticion(salida):
+    app = FastAPI()
+    app.add_middleware(logs.MiddlewareCorrelacion)
+
+    @app.get("/eco")
+    def eco():
+        logger.info("atendiendo eco")
+        return {"correlacion": logs.correlacion_actual()}
+
+    cliente = TestClient(app)
+    propia = cliente.get("/eco", headers={"X-Request-ID": "peticion-123"})
+    nueva = cliente.get("/eco")
+    with logs.correlacion("trabajo-7"):
+        logger.warning("desde la cola")
+
+    texto = salida()
+    assert propia.headers["X-Request-ID"] == "peticion-123" == propia.json()["correlacion"]
+    assert re.fullmatch(r"[0-9a-f]{12}", nueva.headers["X-Request-ID"])
+    assert "INFO    [peticion-123] services.prueba_logs: atendiendo eco" in texto
+    assert f"[{nueva.headers['X-Request-ID']}]" in texto
+    assert "WARNING [trabajo-7] services.prueba_logs: desde la cola" in texto
+
+
+def test_muestreo_y_nivel_en_caliente(salida):
+    logs.set_muestreo_payload(3)
+    for i in range(9):
+        logger.debug("Prompt enviado: %s", logs.truncar(f"prompt {i}"), extra=logs.MUESTREO)
+    admin_settings.set_logging(admin_settings.LoggingPayload(nivel="warning", logger="services.prueba_logs"))
+    logger.info("no debe salir")
+    logger.warning("sí debe salir")
+    with pytest.raises(HTTPException) as error:
+        admin_settings.set_logging(admin_settings.LoggingPayload(nivel="ruidoso"))
+
+    estadisticas = admin_settings.get_logging()
+    texto = salida()
+    assert [linea.rsplit(" ", 1)[-1] for linea in texto.splitlines() if "Prompt enviado" in linea] == ["0", "3", "6"]
+    assert "no debe salir" not in texto and "sí debe salir" in texto
+    assert error.value.status_code == 400
+    assert estadisticas["loggers"]["services.prueba_logs"] == "WARNING"
+    assert estadisticas["muestreo_payload"] == 3
+    logging.getLogger("services.prueba_logs").setLevel(logging.NOTSET)
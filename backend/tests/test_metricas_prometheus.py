@@ -0,0 +1,116 @@
+"""
+Tests para las métricas Prometheus (core/metricas_prometheus.py)
+"""
+import asyncio
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from core import metricas_prometheus
+from core.cache import CacheService
+from services import proveedor_mock, proveedores_llm
+
+pytest.importorskip("prometheus_client")
+from prometheus_client import REGISTRY
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def valor(nombre, **etiquetas):
+    return REGISTRY.get_sample_value(nombre, etiquetas) or 0.0
+
+
+def test_peticiones_por_plantilla_de_ruta():
+    app = FastAPI()
+    app.add_middleware(metricas_prometheus.MiddlewareMetricas)
+
+    @app.get("/api/cosas/{cosa_id}")
+    def leer(cosa_id: int):
+        en_curso = valor("noticias_http_peticiones_en_curso")
+        return {"id": cosa_id, "en_curso": en_curso}
+
+    antes = valor("noticias_http_peticiones_total", metodo="GET", ruta="/api/cosas/{cosa_id}", estado="200")
+    cliente = TestClient(app)
+    respuestas = [cliente.get(f"/api/cosas/{i}") for i in range(3)]
+    cliente.get("/no-existe")
+
+    assert all(r.json()["en_curso"] >= 1 for r in respuestas)
+    assert valor("noticias_http_peticiones_total", metodo="GET", ruta="/api/cosas/{cosa_id}", estado="200") == antes + 3
+    assert valor("noticias_http_peticion_segundos_count", metodo="GET", ruta="/api/cosas/{cosa_id}") >= 3
+    assert valor("noticias_http_peticiones_total", metodo="GET", ruta=metricas_prometheus.RUTA_SIN_PLANTILLA, estado="404") >= 1
+    assert valor("noticias_http_peticiones_en_curso") == 0
+
+
+def test_pool_en_uso_y_overflow():
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=1, max_overflow=2)
+    metricas_prometheus.instrumentar_pool(engine)
+
+    conexiones = [engine.connect() for _ in range(3)]
+    for conexion in conexiones:
+        conexion.execute(text("SELECT 1"))
+    assert valor("noticias_db_pool_conexiones_en_uso") == 3
+    assert valor("noticias_db_pool_overflow_en_uso") == 2
+    for conexion in conexiones:
+        conexion.close()
+    assert valor("noticias_db_pool_conexiones_en_uso") == 0
+    assert valor("noticias_db_pool_overflow_en_uso") == 0
+    engine.dispose()
+
+
+def test_llamadas_llm_errores_y_tokens():
+    llm = SimpleNamespace(id=77, nombre="Mock métricas", proveedor="Mock", modelo_id="mock-metricas", api_key="",
+                          configuracion={"mock": {"latencia": {"ms": 0}, "tokens_por_segundo": 0}})
+    asyncio.run(proveedores_llm.completar_async(proveedor_mock.ClienteMock(llm), llm, "TÍTULO: Hola", 50))
+    llm.configuracion = {"mock": {"latencia": {"ms": 0}, "tasa_429": 1.0}}
+    with pytest.raises(proveedor_mock.ErrorMock):
+        asyncio.run(proveedores_llm.completar_async(proveedor_mock.ClienteMock(llm), llm, "TÍTULO: Hola", 50))
+    metricas_prometheus.contar_tokens(llm, 120)
+
+    etiquetas = {"proveedor": "Mock", "modelo": "mock-metricas"}
+    assert valor("noticias_llm_llamada_segundos_count", resultado="ok", **etiquetas) == 1
+    assert valor("noticias_llm_llamada_segundos_count", resultado="error", **etiquetas) == 1
+    assert valor("noticias_llm_errores_total", codigo="429", **etiquetas) == 1
+    assert valor("noticias_llm_tokens_total", llm_id="77", llm="Mock métricas") == 120
+    assert metricas_prometheus.codigo_error(asyncio.TimeoutError()) == "timeout"
+
+
+def test_aciertos_de_cache_por_espacio():
+    class RedisFalso:
+        async def get(self, key):
+            if key.endswith("roto"):
+                raise ConnectionError("sin redis")
+            return "1" if key.endswith("a") else None
+
+    cache = CacheService.__new__(CacheService)
+    cache.redis = RedisFalso()
+    for clave in ("llm:respuesta:a", "llm:respuesta:b", "llm:respuesta:roto"):
+        asyncio.run(cache.get(clave))
+
+    assert valor("noticias_cache_consultas_total", espacio="llm:respuesta", resultado="hit") >= 1
+    assert valor("noticias_cache_consultas_total", espacio="llm:respuesta", resultado="miss") >= 1
+    assert valor("noticias_cache_consultas_total", espacio="llm:respuesta", resultado="error") >= 1
+
+
+def test_agregacion_entre_procesos(tmp_path):
+    """Dos workers escriben en PROMETHEUS_MULTIPROC_DIR y /metrics de un tercero los suma"""
+    entorno = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    worker = (
+        "from types import SimpleNamespace\n"
+        "from core import metricas_prometheus as m\n"
+        "m.contar_tokens(SimpleNamespace(id=1, nombre='A'), 10)\n"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], cwd=BACKEND, env=entorno, check=True)
+    salida = subprocess.run(
+        [sys.executable, "-c", "from core import metricas_prometheus as m; print(m.exponer()[0].decode())"],
+        cwd=BACKEND, env=entorno, check=True, capture_output=True, text=True
+    ).stdout
+
+    assert 'noticias_llm_tokens_total{llm="A",llm_id="1"} 20.0' in salida
@@ -0,0 +1,130 @@
+"""
+Tests para el perfilador por muestreo (services/perfilador.py)
+"""
+import os
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config import settings
+from core.auth import get_current_admin
+from routers import admin_settings
+from services import perfilador
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    perfilador.reiniciar_estadisticas()
+    yield
+    perfilador.reiniciar_estadisticas()
+
+
+def _ocupado(segundos):
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        sum(range(200))
+
+
+def test_colapsado_y_resumen():
+    perfil = perfilador.Perfil(intervalo_ms=2).iniciar()
+    _ocupado(0.2)
+    perfil.detener()
+
+    lineas = perfil.colapsado().splitlines()
+    assert lineas and all(linea.rsplit(" ", 1)[1].isdigit() for linea in lineas)
+    propias = [linea for linea in lineas if "_ocupado (tests/test_perfilador.py:" in linea]
+    assert propias and propias[0].startswith(threading.current_thread().name + ";")
+    # El propio hilo muestreador no aparece
+    assert not any("_muestrear (services/perfilador.py" in linea for linea in lineas)
+
+    resumen = perfil.resumen()
+    assert resumen["pid"] == os.getpid() and resumen["muestras"] > 20
+    assert "test_perfilador.py" in resumen["top"][0][0] and resumen["top"][0][1] > 50
+
+
+def test_hilos_inactivos_omitidos():
+    evento = threading.Event()
+    hilo = threading.Thread(target=evento.wait, name="esperando", daemon=True)
+    hilo.start()
+    try:
+        sin_inactivos = perfilador.Perfil(intervalo_ms=2).iniciar()
+        con_inactivos = perfilador.Perfil(intervalo_ms=2, inactivos=True).iniciar()
+        time.sleep(0.05)
+        sin_inactivos.detener()
+        con_inactivos.detener()
+    finally:
+        evento.set()
+    assert "esperando;" not in sin_inactivos.colapsado()
+    assert "esperando;" in con_inactivos.colapsado()
+
+
+@pytest.fixture
+def cliente_admin():
+    app = FastAPI()
+    app.include_router(admin_settings.router)
+    app.dependency_overrides[get_current_admin] = lambda: object()
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+def test_endpoint_perfil(cliente_admin):
+    respuesta = cliente_admin.get("/api/admin/settings/perfil", params={"segundos": 0.1, "inactivos": True})
+    assert respuesta.status_code == 200
+    assert respuesta.headers["x-perfil-pid"] == str(os.getpid())
+    assert int(respuesta.headers["x-perfil-muestras"]) > 0
+    assert respuesta.headers["content-disposition"].endswith('.folded"')
+    assert all(linea.rsplit(" ", 1)[1].isdigit() for linea in respuesta.text.splitlines())
+    assert cliente_admin.get("/api/admin/settings/perfilador").json()["perfiles"] == 1
+
+    assert cliente_admin.get("/api/admin/settings/perfil", params={"segundos": settings.PERFILADOR_MAX_S + 1}).status_code == 400
+
+
+def test_endpoint_perfil_en_curso(cliente_admin, monkeypatch):
+    monkeypatch.setitem(perfilador._en_curso, "proceso", True)
+    assert cliente_admin.get("/api/admin/settings/perfil", params={"segundos": 0.1}).status_code == 409
+
+
+def test_endpoint_perfil_solo_admin():
+    app = FastAPI()
+    app.include_router(admin_settings.router)
+    assert TestClient(app).get("/api/admin/settings/perfil").status_code == 401
+
+
+def test_perfil_por_peticion(monkeypatch):
+    monkeypatch.setattr(settings, "PERFILADOR_CLAVE", "secreta")
+    monkeypatch.setattr(settings, "PERFILADOR_INTERVALO_MS", 2.0)
+    app = FastAPI()
+    app.add_middleware(perfilador.MiddlewarePerfil)
+
+    @app.get("/async")
+    async def ruta_async():
+        _ocupado(0.15)
+        return {}
+
+    @app.get("/sync")
+    def ruta_sync():
+        _ocupado(0.15)
+        return {}
+
+    cliente = TestClient(app)
+    for ruta in ("/async", "/sync"):
+        respuesta = cliente.get(ruta, headers={perfilador.CABECERA_PERFILAR: "secreta"})
+        resumen = respuesta.headers[perfilador.CABECERA_RESUMEN]
+        assert resumen.startswith("muestras=") and f"pid={os.getpid()}" in resumen
+        assert "_ocupado (tests/test_perfilador.py:" in resumen.split("|", 1)[1].split(",")[0]
+
+    assert perfilador.CABECERA_RESUMEN not in cliente.get("/async").headers
+    assert perfilador.CABECERA_RESUMEN not in cliente.get("/async", headers={perfilador.CABECERA_PERFILAR: "otra"}).headers
+    assert perfilador.get_estadisticas()["perfiles_peticion"] == 2
+
+
+def test_perfil_por_peticion_desactivado_sin_clave(monkeypatch):
+    monkeypatch.setattr(settings, "PERFILADOR_CLAVE", None)
+    app = FastAPI()
+    app.add_middleware(perfilador.MiddlewarePerfil)
+    app.get("/")(lambda: {})
+    respuesta = TestClient(app).get("/", headers={perfilador.CABECERA_PERFILAR: ""})
+    assert perfilador.CABECERA_RESUMEN not in respuesta.headers
@@ -0,0 +1,76 @@
+"""
+Tests para la caché de plantillas compiladas (services/plantillas.py)
+"""
+import types
+
+import pytest
+
+from services import plantillas
+from services.plantillas import PlantillaCompilada
+from services.generador_ia import GeneradorIA
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia():
+    plantillas.limpiar()
+    yield
+    plantillas.limpiar()
+
+
+def test_render_equivale_a_reemplazo_de_variables():
+    texto = "Tema: {tema}. Salida {nombre_salida} ({tipo_salida}) sobre {tema} {{titulo}}"
+    variables = {"tema": "Economía", "nombre_salida": "Web", "tipo_salida": "digital", "titulo": "T", "extra": "x"}
+
+    esperado = texto
+    for nombre, valor in variables.items():
+        esperado = esperado.replace(f"{{{nombre}}}", valor)
+
+    assert PlantillaCompilada(texto).renderizar(variables) == esperado
+
+
+def test_variables_faltantes():
+    with pytest.raises(ValueError, match="Variables faltantes en el prompt: fecha"):
+        PlantillaCompilada("Hoy es {fecha}").renderizar({})
+
+
+def test_valores_con_llaves_no_se_reinterpretan():
+    plantilla = PlantillaCompilada("CONTENIDO: {contenido}")
+    assert plantilla.renderizar({"contenido": "texto con {llaves}"}) == "CONTENIDO: texto con {llaves}"
+
+
+def test_cache_por_version_e_invalidacion():
+    construcciones = []
+
+    def construir():
+        construcciones.append(1)
+        return PlantillaCompilada("Prompt {tema}")
+
+    plantillas.obtener("prompt", 1, ("v1",), construir)
+    plantillas.obtener("prompt", 1, ("v1",), construir)
+    assert len(construcciones) == 1
+
+    # Nueva versión (p.ej. item editado en otro worker)
+    plantillas.obtener("prompt", 1, ("v2",), construir)
+    assert len(construcciones) == 2
+
+    # Invalidación explícita desde los endpoints de escritura
+    plantillas.invalidar_prompt(1)
+    plantillas.obtener("prompt", 1, ("v2",), construir)
+    assert len(construcciones) == 3
+    assert plantillas.get_estadisticas()["aciertos"] == 1
+
+
+def test_generador_reutiliza_bloque_de_estilo_compilado():
+    gen = GeneradorIA(db=None)
+    gen._version_plantilla = lambda maestro, modelo_item, columna_padre: ("v1",)
+
+    item = types.SimpleNamespace(contenido="Regla 1", orden=1)
+    estilo = types.SimpleNamespace(id=7, nombre="Manual", configuracion={"tono": "formal"}, items=[item])
+
+    primero = gen.aplicar_estilo("Base", estilo)
+    # Cambios sin nueva versión ni invalidación no se ven: se usa la compilada
+    item.contenido = "Regla cambiada"
+    assert gen.aplicar_estilo("Base", estilo) == primero
+
+    plantillas.invalidar_estilo(7)
+    assert "Regla cambiada" in gen.aplicar_estilo("Base", estilo)
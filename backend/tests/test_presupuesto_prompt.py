@@ -0,0 +1,169 @@
+"""
+Tests para el presupuesto de tokens del prompt (services/presupuesto_prompt.py)
+"""
+import types
+
+import pytest
+
+from services import plantillas, presupuesto_prompt, runtime_settings
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    presupuesto_prompt.reiniciar_estadisticas()
+    plantillas.limpiar()
+    yield
+    runtime_settings.set_max_prompt_tokens(None)
+    presupuesto_prompt.reiniciar_estadisticas()
+
+
+def frases(n, palabra="dato"):
+    return " ".join(f"Frase {i} con {palabra} relevante para la noticia." for i in range(n))
+
+
+def test_planificar_descarta_primero_la_menor_prioridad():
+    P = presupuesto_prompt
+    salida = P.Segmento("salida", "x", P.PRIORIDAD_SALIDA, tokens=50, obligatorio=True)
+    noticia = P.Segmento("noticia", frases(100), P.PRIORIDAD_NOTICIA, minimo=20, obligatorio=True)
+    config = P.Segmento("estilo_config", "Tono: formal", P.PRIORIDAD_ESTILO_CONFIG, tokens=30)
+    item1 = P.Segmento("estilo_item:1", "a", P.PRIORIDAD_ESTILO_ITEM, tokens=40)
+    item2 = P.Segmento("estilo_item:2", "b", P.PRIORIDAD_ESTILO_ITEM, tokens=40)
+    segmentos = [salida, noticia, config, item1, item2]
+
+    # Sobran 40 tokens: basta con el último item
+    informe = P.planificar(segmentos, sum(s.tokens for s in segmentos) - 40)
+    assert informe["descartados"] == ["estilo_item:2"] and informe["ajustado"]
+    assert not item1.descartado and not noticia.recortado
+
+    # Con poco margen se va el estilo entero y se recorta la noticia, nunca la salida
+    informe = P.planificar(segmentos, 200)
+    assert informe["descartados"] == ["estilo_item:1", "estilo_config"]
+    assert informe["recortados"] == ["noticia"] and informe["ajustado"]
+    assert noticia.texto.endswith(P.MARCA_RECORTE)
+    assert salida.tokens == 50 and informe["tokens_finales"] <= 200
+
+
+def test_recortar_texto_corta_en_fin_de_frase():
+    texto = frases(50)
+    recortado = presupuesto_prompt.recortar_texto(texto, 100)
+
+    assert presupuesto_prompt.contar_tokens(recortado) <= 100
+    assert recortado.endswith("noticia." + presupuesto_prompt.MARCA_RECORTE)
+    assert presupuesto_prompt.recortar_texto("corto", 100) == "corto"
+
+
+def test_conteo_por_item_cacheado():
+    presupuesto_prompt.contar_tokens_cacheado("estilo_item", 1, "Regla uno")
+    presupuesto_prompt.contar_tokens_cacheado("estilo_item", 1, "Regla uno")
+    presupuesto_prompt.contar_tokens_cacheado("estilo_item", 1, "Regla editada")
+
+    estadisticas = presupuesto_prompt.get_estadisticas()
+    assert estadisticas["conteos_cacheados"] == 1
+    assert estadisticas["conteos_calculados"] == 2
+
+
+def test_presupuesto_por_llm_y_override_runtime():
+    llm = make_llm()
+    runtime_settings.set_max_prompt_tokens(3000)
+    assert presupuesto_prompt.get_presupuesto(llm) == 3000
+
+    llm.configuracion = {"max_tokens_prompt": 800}
+    assert presupuesto_prompt.get_presupuesto(llm) == 800
+    assert presupuesto_prompt.get_presupuesto(None) == 3000
+
+
+def test_prompt_largo_conserva_instrucciones_y_recorta_noticia():
+    llm = make_llm()
+    llm.configuracion = {"max_tokens_prompt": 400}
+    noticia = make_noticia_temporal()
+    noticia.contenido = frases(200)
+    items = [types.SimpleNamespace(id=i, contenido=frases(20, f"regla{i}"), orden=i) for i in (1, 2)]
+    noticia.seccion.estilo = types.SimpleNamespace(id=3, nombre="Manual", configuracion={"tono": "formal"}, items=items)
+    gen = GeneradorIA(db=None)
+
+    mensajes, _ = gen._preparar_prompt_temporal(noticia, make_salida(1), llm=llm)
+
+    texto = "\n".join(b["text"] for b in mensajes[0]["content"]) if isinstance(mensajes, list) else mensajes
+    assert "Optimiza para web" in texto
+    assert "regla1" not in texto and "regla2" not in texto
+    assert presupuesto_prompt.MARCA_RECORTE in texto
+    assert "Frase 0 con dato" in texto
+    assert presupuesto_prompt.contar_tokens(texto) <= 400
+
+
+def test_prompt_que_cabe_usa_el_bloque_de_estilo_compilado():
+    llm = make_llm()
+    noticia = make_noticia_temporal()
+    item = types.SimpleNamespace(id=1, contenido="Usa frases cortas.", orden=1)
+    noticia.seccion.estilo = types.SimpleNamespace(id=3, nombre="Manual", configuracion={"tono": "formal"}, items=[item])
+    gen = GeneradorIA(db=None)
+
+    mensajes, _ = gen._preparar_prompt_temporal(noticia, make_salida(1), llm=llm)
+
+    assert mensajes[0]["content"][0]["text"] == gen._bloque_estilo(noticia.seccion.estilo).strip()
+    assert presupuesto_prompt.get_estadisticas()["planificados"] == 0
+
+
+def test_partes_del_estilo_se_cachean_por_version():
+    class EstiloContado(types.SimpleNamespace):
+        lecturas = 0
+
+        @property
+        def items(self):
+            EstiloContado.lecturas += 1
+            return self._items
+
+    llm = make_llm()
+    noticia = make_noticia_temporal()
+    noticia.seccion.estilo = EstiloContado(
+        id=3, nombre="Manual", configuracion={"tono": "formal"},
+        _items=[types.SimpleNamespace(id=1, contenido="Usa frases cortas.", orden=1)]
+    )
+    gen = GeneradorIA(db=None)
+    gen._version_plantilla = lambda maestro, modelo_item, columna_padre: ("v1",) if maestro is noticia.seccion.estilo else None
+
+    primero, _ = gen._preparar_prompt_temporal(noticia, make_salida(1), llm=llm)
+    lecturas = EstiloContado.lecturas
+    calculados = presupuesto_prompt.get_estadisticas()["conteos_calculados"]
+    segundo, _ = gen._preparar_prompt_temporal(noticia, make_salida(1), llm=llm)
+
+    # Con la versión sin cambios no se vuelven a leer, ordenar ni contar los items
+    assert segundo == primero
+    assert EstiloContado.lecturas == lecturas
+    assert presupuesto_prompt.get_estadisticas()["conteos_calculados"] == calculados
@@ -0,0 +1,257 @@
+"""
+Tests para el presupuesto diario de tokens (services/presupuesto_tokens.py)
+"""
+import asyncio
+import types
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.orm_models import ConsumoTokensDiario, LLMMaestro
+from services import presupuesto_tokens
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+class FakeAnthropicContador:
+    def __init__(self):
+        self.messages = self
+        self.llamadas = 0
+
+    async def create(self, model, max_tokens, temperature, messages):
+        self.llamadas += 1
+        texto = f"TÍTULO: Título de la llamada {self.llamadas}\n\nCONTENIDO:\n" + "Contenido generado de prueba " * 3
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=texto)],
+            usage=types.SimpleNamespace(input_tokens=30, output_tokens=10)
+        )
+
+
+class FakeRedis:
+    """Subconjunto de redis.asyncio usado por ContadorRedis"""
+
+    def __init__(self):
+        self.datos = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def get(self, clave):
+        valor = self.datos.get(clave)
+        return str(valor) if valor is not None else None
+
+    async def set(self, clave, valor, ex=None):
+        self.datos[clave] = int(valor)
+        self.ttls[clave] = ex
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.operaciones = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def incrby(self, clave, n):
+        self.operaciones.append(("incrby", clave, n))
+
+    def expire(self, clave, ttl):
+        self.operaciones.append(("expire", clave, ttl))
+
+    async def execute(self):
+        resultados = []
+        for operacion, clave, valor in self.operaciones:
+            if operacion == "incrby":
+                self.redis.datos[clave] = self.redis.datos.get(clave, 0) + valor
+                resultados.append(self.redis.datos[clave])
+            else:
+                self.redis.ttls[clave] = valor
+                resultados.append(True)
+        return resultados
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(presupuesto_tokens, "get_cache_service", lambda: types.SimpleNamespace(redis=fake))
+    presupuesto_tokens.reiniciar_estadisticas()
+    yield fake
+    presupuesto_tokens.reiniciar_estadisticas()
+
+
+@pytest.fixture
+def sesiones():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    LLMMaestro.__table__.create(engine)
+    ConsumoTokensDiario.__table__.create(engine)
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+def consumo(redis, ambito, entidad_id):
+    return redis.datos.get(f"{presupuesto_tokens.PREFIJO_CLAVE}{ambito}:{entidad_id}:{date.today():%Y%m%d}", 0)
+
+
+def make_generador(llm, usuario=None):
+    gen = GeneradorIA(db=object(), usuario=usuario)  # con BD: se controla el presupuesto
+    gen._clientes_async[llm.id] = FakeAnthropicContador()
+    return gen
+
+
+def generar(gen, llm):
+    return asyncio.run(gen.generar_para_salida_temporal_async(
+        make_noticia_temporal(), make_salida(1), llm, usar_cache=False
+    ))
+
+
+def test_reserva_y_conciliacion_con_el_consumo_real(redis):
+    llm = make_llm()
+    llm.limite_diario_tokens = 100000
+    usuario = types.SimpleNamespace(id=7, limite_tokens_diario=100000)
+
+    generar(make_generador(llm, usuario), llm)
+
+    # Queda el consumo real (30 + 10), no la estimación reservada
+    assert consumo(redis, "llm", llm.id) == 40
+    assert consumo(redis, "usuario", 7) == 40
+    assert all(ttl == presupuesto_tokens.TTL_CLAVE_S for ttl in redis.ttls.values())
+
+
+def test_limite_del_llm_rechaza_sin_llamar_al_proveedor(redis):
+    llm = make_llm()
+    llm.limite_diario_tokens = 1000
+    gen = make_generador(llm)
+    redis.datos[f"{presupuesto_tokens.PREFIJO_CLAVE}llm:{llm.id}:{date.today():%Y%m%d}"] = 990
+
+    with pytest.raises(presupuesto_tokens.PresupuestoExcedido) as error:
+        generar(gen, llm)
+
+    assert error.value.ambito == "llm"
+    assert gen._clientes_async[llm.id].llamadas == 0
+    # La reserva rechazada se deshace
+    assert consumo(redis, "llm", llm.id) == 990
+
+
+def test_limite_del_usuario_rechaza(redis):
+    llm = make_llm()
+    usuario = types.SimpleNamespace(id=7, limite_tokens_diario=10)
+
+    with pytest.raises(presupuesto_tokens.PresupuestoExcedido, match="usuario"):
+        generar(make_generador(llm, usuario), llm)
+
+    assert consumo(redis, "llm", llm.id) == 0 and consumo(redis, "usuario", 7) == 0
+
+
+def test_llm_sin_presupuesto_degrada_al_fallback(redis):
+    llm = make_llm()
+    llm.limite_diario_tokens = 10
+    respaldo = make_llm()
+    respaldo.id, respaldo.modelo_id, respaldo.limite_diario_tokens = 100, "modelo-barato", None
+    gen = make_generador(llm)
+    gen._clientes_async[respaldo.id] = FakeAnthropicContador()
+    gen._candidatos_enrutamiento = lambda llm, politica: [llm, respaldo]
+
+    resultado = generar(gen, llm)
+
+    assert resultado["modelo_respuesta"] == "modelo-barato"
+    assert gen._clientes_async[llm.id].llamadas == 0
+    assert consumo(redis, "llm", respaldo.id) == 40
+    assert presupuesto_tokens.get_estadisticas()["degradaciones"] == 1
+
+
+def test_contador_bd_incrementa_en_la_bd(sesiones):
+    contador = presupuesto_tokens.ContadorBD(sesiones)
+    hoy = date.today()
+
+    assert contador._incrementar("llm", 1, hoy, 500) == 500
+    assert contador._incrementar("llm", 1, hoy, -120) == 380
+    assert contador._incrementar("usuario", 1, hoy, 7) == 7
+    assert contador._leer("llm", 1, hoy) == 380
+    contador._poner("llm", 1, hoy, 0)
+    assert contador._leer("llm", 1, hoy) == 0
+
+
+def test_volcado_copia_el_consumo_a_tokens_usados_hoy(sesiones, monkeypatch):
+    monkeypatch.setattr(presupuesto_tokens, "_contador_bd", presupuesto_tokens.ContadorBD(sesiones))
+    monkeypatch.setattr(presupuesto_tokens, "SessionLocal", sesiones)
+    presupuesto_tokens.reiniciar_estadisticas()
+    db = sesiones()
+    db.add(LLMMaestro(id=1, nombre="Claude", proveedor="Anthropic", modelo_id="m", url_api="u", api_key="k"))
+    db.commit()
+
+    # Ruta síncrona: sin commit por llamada, se acumula hasta el volcado
+    presupuesto_tokens.registrar(1, None, 120)
+    presupuesto_tokens.registrar(1, None, 30)
+    actualizados = asyncio.run(presupuesto_tokens.volcar())
+
+    db.expire_all()
+    assert actualizados == 1
+    assert db.query(LLMMaestro).get(1).tokens_usados_hoy == 150
+    assert presupuesto_tokens.get_estadisticas()["pendientes"] == 0
+    db.close()
+
+
+def test_volcado_fallido_conserva_el_consumo_pendiente(redis, monkeypatch):
+    presupuesto_tokens.registrar(1, 7, 120)
+    incrementar = presupuesto_tokens.ContadorRedis.incrementar
+    llamadas = []
+
+    async def incrementar_caido(self, ambito, entidad_id, fecha, tokens):
+        llamadas.append(ambito)
+        if len(llamadas) == 2:
+            raise ConnectionError("redis caído")
+        return await incrementar(self, ambito, entidad_id, fecha, tokens)
+
+    monkeypatch.setattr(presupuesto_tokens.ContadorRedis, "incrementar", incrementar_caido)
+    monkeypatch.setattr(presupuesto_tokens, "_ids_llm", lambda: [])
+    monkeypatch.setattr(presupuesto_tokens, "_guardar_tokens_hoy", lambda totales: None)
+    with pytest.raises(ConnectionError):
+        asyncio.run(presupuesto_tokens.volcar())
+
+    # El primer ámbito ya se volcó; el segundo sigue pendiente y entra en el siguiente volcado
+    assert presupuesto_tokens.get_estadisticas()["pendientes"] == 1
+    monkeypatch.setattr(presupuesto_tokens.ContadorRedis, "incrementar", incrementar)
+    asyncio.run(presupuesto_tokens.volcar())
+    assert consumo(redis, "llm", 1) == 120 and consumo(redis, "usuario", 7) == 120
+    assert presupuesto_tokens.get_estadisticas()["pendientes"] == 0
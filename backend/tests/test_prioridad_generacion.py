@@ -0,0 +1,104 @@
+"""
+Tests para los carriles de prioridad por LLM (services/prioridad_generacion.py)
+"""
+import asyncio
+import types
+
+import pytest
+
+from services import prioridad_generacion
+from services.prioridad_generacion import URGENTE, NORMAL, LOTE
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    prioridad_generacion.reiniciar_estadisticas()
+    yield
+    prioridad_generacion.reiniciar_estadisticas()
+
+
+def test_clasificar_por_tipo_rol_y_lote():
+    assert prioridad_generacion.clasificar("breaking", "jefe_seccion") == URGENTE
+    assert prioridad_generacion.clasificar("breaking", "viewer") == NORMAL
+    assert prioridad_generacion.clasificar("breaking", "director", lote=True) == URGENTE
+    assert prioridad_generacion.clasificar("feature", "director") == NORMAL
+    assert prioridad_generacion.clasificar("opinion", "admin", lote=True) == LOTE
+    noticia = types.SimpleNamespace(tipo="breaking")
+    assert prioridad_generacion.clasificar_noticia(noticia, types.SimpleNamespace(role="admin")) == URGENTE
+
+
+def test_breaking_de_un_rol_sin_permiso_va_al_carril_normal():
+    # editor y redactor pueden generar (get_current_editor) pero no lanzar urgentes
+    noticia = types.SimpleNamespace(tipo="breaking")
+    for rol in ("editor", "redactor"):
+        assert prioridad_generacion.clasificar_noticia(noticia, types.SimpleNamespace(role=rol)) == NORMAL
+    assert prioridad_generacion.clasificar_noticia(noticia, types.SimpleNamespace(role="redactor"), lote=True) == LOTE
+
+
+def test_reservas_dejan_siempre_una_plaza_compartida():
+    llm = types.SimpleNamespace(id=1, configuracion={})
+    assert prioridad_generacion.get_reservas(llm, 4) == {URGENTE: 1, NORMAL: 1, LOTE: 0}
+    assert prioridad_generacion.get_reservas(llm, 2) == {URGENTE: 1, NORMAL: 0, LOTE: 0}
+    llm.configuracion = {"reservas_prioridad": {"urgente": 2, "normal": 0}}
+    assert prioridad_generacion.get_reservas(llm, 4) == {URGENTE: 2, NORMAL: 0, LOTE: 0}
+
+
+def test_el_lote_no_ocupa_las_plazas_reservadas():
+    async def escenario():
+        planificador = prioridad_generacion.Planificador(1, 4, {URGENTE: 1, NORMAL: 1, LOTE: 0})
+        for _ in range(2):
+            await planificador.adquirir(LOTE)
+        tercero = asyncio.create_task(planificador.adquirir(LOTE))
+        await asyncio.sleep(0)
+        assert not tercero.done() and planificador.en_cola[LOTE] == 1
+
+        # Las plazas reservadas siguen libres para normal y urgente
+        await asyncio.wait_for(planificador.adquirir(NORMAL), 1)
+        await asyncio.wait_for(planificador.adquirir(URGENTE), 1)
+        tercero.cancel()
+
+    asyncio.run(escenario())
+
+
+def test_urgente_adelanta_al_lote_en_espera():
+    async def escenario():
+        planificador = prioridad_generacion.Planificador(1, 1, {URGENTE: 0, NORMAL: 0, LOTE: 0})
+        orden = []
+
+        async def generar(clase, etiqueta):
+            await planificador.adquirir(clase)
+            orden.append(etiqueta)
+            await asyncio.sleep(0)
+            planificador.liberar(clase)
+
+        await planificador.adquirir(LOTE)  # ocupando la única plaza
+        tareas = [asyncio.create_task(generar(LOTE, f"lote{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tareas.append(asyncio.create_task(generar(URGENTE, "urgente")))
+        await asyncio.sleep(0)
+        assert planificador.en_cola == {URGENTE: 1, NORMAL: 0, LOTE: 3}
+
+        planificador.liberar(LOTE)
+        await asyncio.gather(*tareas)
+        return orden
+
+    assert asyncio.run(escenario()) == ["urgente", "lote0", "lote1", "lote2"]
+    clases = prioridad_generacion.get_estadisticas()["1"]["clases"]
+    assert clases[URGENTE]["adelantamientos"] == 1
+    assert clases[LOTE]["adquisiciones"] == 4
+
+
+def test_espera_cancelada_no_bloquea_la_cola():
+    async def escenario():
+        planificador = prioridad_generacion.Planificador(1, 1, {URGENTE: 0, NORMAL: 0, LOTE: 0})
+        await planificador.adquirir(NORMAL)
+        cancelada = asyncio.create_task(planificador.adquirir(NORMAL))
+        siguiente = asyncio.create_task(planificador.adquirir(NORMAL))
+        await asyncio.sleep(0)
+        cancelada.cancel()
+        await asyncio.sleep(0)
+        planificador.liberar(NORMAL)
+        await asyncio.wait_for(siguiente, 1)
+        return planificador.en_uso[NORMAL], planificador.en_cola[NORMAL]
+
+    assert asyncio.run(escenario()) == (1, 0)
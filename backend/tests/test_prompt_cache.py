@@ -0,0 +1,153 @@
+"""
+Tests para la caché de prompts del proveedor (bloque de estilo como prefijo cacheable)
+"""
+import asyncio
+import types
+
+from services import plantillas
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+class FakeAnthropicConCache:
+    """
+    Stand-in local de AsyncAnthropic que imita la caché de prompts: el texto hasta
+    el último bloque con cache_control se escribe en caché la primera vez y se
+    lee en las siguientes llamadas
+    """
+
+    def __init__(self):
+        self.messages = self
+        self.prefijos = set()
+        self.peticiones = []
+
+    async def create(self, model, max_tokens, temperature, messages):
+        self.peticiones.append(messages)
+        bloques = messages[0]["content"]
+        if isinstance(bloques, str):
+            bloques = [{"type": "text", "text": bloques}]
+
+        prefijo, tokens_prefijo, tokens_resto = "", 0, 0
+        for bloque in bloques:
+            tokens = len(bloque["text"].split())
+            if "cache_control" in bloque:
+                prefijo += bloque["text"]
+                tokens_prefijo += tokens + tokens_resto
+                tokens_resto = 0
+            else:
+                tokens_resto += tokens
+
+        lectura = escritura = 0
+        if prefijo in self.prefijos:
+            lectura = tokens_prefijo
+        elif prefijo:
+            self.prefijos.add(prefijo)
+            escritura = tokens_prefijo
+
+        texto = "TÍTULO: Título generado con caché\n\nCONTENIDO:\n" + "Contenido generado de prueba " * 3
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=texto)],
+            usage=types.SimpleNamespace(
+                input_tokens=tokens_resto,
+                output_tokens=10,
+                cache_read_input_tokens=lectura,
+                cache_creation_input_tokens=escritura
+            )
+        )
+
+
+def make_noticia_con_estilo(titulo):
+    noticia = make_noticia_temporal()
+    noticia.titulo = titulo
+    item = types.SimpleNamespace(contenido="Usa frases cortas y voz activa.", orden=1)
+    noticia.seccion.estilo = types.SimpleNamespace(id=3, nombre="Manual", configuracion={"tono": "formal"}, items=[item])
+    return noticia
+
+
+def generar(gen, noticia, llm):
+    return asyncio.run(gen.generar_para_salida_temporal_async(noticia, make_salida(1), llm))
+
+
+def test_prefijo_de_estilo_primero_y_noticia_al_final():
+    plantillas.limpiar()
+    gen = GeneradorIA(db=None)
+
+    mensajes, _ = gen._preparar_prompt_temporal(make_noticia_con_estilo("Noticia A"), make_salida(1))
+    bloques = mensajes[0]["content"]
+
+    assert len(bloques) == 2
+    assert bloques[0]["cache_control"] == {"type": "ephemeral"}
+    assert "ESTILO Y DIRECTIVAS" in bloques[0]["text"]
+    assert "Usa frases cortas" in bloques[0]["text"]
+    assert "Noticia A" not in bloques[0]["text"]
+    assert "cache_control" not in bloques[1]
+    assert "NOTICIA A PROCESAR" in bloques[1]["text"]
+
+
+def test_tokens_de_cache_escritura_y_lectura():
+    plantillas.limpiar()
+    llm = make_llm()
+    cliente = FakeAnthropicConCache()
+    gen = GeneradorIA(db=None)
+    gen._clientes_async[llm.id] = cliente
+    gen._registrar_tokens = lambda llm, tokens: None
+
+    primera = generar(gen, make_noticia_con_estilo("Noticia A"), llm)
+    segunda = generar(gen, make_noticia_con_estilo("Noticia B"), llm)
+
+    # Mismo prefijo en ambas peticiones, distinta parte variable
+    assert cliente.peticiones[0][0]["content"][0] == cliente.peticiones[1][0]["content"][0]
+    assert primera["tokens_cache_escritura"] > 0 and primera["tokens_cache_lectura"] == 0
+    assert segunda["tokens_cache_lectura"] == primera["tokens_cache_escritura"]
+    assert segunda["tokens_cache_escritura"] == 0
+    # tokens_usados incluye la entrada servida desde caché
+    assert segunda["tokens_usados"] == primera["tokens_usados"]
+
+
+def test_metricas_de_valor_incluyen_tokens_de_cache():
+    gen = GeneradorIA(db=None)
+    base = dict(
+        tiempo_generacion_total=2.0, tokens_totales=10000, cantidad_salidas=2,
+        modelo_usado="claude-3-5-sonnet-20241022", contenido_total="texto " * 100
+    )
+
+    sin_cache = gen.calcular_metricas_valor(**base)
+    con_cache = gen.calcular_metricas_valor(**base, tokens_cache_lectura=5000)
+
+    assert con_cache["tokens_cache_lectura"] == 5000
+    assert con_cache["tokens_cache_escritura"] == 0
+    assert con_cache["costo_generacion"] < sin_cache["costo_generacion"]
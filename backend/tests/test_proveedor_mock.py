@@ -0,0 +1,114 @@
+"""
+Tests para el proveedor LLM simulado de pruebas de carga (services/proveedor_mock.py)
+"""
+import asyncio
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import enrutamiento, proveedor_mock, proveedores_llm
+from services.generador_ia import GeneradorIA
+
+PROMPT = "TÍTULO: Lluvias en la costa\nCONTENIDO ORIGINAL: Las lluvias afectaron a varios barrios de la ciudad.\nSECCIÓN: Local"
+
+
+def llm_mock(llm_id=1, **mock):
+    return SimpleNamespace(id=llm_id, nombre="Mock", proveedor="Mock", modelo_id="mock-1", api_key="",
+                           url_api=None, configuracion={"mock": mock})
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    proveedor_mock.reiniciar_estadisticas()
+    yield
+    proveedor_mock.reiniciar_estadisticas()
+
+
+def test_respuesta_determinista_y_uso_realista():
+    llm = llm_mock(latencia={"ms": 0}, tokens_por_segundo=0, tokens_salida=[40, 80])
+    uno = asyncio.run(proveedores_llm.completar_async(proveedor_mock.ClienteMock(llm), llm, PROMPT, 2000))
+    dos = asyncio.run(proveedores_llm.completar_async(proveedor_mock.ClienteMock(llm), llm, PROMPT, 2000))
+
+    assert uno == dos
+    texto, uso = uno
+    assert texto.startswith("TÍTULO: Lluvias en la costa\n\nCONTENIDO:\nLas lluvias afectaron")
+    assert uso["tokens"] > 40
+    otro, _ = asyncio.run(proveedores_llm.completar_async(proveedor_mock.ClienteMock(llm), llm, PROMPT + ".", 2000))
+    assert otro != texto
+    # max_tokens acota la respuesta
+    corto, uso_corto = asyncio.run(proveedores_llm.completar_async(proveedor_mock.ClienteMock(llm), llm, PROMPT, 10))
+    assert uso_corto["tokens"] < uso["tokens"]
+    assert proveedor_mock.get_estadisticas()["llamadas"] == 4
+
+
+def test_distribuciones_de_latencia():
+    rng = random.Random(1)
+    assert proveedor_mock.muestrear_latencia_ms({"distribucion": "fija", "ms": 250}, rng) == 250
+    normal = [proveedor_mock.muestrear_latencia_ms({"distribucion": "normal", "ms": 200, "desviacion_ms": 20}, rng)
+              for _ in range(2000)]
+    assert 190 < statistics.mean(normal) < 210
+    cola = sorted(proveedor_mock.muestrear_latencia_ms({"distribucion": "cola_larga", "ms": 100, "p99_ms": 2000}, rng)
+                  for _ in range(5000))
+    assert 85 < cola[2500] < 115
+    assert 1400 < cola[4950] < 2800
+
+    with pytest.raises(ValueError):
+        proveedor_mock.ClienteMock(llm_mock(latencia={"distribucion": "uniforme"}))
+
+
+def test_errores_inyectados_son_reintentables():
+    llm = llm_mock(latencia={"ms": 0}, tasa_429=0.5, tasa_500=0.3, tasa_timeout=0.2, timeout_ms=0)
+    cliente = proveedor_mock.ClienteMock(llm)
+
+    async def llamar():
+        try:
+            await cliente.completar(PROMPT, 100)
+        except Exception as e:
+            return e
+
+    errores = [asyncio.run(llamar()) for _ in range(200)]
+    assert all(enrutamiento.es_reintentable(e) for e in errores)
+    estadisticas = proveedor_mock.get_estadisticas()
+    assert estadisticas["errores_429"] + estadisticas["errores_500"] + estadisticas["timeouts"] == 200
+    assert estadisticas["errores_429"] > estadisticas["timeouts"] > 0
+    assert estadisticas["tokens_salida"] == 0
+
+
+def test_streaming_al_ritmo_de_tokens_por_segundo():
+    llm = llm_mock(latencia={"ms": 0}, tokens_por_segundo=2000, tokens_salida=[100, 100])
+    cliente = proveedor_mock.ClienteMock(llm)
+
+    async def leer():
+        eventos = []
+        async for evento in proveedores_llm.stream_async(cliente, llm, PROMPT, 2000):
+            eventos.append(evento)
+        return eventos
+
+    inicio = time.perf_counter()
+    eventos = asyncio.run(leer())
+    duracion = time.perf_counter() - inicio
+
+    deltas = [e["texto"] for e in eventos if e["tipo"] == "delta"]
+    assert len(deltas) > 10
+    texto, uso = asyncio.run(proveedores_llm.completar_async(proveedor_mock.ClienteMock(llm), llm, PROMPT, 2000))
+    assert "".join(deltas) == texto
+    assert eventos[-1] == {"tipo": "fin", "uso": uso}
+    # ~100+ tokens a 2000 tokens/s
+    assert duracion >= 0.04
+
+
+def test_generador_usa_el_proveedor_mock(monkeypatch):
+    llm = llm_mock(llm_id=99, latencia={"ms": 0}, tokens_por_segundo=0)
+    monkeypatch.setattr(GeneradorIA, "_registrar_tokens", lambda self, llm, tokens: None)
+    generador = GeneradorIA(SimpleNamespace())
+
+    resultado, tokens = generador._invocar_llm(llm, PROMPT)
+    resultado_async, tokens_async = asyncio.run(generador._ainvocar_llm(llm, PROMPT))
+
+    assert resultado["titulo"] == "Lluvias en la costa"
+    assert tokens == tokens_async > 0
+    assert resultado_async["contenido"] == resultado["contenido"]
+    proveedores_llm.invalidar_clientes_llm(99)
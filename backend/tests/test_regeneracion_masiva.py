@@ -0,0 +1,260 @@
+"""
+Tests para la regeneración masiva (services/regeneracion_masiva.py) con el
+sustituto local de las APIs batch (services/proveedores_batch.py)
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from config import settings
+from core.database import Base
+from models.orm_models import (
+    RegeneracionMasiva,
+    TrabajoGeneracion,
+    Noticia,
+    NoticiaSalida,
+    SalidaMaestro,
+    LLMMaestro
+)
+from services import cola_generacion, proveedores_batch, proveedores_llm, regeneracion_masiva
+from services.generador_ia import GeneradorIA
+
+
+@pytest.fixture(autouse=True)
+def limpio(monkeypatch):
+    regeneracion_masiva.reiniciar_estadisticas()
+    monkeypatch.setattr(settings, "BULK_MAX_EN_VUELO", 2)
+    monkeypatch.setattr(settings, "BULK_BATCH_TAMANO", 2)
+    monkeypatch.setattr(settings, "BULK_BATCH_MAX_EN_VUELO", 1)
+    yield
+    proveedores_batch._lotes_locales.clear()
+
+
+@pytest.fixture
+def sesiones():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    fabrica = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    db = fabrica()
+    db.add(LLMMaestro(id=1, nombre="Claude", proveedor="Anthropic", modelo_id="claude", url_api="x", api_key="", activo=True))
+    for salida_id in (1, 2):
+        db.add(SalidaMaestro(id=salida_id, nombre=f"Salida {salida_id}", tipo_salida="digital", activo=True))
+    noticias = [
+        (1, 'activo', datetime(2026, 1, 10)),
+        (2, 'archivado', datetime(2026, 2, 10)),
+        (3, 'activo', datetime(2026, 3, 10)),
+        (4, 'eliminado', datetime(2026, 3, 11)),
+        (5, 'activo', datetime(2026, 4, 10)),
+    ]
+    for noticia_id, estado, fecha in noticias:
+        db.add(Noticia(id=noticia_id, titulo=f"Noticia {noticia_id}", contenido="Contenido de la noticia",
+                       usuario_id=1, estado=estado, fecha=fecha))
+        db.add(NoticiaSalida(noticia_id=noticia_id, salida_id=1, titulo="Antiguo", contenido_generado="Contenido antiguo"))
+    db.commit()
+    db.close()
+    return fabrica
+
+
+def crear(fabrica, modo="cola", **filtro):
+    db = fabrica()
+    try:
+        return regeneracion_masiva.crear(db, filtro, llm_id=1, modo=modo).id
+    finally:
+        db.close()
+
+
+def leer(fabrica, regeneracion_id):
+    db = fabrica()
+    try:
+        return regeneracion_masiva.resumen(db, db.get(RegeneracionMasiva, regeneracion_id))
+    finally:
+        db.close()
+
+
+def terminar_trabajos(fabrica):
+    db = fabrica()
+    for trabajo in db.query(TrabajoGeneracion).filter(TrabajoGeneracion.estado == cola_generacion.PENDIENTE):
+        trabajo.estado = cola_generacion.COMPLETADO
+    db.commit()
+    db.close()
+
+
+def test_filtro_por_estado_y_fechas_excluye_eliminadas(sesiones):
+    db = sesiones()
+    todas = regeneracion_masiva.consulta_noticias(db, {})
+    assert sorted(n.id for n in todas) == [1, 2, 3, 5]
+    filtradas = regeneracion_masiva.consulta_noticias(db, {"estado": "activo", "desde": "2026-02-01T00:00:00"})
+    assert sorted(n.id for n in filtradas) == [3, 5]
+    db.close()
+
+    assert leer(sesiones, crear(sesiones, hasta=datetime(2026, 2, 28)))["total_noticias"] == 2
+
+
+def test_modo_cola_limita_trabajos_en_vuelo_y_completa(sesiones):
+    regeneracion_id = crear(sesiones)
+
+    asyncio.run(regeneracion_masiva.avanzar(regeneracion_id, sesiones))
+    asyncio.run(regeneracion_masiva.avanzar(regeneracion_id, sesiones))  # sin huecos: no encola más
+    db = sesiones()
+    trabajos = db.query(TrabajoGeneracion).order_by(TrabajoGeneracion.id).all()
+    assert [t.noticia_id for t in trabajos] == [1, 2]
+    assert all(t.prioridad == "lote" and t.regenerar and t.salidas_ids == [1] for t in trabajos)
+    assert all(t.regeneracion_id == regeneracion_id for t in trabajos)
+    db.close()
+    resumen = leer(sesiones, regeneracion_id)
+    assert resumen["noticias_enviadas"] == 2 and resumen["porcentaje"] == 0.0
+
+    estados = []
+    for _ in range(2):
+        terminar_trabajos(sesiones)
+        estados.append(asyncio.run(regeneracion_masiva.avanzar(regeneracion_id, sesiones)))
+
+    assert estados == [regeneracion_masiva.EN_CURSO, regeneracion_masiva.COMPLETADA]
+    resumen = leer(sesiones, regeneracion_id)
+    assert resumen["trabajos"] == {cola_generacion.COMPLETADO: 4}
+    assert resumen["porcentaje"] == 100.0
+
+
+def test_pausada_no_avanza_y_cancelar_cancela_pendientes(sesiones):
+    regeneracion_id = crear(sesiones)
+    asyncio.run(regeneracion_masiva.avanzar(regeneracion_id, sesiones))
+    db = sesiones()
+    assert regeneracion_masiva.pausar(db, db.get(RegeneracionMasiva, regeneracion_id))
+    db.close()
+    assert asyncio.run(regeneracion_masiva.avanzar(regeneracion_id, sesiones)) is None
+
+    db = sesiones()
+    assert regeneracion_masiva.cancelar(db, db.get(RegeneracionMasiva, regeneracion_id))
+    estados = {t.estado for t in db.query(TrabajoGeneracion).all()}
+    db.close()
+    assert estados == {cola_generacion.CANCELADO}
+
+
+@pytest.fixture
+def prompts_simples(monkeypatch):
+    def _preparar(self, noticia, salida, prompt=None, estilo=None, llm=None):
+        return f"Reescribe la noticia {noticia.id} para la salida {salida.id}", None
+    monkeypatch.setattr(GeneradorIA, "_preparar_prompt_salida", _preparar)
+
+
+def test_modo_batch_guarda_salidas_y_reencola_las_fallidas(sesiones, prompts_simples):
+    regeneracion_id = crear(sesiones, modo="batch", estado="activo")
+
+    async def ejecutor(peticion):
+        if peticion.custom_id == "n3-s1":
+            raise RuntimeError("overloaded")
+        return f"TÍTULO: Nuevo {peticion.custom_id}\n\nCONTENIDO:\nContenido regenerado por lote", proveedores_llm.uso_tokens(40)
+
+    async def escenario():
+        estados = []
+        for _ in range(4):
+            estados.append(await regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor))
+            await asyncio.sleep(0.01)  # el sustituto local procesa el lote
+        return estados
+
+    estados = asyncio.run(escenario())
+
+    db = sesiones()
+    regeneracion = db.get(RegeneracionMasiva, regeneracion_id)
+    lotes = list(regeneracion.lotes_batch.values())
+    assert [l["noticias"] for l in lotes] == [[1, 3], [5]]
+    assert all(l["estado"] == regeneracion_masiva.LOTE_PROCESADO for l in lotes)
+    titulos = {ns.noticia_id: ns.titulo for ns in db.query(NoticiaSalida).all()}
+    assert titulos == {1: "Nuevo n1-s1", 2: "Antiguo", 3: "Antiguo", 4: "Antiguo", 5: "Nuevo n5-s1"}
+    reencolado = db.query(TrabajoGeneracion).one()
+    assert (reencolado.noticia_id, reencolado.salidas_ids, reencolado.prioridad) == (3, [1], "lote")
+    db.close()
+
+    # Termina cuando el trabajo reencolado sale de la cola
+    assert estados[-1] == regeneracion_masiva.EN_CURSO
+    terminar_trabajos(sesiones)
+    assert asyncio.run(regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor)) == regeneracion_masiva.COMPLETADA
+    assert leer(sesiones, regeneracion_id)["salidas_batch_completadas"] == 2
+    assert regeneracion_masiva.get_estadisticas()["batch"]["lotes_enviados"] == 2
+
+
+def test_lote_local_perdido_tras_reinicio_se_reenvia(sesiones, prompts_simples):
+    regeneracion_id = crear(sesiones, modo="batch", estado="archivado")
+
+    async def ejecutor(peticion):
+        return "TÍTULO: Reenviado tras el reinicio\n\nCONTENIDO:\nContenido regenerado por lote", proveedores_llm.uso_tokens(40)
+
+    async def primer_proceso():
+        await regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor)
+
+    asyncio.run(primer_proceso())
+    proveedores_batch._lotes_locales.clear()  # el proceso se reinicia: el lote en memoria se pierde
+
+    async def segundo_proceso():
+        await regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor)
+        await asyncio.sleep(0.01)
+        return await regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor)
+
+    assert asyncio.run(segundo_proceso()) == regeneracion_masiva.COMPLETADA
+    db = sesiones()
+    estados = sorted(l["estado"] for l in db.get(RegeneracionMasiva, regeneracion_id).lotes_batch.values())
+    titulo = db.query(NoticiaSalida).filter(NoticiaSalida.noticia_id == 2).one().titulo
+    db.close()
+    assert estados == [regeneracion_masiva.LOTE_PROCESADO, regeneracion_masiva.LOTE_REENVIADO]
+    assert titulo == "Reenviado tras el reinicio"
+
+
+def test_segunda_regeneracion_sin_cambios_no_envia_lotes(sesiones, prompts_simples):
+    async def ejecutor(peticion):
+        return "TÍTULO: Regenerada por lote\n\nCONTENIDO:\nContenido regenerado por lote", proveedores_llm.uso_tokens(40)
+
+    async def ejecutar(regeneracion_id):
+        await regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor)
+        await asyncio.sleep(0.01)
+        await regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor)
+        return leer(sesiones, regeneracion_id)
+
+    assert asyncio.run(ejecutar(crear(sesiones, modo="batch", estado="archivado")))["estado"] == regeneracion_masiva.COMPLETADA
+    # Nada cambió: la segunda se completa sin enviar ningún lote
+    resumen = asyncio.run(ejecutar(crear(sesiones, modo="batch", estado="archivado")))
+    assert resumen["estado"] == regeneracion_masiva.COMPLETADA
+    assert resumen["salidas_omitidas"] == 1 and resumen["salidas_batch_completadas"] == 0
+    assert regeneracion_masiva.get_estadisticas()["batch"]["lotes_enviados"] == 1
+
+
+def test_envio_batch_sin_fila_bloqueada_y_reenvio_tras_fallo(sesiones, prompts_simples, monkeypatch):
+    regeneracion_id = crear(sesiones, modo="batch", estado="archivado")
+    enviar_original = proveedores_batch.enviar
+    vistos = []
+
+    async def enviar(llm, peticiones, ejecutor_local=None):
+        # Durante la llamada al proveedor el cursor y la reserva ya están confirmados
+        # y otro supervisor no puede avanzar la misma regeneración
+        db = sesiones()
+        regeneracion = db.get(RegeneracionMasiva, regeneracion_id)
+        vistos.append((regeneracion.cursor_noticia_id, [l["estado"] for l in regeneracion.lotes_batch.values()]))
+        db.close()
+        assert await regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor) is None
+        if len(vistos) == 1:
+            raise ConnectionError("proveedor caído")
+        return await enviar_original(llm, peticiones, ejecutor_local)
+
+    async def ejecutor(peticion):
+        return "TÍTULO: Tras el reintento\n\nCONTENIDO:\nContenido regenerado por lote", proveedores_llm.uso_tokens(40)
+
+    monkeypatch.setattr(proveedores_batch, "enviar", enviar)
+
+    async def escenario():
+        estados = [await regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor)]
+        estados.append(await regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor))
+        await asyncio.sleep(0.01)
+        estados.append(await regeneracion_masiva.avanzar(regeneracion_id, sesiones, ejecutor))
+        return estados
+
+    estados = asyncio.run(escenario())
+
+    assert estados == [regeneracion_masiva.EN_CURSO, regeneracion_masiva.EN_CURSO, regeneracion_masiva.COMPLETADA]
+    # El reenvío usa el lote reservado: el cursor no vuelve a avanzar
+    assert vistos == [(2, [regeneracion_masiva.LOTE_ENVIANDO])] * 2
+    resumen = leer(sesiones, regeneracion_id)
+    assert resumen["noticias_enviadas"] == 1 and resumen["salidas_batch_completadas"] == 1
+    assert regeneracion_masiva.get_estadisticas()["lotes_enviados"] == 1
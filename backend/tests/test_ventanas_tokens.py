@@ -0,0 +1,158 @@
+"""
+Tests para las ventanas deslizantes de consumo de tokens (services/ventanas_tokens.py)
+"""
+import asyncio
+import time
+import types
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.orm_models import VentanaTokens
+from services import ventanas_tokens
+from services.generador_ia import GeneradorIA
+
+
+def make_llm(max_concurrencia=None):
+    llm = types.SimpleNamespace()
+    llm.id = 99
+    llm.nombre = "LLM Test"
+    llm.proveedor = "Anthropic"
+    llm.modelo_id = "modelo-test"
+    llm.api_key = ""
+    llm.url_api = "https://api.test"
+    llm.tokens_usados_hoy = 0
+    llm.configuracion = {"max_concurrencia": max_concurrencia} if max_concurrencia else {}
+    return llm
+
+
+def make_salida(salida_id, tipo="digital"):
+    s = types.SimpleNamespace()
+    s.id = salida_id
+    s.nombre = f"Salida {salida_id}"
+    s.tipo_salida = tipo
+    s.configuracion = {}
+    return s
+
+
+def make_noticia_temporal():
+    item = types.SimpleNamespace(contenido="Reescribe la noticia {titulo} para {nombre_salida}.", orden=1)
+    prompt = types.SimpleNamespace(nombre="PromptTest", items=[item])
+    seccion = types.SimpleNamespace(nombre="General", prompt=prompt, estilo=None)
+    n = types.SimpleNamespace()
+    n.id = None
+    n.titulo = "Título de la noticia de prueba"
+    n.contenido = "Contenido de la noticia de prueba con suficiente texto."
+    n.fecha = types.SimpleNamespace(strftime=lambda fmt: "17/10/2025")
+    n.seccion = seccion
+    return n
+
+
+class FakeAnthropicContador:
+    def __init__(self):
+        self.messages = self
+        self.llamadas = 0
+
+    async def create(self, model, max_tokens, temperature, messages):
+        self.llamadas += 1
+        texto = f"TÍTULO: Título de la llamada {self.llamadas}\n\nCONTENIDO:\n" + "Contenido generado de prueba " * 3
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=texto)],
+            usage=types.SimpleNamespace(input_tokens=30, output_tokens=10)
+        )
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    ventanas_tokens.limpiar()
+    yield
+    ventanas_tokens.limpiar()
+
+
+@pytest.fixture
+def sesiones():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    VentanaTokens.__table__.create(engine)
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+def test_anillo_recicla_las_ranuras_al_avanzar():
+    anillo = ventanas_tokens.Anillo(60, 1)
+    anillo.sumar(1000, 10)
+    anillo.sumar(1030, 5)
+
+    assert anillo.total(1030) == 15
+    # A los 60 s la primera ranura sale de la ventana sin reset explícito
+    assert anillo.total(1060) == 5
+    anillo.sumar(1060, 7)  # misma ranura que el instante 1000: se recicla
+    assert anillo.datos[1000 % 60] == [1060, 7]
+    assert anillo.total(1090) == 7
+    # Un consumo más viejo que la ranura no pisa el vigente
+    anillo.sumar(1000, 100)
+    assert anillo.total(1060) == 12
+
+
+def test_registrar_suma_en_cada_ambito_y_escala():
+    ahora = time.time()
+    ventanas_tokens.registrar(1, 7, 3, 40, instante=ahora - 120)  # hace 2 min
+    ventanas_tokens.registrar(1, 7, None, 10, instante=ahora)
+
+    assert ventanas_tokens.uso("llm", 1)["ventanas"] == {"minuto": 10, "hora": 50, "dia": 50}
+    assert ventanas_tokens.uso("usuario", 7)["ventanas"]["hora"] == 50
+    assert ventanas_tokens.uso("seccion", 3)["ventanas"] == {"minuto": 0, "hora": 40, "dia": 40}
+    assert ventanas_tokens.uso("llm", 2)["ventanas"]["dia"] == 0
+
+    serie = ventanas_tokens.uso("llm", 1, "hora")["serie"]
+    assert len(serie) == 60
+    assert serie[-1]["tokens"] == 10 and sum(r["tokens"] for r in serie) == 50
+    assert [r["entidad_id"] for r in ventanas_tokens.resumen("usuario")] == [7]
+
+
+def test_generacion_registra_llm_usuario_y_seccion():
+    llm = make_llm()
+    noticia = make_noticia_temporal()
+    noticia.seccion_id = 4
+    gen = GeneradorIA(db=None)
+    gen.usuario_id = 7
+    gen._clientes_async[llm.id] = FakeAnthropicContador()
+
+    asyncio.run(gen.generar_para_salida_temporal_async(noticia, make_salida(1), llm, usar_cache=False))
+
+    for ambito, entidad_id in (("llm", llm.id), ("usuario", 7), ("seccion", 4)):
+        assert ventanas_tokens.uso(ambito, entidad_id)["ventanas"]["minuto"] == 40
+
+
+def test_sincronizacion_persiste_y_suma_lo_de_varios_workers(sesiones):
+    ahora = time.time()
+    # Worker A
+    ventanas_tokens.registrar(1, None, None, 30, instante=ahora)
+    ventanas_tokens._sincronizar(sesiones)
+
+    # Worker B (memoria vacía, p. ej. tras reiniciar)
+    ventanas_tokens.limpiar()
+    ventanas_tokens.registrar(1, None, None, 12, instante=ahora)
+    filas = ventanas_tokens._sincronizar(sesiones)
+
+    assert filas == 3  # minuto, hora y día del LLM 1
+    assert ventanas_tokens.uso("llm", 1)["ventanas"]["hora"] == 42
+
+    # Un arranque nuevo recupera las ventanas desde la tabla
+    ventanas_tokens.limpiar()
+    ventanas_tokens._sincronizar(sesiones)
+    assert ventanas_tokens.uso("llm", 1)["ventanas"]["dia"] == 42
+
+
+def test_reiniciar_vacia_tambien_la_tabla(sesiones):
+    ventanas_tokens.registrar(1, 7, None, 30)
+    ventanas_tokens._sincronizar(sesiones)
+
+    ventanas_tokens.reiniciar("llm", 1)
+    assert ventanas_tokens.uso("llm", 1)["ventanas"]["dia"] == 0
+    ventanas_tokens._sincronizar(sesiones)
+
+    ventanas_tokens.limpiar()
+    ventanas_tokens._sincronizar(sesiones)
+    assert ventanas_tokens.uso("llm", 1)["ventanas"]["dia"] == 0
+    assert ventanas_tokens.uso("usuario", 7)["ventanas"]["dia"] == 30
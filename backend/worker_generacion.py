@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Pool de workers de la cola de generación (tabla generation_jobs)
+
+Lanza N procesos; cada uno reclama trabajos con SELECT ... FOR UPDATE SKIP LOCKED
+y ejecuta hasta --concurrencia a la vez. Con workers dedicados conviene poner
+COLA_TRABAJOS_EN_API=False en la API para que solo encole.
+
+Cada proceso supervisa además las regeneraciones masivas (POST /api/generar/bulk);
+la fila bloqueada evita que dos procesos avancen la misma a la vez.
+
+Al recibir SIGTERM/SIGINT cada proceso deja de reclamar, devuelve a la cola lo que
+tenía en curso y vuelca el consumo de tokens pendiente.
+
+Uso:
+    python worker_generacion.py --procesos 2 --concurrencia 4
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+
+from config import settings
+from core import logs
+from services import cola_generacion, presupuesto_tokens, ventanas_tokens, regeneracion_masiva
+from services.proveedores_llm import cerrar_executor, cerrar_clientes
+
+logger = logging.getLogger(__name__)
+
+
+async def _principal(concurrencia: int) -> None:
+    tarea = asyncio.create_task(cola_generacion.trabajar(concurrencia=concurrencia))
+    loop = asyncio.get_running_loop()
+    for senal in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(senal, tarea.cancel)
+
+    # El consumo de tokens se acumula en memoria del proceso, igual que en la API
+    tareas_fondo = [
+        asyncio.create_task(presupuesto_tokens.volcar_periodicamente()),
+        asyncio.create_task(ventanas_tokens.sincronizar_periodicamente()),
+        asyncio.create_task(regeneracion_masiva.supervisar())
+    ]
+    try:
+        await tarea
+    except asyncio.CancelledError:
+        pass
+    finally:
+        for t in tareas_fondo:
+            t.cancel()
+        try:
+            await presupuesto_tokens.volcar()
+            await ventanas_tokens.sincronizar()
+        except Exception as e:
+            logger.error("⚠️ Error volcando consumo de tokens: %s", e)
+        cerrar_executor()
+        await cerrar_clientes()
+        logger.info("🔴 Worker de generación %s detenido", cola_generacion.id_worker())
+
+
+def _proceso(concurrencia: int) -> None:
+    logs.configurar()
+    try:
+        asyncio.run(_principal(concurrencia))
+    finally:
+        logs.detener()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos worker")
+    parser.add_argument("--concurrencia", type=int, default=settings.COLA_CONCURRENCIA,
+                        help="Trabajos simultáneos por proceso")
+    args = parser.parse_args()
+
+    if args.procesos <= 1:
+        _proceso(args.concurrencia)
+    else:
+        procesos = [
+            multiprocessing.Process(target=_proceso, args=(args.concurrencia,), name=f"worker-generacion-{i}")
+            for i in range(args.procesos)
+        ]
+        for p in procesos:
+            p.start()
+        try:
+            for p in procesos:
+                p.join()
+        except KeyboardInterrupt:
+            for p in procesos:
+                p.terminate()
+                p.join()